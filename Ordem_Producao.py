@@ -9,7 +9,6 @@ from __future__ import annotations
 import os
 import sys
 import json
-import traceback
 import subprocess
 from dataclasses import dataclass, asdict
 from datetime import datetime, date
@@ -30,8 +29,30 @@ from openpyxl.cell.cell import MergedCell
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
 
-from reportlab.lib.pagesizes import mm
-from reportlab.pdfgen import canvas
+from etiqueta import (
+    LAYOUT_1_POR_PAGINA,
+    LAYOUTS_ETIQUETA,
+    caminho_pdf_unico,
+    gerar_pdf_etiquetas_em_partes,
+    por_folha_do_layout,
+)
+from etiqueta_lote import JanelaLoteEtiquetas, reservar_seriais
+
+import sistema_log
+from sistema_metricas import METRICAS, JanelaDiagnostico
+from referencia_cache import ReferenciaCacheMixin
+from validacao_insumos import ValidacaoInsumosMixin
+from baixa_producao import FinalizacaoOPMixin
+from estoque_razao import RazaoEstoqueMixin
+from arquivo_ordens import ArquivoOrdensMixin
+from situacao_auditoria import AuditoriaSituacaoMixin
+from consultas_preparadas import ConsultasPreparadasMixin, declarar
+from conexao_resiliente import PARAMETROS_KEEPALIVE, ConexaoIndisponivel, ConexaoResilienteMixin, eh_leitura
+import tempo_limite
+from tempo_limite import (CONSULTA, GRAVACAO, LISTA, RELATORIO, ConexaoLimitada, CursorLimitado,
+                          LimiteConsultaMixin)
+from modelo_lista import ModeloLista
+from ouvinte_alteracoes import obter_ouvinte
 
 
 # ============================================================
@@ -54,6 +75,8 @@ if not os.path.exists(BASE_DIR):
         BASE_DIR = os.path.join(APP_DIR, "Planilhas_OP")
         os.makedirs(BASE_DIR, exist_ok=True)
 
+METRICAS.log_dir = os.path.join(BASE_DIR, "logs")
+
 CAMINHO_MODELO = os.path.join(BASE_DIR, "pedido-de-compra v2.xlsx")
 CAMINHO_SAIDA = os.path.join(BASE_DIR, "saida_pedido-de-compra v2.xlsx")
 
@@ -62,18 +85,12 @@ N8N_WEBHOOK_URL = "http://localhost:56789/webhook/ordem-producao"
 
 
 def log_exception(err: Exception, context: str = "") -> str:
-    try:
-        texto = "".join(traceback.format_exception(
-            type(err), err, err.__traceback__))
-        log_path = os.path.join(BASE_DIR, "erro_app.log")
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write("\n" + ("=" * 80) + "\n")
-            if context:
-                f.write(f"{context}\n")
-            f.write(texto)
-        return log_path
-    except Exception:
-        return os.path.join(BASE_DIR, "erro_app.log")
+    """
+    Registra a exception (com traceback) no log do sistema e devolve o
+    caminho do arquivo para mostrar ao usuário.
+    """
+    sistema_log.log_exception(BASE_DIR, "erro_app.log", err, context)
+    return sistema_log.caminho_log(BASE_DIR, "erro_app.log")
 
 
 # ============================================================
@@ -187,6 +204,15 @@ class AppConfig:
     bling_token: str = ""
     bling_timeout: int = 20
 
+    # F11: marca por padrão a baixa de insumos/entrada do produto (baixa_producao.py)
+    baixa_estoque_ao_finalizar: bool = False
+
+    # statement_timeout por classe de consulta (tempo_limite.py); 0 = sem limite
+    limite_consulta_ms: int = 3000
+    limite_lista_ms: int = 15000
+    limite_relatorio_ms: int = 120000
+    limite_gravacao_ms: int = 10000
+
 
 def config_path() -> str:
     return os.path.join(BASE_DIR, "config_op.json")
@@ -324,9 +350,52 @@ def gerar_abas_fornecedor_pedido(
 # DB
 # ============================================================
 
-class SistemaOrdemProducao:
+# consultas por tecla/componente: PREPARE uma vez por conexão (consultas_preparadas.py)
+declarar("produto", ("text",), """
+    SELECT p."produtoId", p."nomeProduto", p."sku", p."preco", p."tipo"
+      FROM "Ekenox"."produtos" p
+     WHERE p."produtoId"::text = $1
+""")
+declarar("saldo_fisico", ("bigint",), """
+    SELECT COALESCE(SUM(e."saldoFisico"), 0)
+      FROM "Ekenox"."estoque" e
+     WHERE e."fkProduto"::bigint = $1
+""")
+declarar("qtd_arranjo_sku", ("text[]",), """
+    SELECT COALESCE(SUM(a."quantidade"), 0)
+      FROM "Ekenox"."arranjo" a
+     WHERE UPPER(TRIM(a."sku")) = ANY($1)
+""")
+declarar("estoque_maximo", ("bigint",), """
+    SELECT ip."estoqueMaximo"
+      FROM "Ekenox"."infoProduto" ip
+     WHERE ip."fkProduto"::bigint = $1
+     LIMIT 1
+""")
+declarar("estrutura", ("bigint",), """
+    SELECT e."componente", e."quantidade"
+      FROM "Ekenox"."estrutura" e
+     WHERE e."fkproduto"::bigint = $1
+     ORDER BY e."componente"
+""")
+declarar("info_produto", ("bigint",), """
+    SELECT i."estoqueMinimo", i."estoqueMaximo", i."precoCompra", i."fkFornecedor", i."fkProduto"
+      FROM "Ekenox"."infoProduto" i
+     WHERE i."fkProduto"::bigint = $1
+""")
+declarar("fornecedor", ("bigint",), """
+    SELECT f."idFornecedor", f."nome", f."codigo", f."telefone", f."celular"
+      FROM "Ekenox"."fornecedor" f
+     WHERE f."idFornecedor" = $1
+""")
+
+
+class SistemaOrdemProducao(ReferenciaCacheMixin, ValidacaoInsumosMixin, FinalizacaoOPMixin,
+                           RazaoEstoqueMixin, ArquivoOrdensMixin, AuditoriaSituacaoMixin,
+                           ConsultasPreparadasMixin, ConexaoResilienteMixin, LimiteConsultaMixin):
     def __init__(self, cfg: AppConfig):
         self.cfg = cfg
+        tempo_limite.configurar(cfg)
         self.conn: Optional[psycopg2.extensions.connection] = None
         self.cursor: Optional[psycopg2.extensions.cursor] = None
         self.ultimo_erro: Optional[str] = None
@@ -341,8 +410,12 @@ class SistemaOrdemProducao:
                 password=self.cfg.db_password,
                 port=int(self.cfg.db_port),
                 connect_timeout=5,
+                connection_factory=ConexaoLimitada,
+                **PARAMETROS_KEEPALIVE,
             )
-            self.cursor = self.conn.cursor()
+            self.cursor = self.conn.cursor(cursor_factory=CursorLimitado)
+            self.ref_invalidar()
+            self.validacao_invalidar()
             return True
         except Exception as e:
             self.ultimo_erro = f"{type(e).__name__}: {e}"
@@ -360,71 +433,60 @@ class SistemaOrdemProducao:
         except Exception:
             pass
 
-    def _q(self, sql: str, params: Tuple = ()) -> None:
-        if not self.cursor:
-            raise RuntimeError("Sem cursor (não conectado).")
-        self.cursor.execute(sql, params)
+    def _q(self, sql: str, params: Tuple = (), classe: Optional[str] = None) -> None:
+        """classe (tempo_limite): padrão CONSULTA para leitura, GRAVACAO para escrita."""
+        leitura = eh_leitura(sql)
+        classe = classe or (CONSULTA if leitura else GRAVACAO)
+
+        def executar():
+            if not self.cursor:
+                raise RuntimeError("Sem cursor (não conectado).")
+            self._limitar(classe)
+            with METRICAS.medir(sql, params, self.cursor):
+                self.cursor.execute(sql, params)
+
+        # queda de conexão: reconecta e repete só leitura (conexao_resiliente.py)
+        self._executar_resiliente(executar, leitura)
 
     def gerar_numero_ordem(self) -> int:
         try:
-            self._q(
-                """SELECT COALESCE(MAX(numero),0) + 1 FROM "Ekenox"."ordem_producao";""")
-            r = self.cursor.fetchone()
-            return int(r[0]) if r and r[0] is not None else 1
+            return self._proximo_valor_ordens("numero")
         except Exception:
             return 1
 
     def gerar_id_ordem(self) -> int:
         try:
-            self._q(
-                """SELECT COALESCE(MAX(id),0) + 1 FROM "Ekenox"."ordem_producao";""")
-            r = self.cursor.fetchone()
-            return int(r[0]) if r and r[0] is not None else 1
+            return self._proximo_valor_ordens("id")
         except Exception:
             return 1
 
     def validar_produto(self, produto_id: int) -> Optional[Dict[str, Any]]:
         try:
-            sql = """
-                SELECT p."produtoId", p."nomeProduto", p."sku", p."preco", p."tipo"
-                  FROM "Ekenox"."produtos" p
-                 WHERE p."produtoId" = %s;
-            """
-            self._q(sql, (int(produto_id),))
+            self._qp("produto", (str(int(produto_id)),))
             r = self.cursor.fetchone()
             if not r:
                 return None
             return {"produtoid": r[0], "nomeproduto": r[1], "sku": r[2], "preco": r[3], "tipo": r[4]}
+        except ConexaoIndisponivel:
+            raise           # sem banco não é "produto não encontrado"
         except Exception:
             if self.conn:
                 self.conn.rollback()
             return None
 
     def validar_situacao(self, situacao_id: int) -> Optional[Dict[str, Any]]:
-        try:
-            self._q(
-                """SELECT s."id", s."nome" FROM "Ekenox"."situacao" s WHERE s."id" = %s;""",
-                (int(situacao_id),),
-            )
-            r = self.cursor.fetchone()
-            if not r:
-                return None
-            return {"id": r[0], "nome": r[1]}
-        except Exception:
-            if self.conn:
-                self.conn.rollback()
+        s = self.ref_situacao(situacao_id)
+        if not s:
             return None
+        return {"id": s["id"], "nome": s["nome"]}
 
     def saldo_fisico(self, produto_id: int) -> float:
         try:
-            sql = """
-                SELECT COALESCE(SUM(e."saldoFisico"), 0)
-                  FROM "Ekenox"."estoque" e
-                 WHERE e."fkProduto"::bigint = %s;
-            """
-            self._q(sql, (int(produto_id),))
+            self._qp("saldo_fisico", (int(produto_id),))
             r = self.cursor.fetchone()
             return float(r[0]) if r and r[0] is not None else 0.0
+        except ConexaoIndisponivel:
+            raise           # sem banco não é saldo 0
         except Exception:
             if self.conn:
                 self.conn.rollback()
@@ -464,12 +526,7 @@ class SistemaOrdemProducao:
             else:
                 candidatos.add(sku_norm + "N")
 
-            sql = """
-                SELECT COALESCE(SUM(a."quantidade"), 0)
-                  FROM "Ekenox"."arranjo" a
-                 WHERE UPPER(TRIM(a."sku")) = ANY(%s);
-            """
-            self._q(sql, (sorted(candidatos),))
+            self._qp("qtd_arranjo_sku", (sorted(candidatos),))
             row = self.cursor.fetchone()
             return float(row[0]) if row and row[0] is not None else 0.0
         except Exception:
@@ -478,24 +535,48 @@ class SistemaOrdemProducao:
             return 0.0
 
     def listar_produtos_disponiveis(self, limite: Optional[int] = None):
+        """
+        Produtos fora das categorias excluídas da produção (subárvore inteira,
+        ver categoria_hierarquia.sql). Sem a tabela categoria_excluida no banco,
+        usa a hierarquia calculada em memória pelo cache de referência (que
+        cai na lista fixa antiga quando nenhuma categoria tem filtro).
+        """
+        base_sql = """
+            SELECT p."produtoId", p."nomeProduto", p."sku", p."preco", p."tipo"
+              FROM "Ekenox"."produtos" AS p
+              JOIN "Ekenox"."infoProduto" AS ip
+                ON ip."fkProduto" = p."produtoId"
+             WHERE ip."fkCategoria" IS NOT NULL
+               AND {filtro}
+             ORDER BY p."nomeProduto"
+        """
+        filtro_tabela = """NOT EXISTS (
+                    SELECT 1 FROM "Ekenox"."categoria_excluida" ce
+                     WHERE ce."categoriaId" = ip."fkCategoria")"""
         try:
-            base_sql = """
-                SELECT p."produtoId", p."nomeProduto", p."sku", p."preco", p."tipo"
-                  FROM "Ekenox"."produtos" AS p
-                  JOIN "Ekenox"."infoProduto" AS ip
-                    ON ip."fkProduto" = p."produtoId"
-                 WHERE ip."fkCategoria" NOT IN (
-                    3844533,3983855,7879429,3869959,4241123,
-                    3870601,3844542,7651801,3983399,959867,
-                    897565,3984869,3862825,7879102,7911660,
-                    4828356,6568231
-                 )
-                 ORDER BY p."nomeProduto"
-            """
-            if limite and limite > 0:
-                self._q(base_sql + " LIMIT %s", (int(limite),))
-            else:
-                self._q(base_sql)
+            conn = self.conn
+            self.cursor.execute("SAVEPOINT listar_produtos")
+            try:
+                sql = base_sql.format(filtro=filtro_tabela)
+                params: tuple = ()
+                if limite and limite > 0:
+                    sql += " LIMIT %s"
+                    params = (int(limite),)
+                self._q(sql, params)
+                linhas = self.cursor.fetchall() or []
+                if self.conn is conn:   # reconectou: o savepoint ficou na conexão antiga
+                    self.cursor.execute("RELEASE SAVEPOINT listar_produtos")
+                return linhas
+            except errors.UndefinedTable:
+                # volta só a consulta que falhou: a transação do chamador fica
+                self.cursor.execute("ROLLBACK TO SAVEPOINT listar_produtos")
+                self.cursor.execute("RELEASE SAVEPOINT listar_produtos")
+                sql = base_sql.format(filtro='ip."fkCategoria" <> ALL(%s)')
+                params = (sorted(self.ref_categorias_excluidas()),)
+                if limite and limite > 0:
+                    sql += " LIMIT %s"
+                    params += (int(limite),)
+                self._q(sql, params)
             return self.cursor.fetchall() or []
         except Exception:
             if self.conn:
@@ -503,36 +584,15 @@ class SistemaOrdemProducao:
             return []
 
     def listar_situacoes_disponiveis(self, limite: Optional[int] = None):
-        try:
-            sql = """SELECT s."id", s."nome" FROM "Ekenox"."situacao" s ORDER BY s."nome" """
-            if limite and limite > 0:
-                sql += " LIMIT %s"
-                self._q(sql, (int(limite),))
-            else:
-                self._q(sql)
-            return self.cursor.fetchall() or []
-        except Exception:
-            if self.conn:
-                self.conn.rollback()
-            return []
+        linhas = [(s["id"], s["nome"]) for s in self.ref_situacoes()]
+        return linhas[:int(limite)] if limite and limite > 0 else linhas
 
     def listar_depositos_disponiveis(self, limite: Optional[int] = None):
-        try:
-            sql = """
-                SELECT d."id", d."descricao", d."situacao", d."padrao", d."desconsiderarsaldo"
-                  FROM "Ekenox"."deposito" d
-                 ORDER BY d."descricao"
-            """
-            if limite and limite > 0:
-                sql += " LIMIT %s"
-                self._q(sql, (int(limite),))
-            else:
-                self._q(sql)
-            return self.cursor.fetchall() or []
-        except Exception:
-            if self.conn:
-                self.conn.rollback()
-            return []
+        linhas = [
+            (d["id"], d["descricao"], d["situacao"], d["padrao"], d["desconsiderarsaldo"])
+            for d in self.ref_depositos()
+        ]
+        return linhas[:int(limite)] if limite and limite > 0 else linhas
 
     def inserir_ordem_producao(self, dados: Dict[str, Any]) -> tuple[bool, str]:
         try:
@@ -549,7 +609,7 @@ class SistemaOrdemProducao:
 
             query = """
                 INSERT INTO "Ekenox"."ordem_producao" (
-                    id, numero, deposito_destino, deposito_origem, situacao_id,
+                    id, numero, deposito_id_destino, deposito_id_origem, situacao_id,
                     responsavel, fkprodutoid, data_previsao_inicio, data_previsao_final,
                     data_inicio, data_fim, valor, observacao, quantidade
                 ) VALUES (
@@ -573,7 +633,7 @@ class SistemaOrdemProducao:
                 float(dados["quantidade"]),
             )
 
-            self.cursor.execute(query, valores)
+            self._q(query, valores)
             self.conn.commit()
             return True, ""
 
@@ -603,13 +663,14 @@ class SistemaOrdemProducao:
     def buscar_ordem_producao_por_numero(self, numero: str | int):
         try:
             num_int = int(str(numero).strip())
-            sql = """
+            # número é único nas duas tabelas: acha a OP mesmo arquivada
+            sql = f"""
                 SELECT
-                    o."id", o."numero", o."deposito_destino", o."deposito_origem",
+                    o."id", o."numero", o."deposito_id_destino", o."deposito_id_origem",
                     o."situacao_id", o."responsavel", o."fkprodutoid",
                     o."data_previsao_inicio", o."data_previsao_final",
                     o."data_inicio", o."data_fim", o."valor", o."observacao", o."quantidade"
-                FROM "Ekenox"."ordem_producao" o
+                FROM {self._origem_ordens(incluir_arquivo=True)} o
                 WHERE o."numero" = %s
                 LIMIT 1;
             """
@@ -639,9 +700,13 @@ class SistemaOrdemProducao:
                 self.conn.rollback()
             return None
 
-    def listar_ordens_producao(self):
+    def listar_ordens_producao(self, ids: Optional[List[int]] = None, incluir_arquivo: bool = False):
+        """
+        ids: só essas OPs (remendo da lista após NOTIFY).
+        incluir_arquivo: também as OPs arquivadas (view ordem_producao_todas).
+        """
         try:
-            sql = """
+            sql = f"""
                 SELECT
                     o."id",
                     o."numero",
@@ -652,14 +717,15 @@ class SistemaOrdemProducao:
                     o."quantidade",
                     o."data_inicio",
                     o."data_fim"
-                FROM "Ekenox"."ordem_producao" o
+                FROM {self._origem_ordens(incluir_arquivo)} o
                 LEFT JOIN "Ekenox"."produtos" p
                        ON p."produtoId" = o."fkprodutoid"
                 LEFT JOIN "Ekenox"."situacao" s
                        ON s."id" = o."situacao_id"
+                WHERE CAST(%s AS BIGINT[]) IS NULL OR o."id" = ANY(CAST(%s AS BIGINT[]))
                 ORDER BY o."id" DESC;
             """
-            self._q(sql)
+            self._q(sql, (ids, ids), classe=LISTA)
             return self.cursor.fetchall() or []
         except Exception:
             if self.conn:
@@ -679,6 +745,7 @@ class SistemaOrdemProducao:
             return False
 
     def listar_ordens_sem_data_fim(self):
+        # só a tabela quente; o WHERE é o predicado de ix_ordem_producao_pendentes
         try:
             sql = """
                 SELECT
@@ -695,75 +762,34 @@ class SistemaOrdemProducao:
                        ON p."produtoId" = o."fkprodutoid"
                 LEFT JOIN "Ekenox"."situacao" s
                        ON s."id" = o."situacao_id"
-                WHERE o."data_fim" IS NULL OR o."data_fim" = '1970-01-01'
+                WHERE (o."data_fim" IS NULL OR o."data_fim" = '1970-01-01')
                 ORDER BY o."id" DESC;
             """
-            self._q(sql)
+            self._q(sql, classe=LISTA)
             return self.cursor.fetchall() or []
         except Exception:
             if self.conn:
                 self.conn.rollback()
             return []
 
-    def finalizar_ordem_individual(self, ordem_id: int) -> bool:
-        try:
-            hoje = date.today()
-            sql = """
-                UPDATE "Ekenox"."ordem_producao"
-                   SET "data_fim" = %s,
-                       situacao_id = 18162
-                 WHERE "id" = %s
-                   AND ("data_fim" IS NULL OR "data_fim" = '1970-01-01');
-            """
-            self._q(sql, (hoje, int(ordem_id)))
-            if (self.cursor.rowcount or 0) == 0:
-                self.conn.rollback()
-                return False
-            self.conn.commit()
-            return True
-        except Exception:
-            if self.conn:
-                self.conn.rollback()
-            return False
-
     def buscar_estoque_maximo(self, fkproduto: int) -> float:
         try:
-            sql = """
-                SELECT ip."estoqueMaximo"
-                  FROM "Ekenox"."infoProduto" ip
-                 WHERE ip."fkProduto"::bigint = %s
-                 LIMIT 1;
-            """
-            self._q(sql, (int(fkproduto),))
+            self._qp("estoque_maximo", (int(fkproduto),))
             r = self.cursor.fetchone()
             return float(r[0]) if r and r[0] is not None else 0.0
+        except ConexaoIndisponivel:
+            raise
         except Exception:
             if self.conn:
                 self.conn.rollback()
             return 0.0
 
     def f7_buscar_estrutura(self, fkproduto: int):
-        sql = """
-            SELECT e."componente", e."quantidade"
-              FROM "Ekenox"."estrutura" e
-             WHERE e."fkproduto"::bigint = %s
-             ORDER BY e."componente";
-        """
-        self._q(sql, (int(fkproduto),))
+        self._qp("estrutura", (int(fkproduto),))
         return self.cursor.fetchall() or []
 
     def f7_buscar_info_produto(self, fkproduto: int) -> Dict[str, Any]:
-        sql = """
-            SELECT
-                i."estoqueMinimo",
-                i."estoqueMaximo",
-                i."precoCompra",
-                i."fkFornecedor",
-                i."fkProduto"
-              FROM "Ekenox"."infoProduto" i
-             WHERE i."fkProduto"::bigint = %s;
-        """
-        self._q(sql, (int(fkproduto),))
+        self._qp("info_produto", (int(fkproduto),))
         r = self.cursor.fetchone()
         if not r:
             return {}
@@ -778,17 +804,73 @@ class SistemaOrdemProducao:
     def f7_buscar_fornecedor(self, id_fornecedor: int) -> Dict[str, Any]:
         if not id_fornecedor:
             return {}
-        sql = """
-            SELECT f."idFornecedor", f."nome", f."codigo", f."telefone", f."celular"
-              FROM "Ekenox"."fornecedor" f
-             WHERE f."idFornecedor" = %s;
-        """
-        self._q(sql, (int(id_fornecedor),))
+        self._qp("fornecedor", (int(id_fornecedor),))
         r = self.cursor.fetchone()
         if not r:
             return {}
         return {"idFornecedor": r[0], "nome": r[1], "codigo": r[2], "telefone": r[3], "celular": r[4]}
 
+    def f7_analisar_estrutura(
+        self,
+        itens: List[Tuple[Any, Any]],
+        qtd_produzir: float,
+    ) -> Tuple[List[Tuple[Any, ...]], List[Dict[str, Any]]]:
+        """
+        F7: para cada componente da estrutura calcula necessário/saldo/falta
+        e junta info de compra + fornecedor.
+        Retorna (linhas_da_grade, itens_faltantes_para_pedido).
+        """
+        linhas: List[Tuple[Any, ...]] = []
+        itens_faltantes_para_pedido: List[Dict[str, Any]] = []
+
+        for (componente, qtd_base) in itens:
+            qtd_necessaria = float(qtd_base or 0.0) * float(qtd_produzir)
+            saldo = float(self.saldo_fisico(int(componente)) or 0.0)
+            falta = max(0.0, qtd_necessaria - saldo)
+
+            info = self.f7_buscar_info_produto(int(componente))
+            est_min = float(info.get("estoqueMinimo", 0.0) or 0.0)
+            est_max = float(info.get("estoqueMaximo", 0.0) or 0.0)
+            preco_compra = float(info.get("precoCompra", 0.0) or 0.0)
+
+            fornecedor_nome = ""
+            fk_fornecedor = int(info.get("fkFornecedor", 0) or 0)
+            if fk_fornecedor:
+                forn = self.f7_buscar_fornecedor(fk_fornecedor)
+                fornecedor_nome = (forn.get("nome") or "").strip()
+
+            prod_comp = self.validar_produto(int(componente))
+            comp_nome = (prod_comp.get("nomeproduto")
+                         if prod_comp else "") or ""
+
+            if falta > 0:
+                qtd_comprar = ceil(falta)
+
+                itens_faltantes_para_pedido.append({
+                    "fornecedor": fornecedor_nome or "SEM FORNECEDOR",
+                    "descricao": f"{componente} - {comp_nome}".strip(" -"),
+                    "qtd_comprar": float(qtd_comprar),
+                    "estoque_atual": float(saldo),
+                    "estoque_minimo": float(est_min),
+                    "estoque_maximo": float(est_max),
+                    "valor_unitario": float(preco_compra) if preco_compra > 0 else None,
+                })
+
+            linhas.append((
+                int(componente),
+                comp_nome,
+                float(qtd_base or 0.0),
+                float(qtd_necessaria),
+                float(saldo),
+                float(falta),
+                float(est_min),
+                float(est_max),
+                fornecedor_nome,
+                float(preco_compra),
+            ))
+
+        return linhas, itens_faltantes_para_pedido
+
     def relatorio_bling_insumos_produto(self, produto_id: int, qtd_produzir: float):
         sql = """
             SELECT
@@ -812,61 +894,9 @@ class SistemaOrdemProducao:
             WHERE e."fkproduto"::bigint = %s
             ORDER BY descricao;
         """
-        self._q(sql, (float(qtd_produzir), int(produto_id)))
+        self._q(sql, (float(qtd_produzir), int(produto_id)), classe=RELATORIO)
         return self.cursor.fetchall() or []
 
-    def validar_estoque_insumos_para_producao(
-        self,
-        fkproduto: int,
-        qtd_produzir: float,
-        bloquear_se_saldo_negativo: bool = True,
-        bloquear_se_insuficiente: bool = True,
-    ) -> Dict[str, Any]:
-        problemas: List[Dict[str, Any]] = []
-        try:
-            itens = self.f7_buscar_estrutura(int(fkproduto))
-            if not itens:
-                return {"ok": True, "problemas": []}
-
-            for (componente, qtd_base) in itens:
-                comp_id = int(componente)
-                qtd_base_f = float(qtd_base or 0.0)
-                necessario = qtd_base_f * float(qtd_produzir)
-
-                saldo = float(self.saldo_fisico(comp_id) or 0.0)
-                prod_comp = self.validar_produto(comp_id) or {}
-                nome = (prod_comp.get("nomeproduto") or "").strip()
-                falta = max(0.0, necessario - saldo)
-
-                if bloquear_se_saldo_negativo and saldo < 0:
-                    problemas.append({
-                        "componente": comp_id,
-                        "nome": nome,
-                        "qtd_base": qtd_base_f,
-                        "necessario": necessario,
-                        "saldo": saldo,
-                        "falta": falta,
-                        "motivo": "Saldo negativo",
-                    })
-                    continue
-
-                if bloquear_se_insuficiente and saldo < necessario:
-                    problemas.append({
-                        "componente": comp_id,
-                        "nome": nome,
-                        "qtd_base": qtd_base_f,
-                        "necessario": necessario,
-                        "saldo": saldo,
-                        "falta": falta,
-                        "motivo": "Saldo insuficiente",
-                    })
-
-            return {"ok": (len(problemas) == 0), "problemas": problemas}
-        except Exception:
-            if self.conn:
-                self.conn.rollback()
-            return {"ok": False, "problemas": [{"motivo": "Erro ao validar estrutura/estoque"}]}
-
 
 # ============================================================
 # ETIQUETAS (F12)
@@ -876,6 +906,7 @@ class EtiquetasModule:
     def __init__(self, master: tk.Tk):
         self.master = master
         self.win: Optional[tk.Toplevel] = None
+        self.lote: Optional[JanelaLoteEtiquetas] = None
 
     def open(self, event=None):
         if self.win is not None and self.win.winfo_exists():
@@ -890,13 +921,16 @@ class EtiquetasModule:
         self.win = tk.Toplevel(self.master)
         apply_window_icon(self.win)
         self.win.title("Gerador de Etiquetas EKENOX")
-        self.win.geometry("680x720")
+        self.win.geometry("680x760")
         self.win.transient(self.master)
         self.win.grab_set()
         self.win.bind("<Escape>", lambda e: self.close())
         self._montar_interface(self.win)
 
     def close(self):
+        if self.lote is not None:
+            self.lote.close()
+            self.lote = None
         try:
             if self.win and self.win.winfo_exists():
                 self.win.destroy()
@@ -904,6 +938,45 @@ class EtiquetasModule:
             pass
         self.win = None
 
+    def _padroes_lote(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Empresa + campos de produto da tela, usados como padrão no lote."""
+        empresa = {
+            "company_name": self.entry_empresa.get().strip(),
+            "company_address": self.entry_endereco.get().strip(),
+            "company_district": self.entry_bairro.get().strip(),
+            "company_city": self.entry_cidade.get().strip(),
+            "company_state": self.entry_estado.get().strip(),
+            "company_cep": self.entry_cep.get().strip(),
+            "company_phone": self.entry_telefone.get().strip(),
+            "company_email": self.entry_email.get().strip(),
+        }
+        produto = {
+            "product_title": self.entry_produto.get().strip(),
+            "product_model": self.entry_modelo.get().strip(),
+            "product_classe": self.entry_classe.get().strip(),
+            "voltage": self.combo_tensao.get().strip(),
+            "power": self.combo_potencia.get().strip(),
+            "temperature": self.entry_temperatura.get().strip(),
+            "frequency": self.entry_frequencia.get().strip(),
+        }
+        return empresa, produto
+
+    def _conectar_lote(self):
+        cfg = self.master.cfg
+        return psycopg2.connect(
+            host=cfg.db_host,
+            database=cfg.db_database,
+            user=cfg.db_user,
+            password=cfg.db_password,
+            port=int(cfg.db_port),
+        )
+
+    def abrir_lote(self):
+        if self.lote is None:
+            self.lote = JanelaLoteEtiquetas(
+                self.win, self._conectar_lote, self._padroes_lote)
+        self.lote.open()
+
     def gerar_etiquetas(self):
         if not self.win or not self.win.winfo_exists():
             return
@@ -949,75 +1022,23 @@ class EtiquetasModule:
                     "Erro", "Preencha o 'Número de Série (prefixo/base)'.", parent=self.win)
                 return
 
-            pdf_path = os.path.join(BASE_DIR, "etiquetas.pdf")
-            largura, altura = 100 * mm, 75 * mm
-            c = canvas.Canvas(pdf_path, pagesize=(largura, altura))
-
-            x_titulo = 10
-            x_valor = 70
-            espaco = 10
-
-            for i in range(quantidade):
-                serial = f"{serie_base}-{i+1:03d}"
-
-                c.setLineWidth(1)
-                c.rect(5, 5, largura - 10, altura - 10)
-
-                c.setFont("Helvetica-Bold", 12)
-                c.drawCentredString(largura / 2, altura -
-                                    15, empresa["company_name"])
-
-                y = altura - 30
-
-                campos_empresa = [
-                    ("Endereço:", empresa["company_address"]),
-                    ("Bairro:", empresa["company_district"]),
-                    ("Cidade:",
-                     f"{empresa['company_city']} - {empresa['company_state']}"),
-                    ("CEP:", empresa["company_cep"]),
-                    ("Telefone:", empresa["company_phone"]),
-                    ("Email SAC:", empresa["company_email"]),
-                ]
-
-                for titulo, valor in campos_empresa:
-                    c.setFont("Helvetica-Bold", 9)
-                    c.drawString(x_titulo, y, titulo)
-                    c.setFont("Helvetica", 9)
-                    c.drawString(x_valor, y, valor)
-                    y -= espaco
-
-                c.line(x_titulo, y, largura - 10, y)
-                y -= espaco
-
-                produto_campos = [
-                    ("Produto:", produto["product_title"]),
-                    ("Modelo:", produto["product_model"]),
-                    ("Classe:", produto["product_classe"]),
-                    ("Tensão:", produto["voltage"]),
-                    ("Potência:", produto["power"]),
-                    ("Temp:", produto["temperature"]),
-                    ("Freq:", produto["frequency"]),
-                ]
-
-                for titulo, valor in produto_campos:
-                    c.setFont("Helvetica-Bold", 9)
-                    c.drawString(x_titulo, y, titulo)
-                    c.setFont("Helvetica", 9)
-                    c.drawString(x_valor, y, valor)
-                    y -= espaco
-
-                c.line(x_titulo, y, largura - 10, y)
-                y -= espaco * 2
-
-                c.setFont("Helvetica-Bold", 12)
-                c.drawCentredString(largura / 2, y, f"Nº Série: {serial}")
-
-                c.showPage()
-
-            c.save()
+            # mesma faixa do lote por OP: série avulsa não repete a já impressa
+            conn = self._conectar_lote()
+            try:
+                inicio = reservar_seriais(
+                    conn, f"etq:{produto['product_model'] or serie_base}", quantidade)
+                conn.commit()
+            finally:
+                conn.close()
+
+            pdf_path = caminho_pdf_unico(os.path.join(BASE_DIR, "etiquetas"), serie_base)
+            arquivos = gerar_pdf_etiquetas_em_partes(
+                pdf_path, empresa, produto, serie_base, quantidade,
+                por_folha_do_layout(self.combo_layout.get()), inicio=inicio)
+            pdf_path = arquivos[0]
 
             messagebox.showinfo(
-                "Sucesso", f"PDF gerado:\n{pdf_path}", parent=self.win)
+                "Sucesso", "PDF gerado:\n" + "\n".join(arquivos), parent=self.win)
             try:
                 if os.name == "nt":
                     os.startfile(pdf_path)
@@ -1119,6 +1140,13 @@ class EtiquetasModule:
         self.entry_quantidade.grid(
             row=8, column=1, columnspan=2, pady=2, sticky="w")
 
+        tk.Label(frame_prod, text="Layout:").grid(row=9, column=0, sticky="e")
+        self.combo_layout = ttk.Combobox(
+            frame_prod, values=LAYOUTS_ETIQUETA, state="readonly", width=47)
+        self.combo_layout.grid(
+            row=9, column=1, columnspan=2, pady=2, sticky="w")
+        self.combo_layout.set(LAYOUT_1_POR_PAGINA)
+
         frame_btn = tk.Frame(root, pady=10)
         frame_btn.pack(fill="x")
 
@@ -1127,6 +1155,11 @@ class EtiquetasModule:
             bg="#2563eb", fg="white", font=("Arial", 12, "bold"), width=15
         ).pack(side="left", padx=(40, 10))
 
+        tk.Button(
+            frame_btn, text="Lote por OP...", command=self.abrir_lote,
+            bg="#0f766e", fg="white", font=("Arial", 12, "bold"), width=15
+        ).pack(side="left", padx=(0, 10))
+
         tk.Button(
             frame_btn, text="Fechar", command=self.close,
             bg="#ef4444", fg="white", font=("Arial", 12, "bold"), width=15
@@ -1155,6 +1188,8 @@ class OrdemProducaoApp(tk.Tk):
         self.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self.mod_etiquetas = EtiquetasModule(self)
+        self.diagnostico = JanelaDiagnostico(self, preparadas=self.sistema.relatorio_preparadas,
+                                             interrompidas=tempo_limite.interrupcoes)
 
         if not self.connected:
             messagebox.showerror(
@@ -1174,6 +1209,80 @@ class OrdemProducaoApp(tk.Tk):
         except Exception:
             pass
 
+        # queda do banco/VPN: indicador no topo + reconexão em segundo plano
+        self.sistema.ao_mudar_conexao(lambda _d, _e: self.after(0, self._atualizar_status_conexao))
+        self.after(self.INTERVALO_CONEXAO_MS, self._vigiar_conexao)
+
+    # ---------------- conexão ----------------
+
+    INTERVALO_CONEXAO_MS = 15000
+
+    def _atualizar_status_conexao(self):
+        try:
+            if self.sistema.degradado:
+                self.status_label.config(
+                    text="Sem conexão com o banco - reconectando (valores não são exibidos)",
+                    foreground="red")
+            else:
+                self.status_label.config(text="Conectado ao banco de dados", foreground="green")
+        except tk.TclError:
+            pass
+
+    def _vigiar_conexao(self):
+        if self._closing:
+            return
+        try:
+            self.sistema.verificar_conexao()
+        except Exception:
+            pass
+        self.after(self.INTERVALO_CONEXAO_MS, self._vigiar_conexao)
+
+    def _conexao_degradada(self, titulo: str, parent=None) -> bool:
+        """True (e avisa) quando não há banco: a tela não mostra números calculados sem ele."""
+        if not self.sistema.degradado:
+            return False
+        if self.sistema.reconectar():
+            return False
+        messagebox.showerror(
+            titulo,
+            "Sem conexão com o banco (tentando reconectar).\n"
+            f"{self.sistema.erro_conexao}\n\nTente de novo em instantes.",
+            parent=parent or self)
+        return True
+
+    def _executar_cancelavel(self, titulo: str, fn, erro_txt: str):
+        """
+        fn() numa thread com "Aguarde"/Cancelar (tempo_limite.py).
+        (False, None) = cancelada, erro, consulta cortada pelo tempo limite ou
+        conexão que caiu no meio, mesmo que já tenha voltado (já avisou).
+        """
+        marca = tempo_limite.total_interrupcoes()
+        reconexoes = self.sistema.reconexoes
+        ex = self.sistema.executar_cancelavel(self, titulo, "Consultando o banco...", fn)
+        if ex.cancelada:
+            return False, None
+        # os métodos do sistema devolvem 0/vazio quando a consulta falha: se a
+        # conexão caiu durante fn, parte dos números pode ter vindo zerada
+        if isinstance(ex.erro, ConexaoIndisponivel) or self.sistema.degradado \
+                or self.sistema.reconexoes != reconexoes:
+            messagebox.showerror(
+                titulo,
+                "A conexão com o banco caiu durante a consulta;\n"
+                "o resultado estaria incompleto. Tente de novo em instantes.",
+                parent=self)
+            return False, None
+        if ex.erro is not None:
+            messagebox.showerror(titulo, f"{erro_txt}:\n{ex.erro}", parent=self)
+            return False, None
+        if tempo_limite.total_interrupcoes() > marca:
+            messagebox.showerror(
+                titulo,
+                "Uma consulta passou do tempo limite e foi interrompida;\n"
+                "o resultado estaria incompleto. Tente de novo em instantes.",
+                parent=self)
+            return False, None
+        return True, ex.resultado
+
     # ---------------- helpers ----------------
 
     def parse_int(self, valor_str: str, campo: str) -> int:
@@ -1373,6 +1482,7 @@ class OrdemProducaoApp(tk.Tk):
                 ("<F11>", self.finalizar_producoes_pendentes),
                 ("<F12>", self.mod_etiquetas.open),
                 ("<Escape>", lambda e: self.on_close()),
+                ("<Control-Shift-D>", self.diagnostico.open),
             ]:
                 self.bind_all(seq, func)
 
@@ -1429,6 +1539,7 @@ class OrdemProducaoApp(tk.Tk):
     # ============================================================
 
     def atualizar_quantidade_producao(self, event=None):
+        reconexoes = self.sistema.reconexoes
         try:
             pid_str = (self.produto_id_var.get() or "").strip()
             if not pid_str:
@@ -1440,7 +1551,8 @@ class OrdemProducaoApp(tk.Tk):
             produto = self.sistema.validar_produto(pid)
             if not produto:
                 self.quantidade_var.set("")
-                self.variaveis_quantidade = {"erro": "Produto não encontrado"}
+                self.variaveis_quantidade = {
+                    "erro": "Sem conexão com o banco." if self.sistema.degradado else "Produto não encontrado"}
                 return
 
             preco = float(produto.get("preco") or 0.0)
@@ -1469,6 +1581,12 @@ class OrdemProducaoApp(tk.Tk):
             else:
                 sugestao_final = sugestao_calc
 
+            if self.sistema.degradado or self.sistema.reconexoes != reconexoes:
+                # caiu no meio (mesmo que já tenha voltado): média/arranjo podem ter vindo zerados
+                self.quantidade_var.set("")
+                self.variaveis_quantidade = {"erro": "Sem conexão com o banco."}
+                return
+
             self.quantidade_var.set(f"{sugestao_final:.2f}")
 
             self.variaveis_quantidade = {
@@ -1486,6 +1604,10 @@ class OrdemProducaoApp(tk.Tk):
                 "Sugestão final (múltiplo arranjo)": sugestao_final,
                 "Obs": "Sugestão = estoqueMax - (média/dia * 7), arredondando para cima no múltiplo do arranjo.",
             }
+        except ConexaoIndisponivel:
+            # sem saldo/estoque máximo do banco não há sugestão
+            self.quantidade_var.set("")
+            self.variaveis_quantidade = {"erro": "Sem conexão com o banco."}
         except Exception as e:
             self.variaveis_quantidade = {"erro": f"{type(e).__name__}: {e}"}
 
@@ -1524,6 +1646,8 @@ class OrdemProducaoApp(tk.Tk):
             messagebox.showerror(
                 "F7 - Estrutura", "Sem conexão com o banco.", parent=self)
             return
+        if self._conexao_degradada("F7 - Estrutura"):
+            return
 
         prod = (self.produto_id_var.get() or "").strip()
         qtd_txt = (self.quantidade_var.get() or "").strip()
@@ -1550,68 +1674,23 @@ class OrdemProducaoApp(tk.Tk):
                 "F7 - Estrutura", "Quantidade para produzir deve ser > 0.", parent=self)
             return
 
-        try:
+        def analisar():
             itens = self.sistema.f7_buscar_estrutura(produto_id)
-        except Exception as e:
-            messagebox.showerror(
-                "F7 - Estrutura", f"Erro ao ler estrutura:\n{e}", parent=self)
+            if not itens:
+                return itens, ([], [])
+            return itens, self.sistema.f7_analisar_estrutura(itens, qtd_produzir)
+
+        ok, res = self._executar_cancelavel("F7 - Estrutura", analisar, "Erro ao ler estrutura")
+        if not ok:
             return
+        itens, (linhas, itens_faltantes_para_pedido) = res
 
         if not itens:
             messagebox.showinfo(
                 "F7 - Estrutura", "Sem estrutura cadastrada para este produto.", parent=self)
             return
 
-        linhas = []
-        faltantes = 0
-        itens_faltantes_para_pedido: List[Dict[str, Any]] = []
-
-        for (componente, qtd_base) in itens:
-            qtd_necessaria = float(qtd_base or 0.0) * float(qtd_produzir)
-            saldo = float(self.sistema.saldo_fisico(int(componente)) or 0.0)
-            falta = max(0.0, qtd_necessaria - saldo)
-
-            info = self.sistema.f7_buscar_info_produto(int(componente))
-            est_min = float(info.get("estoqueMinimo", 0.0) or 0.0)
-            est_max = float(info.get("estoqueMaximo", 0.0) or 0.0)
-            preco_compra = float(info.get("precoCompra", 0.0) or 0.0)
-
-            fornecedor_nome = ""
-            fk_fornecedor = int(info.get("fkFornecedor", 0) or 0)
-            if fk_fornecedor:
-                forn = self.sistema.f7_buscar_fornecedor(fk_fornecedor)
-                fornecedor_nome = (forn.get("nome") or "").strip()
-
-            prod_comp = self.sistema.validar_produto(int(componente))
-            comp_nome = (prod_comp.get("nomeproduto")
-                         if prod_comp else "") or ""
-
-            if falta > 0:
-                faltantes += 1
-                qtd_comprar = ceil(falta)
-
-                itens_faltantes_para_pedido.append({
-                    "fornecedor": fornecedor_nome or "SEM FORNECEDOR",
-                    "descricao": f"{componente} - {comp_nome}".strip(" -"),
-                    "qtd_comprar": float(qtd_comprar),
-                    "estoque_atual": float(saldo),
-                    "estoque_minimo": float(est_min),
-                    "estoque_maximo": float(est_max),
-                    "valor_unitario": float(preco_compra) if preco_compra > 0 else None,
-                })
-
-            linhas.append((
-                int(componente),
-                comp_nome,
-                float(qtd_base or 0.0),
-                float(qtd_necessaria),
-                float(saldo),
-                float(falta),
-                float(est_min),
-                float(est_max),
-                fornecedor_nome,
-                float(preco_compra),
-            ))
+        faltantes = len(itens_faltantes_para_pedido)
 
         win = tk.Toplevel(self)
         apply_window_icon(win)
@@ -1802,7 +1881,11 @@ class OrdemProducaoApp(tk.Tk):
                 "F9 - Relatório", "Quantidade para produzir deve ser > 0.", parent=self)
             return
 
-        produto = self.sistema.validar_produto(produto_id) or {}
+        try:
+            produto = self.sistema.validar_produto(produto_id) or {}
+        except ConexaoIndisponivel as e:
+            messagebox.showerror("F9 - Relatório", f"Sem conexão com o banco.\n{e}", parent=self)
+            return
         if not produto:
             messagebox.showerror(
                 "F9 - Relatório", "Produto não encontrado.", parent=self)
@@ -1811,12 +1894,11 @@ class OrdemProducaoApp(tk.Tk):
         prod_nome = (produto.get("nomeproduto") or "").strip()
         prod_codigo = int(produto_id)
 
-        try:
-            insumos = self.sistema.relatorio_bling_insumos_produto(
-                produto_id, qtd_produzir)
-        except Exception as e:
-            messagebox.showerror(
-                "F9 - Relatório", f"Erro ao consultar estrutura:\n{e}", parent=self)
+        ok, insumos = self._executar_cancelavel(
+            "F9 - Relatório",
+            lambda: self.sistema.relatorio_bling_insumos_produto(produto_id, qtd_produzir),
+            "Erro ao consultar estrutura")
+        if not ok:
             return
 
         if not insumos:
@@ -2205,6 +2287,8 @@ class OrdemProducaoApp(tk.Tk):
             messagebox.showerror(
                 "Erro", "Não há conexão com o banco.", parent=self)
             return
+        if self._conexao_degradada("Salvar OP"):
+            return
 
         try:
             dados: Dict[str, Any] = {}
@@ -2265,13 +2349,13 @@ class OrdemProducaoApp(tk.Tk):
 
             fkproduto_final = int(dados["fkprodutoid"])
             problemas_gerais = []
-            for i, qtd_lote in enumerate(partes):
-                res = self.sistema.validar_estoque_insumos_para_producao(
-                    fkproduto=fkproduto_final,
-                    qtd_produzir=float(qtd_lote),
-                    bloquear_se_saldo_negativo=True,
-                    bloquear_se_insuficiente=True,
-                )
+            # todos os lotes numa chamada só (fn_validar_insumos, se instalada)
+            resultados = self.sistema.validar_insumos_lotes(
+                [(fkproduto_final, float(qtd_lote)) for qtd_lote in partes],
+                bloquear_se_saldo_negativo=True,
+                bloquear_se_insuficiente=True,
+            )
+            for i, (qtd_lote, res) in enumerate(zip(partes, resultados)):
                 if not res.get("ok"):
                     problemas_gerais.append(
                         (i, float(qtd_lote), res.get("problemas", [])))
@@ -2391,7 +2475,12 @@ class OrdemProducaoApp(tk.Tk):
                 "F10 - Ordens", "Não há conexão com o banco.", parent=self)
             return
 
+        # padrão: só a tabela de trabalho; vazia -> tenta com as arquivadas
+        incluir_arquivo = False
         ordens = self.sistema.listar_ordens_producao()
+        if not ordens:
+            incluir_arquivo = True
+            ordens = self.sistema.listar_ordens_producao(incluir_arquivo=True)
         if not ordens:
             messagebox.showinfo(
                 "F10 - Ordens", "Nenhuma ordem encontrada.", parent=self)
@@ -2404,6 +2493,11 @@ class OrdemProducaoApp(tk.Tk):
         win.transient(self)
         win.grab_set()
 
+        var_arquivo = tk.BooleanVar(master=win, value=incluir_arquivo)
+
+        topo = ttk.Frame(win, padding=(10, 10, 10, 0))
+        topo.pack(fill=tk.X)
+
         frame = ttk.Frame(win, padding=10)
         frame.pack(fill=tk.BOTH, expand=True)
 
@@ -2436,8 +2530,10 @@ class OrdemProducaoApp(tk.Tk):
                 return dt.strftime("%d/%m/%Y")
             return str(dt)
 
-        for (oid, numero, produto_id, produto_nome, _sid, situacao_nome, quantidade, data_inicio, data_fim) in ordens:
-            tree.insert("", tk.END, values=(
+        def valores(row):
+            (oid, numero, produto_id, produto_nome, _sid, situacao_nome,
+             quantidade, data_inicio, data_fim) = row
+            return (
                 oid,
                 numero,
                 produto_id,
@@ -2446,7 +2542,32 @@ class OrdemProducaoApp(tk.Tk):
                 f"{float(quantidade):.2f}" if quantidade is not None else "",
                 fmt(data_inicio),
                 fmt(data_fim),
-            ))
+            )
+
+        # mesma ordem do SQL (id DESC)
+        modelo = ModeloLista(tree, chave=lambda r: r[0], valores=valores,
+                             ordem=lambda r: int(r[0]), decrescente=True)
+        modelo.carregar(ordens)
+
+        def recarregar():
+            modelo.carregar(self.sistema.listar_ordens_producao(
+                incluir_arquivo=var_arquivo.get()))
+
+        ttk.Checkbutton(topo, text="Incluir arquivadas", variable=var_arquivo,
+                        command=recarregar).pack(side=tk.LEFT)
+
+        # OPs gravadas/excluídas em outras estações aparecem sem reabrir o F10
+        def on_alteracoes(eventos):
+            modelo.remendar(
+                eventos,
+                lambda chaves: self.sistema.listar_ordens_producao(
+                    ids=[int(k) for k in chaves if str(k).isdigit()],
+                    incluir_arquivo=var_arquivo.get()),
+                recarregar,
+            )
+
+        obter_ouvinte(self.cfg, os.path.join(BASE_DIR, "logs")).inscrever(
+            tree, "ordem_producao", on_alteracoes, adiar=lambda: self.sistema.ocupado)
 
         btns = ttk.Frame(win, padding=(10, 0, 10, 10))
         btns.pack(fill=tk.X)
@@ -2467,20 +2588,98 @@ class OrdemProducaoApp(tk.Tk):
 
             ok = self.sistema.excluir_ordem_producao(int(oid))
             if ok:
-                tree.delete(item_id)
+                modelo.remover(item_id)
                 messagebox.showinfo(
                     "Exclusão", f"OP nº {numero} excluída.", parent=win)
             else:
                 messagebox.showerror(
                     "Erro", "Não foi possível excluir.", parent=win)
 
+        def historico_selecionada(event=None):
+            sel = tree.selection()
+            if not sel:
+                messagebox.showwarning(
+                    "Histórico", "Selecione uma ordem.", parent=win)
+                return
+            v = tree.item(sel[0])["values"]
+            self.mostrar_historico_situacao(int(v[0]), v[1], parent=win)
+
         ttk.Button(btns, text="Excluir (DEL)", command=excluir_selecionada).pack(
             side=tk.RIGHT, padx=(0, 8))
+        ttk.Button(btns, text="Histórico (H)", command=historico_selecionada).pack(
+            side=tk.RIGHT, padx=(0, 8))
         ttk.Button(btns, text="Fechar",
                    command=win.destroy).pack(side=tk.RIGHT)
 
         win.bind("<Escape>", lambda e: win.destroy())
         tree.bind("<Delete>", excluir_selecionada)
+        tree.bind("h", historico_selecionada)
+        tree.bind("H", historico_selecionada)
+
+    def mostrar_historico_situacao(self, ordem_id: int, numero: Any = "", parent=None):
+        """Mudanças de situação da OP (situacao_auditoria.sql), em páginas."""
+        pagina = 50
+        linhas = self.sistema.historico_situacao(ordem_id, limite=pagina)
+
+        win = tk.Toplevel(parent or self)
+        apply_window_icon(win)
+        win.title(f"Histórico de situação - OP nº {numero} (ID {ordem_id})")
+        win.geometry("760x420")
+        win.transient(parent or self)
+        win.grab_set()
+
+        frame = ttk.Frame(win, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        cols = ("quando", "de", "para", "usuario")
+        tree = ttk.Treeview(frame, columns=cols, show="headings", selectmode="browse")
+        vsb = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        for c, titulo, largura, anchor in (
+            ("quando", "Data/hora", 140, "center"),
+            ("de", "De", 220, "w"),
+            ("para", "Para", 220, "w"),
+            ("usuario", "Usuário", 140, "w"),
+        ):
+            tree.heading(c, text=titulo)
+            tree.column(c, width=largura, anchor=anchor)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        vsb.pack(side=tk.RIGHT, fill=tk.Y)
+
+        btns = ttk.Frame(win, padding=(10, 0, 10, 10))
+        btns.pack(fill=tk.X)
+        lbl = ttk.Label(btns, text="")
+        lbl.pack(side=tk.LEFT)
+
+        estado = {"ultimo": None, "total": 0}
+
+        def adicionar(rows):
+            for (aid, quando, sid_old, nome_old, sid_new, nome_new, quem) in rows:
+                tree.insert("", tk.END, values=(
+                    quando.strftime("%d/%m/%Y %H:%M") if isinstance(quando, datetime) else str(quando or ""),
+                    nome_old or ("(criação)" if sid_old is None else sid_old),
+                    nome_new or ("" if sid_new is None else sid_new),
+                    quem or "",
+                ))
+                estado["ultimo"] = aid
+            estado["total"] += len(rows)
+            lbl.configure(text=f"{estado['total']} mudança(s)")
+            if len(rows) < pagina:
+                btn_mais.state(["disabled"])
+
+        def carregar_mais():
+            adicionar(self.sistema.historico_situacao(
+                ordem_id, limite=pagina, antes_de_id=estado["ultimo"]))
+
+        btn_mais = ttk.Button(btns, text="Carregar mais", command=carregar_mais)
+        ttk.Button(btns, text="Fechar", command=win.destroy).pack(side=tk.RIGHT)
+        btn_mais.pack(side=tk.RIGHT, padx=(0, 8))
+
+        adicionar(linhas)
+        if not linhas:
+            lbl.configure(text="Sem mudanças registradas (aplique situacao_auditoria.sql).")
+
+        win.bind("<Escape>", lambda e: win.destroy())
 
     # ============================================================
     # F11 - Finalizar pendentes
@@ -2546,6 +2745,10 @@ class OrdemProducaoApp(tk.Tk):
         btns = ttk.Frame(win, padding=(10, 0, 10, 10))
         btns.pack(fill=tk.X)
 
+        var_baixa = tk.BooleanVar(value=bool(self.cfg.baixa_estoque_ao_finalizar))
+        ttk.Checkbutton(btns, text="Baixar insumos e dar entrada do produto no estoque",
+                        variable=var_baixa).pack(side=tk.LEFT)
+
         def finalizar_selecionadas(event=None):
             sel = tree.selection()
             if not sel:
@@ -2565,22 +2768,25 @@ class OrdemProducaoApp(tk.Tk):
                 nums = ", ".join(str(x[2]) for x in ordens_sel)
                 msg = f"Deseja finalizar {len(ordens_sel)} OPs (números: {nums}) com data fim hoje?"
 
+            baixar = bool(var_baixa.get())
+            if baixar:
+                msg += "\n\nO estoque será baixado (insumos) e o produto receberá a entrada."
             if not messagebox.askyesno("Confirmar", msg, parent=win):
                 return
 
-            ok_count = 0
+            # uma transação para todas as selecionadas (com baixa, se marcada)
+            res = self.sistema.finalizar_ordens([oid for _, oid, _ in ordens_sel], baixar_estoque=baixar)
+            finalizadas = set(res.finalizadas)
             for item_id, oid, _ in ordens_sel:
-                ok = self.sistema.finalizar_ordem_individual(oid)
-                if ok:
+                if oid in finalizadas:
                     tree.delete(item_id)
-                    ok_count += 1
 
-            if ok_count:
-                messagebox.showinfo(
-                    "Finalização", f"{ok_count} ordem(ns) finalizada(s) com sucesso!", parent=win)
+            if res.ok:
+                messagebox.showinfo("Finalização", res.resumo(), parent=win)
             else:
                 messagebox.showerror(
-                    "Erro", "Não foi possível finalizar as ordens selecionadas.", parent=win)
+                    "Erro", "Não foi possível finalizar as ordens selecionadas."
+                    + (f"\n\n{res.erro}" if res.erro else ""), parent=win)
 
         ttk.Button(btns, text="Finalizar selecionadas (ENTER)",
                    command=finalizar_selecionadas).pack(side=tk.RIGHT, padx=(0, 8))
@@ -2610,6 +2816,10 @@ class OrdemProducaoApp(tk.Tk):
         self.after(50, self._open_menu_then_close)
 
     def _open_menu_then_close(self):
+        try:
+            METRICAS.despejar_log()
+        except Exception:
+            pass
         try:
             abrir_menu_principal_skip_entrada(parent=None)
         finally:
@@ -2644,5 +2854,7 @@ class OrdemProducaoApp(tk.Tk):
 # ============================================================
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
     app = OrdemProducaoApp()
     app.mainloop()
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+"""
+arquivo_ordens.py
+Arquivamento de OPs finalizadas (ordem_producao_arquivo.sql).
+
+- "Ekenox".ordem_producao fica só com pendentes + finalizadas recentes
+  (F10/F11, gravação e finalização tocam só ela)
+- arquivar_ordens(): move as finalizadas há mais de N dias para o arquivo,
+  em lotes curtos (commit por lote); agendar com
+      python arquivo_ordens.py --dias 180
+  (Agendador de Tarefas do Windows, semanal)
+- leitura histórica (F10 com "incluir arquivadas", busca por número, geração
+  de id/número) passa pela view "Ekenox".ordem_producao_todas quando o
+  arquivo está instalado; sem ele, tudo segue na tabela de sempre
+"""
+
+import argparse
+import os
+from datetime import date, timedelta
+from typing import Any, List, Optional
+
+
+TABELA_ORDENS = '"Ekenox"."ordem_producao"'
+TABELA_ARQUIVO = '"Ekenox"."ordem_producao_arquivo"'
+VISAO_TODAS = '"Ekenox"."ordem_producao_todas"'
+
+DIAS_RETENCAO_PADRAO = 180
+LOTE_PADRAO = 5000
+
+
+def arquivo_instalado(cur: Any) -> bool:
+    cur.execute("""SELECT to_regclass('"Ekenox".ordem_producao_todas') IS NOT NULL""")
+    r = cur.fetchone()
+    return bool(r and r[0])
+
+
+def arquivar_ordens(conn: Any, dias_retencao: int = DIAS_RETENCAO_PADRAO,
+                    lote: int = LOTE_PADRAO) -> int:
+    """
+    Move as OPs finalizadas antes de hoje - dias_retencao. Um commit por lote
+    (não segura lock na tabela de OPs durante o arquivamento inteiro).
+    Devolve o total movido.
+    """
+    antes = date.today() - timedelta(days=max(int(dias_retencao), 0))
+    total = 0
+    while True:
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT "Ekenox".fn_arquivar_ordens(%s, %s)', (antes, int(lote)))
+                movidas = int(cur.fetchone()[0] or 0)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        total += movidas
+        if movidas < int(lote):
+            return total
+
+
+# ============================================================
+# MIXIN
+# ============================================================
+
+class ArquivoOrdensMixin:
+    """Requer self._q, self.cursor e self.conn (igual aos CRUDMixins)."""
+
+    def _arquivo_disponivel(self) -> bool:
+        disponivel = getattr(self, "_arquivo_ordens", None)
+        if disponivel is None:
+            try:
+                disponivel = arquivo_instalado(self.cursor)
+            except Exception:
+                if self.conn:
+                    self.conn.rollback()
+                disponivel = False
+            self._arquivo_ordens = disponivel
+        return disponivel
+
+    def _origem_ordens(self, incluir_arquivo: bool = False) -> str:
+        """FROM das leituras de OP: só a tabela quente ou a view com o arquivo."""
+        if incluir_arquivo and self._arquivo_disponivel():
+            return VISAO_TODAS
+        return TABELA_ORDENS
+
+    def _proximo_valor_ordens(self, coluna: str) -> int:
+        """MAX(coluna) + 1 olhando também o arquivo (id/número nunca se repetem)."""
+        tabelas = [TABELA_ORDENS]
+        if self._arquivo_disponivel():
+            tabelas.append(TABELA_ARQUIVO)
+        maximos = ", ".join(f'(SELECT MAX("{coluna}") FROM {t})' for t in tabelas)
+        self._q(f"SELECT COALESCE(GREATEST({maximos}), 0) + 1;")
+        r = self.cursor.fetchone()
+        return int(r[0]) if r and r[0] is not None else 1
+
+    def arquivar_ordens_finalizadas(self, dias_retencao: int = DIAS_RETENCAO_PADRAO) -> int:
+        """-1 = arquivo não instalado ou erro."""
+        if not self._arquivo_disponivel():
+            return -1
+        try:
+            return arquivar_ordens(self.conn, dias_retencao)
+        except Exception:
+            return -1
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import psycopg2
+    from sistema_log import log_write
+    from Ordem_Producao import BASE_DIR, load_config
+
+    ap = argparse.ArgumentParser(description="Arquiva OPs finalizadas antigas.")
+    ap.add_argument("--dias", type=int, default=DIAS_RETENCAO_PADRAO,
+                    help=f"mantém na tabela de trabalho as finalizadas nos últimos DIAS "
+                         f"(padrão {DIAS_RETENCAO_PADRAO})")
+    ap.add_argument("--lote", type=int, default=LOTE_PADRAO, help="OPs por transação")
+    args = ap.parse_args(argv)
+
+    cfg = load_config()
+    conn = psycopg2.connect(
+        host=cfg.db_host, database=cfg.db_database, user=cfg.db_user,
+        password=cfg.db_password, port=int(cfg.db_port), connect_timeout=5,
+    )
+    try:
+        with conn.cursor() as cur:
+            instalado = arquivo_instalado(cur)
+        conn.rollback()
+        if not instalado:
+            print("Arquivo não instalado (aplique ordem_producao_arquivo.sql).")
+            return 2
+
+        total = arquivar_ordens(conn, args.dias, args.lote)
+        log_write(os.path.join(BASE_DIR, "logs"), "arquivo_ordens.log",
+                  f"ARQUIVO OPs movidas={total} dias={args.dias}", movidas=total, dias=args.dias)
+        print(f"{total} OP(s) arquivada(s).")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+"""
+baixa_producao.py
+Finalização de OPs com baixa de estoque (backflush) opcional.
+
+Tudo numa transação, para N OPs de uma vez:
+1) UPDATE ordem_producao ... RETURNING -> só as OPs que estavam pendentes
+   (data_fim vazia/1970-01-01); OP já finalizada nunca baixa duas vezes
+2) com baixa:
+   - consumo OP x componente montado uma vez (_op_consumo: estrutura JOIN
+     produtos); razão, criação de linha e UPDATE usam o mesmo conjunto
+   - razão: um movimento por OP x componente ('consumo_op', negativo) e
+     um por OP para o produto acabado ('producao_op')
+   - linhas de estoque travadas em ordem de "fkProduto" (FOR UPDATE) antes
+     do UPDATE: duas finalizações em lote simultâneas não se travam
+   - UPDATE estoque: consumo somado por componente
+   - upsert do produto acabado: soma das quantidades das OPs
+   componente sem linha em estoque ganha a linha
+   (o trigger da razão fica desligado nesta transação: os movimentos por OP
+   já foram gravados; o aviso por linha às telas também, e vai um 'T' de
+   estoque no lugar)
+Qualquer erro -> rollback de tudo (OP continua pendente, saldo intacto).
+
+A razão ("Ekenox".estoque_movimento) vem de estoque_movimento.sql; sem ela
+a baixa é recusada (a finalização simples continua funcionando).
+"""
+
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, List, Optional, Sequence
+
+from conexao_resiliente import executar_com_cursor
+from ouvinte_alteracoes import avisar_recarga, silenciar_avisos
+
+SITUACAO_FINALIZADA_ID = 18162
+
+MOTIVO_CONSUMO = "consumo_op"
+MOTIVO_PRODUCAO = "producao_op"
+
+
+@dataclass
+class ResultadoFinalizacao:
+    finalizadas: List[int] = field(default_factory=list)
+    baixa: bool = False
+    componentes: int = 0        # linhas de estoque baixadas
+    produtos: int = 0           # linhas de estoque com entrada
+    movimentos: int = 0         # linhas gravadas na razão
+    erro: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.erro and bool(self.finalizadas)
+
+    def resumo(self) -> str:
+        if self.erro:
+            return f"Erro: {self.erro}"
+        txt = f"{len(self.finalizadas)} ordem(ns) finalizada(s)."
+        if self.baixa and self.finalizadas:
+            txt += (f"\nEstoque: {self.componentes} insumo(s) baixado(s), "
+                    f"{self.produtos} produto(s) com entrada, {self.movimentos} movimento(s).")
+        return txt
+
+
+def razao_instalada(cur: Any) -> bool:
+    cur.execute("""SELECT to_regclass('"Ekenox".estoque_movimento') IS NOT NULL""")
+    r = cur.fetchone()
+    return bool(r and r[0])
+
+
+def finalizar_ordens_sql(cur: Any, ids: Sequence[int], baixar_estoque: bool = False,
+                         data_fim: Optional[date] = None,
+                         situacao_id: int = SITUACAO_FINALIZADA_ID) -> ResultadoFinalizacao:
+    """Não faz commit/rollback: quem chama controla a transação."""
+    res = ResultadoFinalizacao(baixa=bool(baixar_estoque))
+    ids = sorted({int(i) for i in ids})
+    if not ids:
+        return res
+    data_fim = data_fim or date.today()
+
+    if not baixar_estoque:
+        cur.execute(
+            """
+            UPDATE "Ekenox"."ordem_producao"
+               SET "data_fim" = %s,
+                   situacao_id = %s
+             WHERE "id" = ANY(%s::bigint[])
+               AND ("data_fim" IS NULL OR "data_fim" = '1970-01-01')
+            RETURNING "id";
+            """,
+            (data_fim, int(situacao_id), ids),
+        )
+        res.finalizadas = sorted(int(r[0]) for r in cur.fetchall())
+        return res
+
+    if not razao_instalada(cur):
+        raise RuntimeError("Razão de estoque não instalada (aplique estoque_movimento.sql).")
+
+    # 1) finaliza e guarda as OPs que realmente mudaram
+    cur.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS _op_finalizadas (
+            id bigint PRIMARY KEY,
+            fkprodutoid text NOT NULL,
+            quantidade double precision NOT NULL,
+            deposito_origem bigint,
+            deposito_destino bigint
+        ) ON COMMIT DROP;
+        """
+    )
+    cur.execute(
+        """
+        WITH fin AS (
+            UPDATE "Ekenox"."ordem_producao"
+               SET "data_fim" = %s,
+                   situacao_id = %s
+             WHERE "id" = ANY(%s::bigint[])
+               AND ("data_fim" IS NULL OR "data_fim" = '1970-01-01')
+            RETURNING "id", "fkprodutoid", COALESCE("quantidade", 0)::double precision AS quantidade,
+                      "deposito_id_origem", "deposito_id_destino"
+        )
+        INSERT INTO _op_finalizadas (id, fkprodutoid, quantidade, deposito_origem, deposito_destino)
+        SELECT * FROM fin
+        RETURNING id;
+        """,
+        (data_fim, int(situacao_id), ids),
+    )
+    res.finalizadas = sorted(int(r[0]) for r in cur.fetchall())
+    if not res.finalizadas:
+        return res
+
+    # 2) consumo OP x componente (só componente cadastrado em produtos)
+    cur.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS _op_consumo (
+            op_id bigint NOT NULL,
+            deposito_origem bigint,
+            componente text NOT NULL,
+            quantidade double precision NOT NULL,
+            PRIMARY KEY (op_id, componente)
+        ) ON COMMIT DROP;
+        """
+    )
+    cur.execute(
+        """
+        INSERT INTO _op_consumo (op_id, deposito_origem, componente, quantidade)
+        SELECT f.id, f.deposito_origem, e."componente",
+               SUM(COALESCE(e."quantidade", 0) * f.quantidade)
+          FROM _op_finalizadas f
+          JOIN "Ekenox"."estrutura" e ON e."fkproduto" = f.fkprodutoid
+          JOIN "Ekenox"."produtos" p ON p."produtoId" = e."componente"
+         GROUP BY f.id, f.deposito_origem, e."componente"
+        HAVING SUM(COALESCE(e."quantidade", 0) * f.quantidade) <> 0;
+        """
+    )
+
+    # razão: OP x componente (consumo) + OP (produto acabado)
+    cur.execute(
+        """
+        INSERT INTO "Ekenox".estoque_movimento
+               (fkproduto, deposito_id, quantidade, motivo, ordem_producao_id)
+        SELECT c.componente, c.deposito_origem, -c.quantidade, %s, c.op_id
+          FROM _op_consumo c
+        UNION ALL
+        SELECT f.fkprodutoid, f.deposito_destino, f.quantidade, %s, f.id
+          FROM _op_finalizadas f
+         WHERE f.quantidade <> 0;
+        """,
+        (MOTIVO_CONSUMO, MOTIVO_PRODUCAO),
+    )
+    res.movimentos = int(cur.rowcount or 0)
+
+    # a razão já tem os movimentos por OP: o trigger de estoque não duplica
+    cur.execute("SELECT set_config('ekenox.razao_estoque', 'off', true);")
+    silenciar_avisos(cur)
+
+    # 3) componentes: garante a linha, trava em ordem e baixa num UPDATE só
+    cur.execute(
+        """
+        INSERT INTO "Ekenox"."estoque" ("fkProduto", "saldoFisico", "saldoVirtual")
+        SELECT DISTINCT c.componente, 0, 0
+          FROM _op_consumo c
+         ORDER BY 1
+        ON CONFLICT ("fkProduto") DO NOTHING;
+        """
+    )
+    # componentes e produtos acabados: mesma ordem em qualquer finalização
+    cur.execute(
+        """
+        SELECT 1
+          FROM "Ekenox"."estoque" s
+         WHERE s."fkProduto" IN (SELECT componente FROM _op_consumo
+                                 UNION SELECT fkprodutoid FROM _op_finalizadas)
+         ORDER BY s."fkProduto"
+           FOR UPDATE;
+        """
+    )
+    cur.execute(
+        """
+        UPDATE "Ekenox"."estoque" AS s
+           SET "saldoFisico" = COALESCE(s."saldoFisico", 0) - c.qtd,
+               "saldoVirtual" = COALESCE(s."saldoVirtual", 0) - c.qtd
+          FROM (
+                SELECT componente AS fk, SUM(quantidade) AS qtd
+                  FROM _op_consumo
+                 GROUP BY componente
+               ) AS c
+         WHERE s."fkProduto" = c.fk
+           AND c.qtd <> 0;
+        """
+    )
+    res.componentes = int(cur.rowcount or 0)
+
+    # 4) produto acabado: entrada somada por produto
+    cur.execute(
+        """
+        INSERT INTO "Ekenox"."estoque" AS s ("fkProduto", "saldoFisico", "saldoVirtual")
+        SELECT f.fkprodutoid, SUM(f.quantidade), SUM(f.quantidade)
+          FROM _op_finalizadas f
+         GROUP BY f.fkprodutoid
+        HAVING SUM(f.quantidade) <> 0
+        ON CONFLICT ("fkProduto") DO UPDATE
+           SET "saldoFisico" = COALESCE(s."saldoFisico", 0) + EXCLUDED."saldoFisico",
+               "saldoVirtual" = COALESCE(s."saldoVirtual", 0) + EXCLUDED."saldoVirtual";
+        """
+    )
+    res.produtos = int(cur.rowcount or 0)
+    avisar_recarga(cur, "estoque")
+    return res
+
+
+# ============================================================
+# MIXIN
+# ============================================================
+
+class FinalizacaoOPMixin:
+    """
+    Requer self.cursor e self.conn (igual aos CRUDMixins). Gravação via
+    executar_com_cursor (limite GRAVACAO): queda no meio reconecta e não
+    repete (o erro volta no resultado e a OP continua pendente).
+    """
+
+    def finalizar_ordens(self, ids: Sequence[int], baixar_estoque: bool = False) -> ResultadoFinalizacao:
+        try:
+            res = executar_com_cursor(
+                self, lambda cur: finalizar_ordens_sql(cur, ids, baixar_estoque=baixar_estoque), False)
+            if not res.finalizadas:
+                self.conn.rollback()
+                return res
+            self.conn.commit()
+            return res
+        except Exception as e:
+            if self.conn and not self.conn.closed:
+                self.conn.rollback()
+            return ResultadoFinalizacao(baixa=bool(baixar_estoque), erro=f"{type(e).__name__}: {e}")
+
+    def finalizar_ordem_individual(self, ordem_id: int, baixar_estoque: bool = False) -> bool:
+        return self.finalizar_ordens([ordem_id], baixar_estoque=baixar_estoque).ok
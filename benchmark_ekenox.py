@@ -0,0 +1,643 @@
+from __future__ import annotations
+
+"""
+benchmark_ekenox.py
+Python 3.12+ | Postgres 16+ | psycopg2
+
+Benchmark reprodutível dos caminhos quentes do sistema de OP.
+
+1) Cria um banco descartável (padrão: ekenox_bench) no Postgres informado,
+   ou sobe um container (--docker), e aplica Criacao_arquivo.sql
+2) Gera dados sintéticos determinísticos (--seed) no schema "Ekenox":
+     N produtos, M linhas de estrutura (BOM), K ordens de produção
+3) Mede (R repetições + 1 aquecimento):
+     - f7_analisar_estrutura           (lógica do F7)
+     - validar_estoque_insumos_para_producao (fn_validar_insumos, validacao_insumos.sql)
+     - validar_insumos_python          (caminho reserva, para comparar)
+     - listar_ordens_producao
+     - listar_produtos_disponiveis
+     - gerar_relatorio_componentes_excel
+     - gerar_abas_fornecedor_pedido
+     - gerar_pdf_etiquetas
+     - imprimir_etiquetas_zpl          (ZPL em arquivo, mesmo layout)
+4) Grava JSON em bench/resultados/<data>_<commit>.json
+
+Para cada caso: min/mediana/p95/média/máx (ms) e quantidade de queries
+(pelo METRICAS do _q), para comparar commits:
+
+    python benchmark_ekenox.py --host localhost --port 5432 --user postgres --password ...
+    python benchmark_ekenox.py --docker --produtos 20000 --bom 100000 --ops 50000
+    python benchmark_ekenox.py --comparar bench/resultados/a.json bench/resultados/b.json
+
+O banco de benchmark é apagado no fim (use --manter para inspecionar).
+NUNCA aponte --db para o banco de produção: o script recusa se o nome não
+contiver "bench".
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import psycopg2
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import etiqueta  # noqa: E402
+import etiqueta_zpl  # noqa: E402
+import Ordem_Producao as op  # noqa: E402
+import relatorio_componentes  # noqa: E402
+from sistema_metricas import METRICAS  # noqa: E402
+
+
+SCHEMA_SQL = os.path.join(APP_DIR, "Criacao_arquivo.sql")
+CATEGORIA_SQL = os.path.join(APP_DIR, "categoria_hierarquia.sql")
+VALIDACAO_SQL = os.path.join(APP_DIR, "validacao_insumos.sql")
+MODELO_PEDIDO = os.path.join(APP_DIR, "pedido-de-compra v2.xlsx")
+RESULTADOS_DIR = os.path.join(APP_DIR, "bench", "resultados")
+
+SITUACAO_FINALIZADA = 18162
+
+
+def categorias_da_carga_inicial(caminho: str = CATEGORIA_SQL) -> List[int]:
+    """
+    Raízes excluídas da produção, lidas da carga inicial de
+    categoria_hierarquia.sql (a lista só existe lá).
+    """
+    if not os.path.exists(caminho):
+        return []
+    with open(caminho, "r", encoding="utf-8") as f:
+        sql = f.read()
+    m = re.search(r"""SET "filtroProducao" = 'E'.*?"categoriaId" IN \(([^)]*)\)""", sql, re.S)
+    return [int(x) for x in re.findall(r"\d+", m.group(1))] if m else []
+
+
+# ============================================================
+# CONFIG
+# ============================================================
+
+@dataclass
+class BenchConfig:
+    db_host: str = "localhost"
+    db_port: int = 5432
+    db_user: str = "postgres"
+    db_password: str = ""
+    db_database: str = "ekenox_bench"
+    db_admin: str = "postgres"
+
+    produtos: int = 2000
+    bom: int = 10000
+    ops: int = 5000
+    seed: int = 42
+    repeticoes: int = 5
+    etiquetas: int = 500
+
+
+def _connect(cfg: BenchConfig, database: Optional[str] = None):
+    return psycopg2.connect(
+        host=cfg.db_host,
+        port=int(cfg.db_port),
+        user=cfg.db_user,
+        password=cfg.db_password,
+        database=database or cfg.db_database,
+        connect_timeout=10,
+    )
+
+
+def _app_config(cfg: BenchConfig) -> op.AppConfig:
+    return op.AppConfig(
+        db_host=cfg.db_host,
+        db_database=cfg.db_database,
+        db_user=cfg.db_user,
+        db_password=cfg.db_password,
+        db_port=int(cfg.db_port),
+    )
+
+
+# ============================================================
+# BANCO DESCARTÁVEL
+# ============================================================
+
+def subir_docker(cfg: BenchConfig, porta: int = 55439, imagem: str = "postgres:16") -> str:
+    """Sobe um Postgres temporário (docker run --rm). Retorna o id do container."""
+    senha = cfg.db_password or "bench"
+    out = subprocess.run(
+        ["docker", "run", "-d", "--rm", "-p", f"{porta}:5432",
+         "-e", f"POSTGRES_PASSWORD={senha}", imagem],
+        capture_output=True, text=True, check=True,
+    )
+    cid = out.stdout.strip()
+    cfg.db_host, cfg.db_port, cfg.db_user, cfg.db_password = "127.0.0.1", porta, "postgres", senha
+
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        try:
+            _connect(cfg, cfg.db_admin).close()
+            return cid
+        except Exception:
+            time.sleep(1)
+    raise RuntimeError("Postgres do container não respondeu em 60 s.")
+
+
+def parar_docker(cid: str) -> None:
+    subprocess.run(["docker", "stop", cid], capture_output=True)
+
+
+def criar_banco(cfg: BenchConfig) -> None:
+    if "bench" not in cfg.db_database.lower():
+        raise SystemExit(
+            f"Recusado: o banco '{cfg.db_database}' não parece descartável (precisa conter 'bench').")
+    conn = _connect(cfg, cfg.db_admin)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f'DROP DATABASE IF EXISTS "{cfg.db_database}"')
+            cur.execute(f'CREATE DATABASE "{cfg.db_database}"')
+    finally:
+        conn.close()
+
+
+def apagar_banco(cfg: BenchConfig) -> None:
+    conn = _connect(cfg, cfg.db_admin)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f'DROP DATABASE IF EXISTS "{cfg.db_database}"')
+    finally:
+        conn.close()
+
+
+def aplicar_schema(conn) -> None:
+    with open(SCHEMA_SQL, "r", encoding="utf-8") as f:
+        ddl = f.read()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute('CREATE SCHEMA IF NOT EXISTS "Ekenox";')
+        cur.execute(ddl)
+        # view usada por media_vendas_mensal (não está no script do pgAdmin)
+        cur.execute("""
+            CREATE OR REPLACE VIEW vw_media_vendas_mensal AS
+            SELECT i."fkProduto"::bigint                      AS fkproduto,
+                   date_trunc('month', i."dataPedido")::date  AS datavenda,
+                   SUM(i.quantidade)                          AS media_vendas
+              FROM "Ekenox".itens i
+             GROUP BY 1, 2;
+        """)
+    conn.autocommit = False
+
+
+# ============================================================
+# DADOS SINTÉTICOS
+# ============================================================
+
+def _copy(cur, tabela: str, colunas: Sequence[str], linhas: Iterable[Sequence[Any]]) -> int:
+    """COPY ... FROM STDIN (texto, tab-separado)."""
+    buf = io.StringIO()
+    n = 0
+    for row in linhas:
+        vals = []
+        for v in row:
+            if v is None:
+                vals.append("\\N")
+            else:
+                vals.append(str(v).replace("\\", "\\\\").replace("\t", " ").replace("\n", " "))
+        buf.write("\t".join(vals) + "\n")
+        n += 1
+    buf.seek(0)
+    cols = ", ".join(f'"{c}"' for c in colunas)
+    cur.copy_expert(f"COPY {tabela} ({cols}) FROM STDIN", buf)
+    return n
+
+
+def _aplicar_script(conn, caminho: str) -> None:
+    """Roda um .sql do projeto (tem BEGIN/COMMIT próprio), se existir."""
+    if not os.path.exists(caminho):
+        return
+    with open(caminho, "r", encoding="utf-8") as f:
+        ddl = f.read()
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(ddl)
+    conn.autocommit = False
+
+
+def gerar_dados(conn, cfg: BenchConfig) -> Dict[str, Any]:
+    """
+    Popula o schema com dados determinísticos.
+    ~10% dos produtos são produtos finais (têm estrutura); o resto são
+    componentes. Retorna ids úteis para os casos de benchmark.
+    """
+    rnd = random.Random(cfg.seed)
+    n_prod = max(20, int(cfg.produtos))
+    n_final = max(5, n_prod // 10)
+    finais = list(range(1, n_final + 1))
+    componentes = list(range(n_final + 1, n_prod + 1))
+
+    with conn.cursor() as cur:
+        _copy(cur, '"Ekenox".situacao', ["id", "nome", "idHerdado"], [
+            (18159, "Em aberto", None),
+            (18160, "Em andamento", None),
+            (18161, "Cancelada", None),
+            (SITUACAO_FINALIZADA, "Finalizada", None),
+        ])
+        _copy(cur, '"Ekenox".deposito', ["id", "descricao", "situacao", "padrao", "desconsiderarsaldo"], [
+            (1, "Geral", "A", True, False),
+            (2, "Produção", "A", False, False),
+            (3, "Expedição", "A", False, False),
+        ])
+
+        cats: List[tuple] = [(c, f"Excluída {c}", None) for c in categorias_da_carga_inicial()]
+        cats += [(100 + i, f"Categoria {i}", None if i < 5 else 100 + (i % 5)) for i in range(30)]
+        _copy(cur, '"Ekenox".categoria', ["categoriaId", "nomeCategoria", "categoriaPai"], cats)
+        cat_ids = [c[0] for c in cats]
+
+        n_forn = 50
+        _copy(cur, '"Ekenox".fornecedor', ["idFornecedor", "nome", "codigo", "situacao", "telefone", "celular"], [
+            (i, f"Fornecedor {i:03d}", f"F{i:03d}", "A", "(17)3500-0000", "(17)99999-0000")
+            for i in range(1, n_forn + 1)
+        ])
+
+        def sku(pid: int) -> str:
+            return f"VIX{pid:05d}" + ("N" if pid % 3 == 0 else "")
+
+        _copy(cur, '"Ekenox".produtos',
+              ["produtoId", "nomeProduto", "sku", "preco", "custo", "tipo", "descImetro"], [
+                  (pid,
+                   f"{'PRODUTO' if pid <= n_final else 'COMPONENTE'} {pid:05d}",
+                   sku(pid),
+                   round(rnd.uniform(10, 5000), 2),
+                   round(rnd.uniform(1, 500), 2),
+                   "P" if pid <= n_final else "C",
+                   f"BUFFET TÉRMICO {pid}" if pid <= n_final else None)
+                  for pid in range(1, n_prod + 1)
+              ])
+
+        _copy(cur, '"Ekenox"."infoProduto"',
+              ["fkProduto", "estoqueMinimo", "estoqueMaximo", "precoCompra", "fkFornecedor",
+               "fkCategoria", "unidade", "unidadeMedida"], [
+                  (pid, rnd.randint(0, 20), rnd.randint(20, 500), round(rnd.uniform(1, 300), 2),
+                   rnd.randint(1, n_forn), rnd.choice(cat_ids), "UN", "UN")
+                  for pid in range(1, n_prod + 1)
+              ])
+
+        _copy(cur, '"Ekenox".estoque', ["fkProduto", "saldoFisico", "saldoVirtual"], [
+            (pid, rnd.randint(-5, 400), rnd.randint(0, 400)) for pid in range(1, n_prod + 1)
+        ])
+
+        # BOM: distribui M linhas entre os finais, sem repetir componente
+        m = max(len(finais), int(cfg.bom))
+        por_final = max(1, min(len(componentes), m // len(finais)))
+        bom_rows = []
+        for fk in finais:
+            for comp in rnd.sample(componentes, por_final):
+                bom_rows.append((fk, comp, round(rnd.uniform(0.1, 12), 4), f"{fk}-{comp}"))
+        _copy(cur, '"Ekenox".estrutura', ["fkproduto", "componente", "quantidade", "dados"], bom_rows)
+
+        _copy(cur, '"Ekenox".arranjo', ["sku", "nomeproduto", "quantidade", "chapa", "material"], [
+            (sku(fk), f"PRODUTO {fk:05d}", rnd.choice([5, 10, 20, 40]), "1,2", "AISI 304")
+            for fk in finais
+        ])
+
+        hoje = date.today()
+        k = max(1, int(cfg.ops))
+        op_rows = []
+        for i in range(1, k + 1):
+            ini = hoje - timedelta(days=rnd.randint(0, 1500))
+            pendente = rnd.random() < 0.2
+            op_rows.append((
+                i, i, 2, 1,
+                18159 if pendente else SITUACAO_FINALIZADA,
+                "bench", rnd.choice(finais), ini, ini + timedelta(days=7), ini,
+                None if pendente else ini + timedelta(days=rnd.randint(1, 20)),
+                round(rnd.uniform(100, 9000), 2), None, rnd.choice([5, 10, 20]),
+            ))
+        _copy(cur, '"Ekenox".ordem_producao',
+              ["id", "numero", "deposito_id_destino", "deposito_id_origem", "situacao_id",
+               "responsavel", "fkprodutoid", "data_previsao_inicio", "data_previsao_final",
+               "data_inicio", "data_fim", "valor", "observacao", "quantidade"], op_rows)
+
+        # pedidos/itens (seletor de etiqueta e média de vendas)
+        n_ped = max(10, k // 2)
+        _copy(cur, '"Ekenox".contatos', ["idContato", "nome", "tipoPessoa"], [
+            (i, f"Cliente {i}", "J") for i in range(1, 101)
+        ])
+        _copy(cur, '"Ekenox".pedidos', ["idPedido", "numero", "data", "fkContato", "fkSituacao", "total"], [
+            (i, 100000 + i, hoje - timedelta(days=rnd.randint(0, 700)), rnd.randint(1, 100), None,
+             round(rnd.uniform(100, 20000), 2))
+            for i in range(1, n_ped + 1)
+        ])
+        itens_rows = []
+        iid = 1
+        for ped in range(1, n_ped + 1):
+            for _ in range(2):
+                pid = rnd.choice(finais)
+                itens_rows.append((iid, sku(pid), "UN", rnd.randint(1, 5), 0, 100.0,
+                                   f"PRODUTO {pid:05d}", pid, ped,
+                                   datetime.combine(hoje, datetime.min.time()) - timedelta(days=rnd.randint(0, 700))))
+                iid += 1
+        _copy(cur, '"Ekenox".itens',
+              ["id", "codigo", "unidade", "quantidade", "desconto", "valor", "nomeProduto",
+               "fkProduto", "fkPedido", "dataPedido"], itens_rows)
+
+        cur.execute("ANALYZE;")
+    conn.commit()
+
+    # closure/filtro de categorias: roda depois da carga (o UPDATE inicial
+    # marca as raízes e o rebuild preenche categoria_excluida)
+    _aplicar_script(conn, CATEGORIA_SQL)
+    # fn_validar_insumos: sem ela a validação mediria só o caminho em Python
+    _aplicar_script(conn, VALIDACAO_SQL)
+
+    return {
+        "finais": finais,
+        "produto_f7": finais[0],
+        "componentes_por_final": por_final,
+        "linhas_bom": len(bom_rows),
+        "ops": k,
+    }
+
+
+# ============================================================
+# MEDIÇÃO
+# ============================================================
+
+def _medir(fn: Callable[[], Any], repeticoes: int) -> Dict[str, Any]:
+    fn()  # aquecimento
+    tempos: List[float] = []
+    queries: List[int] = []
+    for _ in range(max(1, repeticoes)):
+        METRICAS.limpar()
+        t0 = time.perf_counter()
+        fn()
+        tempos.append((time.perf_counter() - t0) * 1000.0)
+        queries.append(sum(d["qtd"] for d in METRICAS.top(10_000)))
+    tempos_ord = sorted(tempos)
+    p95 = tempos_ord[min(len(tempos_ord) - 1, int(round(0.95 * (len(tempos_ord) - 1))))]
+    return {
+        "repeticoes": len(tempos),
+        "min_ms": round(tempos_ord[0], 3),
+        "mediana_ms": round(statistics.median(tempos), 3),
+        "p95_ms": round(p95, 3),
+        "media_ms": round(statistics.fmean(tempos), 3),
+        "max_ms": round(tempos_ord[-1], 3),
+        "queries": int(statistics.median(queries)) if queries else 0,
+    }
+
+
+def rodar_casos(cfg: BenchConfig, info: Dict[str, Any], work_dir: str) -> Dict[str, Any]:
+    app_cfg = _app_config(cfg)
+    sistema = op.SistemaOrdemProducao(app_cfg)
+    if not sistema.conectar():
+        raise RuntimeError(f"Falha ao conectar: {sistema.ultimo_erro}")
+
+    pid = int(info["produto_f7"])
+    qtd = 10.0
+    resultados: Dict[str, Any] = {}
+
+    try:
+        def f7():
+            itens = sistema.f7_buscar_estrutura(pid)
+            return sistema.f7_analisar_estrutura(itens, qtd)
+
+        resultados["f7_analisar_estrutura"] = _medir(f7, cfg.repeticoes)
+
+        if not sistema._validacao_sql_disponivel():
+            raise RuntimeError("fn_validar_insumos não instalada (validacao_insumos.sql)")
+        diferencas = sistema.conferir_validacao_insumos([(pid, qtd)])
+        if diferencas:
+            raise RuntimeError("fn_validar_insumos difere do Python:\n" + "\n".join(diferencas))
+
+        resultados["validar_estoque_insumos_para_producao"] = _medir(
+            lambda: sistema.validar_estoque_insumos_para_producao(pid, qtd), cfg.repeticoes)
+
+        resultados["validar_insumos_python"] = _medir(
+            lambda: sistema._validar_insumos_python(pid, qtd), cfg.repeticoes)
+
+        resultados["listar_ordens_producao"] = _medir(
+            sistema.listar_ordens_producao, cfg.repeticoes)
+
+        resultados["listar_produtos_disponiveis"] = _medir(
+            sistema.listar_produtos_disponiveis, cfg.repeticoes)
+
+        resultados["gerar_relatorio_componentes_excel"] = _medir(
+            lambda: relatorio_componentes.gerar_relatorio_componentes_excel(
+                app_cfg, base_dir=work_dir, nome_arquivo="relatorio_bench.xlsx"),
+            max(1, cfg.repeticoes // 2))
+
+        _linhas, faltantes = f7()
+        dados_pedido = []
+        for i, it in enumerate(faltantes or []):
+            dados_pedido.append({
+                "fornecedor": it["fornecedor"],
+                "numero_pedido": 1000 + (i % 10),
+                "data_pedido": date.today(),
+                "produto": it["descricao"],
+                "quantidade": it["qtd_comprar"],
+                "estoque_atual": it["estoque_atual"],
+                "estoque_minimo": it["estoque_minimo"],
+                "estoque_maximo": it["estoque_maximo"],
+                "valor_unitario": it["valor_unitario"],
+            })
+        saida_pedido = os.path.join(work_dir, "saida_pedido_bench.xlsx")
+
+        def pedido():
+            if os.path.exists(saida_pedido):
+                os.remove(saida_pedido)
+            op.gerar_abas_fornecedor_pedido(
+                dados=dados_pedido, caminho_modelo=MODELO_PEDIDO, caminho_saida=saida_pedido)
+
+        if os.path.exists(MODELO_PEDIDO) and dados_pedido:
+            resultados["gerar_abas_fornecedor_pedido"] = _medir(pedido, max(1, cfg.repeticoes // 2))
+            resultados["gerar_abas_fornecedor_pedido"]["linhas"] = len(dados_pedido)
+    finally:
+        sistema.desconectar()
+
+    empresa = {
+        "company_name": "EKENOX DISTRIBUIDORA DE COZ. IND. LTDA",
+        "company_address": "Rua: José de Ribamar Souza, 499",
+        "company_district": "Pq. Industrial",
+        "company_city": "Catanduva",
+        "company_state": "SP",
+        "company_cep": "15803-290",
+        "company_phone": "(11)98740-3669",
+        "company_email": "sac@ekenox.com.br",
+    }
+    produto = {
+        "product_title": "BUFFET TÉRMICO",
+        "product_model": "VIX8368",
+        "product_classe": "IPX4",
+        "voltage": "127V",
+        "power": "2000W",
+        "temperature": "30°C a 120°C",
+        "frequency": "60Hz",
+    }
+    pdf = os.path.join(work_dir, "etiquetas_bench.pdf")
+    resultados["gerar_pdf_etiquetas"] = _medir(
+        lambda: etiqueta.gerar_pdf_etiquetas(pdf, empresa, produto, "EKX2024", cfg.etiquetas),
+        max(1, cfg.repeticoes // 2))
+    resultados["gerar_pdf_etiquetas"]["etiquetas"] = cfg.etiquetas
+    resultados["gerar_pdf_etiquetas"]["bytes"] = os.path.getsize(pdf) if os.path.exists(pdf) else 0
+
+    zpl = os.path.join(work_dir, "etiquetas_bench.zpl")
+    resultados["imprimir_etiquetas_zpl"] = _medir(
+        lambda: etiqueta_zpl.imprimir_etiquetas(zpl, empresa, produto, "EKX2024", cfg.etiquetas),
+        max(1, cfg.repeticoes // 2))
+    resultados["imprimir_etiquetas_zpl"]["etiquetas"] = cfg.etiquetas
+    resultados["imprimir_etiquetas_zpl"]["bytes"] = os.path.getsize(zpl) if os.path.exists(zpl) else 0
+
+    return resultados
+
+
+# ============================================================
+# RESULTADOS
+# ============================================================
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or "desconhecido"
+    except Exception:
+        return "desconhecido"
+
+
+def _versao_pg(cfg: BenchConfig) -> str:
+    try:
+        conn = _connect(cfg)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SHOW server_version;")
+                return str(cur.fetchone()[0])
+        finally:
+            conn.close()
+    except Exception:
+        return "?"
+
+
+def salvar_resultados(cfg: BenchConfig, info: Dict[str, Any], casos: Dict[str, Any],
+                      saida: Optional[str] = None) -> str:
+    commit = _git_commit()
+    doc = {
+        "meta": {
+            "commit": commit,
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "postgres": _versao_pg(cfg),
+            "escala": {"produtos": cfg.produtos, "bom": cfg.bom, "ops": cfg.ops,
+                       "etiquetas": cfg.etiquetas},
+            "seed": cfg.seed,
+            "linhas_bom": info.get("linhas_bom"),
+            "componentes_por_final": info.get("componentes_por_final"),
+        },
+        "casos": casos,
+    }
+    if not saida:
+        os.makedirs(RESULTADOS_DIR, exist_ok=True)
+        saida = os.path.join(RESULTADOS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}_{commit}.json")
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(doc, f, ensure_ascii=False, indent=2)
+    return saida
+
+
+def comparar(a_path: str, b_path: str) -> None:
+    with open(a_path, encoding="utf-8") as f:
+        a = json.load(f)
+    with open(b_path, encoding="utf-8") as f:
+        b = json.load(f)
+    print(f"A: {a['meta']['commit']} ({a['meta']['data']})  escala={a['meta']['escala']}")
+    print(f"B: {b['meta']['commit']} ({b['meta']['data']})  escala={b['meta']['escala']}")
+    print(f"{'caso':42s} {'A med ms':>10s} {'B med ms':>10s} {'delta':>8s} {'A q':>6s} {'B q':>6s}")
+    for nome in sorted(set(a["casos"]) | set(b["casos"])):
+        ca, cb = a["casos"].get(nome, {}), b["casos"].get(nome, {})
+        ma, mb = ca.get("mediana_ms"), cb.get("mediana_ms")
+        delta = f"{(mb - ma) / ma * 100:+.1f}%" if ma and mb is not None else "-"
+        print(f"{nome:42s} {ma if ma is not None else '-':>10} {mb if mb is not None else '-':>10} "
+              f"{delta:>8s} {ca.get('queries', '-'):>6} {cb.get('queries', '-'):>6}")
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark do sistema de OP (Ekenox).")
+    ap.add_argument("--host", default=os.getenv("BENCH_DB_HOST", "localhost"))
+    ap.add_argument("--port", type=int, default=int(os.getenv("BENCH_DB_PORT", "5432")))
+    ap.add_argument("--user", default=os.getenv("BENCH_DB_USER", "postgres"))
+    ap.add_argument("--password", default=os.getenv("BENCH_DB_PASSWORD", ""))
+    ap.add_argument("--db", default="ekenox_bench", help="banco descartável (precisa conter 'bench')")
+    ap.add_argument("--admin-db", default="postgres", help="banco para CREATE/DROP DATABASE")
+    ap.add_argument("--docker", action="store_true", help="sobe postgres:16 temporário via docker")
+    ap.add_argument("--produtos", type=int, default=2000)
+    ap.add_argument("--bom", type=int, default=10000)
+    ap.add_argument("--ops", type=int, default=5000)
+    ap.add_argument("--etiquetas", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--repeticoes", type=int, default=5)
+    ap.add_argument("--saida", default=None, help="arquivo JSON de saída")
+    ap.add_argument("--manter", action="store_true", help="não apaga o banco no fim")
+    ap.add_argument("--comparar", nargs=2, metavar=("A.json", "B.json"))
+    args = ap.parse_args(argv)
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return 0
+
+    cfg = BenchConfig(
+        db_host=args.host, db_port=args.port, db_user=args.user, db_password=args.password,
+        db_database=args.db, db_admin=args.admin_db,
+        produtos=args.produtos, bom=args.bom, ops=args.ops, seed=args.seed,
+        repeticoes=args.repeticoes, etiquetas=args.etiquetas,
+    )
+
+    cid = subir_docker(cfg) if args.docker else None
+    work_dir = tempfile.mkdtemp(prefix="ekenox_bench_")
+    try:
+        print(f"Criando banco {cfg.db_database} em {cfg.db_host}:{cfg.db_port} ...")
+        criar_banco(cfg)
+        conn = _connect(cfg)
+        try:
+            aplicar_schema(conn)
+            t0 = time.perf_counter()
+            info = gerar_dados(conn, cfg)
+            print(f"Dados gerados em {time.perf_counter() - t0:.1f} s "
+                  f"({cfg.produtos} produtos, {info['linhas_bom']} linhas BOM, {info['ops']} OPs)")
+        finally:
+            conn.close()
+
+        casos = rodar_casos(cfg, info, work_dir)
+        for nome, r in casos.items():
+            print(f"{nome:42s} mediana {r['mediana_ms']:>10.2f} ms | p95 {r['p95_ms']:>10.2f} ms"
+                  f" | queries {r['queries']}")
+
+        saida = salvar_resultados(cfg, info, casos, args.saida)
+        print(f"Resultados: {saida}")
+        return 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        if not args.manter:
+            try:
+                apagar_banco(cfg)
+            except Exception as e:
+                print(f"Aviso: não consegui apagar {cfg.db_database}: {e}")
+        if cid:
+            parar_docker(cid)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+"""
+bling_mock.py
+Servidor HTTP local que imita a API v3 do Bling, para testar o
+bling_sync sem internet e sem gastar limite da conta real.
+
+Endpoints:
+  POST /oauth/token             grant_type=refresh_token (Basic client:secret)
+  GET  /produtos                pagina, limite, dataAlteracaoInicial
+  GET  /pedidos/vendas          pagina, limite, dataAlteracaoInicial
+  GET  /pedidos/vendas/<id>     detalhe com contato, situacao e itens
+  GET  /estoques/saldos         idsProdutos[]=...
+
+Comportamentos para teste:
+  - token expira depois de 'requisicoes_por_token' chamadas (-> 401)
+  - 429 a cada 'erro_429_a_cada' requisições (com Retry-After)
+  - tocar(n) marca n produtos e n pedidos como alterados agora
+  - 'requisicoes' conta as chamadas recebidas por rota
+
+Uso em código:
+    with ServidorBlingFalso(produtos=500, pedidos=200) as srv:
+        ClienteBling(srv.base_url, ...)
+
+Ou avulso:
+    python bling_mock.py --porta 8765 --produtos 2000 --pedidos 1000
+    (access_token inicial: "token-0", refresh_token: "refresh-0",
+     client_id/client_secret: "cliente"/"segredo")
+"""
+
+import argparse
+import base64
+import json
+import random
+import re
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+FORMATO_DATA = "%Y-%m-%d %H:%M:%S"
+CLIENT_ID = "cliente"
+CLIENT_SECRET = "segredo"
+
+
+# ============================================================
+# DADOS SINTÉTICOS (determinísticos)
+# ============================================================
+
+class DadosBlingFalsos:
+    def __init__(self, produtos: int = 300, pedidos: int = 150, semente: int = 42,
+                 situacoes: Tuple[int, ...] = (6, 9, 12, 15)) -> None:
+        rnd = random.Random(semente)
+        agora = datetime.now().replace(microsecond=0)
+        self._lock = threading.Lock()
+
+        self.produtos: List[Dict[str, Any]] = []
+        for i in range(produtos):
+            pid = 16000000000 + i
+            self.produtos.append({
+                "id": pid,
+                "nome": f"Produto {i:05d}",
+                "codigo": f"EKX{i:05d}",
+                "preco": round(rnd.uniform(10, 5000), 2),
+                "precoCusto": round(rnd.uniform(5, 2500), 2),
+                "tipo": "P",
+                "situacao": "A",
+                "formato": rnd.choice(["S", "E", "V"]),
+                "descricaoCurta": f"Descrição {i}",
+                "idProdutoPai": None,
+                "_alterado": agora - timedelta(minutes=rnd.randint(60, 60 * 24 * 30)),
+            })
+
+        self.saldos: Dict[int, Tuple[float, float]] = {
+            p["id"]: (float(rnd.randint(0, 500)), float(rnd.randint(0, 500))) for p in self.produtos
+        }
+
+        self.pedidos: List[Dict[str, Any]] = []
+        item_id = 90000000000
+        for i in range(pedidos):
+            data = (agora - timedelta(days=rnd.randint(0, 60))).date().isoformat()
+            itens = []
+            for _ in range(rnd.randint(1, 5)):
+                p = rnd.choice(self.produtos) if self.produtos else {"id": 0, "codigo": "", "nome": ""}
+                item_id += 1
+                qtd = float(rnd.randint(1, 10))
+                itens.append({
+                    "id": item_id, "codigo": p["codigo"], "unidade": "UN", "quantidade": qtd,
+                    "desconto": 0, "valor": p.get("preco", 0), "descricao": p["nome"],
+                    "produto": {"id": p["id"]},
+                })
+            total = round(sum(it["quantidade"] * (it["valor"] or 0) for it in itens), 2)
+            self.pedidos.append({
+                "id": 20000000000 + i,
+                "numero": 100000 + i,
+                "numeroLoja": f"LJ{i:06d}",
+                "data": data,
+                "dataSaida": "0000-00-00",
+                "totalProdutos": total,
+                "total": total,
+                "contato": {"id": 30000000000 + (i % 97), "nome": f"Cliente {i % 97}",
+                            "tipoPessoa": rnd.choice(["F", "J"]), "numeroDocumento": f"{i % 97:011d}"},
+                "situacao": {"id": rnd.choice(situacoes)},
+                "loja": {"id": 0},
+                "numeroPedidoCompra": "",
+                "outrasDespesas": 0,
+                "observacoes": "",
+                "observacoesInternas": "",
+                "desconto": {"valor": 0, "unidade": "REAL"},
+                "taxas": {"taxaComissao": 0, "custoFrete": 0, "valorBase": total},
+                "itens": itens,
+                "_alterado": agora - timedelta(minutes=rnd.randint(60, 60 * 24 * 30)),
+            })
+
+    def tocar(self, n: int = 1) -> None:
+        """Marca os n primeiros produtos/pedidos como alterados agora (e muda algo)."""
+        agora = datetime.now().replace(microsecond=0)
+        with self._lock:
+            for p in self.produtos[:n]:
+                p["preco"] = round(p["preco"] + 1, 2)
+                p["_alterado"] = agora
+            for p in self.pedidos[:n]:
+                p["observacoesInternas"] = f"alterado {agora:%H:%M:%S}"
+                p["_alterado"] = agora
+            for pid in list(self.saldos)[:n]:
+                f, v = self.saldos[pid]
+                self.saldos[pid] = (f + 1, v + 1)
+
+
+def _publico(obj: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in obj.items() if not k.startswith("_")}
+
+
+# ============================================================
+# SERVIDOR
+# ============================================================
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Servidor"
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _json(self, status: int, corpo: Dict[str, Any], cabecalhos: Optional[Dict[str, str]] = None) -> None:
+        dados = json.dumps(corpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        for k, v in (cabecalhos or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self) -> None:
+        srv = self.server.mock
+        if urlparse(self.path).path.rstrip("/") != "/oauth/token":
+            self._json(404, {"error": {"type": "RESOURCE_NOT_FOUND"}})
+            return
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(tamanho).decode("utf-8"))
+        basic = base64.b64encode(f"{CLIENT_ID}:{CLIENT_SECRET}".encode()).decode()
+        if self.headers.get("Authorization") != f"Basic {basic}":
+            self._json(401, {"error": {"type": "invalid_client"}})
+            return
+        with srv.lock:
+            srv.requisicoes["oauth"] += 1
+            if (form.get("grant_type") or [""])[0] != "refresh_token" \
+                    or (form.get("refresh_token") or [""])[0] != srv.refresh_token:
+                self._json(400, {"error": {"type": "invalid_grant"}})
+                return
+            srv.geracao += 1
+            srv.access_token = f"token-{srv.geracao}"
+            srv.refresh_token = f"refresh-{srv.geracao}"
+            srv.usos_token = 0
+            corpo = {"access_token": srv.access_token, "refresh_token": srv.refresh_token,
+                     "expires_in": 21600, "token_type": "Bearer"}
+        self._json(200, corpo)
+
+    def do_GET(self) -> None:
+        srv = self.server.mock
+        url = urlparse(self.path)
+        q = parse_qs(url.query)
+        rota = url.path.rstrip("/")
+
+        with srv.lock:
+            srv.total += 1
+            srv.requisicoes[re.sub(r"/\d+$", "/<id>", rota)] += 1
+            if self.headers.get("Authorization") != f"Bearer {srv.access_token}" \
+                    or (srv.requisicoes_por_token and srv.usos_token >= srv.requisicoes_por_token):
+                self._json(401, {"error": {"type": "invalid_token"}})
+                return
+            srv.usos_token += 1
+            if srv.erro_429_a_cada and srv.total % srv.erro_429_a_cada == 0:
+                self._json(429, {"error": {"type": "TOO_MANY_REQUESTS"}}, {"Retry-After": "0.2"})
+                return
+
+        dados = srv.dados
+        pagina = max(1, int((q.get("pagina") or ["1"])[0]))
+        limite = min(100, max(1, int((q.get("limite") or ["100"])[0])))
+        desde_txt = (q.get("dataAlteracaoInicial") or [""])[0]
+        desde = datetime.strptime(desde_txt, FORMATO_DATA) if desde_txt else None
+
+        def paginar(lista: List[Dict[str, Any]], campos: Optional[Tuple[str, ...]] = None) -> None:
+            with dados._lock:
+                sel = [o for o in lista if desde is None or o["_alterado"] >= desde]
+                ini = (pagina - 1) * limite
+                fatia = sel[ini:ini + limite]
+                if campos:
+                    fatia = [{k: o[k] for k in campos if k in o} for o in fatia]
+                else:
+                    fatia = [_publico(o) for o in fatia]
+            self._json(200, {"data": fatia})
+
+        if rota == "/produtos":
+            paginar(dados.produtos)
+        elif rota == "/pedidos/vendas":
+            paginar(dados.pedidos, ("id", "numero", "numeroLoja", "data", "total", "contato", "situacao"))
+        elif rota.startswith("/pedidos/vendas/"):
+            pid = int(rota.rsplit("/", 1)[1])
+            with dados._lock:
+                ped = next((_publico(p) for p in dados.pedidos if p["id"] == pid), None)
+            if ped is None:
+                self._json(404, {"error": {"type": "RESOURCE_NOT_FOUND"}})
+            else:
+                self._json(200, {"data": ped})
+        elif rota == "/estoques/saldos":
+            ids = [int(x) for x in (q.get("idsProdutos[]") or []) if x.isdigit()]
+            with dados._lock:
+                out = [{"produto": {"id": i}, "saldoFisicoTotal": dados.saldos[i][0],
+                        "saldoVirtualTotal": dados.saldos[i][1], "depositos": []}
+                       for i in ids if i in dados.saldos]
+            self._json(200, {"data": out})
+        else:
+            self._json(404, {"error": {"type": "RESOURCE_NOT_FOUND"}})
+
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+    mock: "ServidorBlingFalso"
+
+
+class ServidorBlingFalso:
+    def __init__(self, produtos: int = 300, pedidos: int = 150, porta: int = 0,
+                 requisicoes_por_token: int = 0, erro_429_a_cada: int = 0, semente: int = 42) -> None:
+        self.dados = DadosBlingFalsos(produtos, pedidos, semente)
+        self.lock = threading.Lock()
+        self.geracao = 0
+        self.access_token = "token-0"
+        self.refresh_token = "refresh-0"
+        self.usos_token = 0
+        self.requisicoes_por_token = int(requisicoes_por_token)
+        self.erro_429_a_cada = int(erro_429_a_cada)
+        self.total = 0
+        self.requisicoes: Counter = Counter()
+
+        self._srv = _Servidor(("127.0.0.1", int(porta)), _Handler)
+        self._srv.mock = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, porta = self._srv.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def iniciar(self) -> "ServidorBlingFalso":
+        self._thread = threading.Thread(target=self._srv.serve_forever, name="bling-mock", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self) -> None:
+        self._srv.shutdown()
+        self._srv.server_close()
+
+    def __enter__(self) -> "ServidorBlingFalso":
+        return self.iniciar()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.parar()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Servidor local que imita a API v3 do Bling.")
+    ap.add_argument("--porta", type=int, default=8765)
+    ap.add_argument("--produtos", type=int, default=300)
+    ap.add_argument("--pedidos", type=int, default=150)
+    ap.add_argument("--requisicoes-por-token", type=int, default=0)
+    ap.add_argument("--erro-429-a-cada", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    srv = ServidorBlingFalso(args.produtos, args.pedidos, args.porta,
+                             args.requisicoes_por_token, args.erro_429_a_cada)
+    print(f"Bling falso em {srv.base_url} (access_token={srv.access_token}, "
+          f"refresh_token={srv.refresh_token}, client={CLIENT_ID}/{CLIENT_SECRET})")
+    try:
+        srv._srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv._srv.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,629 @@
+from __future__ import annotations
+
+"""
+bling_sync.py
+Sincronização incremental com a API v3 do Bling.
+
+- Token: "Ekenox".token (integracao = 'bling'). O access_token é renovado
+  com o refresh_token pouco antes de expirar ou quando a API responde 401.
+  A renovação trava a linha (SELECT ... FOR UPDATE), então dois processos
+  não gastam o mesmo refresh_token.
+- Cursor por entidade em "Ekenox".sequenciadores ('sync:<entidade>' =
+  epoch da última execução OK). Próxima execução pede só o alterado desde
+  então (dataAlteracaoInicial), com MARGEM_CURSOR de sobreposição.
+  O cursor é gravado no mesmo COMMIT dos dados.
+- Páginas buscadas em paralelo (BLING_PARALELO threads) sob um limitador
+  de taxa único (BLING_REQ_POR_S); 429/5xx -> espera (Retry-After) e repete.
+- Gravação em lote: INSERT ... VALUES (execute_values) ON CONFLICT DO UPDATE
+  ... WHERE IS DISTINCT FROM (só o que mudou é escrito).
+
+Entidades (nesta ordem, por causa das FKs):
+  produtos -> "Ekenox".produtos
+  pedidos  -> "Ekenox".contatos, "Ekenox".pedidos, "Ekenox".itens
+  estoque  -> "Ekenox".estoque (a API não filtra saldo por data: busca os
+              saldos de todos os produtos e aplica com estoque_sincronizacao)
+
+Teste local: bling_mock.py sobe um servidor HTTP que imita esses endpoints.
+    python bling_mock.py --porta 8765
+    python bling_sync.py --base-url http://127.0.0.1:8765 produtos pedidos
+
+Uso:
+    python bling_sync.py [produtos] [pedidos] [estoque] [--completo]
+"""
+
+import argparse
+import base64
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import requests
+from psycopg2.extras import execute_values
+
+from estoque_sincronizacao import sincronizar_estoque
+from sistema_log import log_write
+
+
+BLING_REQ_POR_S = float(os.getenv("EKENOX_BLING_REQ_POR_S", "3") or 3)
+BLING_PARALELO = int(os.getenv("EKENOX_BLING_PARALELO", "3") or 3)
+BLING_LIMITE_PAGINA = 100
+BLING_IDS_POR_SALDO = 100
+
+MARGEM_CURSOR = timedelta(minutes=2)
+RENOVAR_ANTES = timedelta(minutes=2)
+LOTE_UPSERT = 500
+FORMATO_DATA_BLING = "%Y-%m-%d %H:%M:%S"
+
+ENTIDADES = ("produtos", "pedidos", "estoque")
+LOG_ARQUIVO = "bling_sync.log"
+
+
+class ErroBling(RuntimeError):
+    pass
+
+
+# ============================================================
+# TOKEN ("Ekenox".token)
+# ============================================================
+
+class TokenBling:
+    """
+    access_token atual da integração. 'conectar' devolve uma conexão
+    psycopg2 nova (a renovação faz COMMIT próprio, fora da transação
+    de dados). Sem linha na tabela, usa 'token_fixo' (AppConfig.bling_token).
+    """
+
+    SQL_LER = """
+        SELECT id, client_id, client_secret, access_token, refresh_token, expires_at
+          FROM "Ekenox".token
+         WHERE integracao ILIKE %s
+         ORDER BY id DESC
+         LIMIT 1
+    """
+
+    def __init__(self, conectar: Callable[[], Any], base_url: str, timeout: int = 20,
+                 integracao: str = "bling", token_fixo: str = "") -> None:
+        self.conectar = conectar
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.integracao = integracao
+        self.token_fixo = (token_fixo or "").strip()
+        self._lock = threading.Lock()
+        self._access: Optional[str] = None
+        self._expira: Optional[datetime] = None
+        self.renovacoes = 0
+
+    @staticmethod
+    def _valido(expira: Optional[datetime]) -> bool:
+        if expira is None:
+            return True
+        if expira.tzinfo is None:
+            expira = expira.replace(tzinfo=timezone.utc)
+        return expira - datetime.now(timezone.utc) > RENOVAR_ANTES
+
+    def obter(self) -> str:
+        with self._lock:
+            if self._access and self._valido(self._expira):
+                return self._access
+            return self._carregar(rejeitado=None)
+
+    def renovar(self, rejeitado: Optional[str] = None) -> str:
+        """Chamado após 401: renova, a não ser que outro processo já tenha renovado."""
+        with self._lock:
+            if self._access and self._access != rejeitado and self._valido(self._expira):
+                return self._access
+            return self._carregar(rejeitado=rejeitado or self._access or "")
+
+    def _carregar(self, rejeitado: Optional[str]) -> str:
+        conn = self.conectar()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(self.SQL_LER + " FOR UPDATE", (self.integracao,))
+                r = cur.fetchone()
+                if not r:
+                    conn.rollback()
+                    if not self.token_fixo:
+                        raise ErroBling(f'Nenhum token "{self.integracao}" em "Ekenox".token.')
+                    self._access, self._expira = self.token_fixo, None
+                    return self._access
+
+                tid, client_id, client_secret, access, refresh, expira = r
+                if access and access != rejeitado and self._valido(expira):
+                    conn.rollback()
+                    self._access, self._expira = access, expira
+                    return access
+
+                novo = self._pedir_token(client_id, client_secret, refresh)
+                expira = datetime.now(timezone.utc) + timedelta(seconds=int(novo.get("expires_in") or 3600))
+                cur.execute(
+                    """
+                    UPDATE "Ekenox".token
+                       SET access_token = %s,
+                           refresh_token = %s,
+                           expires_at = %s
+                     WHERE id = %s
+                    """,
+                    (novo["access_token"], novo.get("refresh_token") or refresh, expira, tid),
+                )
+            conn.commit()
+            self.renovacoes += 1
+            self._access, self._expira = novo["access_token"], expira
+            return self._access
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _pedir_token(self, client_id: str, client_secret: str, refresh: str) -> Dict[str, Any]:
+        if not refresh:
+            raise ErroBling("Token expirado e sem refresh_token em \"Ekenox\".token.")
+        basic = base64.b64encode(f"{client_id or ''}:{client_secret or ''}".encode()).decode()
+        r = requests.post(
+            f"{self.base_url}/oauth/token",
+            headers={"Authorization": f"Basic {basic}", "Accept": "application/json"},
+            data={"grant_type": "refresh_token", "refresh_token": refresh},
+            timeout=self.timeout,
+        )
+        if r.status_code != 200:
+            raise ErroBling(f"Falha ao renovar token: HTTP {r.status_code} {r.text[:200]}")
+        dados = r.json()
+        if not dados.get("access_token"):
+            raise ErroBling("Resposta de renovação sem access_token.")
+        return dados
+
+
+# ============================================================
+# HTTP
+# ============================================================
+
+class LimitadorTaxa:
+    """No máximo 'por_segundo' requisições/s, somando todas as threads."""
+
+    def __init__(self, por_segundo: float) -> None:
+        self.intervalo = 1.0 / max(0.1, float(por_segundo))
+        self._prox = 0.0
+        self._lock = threading.Lock()
+
+    def aguardar(self) -> None:
+        with self._lock:
+            agora = time.monotonic()
+            espera = self._prox - agora
+            self._prox = max(agora, self._prox) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+    def penalizar(self, segundos: float) -> None:
+        """Depois de um 429: ninguém sai antes de 'segundos'."""
+        with self._lock:
+            self._prox = max(self._prox, time.monotonic() + max(0.0, segundos))
+
+
+class ClienteBling:
+    def __init__(self, base_url: str, token: TokenBling, timeout: int = 20,
+                 req_por_s: float = BLING_REQ_POR_S, paralelo: int = BLING_PARALELO,
+                 tentativas: int = 5) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.limitador = LimitadorTaxa(req_por_s)
+        self.paralelo = max(1, int(paralelo))
+        self.tentativas = max(1, int(tentativas))
+        self.requisicoes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _sessao(self) -> requests.Session:
+        s = getattr(self._local, "sessao", None)
+        if s is None:
+            s = self._local.sessao = requests.Session()
+        return s
+
+    def get(self, caminho: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        url = f"{self.base_url}/{caminho.lstrip('/')}"
+        renovou = False
+        ultimo = ""
+        for tentativa in range(self.tentativas):
+            self.limitador.aguardar()
+            tok = self.token.obter()
+            try:
+                r = self._sessao().get(
+                    url, params=params, timeout=self.timeout,
+                    headers={"Authorization": f"Bearer {tok}", "Accept": "application/json"},
+                )
+            except requests.RequestException as e:
+                ultimo = f"{type(e).__name__}: {e}"
+                self.limitador.penalizar(2 ** tentativa)
+                continue
+            with self._lock:
+                self.requisicoes += 1
+
+            if r.status_code == 401 and not renovou:
+                self.token.renovar(rejeitado=tok)
+                renovou = True
+                continue
+            if r.status_code == 429 or r.status_code >= 500:
+                ultimo = f"HTTP {r.status_code}"
+                try:
+                    espera = float(r.headers.get("Retry-After") or 0)
+                except ValueError:
+                    espera = 0.0
+                self.limitador.penalizar(espera or 2 ** tentativa)
+                continue
+            if r.status_code != 200:
+                raise ErroBling(f"GET {caminho}: HTTP {r.status_code} {r.text[:200]}")
+            return r.json() or {}
+        raise ErroBling(f"GET {caminho}: desistiu após {self.tentativas} tentativas ({ultimo})")
+
+    def _pagina(self, caminho: str, params: Dict[str, Any], pagina: int) -> List[Dict[str, Any]]:
+        dados = self.get(caminho, {**params, "pagina": pagina, "limite": BLING_LIMITE_PAGINA})
+        return list(dados.get("data") or [])
+
+    def paginas(self, caminho: str, params: Optional[Dict[str, Any]] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Busca 'paralelo' páginas por vez; para na primeira página incompleta.
+        Entrega as páginas em ordem.
+        """
+        params = dict(params or {})
+        pagina = 1
+        with ThreadPoolExecutor(max_workers=self.paralelo) as ex:
+            while True:
+                numeros = range(pagina, pagina + self.paralelo)
+                onda = list(ex.map(lambda p: self._pagina(caminho, params, p), numeros))
+                for itens in onda:
+                    if itens:
+                        yield itens
+                    if len(itens) < BLING_LIMITE_PAGINA:
+                        return
+                pagina += self.paralelo
+
+    def varios(self, caminhos: Sequence[str],
+               params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """GET em paralelo (ex.: detalhe de cada pedido); devolve os 'data'."""
+        with ThreadPoolExecutor(max_workers=self.paralelo) as ex:
+            return [d.get("data") or {} for d in ex.map(lambda c: self.get(c, params), caminhos)]
+
+
+# ============================================================
+# CURSORES ("Ekenox".sequenciadores)
+# ============================================================
+
+def _chave_cursor(entidade: str) -> str:
+    return f"sync:{entidade}"[:30]
+
+
+def ler_cursor(conn, entidade: str) -> Optional[datetime]:
+    with conn.cursor() as cur:
+        cur.execute('SELECT sequenciador FROM "Ekenox".sequenciadores WHERE tabela = %s',
+                    (_chave_cursor(entidade),))
+        r = cur.fetchone()
+    return datetime.fromtimestamp(int(r[0])) if r and r[0] else None
+
+
+def gravar_cursor(cur, entidade: str, quando: datetime) -> None:
+    """Não faz commit: vai junto com os dados da entidade."""
+    cur.execute(
+        """
+        INSERT INTO "Ekenox".sequenciadores (tabela, sequenciador)
+        VALUES (%s, %s)
+        ON CONFLICT (tabela) DO UPDATE SET sequenciador = EXCLUDED.sequenciador
+        """,
+        (_chave_cursor(entidade), int(quando.timestamp())),
+    )
+
+
+# ============================================================
+# GRAVAÇÃO EM LOTE
+# ============================================================
+
+def upsert_lote(cur, tabela: str, colunas: Sequence[str], chave: Sequence[str],
+                linhas: Sequence[Tuple[Any, ...]]) -> int:
+    """
+    INSERT ... ON CONFLICT (chave) DO UPDATE só das colunas informadas
+    (as demais colunas da tabela não são tocadas) e só se algo mudou.
+    Devolve quantas linhas foram inseridas/alteradas.
+    """
+    if not linhas:
+        return 0
+    pos = [colunas.index(c) for c in chave]
+    unicas = list({tuple(l[i] for i in pos): l for l in linhas}.values())
+
+    outras = [c for c in colunas if c not in chave]
+    cols = ", ".join(f'"{c}"' for c in colunas)
+    conflito = ", ".join(f'"{c}"' for c in chave)
+    sets = ", ".join(f'"{c}" = EXCLUDED."{c}"' for c in outras)
+    atuais = ", ".join(f't."{c}"' for c in outras)
+    novos = ", ".join(f'EXCLUDED."{c}"' for c in outras)
+    sql = f"""
+        INSERT INTO {tabela} AS t ({cols}) VALUES %s
+        ON CONFLICT ({conflito}) DO UPDATE SET {sets}
+        WHERE ({atuais}) IS DISTINCT FROM ({novos})
+    """
+    total = 0
+    for i in range(0, len(unicas), LOTE_UPSERT):
+        lote = unicas[i:i + LOTE_UPSERT]
+        execute_values(cur, sql, lote, page_size=len(lote))
+        total += int(cur.rowcount or 0)
+    return total
+
+
+def _existentes(cur, sql: str, ids: Sequence[Any]) -> set:
+    if not ids:
+        return set()
+    cur.execute(sql, (list(ids),))
+    return {r[0] for r in cur.fetchall()}
+
+
+# ============================================================
+# MAPEAMENTO Bling -> "Ekenox"
+# ============================================================
+
+def _id(obj: Any) -> Optional[int]:
+    if isinstance(obj, dict):
+        obj = obj.get("id")
+    try:
+        v = int(obj)
+    except (TypeError, ValueError):
+        return None
+    return v or None
+
+
+def _data(txt: Any) -> Optional[str]:
+    txt = str(txt or "").strip()
+    return None if not txt or txt.startswith("0000") else txt[:10]
+
+
+def _num(v: Any) -> Optional[float]:
+    try:
+        return None if v in (None, "") else float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+COLS_PRODUTOS = ("produtoId", "nomeProduto", "sku", "preco", "custo", "tipo", "formato",
+                 "descricaoCurta", "idProdutoPai")
+
+
+def linha_produto(p: Dict[str, Any]) -> Tuple[Any, ...]:
+    pai = _id(p.get("idProdutoPai") or p.get("produtoPai"))
+    return (
+        str(p["id"]), p.get("nome"), p.get("codigo"), _num(p.get("preco")),
+        _num(p.get("precoCusto")), p.get("tipo"), p.get("formato"),
+        p.get("descricaoCurta"), str(pai) if pai else None,
+    )
+
+
+COLS_CONTATOS = ("idContato", "nome", "tipoPessoa", "numeroDOcumento")
+
+COLS_PEDIDOS = ("idPedido", "numero", "numeroLoja", "data", "dataSaida", "totalProdutos", "total",
+                "fkContato", "fkSituacao", "fkLoja", "numeroPedidoCompra", "outrasDespesas",
+                "observacoes", "observacoesInternas", "desconto", "taxaComissao", "custoFrete",
+                "valorBase")
+
+COLS_ITENS = ("id", "codigo", "unidade", "quantidade", "desconto", "valor", "nomeProduto",
+              "fkProduto", "fkPedido", "dataPedido")
+
+
+def linha_contato(c: Dict[str, Any]) -> Tuple[Any, ...]:
+    tipo = str(c.get("tipoPessoa") or "").strip()[:1] or None
+    return (_id(c), c.get("nome"), tipo, c.get("numeroDocumento"))
+
+
+def linha_pedido(p: Dict[str, Any], situacoes: set) -> Tuple[Any, ...]:
+    taxas = p.get("taxas") or {}
+    desconto = p.get("desconto")
+    if isinstance(desconto, dict):
+        desconto = desconto.get("valor")
+    sit = _id(p.get("situacao"))
+    return (
+        _id(p), p.get("numero"), p.get("numeroLoja"), _data(p.get("data")), _data(p.get("dataSaida")),
+        _num(p.get("totalProdutos")), _num(p.get("total")), _id(p.get("contato")),
+        sit if sit in situacoes else None, _id(p.get("loja")), p.get("numeroPedidoCompra"),
+        _num(p.get("outrasDespesas")), p.get("observacoes"), p.get("observacoesInternas"),
+        _num(desconto), _num(taxas.get("taxaComissao")), _num(taxas.get("custoFrete")),
+        _num(taxas.get("valorBase")),
+    )
+
+
+def linha_item(i: Dict[str, Any], pedido: Dict[str, Any], produtos: set) -> Tuple[Any, ...]:
+    pid = _id(i.get("produto"))
+    return (
+        _id(i), i.get("codigo"), i.get("unidade"), _num(i.get("quantidade")), _num(i.get("desconto")),
+        _num(i.get("valor")), i.get("descricao"),
+        str(pid) if pid and str(pid) in produtos else None,
+        _id(pedido), _data(pedido.get("data")),
+    )
+
+
+# ============================================================
+# SINCRONIZADOR
+# ============================================================
+
+@dataclass
+class ResultadoSync:
+    entidade: str
+    lidos: int = 0
+    gravados: int = 0
+    removidos: int = 0
+    requisicoes: int = 0
+    desde: Optional[datetime] = None
+    duracao_s: float = 0.0
+    erro: str = ""
+
+    def resumo(self) -> str:
+        desde = self.desde.strftime(FORMATO_DATA_BLING) if self.desde else "carga completa"
+        if self.erro:
+            return f"{self.entidade}: ERRO ({desde}) {self.erro}"
+        return (f"{self.entidade}: {self.lidos} lido(s), {self.gravados} gravado(s), "
+                f"{self.removidos} removido(s), {self.requisicoes} req, "
+                f"{self.duracao_s:.1f}s (desde {desde})")
+
+
+class SincronizadorBling:
+    """
+    Uma entidade = uma transação: dados + cursor no mesmo COMMIT.
+    Se der erro, ROLLBACK e o cursor fica onde estava (a próxima execução
+    repete o intervalo).
+    """
+
+    def __init__(self, conn, cliente: ClienteBling, log_dir: Optional[str] = None) -> None:
+        self.conn = conn
+        self.cliente = cliente
+        self.log_dir = log_dir
+
+    def sincronizar(self, entidades: Optional[Sequence[str]] = None,
+                    completo: bool = False) -> List[ResultadoSync]:
+        pedidas = set(entidades or ENTIDADES)
+        desconhecidas = pedidas - set(ENTIDADES)
+        if desconhecidas:
+            raise ValueError(f"Entidade(s) desconhecida(s): {', '.join(sorted(desconhecidas))}")
+
+        out: List[ResultadoSync] = []
+        for ent in ENTIDADES:
+            if ent in pedidas:
+                out.append(self._rodar(ent, completo))
+        return out
+
+    def _rodar(self, entidade: str, completo: bool) -> ResultadoSync:
+        res = ResultadoSync(entidade)
+        inicio = datetime.now()
+        t0 = time.perf_counter()
+        req0 = self.cliente.requisicoes
+        try:
+            if not completo:
+                ultimo = ler_cursor(self.conn, entidade)
+                res.desde = ultimo - MARGEM_CURSOR if ultimo else None
+            getattr(self, f"_sync_{entidade}")(res, inicio)
+        except Exception as e:
+            self.conn.rollback()
+            res.erro = f"{type(e).__name__}: {e}"
+        res.requisicoes = self.cliente.requisicoes - req0
+        res.duracao_s = time.perf_counter() - t0
+        if self.log_dir:
+            log_write(self.log_dir, LOG_ARQUIVO, res.resumo(), entidade=entidade, lidos=res.lidos,
+                      gravados=res.gravados, removidos=res.removidos, requisicoes=res.requisicoes,
+                      duracao_ms=round(res.duracao_s * 1000.0, 1), erro=res.erro)
+        return res
+
+    def _filtro(self, res: ResultadoSync) -> Dict[str, Any]:
+        return {"dataAlteracaoInicial": res.desde.strftime(FORMATO_DATA_BLING)} if res.desde else {}
+
+    # ---------- produtos ----------
+    def _sync_produtos(self, res: ResultadoSync, inicio: datetime) -> None:
+        with self.conn.cursor() as cur:
+            for pagina in self.cliente.paginas("produtos", self._filtro(res)):
+                linhas = [linha_produto(p) for p in pagina if _id(p)]
+                res.lidos += len(linhas)
+                res.gravados += upsert_lote(cur, '"Ekenox".produtos', COLS_PRODUTOS, ("produtoId",), linhas)
+            gravar_cursor(cur, "produtos", inicio)
+        self.conn.commit()
+
+    # ---------- pedidos (+ contatos, itens) ----------
+    def _sync_pedidos(self, res: ResultadoSync, inicio: datetime) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute('SELECT id FROM "Ekenox".situacao')
+            situacoes = {int(r[0]) for r in cur.fetchall()}
+
+            for pagina in self.cliente.paginas("pedidos/vendas", self._filtro(res)):
+                ids = [i for i in (_id(p) for p in pagina) if i]
+                pedidos = [p for p in self.cliente.varios([f"pedidos/vendas/{i}" for i in ids]) if _id(p)]
+                res.lidos += len(pedidos)
+
+                contatos = [linha_contato(p["contato"]) for p in pedidos
+                            if isinstance(p.get("contato"), dict) and _id(p["contato"])]
+                res.gravados += upsert_lote(cur, '"Ekenox".contatos', COLS_CONTATOS, ("idContato",), contatos)
+                res.gravados += upsert_lote(cur, '"Ekenox".pedidos', COLS_PEDIDOS, ("idPedido",),
+                                            [linha_pedido(p, situacoes) for p in pedidos])
+
+                pids = {str(_id(i.get("produto"))) for p in pedidos for i in (p.get("itens") or [])
+                        if _id(i.get("produto"))}
+                produtos = _existentes(
+                    cur, 'SELECT "produtoId" FROM "Ekenox".produtos WHERE "produtoId" = ANY(%s)', sorted(pids))
+                itens = [linha_item(i, p, produtos) for p in pedidos for i in (p.get("itens") or []) if _id(i)]
+                res.gravados += upsert_lote(cur, '"Ekenox".itens', COLS_ITENS, ("id",), itens)
+
+                # itens que saíram do pedido no Bling
+                if not pedidos:
+                    continue
+                cur.execute(
+                    'DELETE FROM "Ekenox".itens WHERE "fkPedido" = ANY(%s) AND NOT (id = ANY(%s))',
+                    ([_id(p) for p in pedidos], [l[0] for l in itens]),
+                )
+                res.removidos += int(cur.rowcount or 0)
+            gravar_cursor(cur, "pedidos", inicio)
+        self.conn.commit()
+
+    # ---------- estoque ----------
+    def _sync_estoque(self, res: ResultadoSync, inicio: datetime) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute("""SELECT "produtoId" FROM "Ekenox".produtos WHERE "produtoId" ~ '^[0-9]+$' """)
+            ids = [r[0] for r in cur.fetchall()]
+        self.conn.rollback()
+
+        blocos = [ids[i:i + BLING_IDS_POR_SALDO] for i in range(0, len(ids), BLING_IDS_POR_SALDO)]
+        with ThreadPoolExecutor(max_workers=self.cliente.paralelo) as ex:
+            respostas = list(ex.map(
+                lambda b: self.cliente.get("estoques/saldos", {"idsProdutos[]": b}).get("data") or [], blocos))
+
+        linhas = []
+        for saldo in (s for r in respostas for s in r):
+            pid = _id(saldo.get("produto"))
+            if pid:
+                linhas.append((len(linhas) + 1, str(pid),
+                               str(saldo.get("saldoFisicoTotal", "")), str(saldo.get("saldoVirtualTotal", ""))))
+        res.lidos = len(linhas)
+
+        # sincronizar_estoque faz o próprio COMMIT; o cursor vai logo depois
+        rel = sincronizar_estoque(self.conn, linhas)
+        if rel.erros:
+            raise ErroBling(rel.resumo())
+        res.gravados = rel.inseridos + rel.atualizados
+        with self.conn.cursor() as cur:
+            gravar_cursor(cur, "estoque", inicio)
+        self.conn.commit()
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import psycopg2
+    from Ordem_Producao import BASE_DIR, load_config
+
+    ap = argparse.ArgumentParser(description="Sincronização incremental com o Bling.")
+    ap.add_argument("entidades", nargs="*", help="produtos, pedidos, estoque (padrão: todas)")
+    ap.add_argument("--completo", action="store_true", help="ignora o cursor (carga completa)")
+    ap.add_argument("--base-url", help="URL da API (ex.: servidor do bling_mock.py)")
+    args = ap.parse_args(argv)
+
+    cfg = load_config()
+
+    def conectar():
+        return psycopg2.connect(
+            host=cfg.db_host, database=cfg.db_database, user=cfg.db_user,
+            password=cfg.db_password, port=int(cfg.db_port), connect_timeout=5,
+        )
+
+    base_url = args.base_url or cfg.bling_base_url
+    token = TokenBling(conectar, base_url, cfg.bling_timeout, token_fixo=cfg.bling_token)
+    cliente = ClienteBling(base_url, token, timeout=cfg.bling_timeout)
+
+    conn = conectar()
+    try:
+        resultados = SincronizadorBling(conn, cliente, os.path.join(BASE_DIR, "logs")).sincronizar(
+            args.entidades or None, completo=args.completo)
+    finally:
+        conn.close()
+
+    for r in resultados:
+        print(r.resumo())
+    return 1 if any(r.erro for r in resultados) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
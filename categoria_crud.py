@@ -121,6 +121,8 @@ class CategoriaCRUDMixin:
             self._q(sql, (cid, nome, int(categoria_pai)
                     if categoria_pai is not None else None))
             self.conn.commit()
+            if hasattr(self, "ref_invalidar"):
+                self.ref_invalidar()
             return True, ""
 
         except Exception as e:
@@ -157,6 +159,8 @@ class CategoriaCRUDMixin:
                 return False, f"Nenhum registro encontrado para categoriaId={cid}."
 
             self.conn.commit()
+            if hasattr(self, "ref_invalidar"):
+                self.ref_invalidar()
             return True, ""
 
         except Exception as e:
@@ -215,9 +219,45 @@ class CategoriaCRUDMixin:
                 return False, f"Nenhum registro para excluir (categoriaId={cid})."
 
             self.conn.commit()
+            if hasattr(self, "ref_invalidar"):
+                self.ref_invalidar()
             return True, ""
 
         except Exception as e:
             if getattr(self, "conn", None):
                 self.conn.rollback()
             return False, f"Erro ao excluir categoria: {type(e).__name__}: {e}"
+
+    def categoria_set_filtro_producao(self, categoria_id: int, filtro: str | None) -> Tuple[bool, str]:
+        """
+        Define o filtro de produção da subárvore (categoria_hierarquia.sql):
+          'E' = exclui a categoria e descendentes das listagens de produção
+          'I' = inclui (reabre um ramo dentro de subárvore excluída)
+          None = herda do pai
+        """
+        try:
+            cid = int(categoria_id)
+            filtro = (filtro or "").strip().upper() or None
+            if filtro not in (None, "E", "I"):
+                return False, "filtro deve ser 'E', 'I' ou vazio."
+
+            sql = """
+                UPDATE "Ekenox"."categoria"
+                   SET "filtroProducao" = %s
+                 WHERE "categoriaId" = %s;
+            """
+            self._q(sql, (filtro, cid))
+
+            if (self.cursor.rowcount or 0) == 0:
+                self.conn.rollback()
+                return False, f"Categoria não encontrada (categoriaId={cid})."
+
+            self.conn.commit()
+            if hasattr(self, "ref_invalidar"):
+                self.ref_invalidar()
+            return True, ""
+
+        except Exception as e:
+            if getattr(self, "conn", None):
+                self.conn.rollback()
+            return False, f"Erro ao definir filtro da categoria: {type(e).__name__}: {e}"
@@ -0,0 +1,134 @@
+-- categoria_hierarquia.sql
+-- Hierarquia de categorias (closure table) + filtro de produção por subárvore.
+-- Rodar depois do Criacao_arquivo.sql. Idempotente.
+--
+-- "filtroProducao" em "Ekenox".categoria:
+--   'E' = exclui a categoria e toda a subárvore das listagens de produção
+--   'I' = inclui (reabre um ramo dentro de uma subárvore excluída)
+--   NULL = herda do ancestral mais próximo que tenha filtro
+--
+-- categoria_fechamento: (ancestral, descendente, profundidade), inclusive a
+-- própria categoria com profundidade 0.
+-- categoria_excluida: categorias cujo filtro efetivo é 'E' (PK -> anti-join
+-- indexado em listar_produtos_disponiveis).
+-- As duas são recalculadas por trigger de statement em "Ekenox".categoria.
+
+BEGIN;
+
+ALTER TABLE IF EXISTS "Ekenox".categoria
+    ADD COLUMN IF NOT EXISTS "filtroProducao" character(1);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+         WHERE conname = 'categoria_filtro_producao_chk'
+    ) THEN
+        ALTER TABLE "Ekenox".categoria
+            ADD CONSTRAINT categoria_filtro_producao_chk
+            CHECK ("filtroProducao" IS NULL OR "filtroProducao" IN ('E', 'I'));
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS "Ekenox".categoria_fechamento
+(
+    ancestral bigint NOT NULL,
+    descendente bigint NOT NULL,
+    profundidade integer NOT NULL,
+    CONSTRAINT categoria_fechamento_pkey PRIMARY KEY (ancestral, descendente)
+);
+
+CREATE INDEX IF NOT EXISTS idx_categoria_fechamento_descendente
+    ON "Ekenox".categoria_fechamento (descendente, profundidade);
+
+CREATE TABLE IF NOT EXISTS "Ekenox".categoria_excluida
+(
+    "categoriaId" bigint NOT NULL,
+    CONSTRAINT categoria_excluida_pkey PRIMARY KEY ("categoriaId")
+);
+
+CREATE INDEX IF NOT EXISTS idx_infoproduto_fkcategoria
+    ON "Ekenox"."infoProduto" ("fkCategoria");
+
+
+CREATE OR REPLACE FUNCTION "Ekenox".fn_categoria_hierarquia_rebuild()
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM "Ekenox".categoria_fechamento;
+
+    -- caminho[] evita laço infinito se alguém cadastrar um ciclo
+    INSERT INTO "Ekenox".categoria_fechamento (ancestral, descendente, profundidade)
+    WITH RECURSIVE arvore AS (
+        SELECT c."categoriaId" AS ancestral,
+               c."categoriaId" AS descendente,
+               0               AS profundidade,
+               ARRAY[c."categoriaId"] AS caminho
+          FROM "Ekenox".categoria c
+        UNION ALL
+        SELECT a.ancestral,
+               f."categoriaId",
+               a.profundidade + 1,
+               a.caminho || f."categoriaId"
+          FROM arvore a
+          JOIN "Ekenox".categoria f
+            ON f."categoriaPai" = a.descendente
+         WHERE NOT f."categoriaId" = ANY(a.caminho)
+    )
+    SELECT ancestral, descendente, MIN(profundidade)
+      FROM arvore
+     GROUP BY ancestral, descendente;
+
+    DELETE FROM "Ekenox".categoria_excluida;
+
+    INSERT INTO "Ekenox".categoria_excluida ("categoriaId")
+    SELECT x.descendente
+      FROM (
+            SELECT DISTINCT ON (f.descendente)
+                   f.descendente, a."filtroProducao"
+              FROM "Ekenox".categoria_fechamento f
+              JOIN "Ekenox".categoria a
+                ON a."categoriaId" = f.ancestral
+             WHERE a."filtroProducao" IS NOT NULL
+             ORDER BY f.descendente, f.profundidade
+           ) x
+     WHERE x."filtroProducao" = 'E';
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION "Ekenox".trg_categoria_hierarquia()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM "Ekenox".fn_categoria_hierarquia_rebuild();
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_categoria_hierarquia ON "Ekenox".categoria;
+
+CREATE TRIGGER trg_categoria_hierarquia
+    AFTER INSERT OR DELETE OR TRUNCATE
+       OR UPDATE OF "categoriaId", "categoriaPai", "filtroProducao"
+    ON "Ekenox".categoria
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION "Ekenox".trg_categoria_hierarquia();
+
+
+-- Carga inicial: as 17 categorias que eram fixas em listar_produtos_disponiveis
+UPDATE "Ekenox".categoria
+   SET "filtroProducao" = 'E'
+ WHERE "filtroProducao" IS NULL
+   AND "categoriaId" IN (
+        3844533, 3983855, 7879429, 3869959, 4241123,
+        3870601, 3844542, 7651801, 3983399, 959867,
+        897565, 3984869, 3862825, 7879102, 7911660,
+        4828356, 6568231
+   );
+
+SELECT "Ekenox".fn_categoria_hierarquia_rebuild();
+
+END;
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+"""
+conexao_resiliente.py
+Conexão longa do SistemaOrdemProducao que sobrevive a queda de servidor/VPN.
+
+- keepalive TCP (PARAMETROS_KEEPALIVE no psycopg2.connect): conexão morta é
+  percebida em ~1 min, não só quando o TCP do Windows desistir
+- _executar_resiliente(): se a conexão caiu (OperationalError/InterfaceError
+  com conn.closed), reconecta e repete a consulta UMA vez, só quando é
+  leitura e a transação perdida só tinha leituras; gravação perdida vira
+  ConexaoIndisponivel (a tela avisa para refazer)
+- sem conexão: backoff exponencial entre tentativas (1 s ... 60 s), as
+  chamadas falham na hora em vez de travar a tela em connect_timeout
+- estado "degradado" (sem conexão) com aviso aos ouvintes: a tela mostra o
+  indicador e não exibe números calculados sem banco (saldo 0, falta total)
+- executar_com_cursor(): para os mixins que trabalham com o cursor direto
+  (funções que recebem cur): aplica a classe de tempo_limite e passa pelo
+  _executar_resiliente; devolve o resultado
+- verificar_conexao(): chamado pela tela a cada N s; tenta reconectar quando
+  degradado e testa a conexão quando está ociosa
+"""
+
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+import psycopg2
+from psycopg2 import extensions as pg_ext
+
+
+PARAMETROS_KEEPALIVE = {
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 3,
+}
+
+BACKOFF_INICIAL_S = 1.0
+BACKOFF_MAX_S = 60.0
+
+_RE_ESCRITA = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE|CREATE|ALTER|DROP|COPY|LOCK)\b", re.I)
+_RE_COMENTARIO = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+
+
+class ConexaoIndisponivel(RuntimeError):
+    """Sem conexão com o banco (ou caiu no meio de uma gravação)."""
+
+
+def eh_leitura(sql: str) -> bool:
+    """SELECT/WITH/VALUES/SHOW sem comando de escrita: pode repetir em outra conexão."""
+    s = _RE_COMENTARIO.sub(" ", sql or "").strip()
+    primeira = s.split(None, 1)[0].upper() if s else ""
+    if primeira not in ("SELECT", "WITH", "VALUES", "SHOW", "TABLE"):
+        return False
+    return not _RE_ESCRITA.search(s)
+
+
+def conexao_caiu(conn: Any, err: BaseException) -> bool:
+    """Erro de conexão (não de SQL): a conexão ficou fechada."""
+    if not isinstance(err, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+        return False
+    return conn is None or bool(getattr(conn, "closed", 1))
+
+
+def executar_com_cursor(sistema: Any, fn: Callable[[Any], Any], leitura: bool,
+                        classe: Optional[str] = None) -> Any:
+    """
+    fn(sistema.cursor) pelo sistema._executar_resiliente quando existir
+    (reconecta; leitura repete uma vez) e devolve o que fn devolver.
+    classe (tempo_limite): padrão CONSULTA para leitura, GRAVACAO para
+    escrita; aplicada por sistema._limitar quando existir.
+    """
+    out: List[Any] = [None]
+    limitar = getattr(sistema, "_limitar", None)
+    if limitar is not None and not classe:
+        # quem tem _limitar já carregou tempo_limite (o ouvinte roda sem Tk)
+        from tempo_limite import CONSULTA, GRAVACAO
+        classe = CONSULTA if leitura else GRAVACAO
+
+    def executar() -> None:
+        if not sistema.cursor:
+            raise RuntimeError("Sem cursor (não conectado).")
+        if limitar is not None:
+            limitar(classe)
+        out[0] = fn(sistema.cursor)     # depois de reconectar, o cursor é outro
+
+    executor = getattr(sistema, "_executar_resiliente", None)
+    if executor is None:
+        executar()
+    else:
+        executor(executar, leitura)
+    return out[0]
+
+
+@dataclass
+class EstadoConexao:
+    degradado: bool = False
+    erro: str = ""
+    falhas: int = 0
+    proxima_tentativa: float = 0.0
+    reconexoes: int = 0
+    so_leitura: bool = True     # transação atual só teve leituras
+    ouvintes: List[Callable[[bool, str], None]] = field(default_factory=list)
+
+
+# ============================================================
+# MIXIN
+# ============================================================
+
+class ConexaoResilienteMixin:
+    """Requer self.conectar(), self.desconectar(), self.conn e self.cursor (SistemaOrdemProducao)."""
+
+    def _conexao_estado(self) -> EstadoConexao:
+        est = getattr(self, "_estado_conexao", None)
+        if est is None:
+            est = self._estado_conexao = EstadoConexao()
+        return est
+
+    @property
+    def degradado(self) -> bool:
+        return self._conexao_estado().degradado
+
+    @property
+    def erro_conexao(self) -> str:
+        return self._conexao_estado().erro
+
+    @property
+    def reconexoes(self) -> int:
+        """Quantas vezes a conexão foi reaberta (a tela compara antes/depois de uma consulta longa)."""
+        return self._conexao_estado().reconexoes
+
+    def ao_mudar_conexao(self, fn: Callable[[bool, str], None]) -> None:
+        """fn(degradado, erro) a cada mudança de estado."""
+        self._conexao_estado().ouvintes.append(fn)
+
+    def _marcar_conexao(self, degradado: bool, erro: str = "") -> None:
+        est = self._conexao_estado()
+        mudou = est.degradado != degradado
+        est.degradado = degradado
+        est.erro = erro
+        if mudou:
+            for fn in list(est.ouvintes):
+                try:
+                    fn(degradado, erro)
+                except Exception:
+                    pass
+
+    def conexao_viva(self) -> bool:
+        return self.conn is not None and self.cursor is not None and not self.conn.closed
+
+    def reconectar(self, forcar: bool = False) -> bool:
+        """
+        Fecha a conexão atual e abre outra. Sem 'forcar', respeita o backoff
+        (falha na hora se a última tentativa foi há pouco).
+        """
+        est = self._conexao_estado()
+        agora = time.monotonic()
+        if not forcar and agora < est.proxima_tentativa:
+            return False
+
+        self.desconectar()
+        ok = self.conectar()
+        if isinstance(ok, tuple):       # sistema_loader devolve (ok, erro)
+            ok = ok[0]
+
+        if ok:
+            est.falhas = 0
+            est.proxima_tentativa = 0.0
+            est.reconexoes += 1
+            est.so_leitura = True
+            self._marcar_conexao(False)
+            return True
+
+        est.falhas += 1
+        est.proxima_tentativa = agora + min(BACKOFF_MAX_S, BACKOFF_INICIAL_S * 2 ** (est.falhas - 1))
+        # sem conn/cursor: os "if self.conn: rollback()" dos métodos não estouram
+        self.conn = None
+        self.cursor = None
+        self._marcar_conexao(True, getattr(self, "ultimo_erro", None) or "Sem conexão com o banco.")
+        return False
+
+    def verificar_conexao(self) -> bool:
+        """Para o timer da tela: reconecta se degradado; com conexão ociosa, testa com SELECT 1."""
+        if getattr(self, "ocupado", False):     # execução cancelável usando a conexão
+            return True
+        if self.degradado or not self.conexao_viva():
+            return self.reconectar()
+        if self.conn.get_transaction_status() != pg_ext.TRANSACTION_STATUS_IDLE:
+            return True
+        try:
+            self.cursor.execute("SELECT 1")
+            self.conn.rollback()
+            return True
+        except Exception as e:
+            if conexao_caiu(self.conn, e):
+                return self.reconectar(forcar=True)
+            try:
+                self.conn.rollback()
+            except Exception:
+                pass
+            return True
+
+    def _executar_resiliente(self, executar: Callable[[], None], leitura: bool) -> None:
+        """
+        Roda executar() (que usa self.cursor). Queda de conexão: reconecta e,
+        se for leitura numa transação só de leituras, repete uma vez.
+        """
+        est = self._conexao_estado()
+        if not self.conexao_viva() and not self.reconectar():
+            raise ConexaoIndisponivel(est.erro or "Sem conexão com o banco.")
+
+        if self.conn.get_transaction_status() == pg_ext.TRANSACTION_STATUS_IDLE:
+            est.so_leitura = True
+
+        try:
+            executar()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            if not conexao_caiu(self.conn, e):
+                raise
+            repetir = leitura and est.so_leitura
+            if not self.reconectar(forcar=True):
+                raise ConexaoIndisponivel(est.erro or "Sem conexão com o banco.") from e
+            if not repetir:
+                raise ConexaoIndisponivel(
+                    "A conexão com o banco caiu durante uma gravação. Refaça a operação.") from e
+            executar()
+            return
+
+        if not leitura:
+            est.so_leitura = False
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+"""
+consultas_preparadas.py
+Registro de consultas preparadas (PREPARE/EXECUTE) do SistemaOrdemProducao.
+
+- cada consulta quente é declarada uma vez: declarar(nome, tipos, sql com $1..$n);
+  só leituras (podem ser repetidas depois de uma reconexão)
+- _qp(nome, params) faz o PREPARE na primeira vez em cada conexão e depois
+  só EXECUTE; reconectou (outro self.conn) -> prepara de novo
+- com tempo_limite: SET LOCAL statement_timeout da classe CONSULTA antes
+- PREPARE não é desfeito por ROLLBACK: a consulta continua pronta mesmo
+  depois de um erro na transação
+- o PostgreSQL passa para plano genérico depois de algumas execuções; daí em
+  diante não há mais parse nem planejamento por chamada
+- tempos: preparo (parse/análise, uma vez) e execução ficam em memória e no
+  METRICAS; planejamento_vs_execucao() roda EXPLAIN ANALYZE no EXECUTE e devolve
+  "Planning Time" x "Execution Time" (aba "Preparadas" do Ctrl+Shift+D)
+"""
+
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from sistema_metricas import METRICAS
+from tempo_limite import CONSULTA
+
+
+PREFIXO = "ek_"
+
+# statement inexistente no servidor (DISCARD ALL, pooler, etc.)
+PGCODE_SEM_PREPARE = "26000"
+
+
+@dataclass(frozen=True)
+class Consulta:
+    nome: str
+    tipos: Tuple[str, ...]
+    sql: str
+
+    @property
+    def statement(self) -> str:
+        return PREFIXO + self.nome
+
+    @property
+    def sql_prepare(self) -> str:
+        tipos = f" ({', '.join(self.tipos)})" if self.tipos else ""
+        return f"PREPARE {self.statement}{tipos} AS {self.sql.strip().rstrip(';')}"
+
+    @property
+    def sql_execute(self) -> str:
+        if not self.tipos:
+            return f"EXECUTE {self.statement}"
+        return f"EXECUTE {self.statement} ({', '.join(['%s'] * len(self.tipos))})"
+
+
+CONSULTAS: Dict[str, Consulta] = {}
+
+
+def declarar(nome: str, tipos: Sequence[str], sql: str) -> Consulta:
+    c = Consulta(nome, tuple(tipos), sql)
+    atual = CONSULTAS.get(nome)
+    if atual is not None and atual != c:
+        raise ValueError(f"Consulta preparada '{nome}' declarada duas vezes com SQL diferente.")
+    CONSULTAS[nome] = c
+    return c
+
+
+# ============================================================
+# ESTATÍSTICAS
+# ============================================================
+
+@dataclass
+class EstatPreparada:
+    nome: str
+    preparos: int = 0
+    preparo_ms: float = 0.0
+    execucoes: int = 0
+    execucao_ms: float = 0.0
+    ultimos_params: Optional[Tuple[Any, ...]] = None
+    planejamento_ms: Optional[float] = None     # do último EXPLAIN ANALYZE
+    execucao_servidor_ms: Optional[float] = None
+
+
+_estat: Dict[str, EstatPreparada] = {}
+_lock = threading.Lock()
+
+
+def _estat_de(nome: str) -> EstatPreparada:
+    st = _estat.get(nome)
+    if st is None:
+        st = _estat[nome] = EstatPreparada(nome)
+    return st
+
+
+# ============================================================
+# MIXIN
+# ============================================================
+
+class ConsultasPreparadasMixin:
+    """Requer self.cursor e self.conn (igual aos CRUDMixins)."""
+
+    def _preparadas_prontas(self) -> Set[str]:
+        """Nomes já preparados NESTA conexão (zera quando self.conn muda)."""
+        if getattr(self, "_preparadas_conn", None) is not self.conn:
+            self._preparadas_conn = self.conn
+            self._preparadas: Set[str] = set()
+        return self._preparadas
+
+    def _qp(self, nome: str, params: Sequence[Any] = ()) -> None:
+        """Todas as consultas do registro são leituras: com ConexaoResilienteMixin, repete após reconectar."""
+        executor = getattr(self, "_executar_resiliente", None)
+        if executor is None:
+            self._qp_executar(nome, params)
+        else:
+            executor(lambda: self._qp_executar(nome, params), True)
+
+    def _qp_executar(self, nome: str, params: Sequence[Any]) -> None:
+        if not self.cursor:
+            raise RuntimeError("Sem cursor (não conectado).")
+        c = CONSULTAS[nome]
+        limitar = getattr(self, "_limitar", None)     # tempo_limite.LimiteConsultaMixin
+        if limitar is not None:
+            limitar(CONSULTA)
+        prontas = self._preparadas_prontas()
+        params = tuple(params)
+
+        if nome not in prontas:
+            t0 = time.perf_counter()
+            with METRICAS.medir(c.sql_prepare, (), self.cursor):
+                self.cursor.execute(c.sql_prepare)
+            dur = (time.perf_counter() - t0) * 1000.0
+            prontas.add(nome)
+            with _lock:
+                st = _estat_de(nome)
+                st.preparos += 1
+                st.preparo_ms += dur
+
+        t0 = time.perf_counter()
+        try:
+            with METRICAS.medir(c.sql_execute, params, self.cursor):
+                self.cursor.execute(c.sql_execute, params)
+        except Exception as e:
+            if getattr(e, "pgcode", None) == PGCODE_SEM_PREPARE:
+                prontas.discard(nome)
+            raise
+        dur = (time.perf_counter() - t0) * 1000.0
+        with _lock:
+            st = _estat_de(nome)
+            st.execucoes += 1
+            st.execucao_ms += dur
+            st.ultimos_params = params
+
+    def planejamento_vs_execucao(self, nome: str,
+                                 params: Optional[Sequence[Any]] = None) -> Dict[str, Optional[float]]:
+        """
+        EXPLAIN (ANALYZE) do EXECUTE: tempo de planejamento x execução no
+        servidor. Sem params usa os da última chamada. Executa a consulta
+        (só leituras estão no registro).
+        """
+        c = CONSULTAS[nome]
+        with _lock:
+            st = _estat_de(nome)
+            params = tuple(params) if params is not None else st.ultimos_params
+        out: Dict[str, Optional[float]] = {"planejamento_ms": None, "execucao_ms": None}
+        if params is None and c.tipos:
+            return out
+        try:
+            if nome not in self._preparadas_prontas():
+                self.cursor.execute(c.sql_prepare)
+                self._preparadas_prontas().add(nome)
+            self.cursor.execute("EXPLAIN (ANALYZE, SUMMARY, FORMAT JSON) " + c.sql_execute, params or ())
+            r = self.cursor.fetchone()
+            plano = r[0] if r else None
+            if isinstance(plano, str):
+                plano = json.loads(plano)
+            topo = (plano or [{}])[0]
+            out["planejamento_ms"] = float(topo.get("Planning Time", 0.0))
+            out["execucao_ms"] = float(topo.get("Execution Time", 0.0))
+        except Exception:
+            if self.conn:
+                self.conn.rollback()
+            return out
+        with _lock:
+            st.planejamento_ms = out["planejamento_ms"]
+            st.execucao_servidor_ms = out["execucao_ms"]
+        return out
+
+    def relatorio_preparadas(self, medir: bool = False) -> List[Dict[str, Any]]:
+        """
+        Uma linha por consulta declarada: preparos/execuções (tempo no cliente),
+        planos genérico/custom do servidor (pg_prepared_statements, PG 14+) e,
+        com medir=True, planejamento x execução do EXPLAIN ANALYZE.
+        """
+        if medir:
+            for nome in list(CONSULTAS):
+                self.planejamento_vs_execucao(nome)
+
+        servidor: Dict[str, Dict[str, Any]] = {}
+        try:
+            self.cursor.execute("SELECT name, to_jsonb(p) FROM pg_prepared_statements p")
+            for name, info in self.cursor.fetchall():
+                servidor[name] = info if isinstance(info, dict) else json.loads(info)
+        except Exception:
+            if self.conn:
+                self.conn.rollback()
+
+        out: List[Dict[str, Any]] = []
+        with _lock:
+            for nome, c in sorted(CONSULTAS.items()):
+                st = _estat_de(nome)
+                srv = servidor.get(c.statement, {})
+                out.append({
+                    "nome": nome,
+                    "preparada": c.statement in servidor,
+                    "preparos": st.preparos,
+                    "preparo_ms": round(st.preparo_ms, 3),
+                    "execucoes": st.execucoes,
+                    "media_ms": round(st.execucao_ms / st.execucoes, 3) if st.execucoes else 0.0,
+                    "planos_genericos": srv.get("generic_plans"),
+                    "planos_custom": srv.get("custom_plans"),
+                    "planejamento_ms": st.planejamento_ms,
+                    "execucao_servidor_ms": st.execucao_servidor_ms,
+                })
+        return out
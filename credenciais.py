@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+"""
+credenciais.py
+Serviço único de senha (menu, reset de senha, cadastro de usuários, login.py).
+
+Formatos aceitos em "Ekenox".usuarios.senha_hash:
+- pbkdf2_sha256$<iteracoes>$<salt>$<hash>   atual (custo gravado no registro)
+- <salt>$<hash>                             antigo: PBKDF2-SHA256, 120.000 iterações
+- $2a$ / $2b$ / $2y$ ...                    bcrypt (security.py antigo, com APP_PWD_PEPPER);
+                                            precisa de bcrypt ou passlib instalado
+
+- gerar_hash(): sempre no formato atual, com o custo calibrado
+- calibrar(): mede PBKDF2 nesta máquina e escolhe as iterações para levar
+  ~EKENOX_SENHA_ALVO_MS (padrão 250 ms), nunca abaixo de 120.000
+- verificar() devolve também novo_hash quando a senha confere mas o registro
+  está desatualizado (formato antigo, bcrypt ou menos iterações que o
+  calibrado); quem chamou grava com atualizar_hash() — só sobe o custo,
+  nunca desce (máquinas diferentes não ficam regravando umas às outras)
+- verificar_async(): mesma coisa numa thread (Future); a tela consulta
+  .done() com after() e não congela durante o PBKDF2
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+
+PREFIXO = "pbkdf2_sha256"
+ITERACOES_ANTIGO = 120_000
+ITERACOES_MIN = 120_000
+ITERACOES_MAX = 2_000_000
+DKLEN = 32
+
+PWD_PEPPER = os.getenv("APP_PWD_PEPPER", "")
+
+
+def _env_float(nome: str, padrao: float) -> float:
+    try:
+        return float((os.getenv(nome) or "").strip() or padrao)
+    except ValueError:
+        return padrao
+
+
+ALVO_MS = _env_float("EKENOX_SENHA_ALVO_MS", 250.0)
+
+
+def _pbkdf2(senha: str, salt: str, iteracoes: int) -> str:
+    return hashlib.pbkdf2_hmac(
+        "sha256", (senha or "").encode("utf-8"), salt.encode("utf-8"), int(iteracoes), dklen=DKLEN,
+    ).hex()
+
+
+# ============================================================
+# CALIBRAÇÃO
+# ============================================================
+
+_calibrado: Optional[int] = None
+_calib_lock = threading.Lock()
+
+
+def calibrar(alvo_ms: float = ALVO_MS, amostra: int = 20_000) -> int:
+    """Iterações para ~alvo_ms nesta máquina (melhor de 3 medições, múltiplo de 10.000)."""
+    global _calibrado
+    with _calib_lock:
+        if _calibrado is not None:
+            return _calibrado
+        melhor = float("inf")
+        for _ in range(3):
+            t0 = time.perf_counter()
+            _pbkdf2("calibracao", "calibracao", amostra)
+            melhor = min(melhor, time.perf_counter() - t0)
+        por_ms = amostra / max(melhor * 1000.0, 1e-6)
+        it = int(round(por_ms * float(alvo_ms) / 10_000.0)) * 10_000
+        _calibrado = max(ITERACOES_MIN, min(ITERACOES_MAX, it))
+        return _calibrado
+
+
+def iteracoes_atuais() -> int:
+    """Custo para hashes novos (calibra na primeira chamada)."""
+    return _calibrado if _calibrado is not None else calibrar()
+
+
+def calibrar_em_segundo_plano() -> None:
+    if _calibrado is None:
+        threading.Thread(target=calibrar, name="credenciais-calibrar", daemon=True).start()
+
+
+# ============================================================
+# FORMATOS
+# ============================================================
+
+def gerar_hash(senha: str, iteracoes: Optional[int] = None) -> str:
+    it = int(iteracoes or iteracoes_atuais())
+    salt = secrets.token_hex(16)
+    return f"{PREFIXO}${it}${salt}${_pbkdf2(senha, salt, it)}"
+
+
+def eh_bcrypt(armazenado: str) -> bool:
+    return (armazenado or "").startswith(("$2a$", "$2b$", "$2y$"))
+
+
+def _partes(armazenado: str) -> Optional[Tuple[int, str, str]]:
+    """(iteracoes, salt, hash) dos formatos PBKDF2; None se não for PBKDF2."""
+    p = (armazenado or "").strip().split("$")
+    if len(p) == 4 and p[0] == PREFIXO:
+        try:
+            return int(p[1]), p[2], p[3]
+        except ValueError:
+            return None
+    if len(p) == 2 and p[0] and p[1]:
+        return ITERACOES_ANTIGO, p[0], p[1]
+    return None
+
+
+def _verificar_bcrypt(senha: str, armazenado: str) -> bool:
+    p = ((senha or "") + PWD_PEPPER).encode("utf-8")
+    try:
+        import bcrypt
+    except ImportError:
+        bcrypt = None
+    if bcrypt is not None:
+        try:
+            return bool(bcrypt.checkpw(p, armazenado.encode("utf-8")))
+        except ValueError:          # registro bcrypt inválido
+            return False
+    try:
+        from passlib.context import CryptContext
+    except ImportError as e:
+        raise RuntimeError("Senha em bcrypt: instale bcrypt ou passlib.") from e
+    try:
+        return bool(CryptContext(schemes=["bcrypt"], deprecated="auto").verify(p, armazenado))
+    except ValueError:
+        return False
+
+
+def precisa_rehash(armazenado: str) -> bool:
+    partes = _partes(armazenado)
+    if partes is None or not (armazenado or "").startswith(PREFIXO + "$"):
+        return True
+    return partes[0] < iteracoes_atuais()
+
+
+# ============================================================
+# VERIFICAÇÃO
+# ============================================================
+
+@dataclass(frozen=True)
+class ResultadoVerificacao:
+    ok: bool
+    novo_hash: Optional[str] = None     # gravar com atualizar_hash() quando vier
+    duracao_ms: float = 0.0
+
+
+def verificar(senha: str, armazenado: str) -> ResultadoVerificacao:
+    t0 = time.perf_counter()
+    armazenado = (armazenado or "").strip()
+    if not armazenado:
+        return ResultadoVerificacao(False)
+
+    if eh_bcrypt(armazenado):
+        ok = _verificar_bcrypt(senha, armazenado)
+    else:
+        partes = _partes(armazenado)
+        if partes is None:
+            return ResultadoVerificacao(False)
+        it, salt, esperado = partes
+        ok = hmac.compare_digest(_pbkdf2(senha, salt, it), esperado.lower())
+
+    novo = gerar_hash(senha) if ok and precisa_rehash(armazenado) else None
+    return ResultadoVerificacao(ok, novo, round((time.perf_counter() - t0) * 1000.0, 1))
+
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="credenciais")
+
+
+def verificar_async(senha: str, armazenado: str) -> "Future[ResultadoVerificacao]":
+    return _executor.submit(verificar, senha, armazenado)
+
+
+def atualizar_hash(conn: Any, usuario_id: int, novo_hash: str, hash_anterior: str) -> bool:
+    """
+    Regrava o senha_hash só se ainda for o que foi verificado (um reset de
+    senha no meio do caminho não é sobrescrito). Faz commit (fora de autocommit).
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE "Ekenox"."usuarios"
+               SET "senha_hash" = %s
+             WHERE "usuarioId" = %s
+               AND "senha_hash" = %s
+            """,
+            (novo_hash, int(usuario_id), hash_anterior),
+        )
+        ok = cur.rowcount == 1
+    if not conn.autocommit:
+        conn.commit()
+    return ok
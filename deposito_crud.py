@@ -139,6 +139,8 @@ class DepositoCRUDMixin:
             self._q(sql, (did, desc, int(situacao), int(
                 padrao), int(desconsiderarsaldo)))
             self.conn.commit()
+            if hasattr(self, "ref_invalidar"):
+                self.ref_invalidar()
             return True, ""
 
         except Exception as e:
@@ -178,6 +180,8 @@ class DepositoCRUDMixin:
                 return False, f"Nenhum registro encontrado para id={did}."
 
             self.conn.commit()
+            if hasattr(self, "ref_invalidar"):
+                self.ref_invalidar()
             return True, ""
 
         except Exception as e:
@@ -243,6 +247,8 @@ class DepositoCRUDMixin:
                 return False, f"Nenhum registro para excluir (id={did})."
 
             self.conn.commit()
+            if hasattr(self, "ref_invalidar"):
+                self.ref_invalidar()
             return True, ""
 
         except Exception as e:
@@ -2,6 +2,8 @@
 from __future__ import annotations
 from typing import Optional, Dict, Any, List, Tuple
 
+from estoque_sincronizacao import sincronizar_arquivo
+
 
 class EstoqueCRUDMixin:
     """
@@ -186,3 +188,25 @@ class EstoqueCRUDMixin:
     def estoque_set_saldos(self, fk_produto: int, saldo_fisico: float, saldo_virtual: float) -> Tuple[bool, str]:
         """Define saldos (upsert)."""
         return self.estoque_upsert(fk_produto, saldo_fisico=saldo_fisico, saldo_virtual=saldo_virtual)
+
+    def estoque_sincronizar_arquivo(
+        self,
+        caminho: str,
+        zerar_ausentes: bool = False,
+        simular: bool = False,
+        forcar: bool = False,
+    ) -> Tuple[bool, str]:
+        """
+        Sincroniza todos os saldos de um snapshot (CSV/JSON do Bling) via
+        COPY + merge (ver estoque_sincronizacao.py). Retorna (ok, resumo).
+        Só as linhas com saldo diferente são gravadas. zerar_ausentes com
+        snapshot vazio/truncado é recusado, salvo forcar=True.
+        """
+        try:
+            rel = sincronizar_arquivo(self.conn, caminho, zerar_ausentes=zerar_ausentes, simular=simular,
+                                      forcar=forcar)
+            return rel.ok, rel.resumo()
+        except Exception as e:
+            if getattr(self, "conn", None):
+                self.conn.rollback()
+            return False, f"Erro ao sincronizar estoque: {type(e).__name__}: {e}"
@@ -0,0 +1,202 @@
+-- estoque_movimento.sql
+-- Razão (ledger) de movimentos de estoque + fotos periódicas de saldo.
+-- Rodar depois do Criacao_arquivo.sql. Idempotente.
+--
+-- Razão: cada linha = uma variação de "saldoFisico" de um produto
+--   quantidade > 0 entrada, < 0 saída
+--   motivo: 'consumo_op'  (baixa de insumos na finalização da OP)
+--           'producao_op' (entrada do produto acabado na finalização da OP)
+--           'ajuste'      (edição direta em estoque: tela, CRUD, SQL)
+--           'sincronizacao' (estoque_sincronizacao.py / bling_sync.py)
+--   ordem_producao_id: OP de origem (NULL para movimentos fora de OP)
+--
+-- Quem escreve:
+--   - baixa_producao.py grava os movimentos da OP (por OP x componente) e
+--     desliga o trigger na transação: set_config('ekenox.razao_estoque', 'off', true)
+--   - o trigger de "Ekenox".estoque grava o resto (delta por produto, por
+--     comando, via transition tables); motivo vem de
+--     set_config('ekenox.motivo_estoque', '<motivo>', true), padrão 'ajuste'
+--
+-- Fotos: "Ekenox".fn_estoque_fotografar() copia o saldo atual e guarda o
+-- último movimento incluído. Saldo numa data = foto anterior + movimentos
+-- depois dela até a data ("Ekenox".fn_estoque_saldo_em). Agendar a foto
+-- (diária/semanal) com: python estoque_razao.py --fotografar
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS "Ekenox".estoque_movimento
+(
+    id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    criado_em timestamp with time zone NOT NULL DEFAULT now(),
+    fkproduto text COLLATE pg_catalog."default" NOT NULL,
+    deposito_id bigint,
+    quantidade double precision NOT NULL,
+    motivo text COLLATE pg_catalog."default" NOT NULL,
+    ordem_producao_id bigint
+);
+
+CREATE INDEX IF NOT EXISTS ix_estoque_movimento_produto_data
+    ON "Ekenox".estoque_movimento (fkproduto, criado_em);
+
+-- delta depois da foto: fkproduto + id > último da foto
+CREATE INDEX IF NOT EXISTS ix_estoque_movimento_produto_id
+    ON "Ekenox".estoque_movimento (fkproduto, id) INCLUDE (quantidade, criado_em);
+
+-- consumo/entrada por período (todos os produtos)
+CREATE INDEX IF NOT EXISTS ix_estoque_movimento_motivo_data
+    ON "Ekenox".estoque_movimento (motivo, criado_em);
+
+CREATE INDEX IF NOT EXISTS ix_estoque_movimento_op
+    ON "Ekenox".estoque_movimento (ordem_producao_id)
+    WHERE ordem_producao_id IS NOT NULL;
+
+
+-- ============================================================
+-- FOTOS DE SALDO
+-- ============================================================
+
+CREATE TABLE IF NOT EXISTS "Ekenox".estoque_foto
+(
+    id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    tirada_em timestamp with time zone NOT NULL DEFAULT clock_timestamp(),
+    ultimo_movimento_id bigint NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_estoque_foto_tirada_em
+    ON "Ekenox".estoque_foto (tirada_em);
+
+CREATE TABLE IF NOT EXISTS "Ekenox".estoque_foto_saldo
+(
+    foto_id bigint NOT NULL REFERENCES "Ekenox".estoque_foto (id) ON DELETE CASCADE,
+    fkproduto text COLLATE pg_catalog."default" NOT NULL,
+    saldo_fisico double precision NOT NULL,
+    saldo_virtual double precision NOT NULL,
+    PRIMARY KEY (foto_id, fkproduto)
+);
+
+
+CREATE OR REPLACE FUNCTION "Ekenox".fn_estoque_fotografar()
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_ultimo bigint;
+    v_foto bigint;
+BEGIN
+    -- espera quem está gravando movimento terminar: saldo e último id ficam coerentes
+    LOCK TABLE "Ekenox".estoque_movimento IN SHARE MODE;
+
+    SELECT COALESCE(max(id), 0) INTO v_ultimo FROM "Ekenox".estoque_movimento;
+
+    INSERT INTO "Ekenox".estoque_foto (ultimo_movimento_id)
+    VALUES (v_ultimo)
+    RETURNING id INTO v_foto;
+
+    INSERT INTO "Ekenox".estoque_foto_saldo (foto_id, fkproduto, saldo_fisico, saldo_virtual)
+    SELECT v_foto, e."fkProduto", COALESCE(e."saldoFisico", 0), COALESCE(e."saldoVirtual", 0)
+      FROM "Ekenox".estoque e;
+
+    RETURN v_foto;
+END;
+$$;
+
+
+-- saldo físico de cada produto em p_quando; sem foto até a data -> nenhuma linha
+CREATE OR REPLACE FUNCTION "Ekenox".fn_estoque_saldo_em(
+    p_produtos text[],
+    p_quando timestamp with time zone
+)
+RETURNS TABLE (fkproduto text, saldo double precision, foto_id bigint)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH f AS (
+        SELECT ft.id, ft.ultimo_movimento_id
+          FROM "Ekenox".estoque_foto ft
+         WHERE ft.tirada_em <= p_quando
+         ORDER BY ft.tirada_em DESC
+         LIMIT 1
+    )
+    SELECT p.fk,
+           COALESCE(fs.saldo_fisico, 0) + COALESCE((
+               SELECT SUM(m.quantidade)
+                 FROM "Ekenox".estoque_movimento m
+                WHERE m.fkproduto = p.fk
+                  AND m.id > f.ultimo_movimento_id
+                  AND m.criado_em <= p_quando
+           ), 0),
+           f.id
+      FROM f
+     CROSS JOIN unnest(p_produtos) AS p(fk)
+      LEFT JOIN "Ekenox".estoque_foto_saldo fs
+             ON fs.foto_id = f.id AND fs.fkproduto = p.fk;
+$$;
+
+
+-- ============================================================
+-- TRIGGER: edições diretas em estoque viram movimento
+-- ============================================================
+
+CREATE OR REPLACE FUNCTION "Ekenox".fn_estoque_razao()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_motivo text := COALESCE(NULLIF(current_setting('ekenox.motivo_estoque', true), ''), 'ajuste');
+BEGIN
+    IF COALESCE(current_setting('ekenox.razao_estoque', true), '') = 'off' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO "Ekenox".estoque_movimento (fkproduto, quantidade, motivo)
+        SELECT n."fkProduto", n."saldoFisico", v_motivo
+          FROM novas n
+         WHERE COALESCE(n."saldoFisico", 0) <> 0;
+
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO "Ekenox".estoque_movimento (fkproduto, quantidade, motivo)
+        SELECT a."fkProduto", -a."saldoFisico", v_motivo
+          FROM antigas a
+         WHERE COALESCE(a."saldoFisico", 0) <> 0;
+
+    ELSE
+        INSERT INTO "Ekenox".estoque_movimento (fkproduto, quantidade, motivo)
+        SELECT x.fk, SUM(x.q), v_motivo
+          FROM (
+                SELECT n."fkProduto" AS fk, COALESCE(n."saldoFisico", 0) AS q FROM novas n
+                UNION ALL
+                SELECT a."fkProduto", -COALESCE(a."saldoFisico", 0) FROM antigas a
+               ) x
+         GROUP BY x.fk
+        HAVING SUM(x.q) <> 0;
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_estoque_razao_ins ON "Ekenox".estoque;
+CREATE TRIGGER trg_estoque_razao_ins
+    AFTER INSERT ON "Ekenox".estoque
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION "Ekenox".fn_estoque_razao();
+
+DROP TRIGGER IF EXISTS trg_estoque_razao_upd ON "Ekenox".estoque;
+CREATE TRIGGER trg_estoque_razao_upd
+    AFTER UPDATE ON "Ekenox".estoque
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION "Ekenox".fn_estoque_razao();
+
+DROP TRIGGER IF EXISTS trg_estoque_razao_del ON "Ekenox".estoque;
+CREATE TRIGGER trg_estoque_razao_del
+    AFTER DELETE ON "Ekenox".estoque
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT EXECUTE FUNCTION "Ekenox".fn_estoque_razao();
+
+
+-- primeira foto: ponto de partida das consultas por data
+SELECT "Ekenox".fn_estoque_fotografar()
+ WHERE NOT EXISTS (SELECT 1 FROM "Ekenox".estoque_foto);
+
+END;
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+"""
+estoque_razao.py
+Consultas na razão de estoque (estoque_movimento.sql).
+
+- saldo numa data: uma foto (estoque_foto) + os movimentos depois dela até
+  a data -> nunca soma o histórico inteiro
+- consumo por período (ex.: últimos 90 dias) direto da razão
+- movimentos de um produto (extrato), paginado
+- fotografar(): foto do saldo atual; agendar com
+      python estoque_razao.py --fotografar
+  (Agendador de Tarefas do Windows, diária/semanal)
+
+O saldo atual continua em "Ekenox".estoque, mantido incrementalmente: a baixa
+da OP grava a razão e aplica o delta; edições diretas passam pelo trigger.
+"""
+
+import argparse
+import os
+from datetime import date, datetime, time as dtime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from conexao_resiliente import executar_com_cursor
+from sistema_log import log_write
+
+
+Quando = Union[date, datetime]
+
+
+def _fim_do_dia(quando: Quando) -> datetime:
+    """Data sem hora = saldo no fim do dia."""
+    if isinstance(quando, datetime):
+        return quando
+    return datetime.combine(quando, dtime.max)
+
+
+def saldos_em(cur: Any, produtos: Sequence[Any], quando: Quando) -> Dict[str, float]:
+    """
+    {fkproduto: saldo físico em 'quando'}. Produtos sem foto anterior à data
+    ficam de fora (não dá para saber o saldo antes da primeira foto).
+    """
+    chaves = [str(p) for p in produtos]
+    if not chaves:
+        return {}
+    cur.execute(
+        'SELECT fkproduto, saldo FROM "Ekenox".fn_estoque_saldo_em(%s::text[], %s)',
+        (chaves, _fim_do_dia(quando)),
+    )
+    return {str(fk): float(saldo or 0.0) for fk, saldo in cur.fetchall()}
+
+
+def consumo_periodo(cur: Any, dias: int = 90, produtos: Optional[Sequence[Any]] = None,
+                    motivo: str = "consumo_op") -> List[Tuple[str, float]]:
+    """[(fkproduto, quantidade consumida)] nos últimos 'dias', maior consumo primeiro."""
+    chaves = [str(p) for p in produtos] if produtos else None
+    cur.execute(
+        """
+        SELECT m.fkproduto, -SUM(m.quantidade) AS consumo
+          FROM "Ekenox".estoque_movimento m
+         WHERE m.motivo = %s
+           AND m.criado_em >= now() - make_interval(days => %s)
+           AND (CAST(%s AS TEXT[]) IS NULL OR m.fkproduto = ANY(CAST(%s AS TEXT[])))
+         GROUP BY m.fkproduto
+         ORDER BY consumo DESC, m.fkproduto
+        """,
+        (motivo, int(dias), chaves, chaves),
+    )
+    return [(str(fk), float(q or 0.0)) for fk, q in cur.fetchall()]
+
+
+def extrato(cur: Any, fkproduto: Any, inicio: Optional[Quando] = None, fim: Optional[Quando] = None,
+            limite: int = 200, depois_de_id: Optional[int] = None) -> List[Tuple[Any, ...]]:
+    """
+    Movimentos de um produto no período, do mais recente para o mais antigo:
+    [(id, criado_em, quantidade, motivo, ordem_producao_id, deposito_id)].
+    Próxima página: depois_de_id = id da última linha recebida.
+    """
+    cur.execute(
+        """
+        SELECT m.id, m.criado_em, m.quantidade, m.motivo, m.ordem_producao_id, m.deposito_id
+          FROM "Ekenox".estoque_movimento m
+         WHERE m.fkproduto = %s
+           AND (%s::timestamptz IS NULL OR m.criado_em >= %s::timestamptz)
+           AND (%s::timestamptz IS NULL OR m.criado_em <= %s::timestamptz)
+           AND (%s::bigint IS NULL OR m.id < %s::bigint)
+         ORDER BY m.id DESC
+         LIMIT %s
+        """,
+        (
+            str(fkproduto),
+            inicio, inicio,
+            None if fim is None else _fim_do_dia(fim), None if fim is None else _fim_do_dia(fim),
+            depois_de_id, depois_de_id,
+            int(limite),
+        ),
+    )
+    return cur.fetchall() or []
+
+
+def fotografar(conn: Any) -> int:
+    """Foto do saldo atual (commit próprio). Devolve o id da foto."""
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT "Ekenox".fn_estoque_fotografar()')
+            foto_id = int(cur.fetchone()[0])
+        conn.commit()
+        return foto_id
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# ============================================================
+# MIXIN
+# ============================================================
+
+class RazaoEstoqueMixin:
+    """
+    Requer self.cursor e self.conn (igual aos CRUDMixins). Leituras via
+    executar_com_cursor: saldo em CONSULTA, consumo e extrato em RELATORIO.
+    """
+
+    def _razao_ler(self, fn: Callable[[Any], Any], relatorio: bool = False) -> Any:
+        # tempo_limite só aqui dentro: ele traz o Tk e a CLI deste módulo roda sem
+        from tempo_limite import CONSULTA, RELATORIO
+        return executar_com_cursor(self, fn, True, RELATORIO if relatorio else CONSULTA)
+
+    def _razao_rollback(self) -> None:
+        if self.conn and not self.conn.closed:
+            self.conn.rollback()
+
+    def saldo_em(self, fkproduto: Any, quando: Quando) -> Optional[float]:
+        """None = sem foto anterior à data (ou razão não instalada)."""
+        try:
+            saldos = self._razao_ler(lambda cur: saldos_em(cur, [fkproduto], quando))
+            return saldos.get(str(fkproduto))
+        except Exception:
+            self._razao_rollback()
+            return None
+
+    def consumo_ultimos_dias(self, dias: int = 90,
+                             produtos: Optional[Sequence[Any]] = None) -> List[Tuple[str, float]]:
+        try:
+            return self._razao_ler(lambda cur: consumo_periodo(cur, dias=dias, produtos=produtos), True)
+        except Exception:
+            self._razao_rollback()
+            return []
+
+    def extrato_estoque(self, fkproduto: Any, inicio: Optional[Quando] = None,
+                        fim: Optional[Quando] = None, limite: int = 200,
+                        depois_de_id: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        try:
+            return self._razao_ler(
+                lambda cur: extrato(cur, fkproduto, inicio, fim, limite, depois_de_id), True)
+        except Exception:
+            self._razao_rollback()
+            return []
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import psycopg2
+    from Ordem_Producao import BASE_DIR, load_config
+
+    ap = argparse.ArgumentParser(description="Razão de estoque: fotos e consultas.")
+    ap.add_argument("--fotografar", action="store_true", help="grava uma foto do saldo atual")
+    ap.add_argument("--saldo", nargs="+", metavar="PRODUTO", help="saldo dos produtos na data (--data)")
+    ap.add_argument("--data", help="AAAA-MM-DD (padrão: hoje)")
+    ap.add_argument("--consumo", type=int, metavar="DIAS", help="consumo em OPs nos últimos DIAS")
+    args = ap.parse_args(argv)
+
+    cfg = load_config()
+    conn = psycopg2.connect(
+        host=cfg.db_host, database=cfg.db_database, user=cfg.db_user,
+        password=cfg.db_password, port=int(cfg.db_port), connect_timeout=5,
+    )
+    try:
+        if args.fotografar:
+            foto_id = fotografar(conn)
+            log_write(os.path.join(BASE_DIR, "logs"), "estoque.log", f"FOTO estoque id={foto_id}")
+            print(f"Foto {foto_id} gravada.")
+
+        with conn.cursor() as cur:
+            if args.saldo:
+                quando = date.fromisoformat(args.data) if args.data else date.today()
+                saldos = saldos_em(cur, args.saldo, quando)
+                for p in args.saldo:
+                    s = saldos.get(str(p))
+                    print(f"{p}\t{'sem foto anterior' if s is None else f'{s:g}'}")
+            if args.consumo:
+                for fk, q in consumo_periodo(cur, dias=args.consumo):
+                    print(f"{fk}\t{q:g}")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
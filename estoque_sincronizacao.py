@@ -0,0 +1,426 @@
+from __future__ import annotations
+
+"""
+estoque_sincronizacao.py
+Sincronização em lote dos saldos de "Ekenox"."estoque" a partir de um
+snapshot completo (CSV ou JSON exportado do Bling).
+
+Fluxo (tudo em uma transação):
+1) Lê o arquivo -> [(linha, fkProduto, saldoFisico, saldoVirtual), ...]
+2) COPY para tabela temporária (_estoque_sync)
+3) Validação set-based em UMA query: ID numérico, saldos numéricos,
+   produto repetido no arquivo. Produtos que não existem em
+   "Ekenox"."produtos" são ignorados (a FK não deixaria gravar) e contados.
+4) Merge: INSERT ... ON CONFLICT ("fkProduto") DO UPDATE ... WHERE
+   (saldos) IS DISTINCT FROM (novos) -> só as linhas que mudaram são escritas
+5) zerar_ausentes=True: produtos que não vieram no snapshot ficam com 0
+   - snapshot vazio: recusado (zeraria o estoque inteiro)
+   - snapshot com menos de MIN_PROPORCAO_ZERAR das linhas atuais de
+     "Ekenox"."estoque": recusado, salvo forcar=True (--forcar)
+6) simular=True faz tudo e dá ROLLBACK (prévia)
+
+Saldo vazio no arquivo = "não informado": mantém o atual (ou 0 se novo).
+
+Formatos aceitos:
+  CSV  (';' ',' ou TAB): fkProduto;saldoFisico;saldoVirtual
+  JSON: lista ou {"data": [...]} no formato do Bling v3
+        ({"produto": {"id": ...}, "saldoFisicoTotal": ..., "saldoVirtualTotal": ...})
+        ou com as chaves fkProduto/saldoFisico/saldoVirtual
+
+Uso:
+    python estoque_sincronizacao.py saldos.json [--zerar-ausentes [--forcar]] [--simular]
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ouvinte_alteracoes import avisar_recarga, silenciar_avisos
+
+
+TABELA_ESTOQUE = '"Ekenox"."estoque"'
+TABELA_PRODUTOS = '"Ekenox"."produtos"'
+
+# nomes aceitos no cabeçalho / chaves do JSON (minúsculo, sem espaços)
+COLUNAS_ACEITAS: Dict[str, Tuple[str, ...]] = {
+    "fkproduto": ("fkproduto", "produtoid", "produto", "idproduto", "id", "codigo"),
+    "saldofisico": ("saldofisico", "saldofisicototal", "fisico"),
+    "saldovirtual": ("saldovirtual", "saldovirtualtotal", "virtual"),
+}
+
+MAX_ERROS_RELATORIO = 1000
+
+# zerar_ausentes: snapshot menor que esta fração das linhas atuais do estoque
+# é tratado como export truncado e recusado (a não ser com forcar=True)
+MIN_PROPORCAO_ZERAR = 0.5
+
+Linha = Tuple[int, str, str, str]
+
+
+# ============================================================
+# RELATÓRIO
+# ============================================================
+
+@dataclass
+class RelatorioSincronizacao:
+    linhas_lidas: int = 0
+    erros: List[Tuple[int, str]] = field(default_factory=list)
+    ignorados: List[str] = field(default_factory=list)
+    recusa: str = ""
+    inseridos: int = 0
+    atualizados: int = 0
+    inalterados: int = 0
+    zerados: int = 0
+    aplicado: bool = False
+    simulado: bool = False
+    tempos: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.erros and not self.recusa
+
+    @property
+    def duracao_s(self) -> float:
+        return sum(self.tempos.values())
+
+    def resumo(self) -> str:
+        if self.recusa:
+            return f"{self.recusa}\nNada foi gravado."
+        if self.erros:
+            linhas = "\n".join(f"  linha {ln}: {msg}" for ln, msg in self.erros[:15])
+            mais = f"\n  ... +{len(self.erros) - 15} erro(s)" if len(self.erros) > 15 else ""
+            return (f"{len(self.erros)} linha(s) com erro em {self.linhas_lidas} lida(s). "
+                    f"Nada foi gravado.\n{linhas}{mais}")
+        acao = "Prévia (nada gravado)" if self.simulado else ("Sincronizado" if self.aplicado else "Sem alterações")
+        tempos = ", ".join(f"{k} {v:.2f}s" for k, v in self.tempos.items())
+        return (
+            f"{acao}: {self.linhas_lidas} linha(s)\n"
+            f"  inseridos:   {self.inseridos}\n"
+            f"  atualizados: {self.atualizados}\n"
+            f"  inalterados: {self.inalterados}\n"
+            f"  zerados:     {self.zerados}\n"
+            f"  ignorados (produto não cadastrado): {len(self.ignorados)}\n"
+            f"  tempo: {self.duracao_s:.2f} s ({tempos})"
+        )
+
+
+# ============================================================
+# LEITURA DO ARQUIVO
+# ============================================================
+
+def _norm_chave(txt: Any) -> str:
+    return "".join(str(txt or "").strip().lower().split()).replace("_", "")
+
+
+def _valor(v: Any) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v).strip()
+
+
+def _campo_json(item: Dict[str, Any], campo: str) -> str:
+    chaves = {_norm_chave(k): v for k, v in item.items()}
+    if campo == "fkproduto" and isinstance(item.get("produto"), dict):
+        return _valor(item["produto"].get("id"))
+    for nome in COLUNAS_ACEITAS[campo]:
+        if nome in chaves and not isinstance(chaves[nome], (dict, list)):
+            return _valor(chaves[nome])
+    return ""
+
+
+def _ler_json(caminho: str) -> List[Linha]:
+    with open(caminho, "r", encoding="utf-8-sig") as f:
+        dados = json.load(f)
+    if isinstance(dados, dict):
+        dados = dados.get("data", [])
+    if not isinstance(dados, list):
+        raise ValueError("JSON deve ser uma lista ou {\"data\": [...]}.")
+
+    linhas: List[Linha] = []
+    for n, item in enumerate(dados, start=1):
+        if not isinstance(item, dict):
+            linhas.append((n, "", "", ""))
+            continue
+        linhas.append((n, _campo_json(item, "fkproduto"),
+                       _campo_json(item, "saldofisico"), _campo_json(item, "saldovirtual")))
+    return linhas
+
+
+class _DialetoPontoVirgula(csv.excel):
+    delimiter = ";"
+
+
+def _ler_csv(caminho: str) -> List[Linha]:
+    with open(caminho, "r", encoding="utf-8-sig", newline="") as f:
+        amostra = f.read(8192)
+        f.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=";,\t")
+        except csv.Error:
+            dialeto = _DialetoPontoVirgula
+        rd = csv.reader(f, dialeto)
+
+        cab = [_norm_chave(c) for c in (next(rd, []) or [])]
+        idx: Dict[str, int] = {}
+        for campo, aceitos in COLUNAS_ACEITAS.items():
+            for i, nome in enumerate(cab):
+                if nome in aceitos:
+                    idx[campo] = i
+                    break
+        if "fkproduto" not in idx or len(idx) < 2:
+            raise ValueError("Cabeçalho precisa de fkProduto e saldoFisico e/ou saldoVirtual.")
+
+        def pega(vals: List[str], campo: str) -> str:
+            i = idx.get(campo)
+            return vals[i].strip() if i is not None and i < len(vals) else ""
+
+        linhas: List[Linha] = []
+        for n, row in enumerate(rd, start=2):
+            if not any(c.strip() for c in row):
+                continue
+            linhas.append((n, pega(row, "fkproduto"), pega(row, "saldofisico"), pega(row, "saldovirtual")))
+    return linhas
+
+
+def ler_arquivo_saldos(caminho: str) -> List[Linha]:
+    """
+    Retorna [(linha, fkProduto, saldoFisico, saldoVirtual), ...] como texto
+    (a validação é feita no banco). No JSON, 'linha' é a posição do item.
+    """
+    if os.path.splitext(caminho)[1].lower() == ".json":
+        return _ler_json(caminho)
+    return _ler_csv(caminho)
+
+
+# ============================================================
+# SINCRONIZAÇÃO (set-based)
+# ============================================================
+
+def _copy_staging(cur, linhas: Sequence[Linha]) -> None:
+    cur.execute("""
+        CREATE TEMP TABLE _estoque_sync (
+            linha integer,
+            fkproduto text,
+            saldo_fisico text,
+            saldo_virtual text
+        ) ON COMMIT DROP;
+    """)
+    buf = io.StringIO()
+    csv.writer(buf).writerows(linhas)
+    buf.seek(0)
+    cur.copy_expert(
+        "COPY _estoque_sync (linha, fkproduto, saldo_fisico, saldo_virtual) FROM STDIN WITH (FORMAT csv)",
+        buf,
+    )
+
+
+def sincronizar_estoque(
+    conn,
+    linhas: Sequence[Linha],
+    zerar_ausentes: bool = False,
+    simular: bool = False,
+    tabela_estoque: str = TABELA_ESTOQUE,
+    tabela_produtos: str = TABELA_PRODUTOS,
+    forcar: bool = False,
+) -> RelatorioSincronizacao:
+    """
+    Aplica o snapshot numa única transação de 'conn'.
+    Qualquer erro de validação -> ROLLBACK e relatório só com os erros.
+    Com zerar_ausentes, snapshot vazio é sempre recusado e snapshot muito
+    menor que o estoque atual só é aplicado com forcar=True (rel.recusa).
+    """
+    rel = RelatorioSincronizacao(linhas_lidas=len(linhas), simulado=simular)
+    if not linhas:
+        if zerar_ausentes:
+            rel.recusa = "Snapshot vazio: zerar ausentes zeraria todo o estoque. Recusado."
+        return rel
+
+    E, P = tabela_estoque, tabela_produtos
+    num = r"'^-?[0-9]*\.?[0-9]+$'"
+    cur = conn.cursor()
+    t = time.perf_counter()
+
+    def etapa(nome: str) -> None:
+        nonlocal t
+        agora = time.perf_counter()
+        rel.tempos[nome] = rel.tempos.get(nome, 0.0) + (agora - t)
+        t = agora
+
+    try:
+        # motivo dos movimentos gravados pelo trigger da razão (estoque_movimento.sql)
+        cur.execute("SELECT set_config('ekenox.motivo_estoque', 'sincronizacao', true);")
+        silenciar_avisos(cur)           # um aviso 'T' no fim, não um por produto
+        if zerar_ausentes and not forcar:
+            cur.execute(f"SELECT count(*) FROM {E};")
+            atuais = int(cur.fetchone()[0] or 0)
+            if len(linhas) < atuais * MIN_PROPORCAO_ZERAR:
+                conn.rollback()
+                rel.recusa = (
+                    f"Snapshot com {len(linhas)} linha(s) para {atuais} no estoque atual "
+                    f"(mínimo {MIN_PROPORCAO_ZERAR:.0%}): parece truncado e zerar ausentes "
+                    f"zeraria o restante. Recusado (use forcar/--forcar se for intencional).")
+                return rel
+        _copy_staging(cur, linhas)
+        etapa("copy")
+
+        # ---------- 1) validação ----------
+        cur.execute(f"""
+            WITH s AS (
+                SELECT linha,
+                       COALESCE(TRIM(fkproduto), '')                  AS fk,
+                       COALESCE(REPLACE(TRIM(saldo_fisico), ',', '.'), '')  AS fis,
+                       COALESCE(REPLACE(TRIM(saldo_virtual), ',', '.'), '') AS vir
+                  FROM _estoque_sync
+            ),
+            dup AS (
+                SELECT fk FROM s GROUP BY fk HAVING COUNT(*) > 1
+            )
+            SELECT linha, erro FROM (
+                SELECT s.linha,
+                       concat_ws('; ',
+                           CASE WHEN s.fk !~ '^[0-9]+$' THEN 'produto inválido' END,
+                           CASE WHEN s.fis <> '' AND s.fis !~ {num} THEN 'saldoFisico inválido' END,
+                           CASE WHEN s.vir <> '' AND s.vir !~ {num} THEN 'saldoVirtual inválido' END,
+                           CASE WHEN s.fis = '' AND s.vir = '' THEN 'sem saldo' END,
+                           CASE WHEN d.fk IS NOT NULL THEN 'produto repetido no arquivo' END
+                       ) AS erro
+                  FROM s
+                  LEFT JOIN dup d ON d.fk = s.fk
+            ) v
+             WHERE erro <> ''
+             ORDER BY linha
+             LIMIT {MAX_ERROS_RELATORIO};
+        """)
+        rel.erros = [(int(r[0]), r[1]) for r in cur.fetchall()]
+        etapa("validacao")
+        if rel.erros:
+            conn.rollback()
+            return rel
+
+        # ---------- 2) normaliza (saldo vazio = mantém o atual) ----------
+        cur.execute(f"""
+            CREATE TEMP TABLE _estoque_norm ON COMMIT DROP AS
+            SELECT TRIM(s.fkproduto) AS fk,
+                   COALESCE(NULLIF(REPLACE(TRIM(s.saldo_fisico), ',', '.'), '')::double precision,
+                            e."saldoFisico", 0)  AS saldo_fisico,
+                   COALESCE(NULLIF(REPLACE(TRIM(s.saldo_virtual), ',', '.'), '')::double precision,
+                            e."saldoVirtual", 0) AS saldo_virtual,
+                   EXISTS (SELECT 1 FROM {P} p
+                            WHERE CAST(p."produtoId" AS TEXT) = TRIM(s.fkproduto)) AS cadastrado
+              FROM _estoque_sync s
+              LEFT JOIN {E} e ON CAST(e."fkProduto" AS TEXT) = TRIM(s.fkproduto);
+        """)
+        cur.execute("SELECT fk FROM _estoque_norm WHERE NOT cadastrado ORDER BY fk;")
+        rel.ignorados = [r[0] for r in cur.fetchall()]
+        etapa("normalizacao")
+
+        # ---------- 3) merge (só o que mudou) ----------
+        cur.execute(f"""
+            INSERT INTO {E} AS e ("fkProduto", "saldoFisico", "saldoVirtual")
+            SELECT n.fk, n.saldo_fisico, n.saldo_virtual
+              FROM _estoque_norm n
+             WHERE n.cadastrado
+            ON CONFLICT ("fkProduto") DO UPDATE
+               SET "saldoFisico" = EXCLUDED."saldoFisico",
+                   "saldoVirtual" = EXCLUDED."saldoVirtual"
+             WHERE (e."saldoFisico", e."saldoVirtual")
+                   IS DISTINCT FROM (EXCLUDED."saldoFisico", EXCLUDED."saldoVirtual")
+            RETURNING (xmax = 0);
+        """)
+        for (inserido,) in cur.fetchall():
+            if inserido:
+                rel.inseridos += 1
+            else:
+                rel.atualizados += 1
+        rel.inalterados = len(linhas) - len(rel.ignorados) - rel.inseridos - rel.atualizados
+
+        if zerar_ausentes:
+            cur.execute(f"""
+                UPDATE {E} e
+                   SET "saldoFisico" = 0, "saldoVirtual" = 0
+                 WHERE (COALESCE(e."saldoFisico", 0) <> 0 OR COALESCE(e."saldoVirtual", 0) <> 0)
+                   AND NOT EXISTS (
+                        SELECT 1 FROM _estoque_norm n
+                         WHERE n.fk = CAST(e."fkProduto" AS TEXT));
+            """)
+            rel.zerados = int(cur.rowcount or 0)
+        etapa("merge")
+
+        if simular:
+            conn.rollback()
+        else:
+            rel.aplicado = bool(rel.inseridos or rel.atualizados or rel.zerados)
+            if rel.aplicado:
+                avisar_recarga(cur, E)
+            conn.commit()
+        etapa("commit")
+        return rel
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            cur.close()
+        except Exception:
+            pass
+
+
+def sincronizar_arquivo(conn, caminho: str, zerar_ausentes: bool = False, simular: bool = False,
+                        tabela_estoque: str = TABELA_ESTOQUE,
+                        tabela_produtos: str = TABELA_PRODUTOS,
+                        forcar: bool = False) -> RelatorioSincronizacao:
+    """Atalho: lê CSV/JSON e sincroniza."""
+    t0 = time.perf_counter()
+    linhas = ler_arquivo_saldos(caminho)
+    leitura = time.perf_counter() - t0
+    rel = sincronizar_estoque(conn, linhas, zerar_ausentes, simular, tabela_estoque, tabela_produtos,
+                              forcar=forcar)
+    rel.tempos = {"leitura": leitura, **rel.tempos}
+    return rel
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import psycopg2
+    from tela_estoque import env_override, load_config, log_estoque
+
+    ap = argparse.ArgumentParser(description="Sincroniza saldos de estoque a partir de CSV/JSON.")
+    ap.add_argument("arquivo")
+    ap.add_argument("--zerar-ausentes", action="store_true",
+                    help="zera o saldo dos produtos que não estão no arquivo")
+    ap.add_argument("--forcar", action="store_true",
+                    help="com --zerar-ausentes, aceita snapshot bem menor que o estoque atual")
+    ap.add_argument("--simular", action="store_true", help="só mostra o relatório (ROLLBACK)")
+    args = ap.parse_args(argv)
+
+    cfg = env_override(load_config())
+    conn = psycopg2.connect(
+        host=cfg.db_host, database=cfg.db_database, user=cfg.db_user,
+        password=cfg.db_password, port=int(cfg.db_port), connect_timeout=5,
+    )
+    try:
+        rel = sincronizar_arquivo(conn, args.arquivo, args.zerar_ausentes, args.simular,
+                                  forcar=args.forcar)
+    finally:
+        conn.close()
+
+    log_estoque(
+        f"SYNC {os.path.basename(args.arquivo)}: +{rel.inseridos} ~{rel.atualizados} "
+        f"={rel.inalterados} 0:{rel.zerados} ign:{len(rel.ignorados)} erros:{len(rel.erros)} "
+        f"simular={args.simular}{' RECUSADO' if rel.recusa else ''} ({rel.duracao_s:.2f}s)")
+    print(rel.resumo())
+    return 0 if rel.ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
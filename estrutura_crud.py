@@ -2,6 +2,8 @@
 from __future__ import annotations
 from typing import Optional, Dict, Any, List, Tuple
 
+from estrutura_importacao import importar_arquivo
+
 
 class EstruturaCRUDMixin:
     """
@@ -277,3 +279,23 @@ class EstruturaCRUDMixin:
             if getattr(self, "conn", None):
                 self.conn.rollback()
             return False, f"Erro ao excluir estrutura do produto: {type(e).__name__}: {e}"
+
+    def estrutura_importar_arquivo(
+        self,
+        caminho: str,
+        substituir: bool = False,
+        simular: bool = False,
+    ) -> Tuple[bool, str]:
+        """
+        Importação em lote (CSV/XLSX) via COPY + merge set-based
+        (ver estrutura_importacao.py). Retorna (ok, resumo).
+        substituir=True: a estrutura de cada produto do arquivo passa a ser
+        exatamente a do arquivo. simular=True: só calcula o diff (ROLLBACK).
+        """
+        try:
+            rel = importar_arquivo(self.conn, caminho, substituir=substituir, simular=simular)
+            return rel.ok, rel.resumo()
+        except Exception as e:
+            if getattr(self, "conn", None):
+                self.conn.rollback()
+            return False, f"Erro ao importar estrutura: {type(e).__name__}: {e}"
@@ -0,0 +1,418 @@
+from __future__ import annotations
+
+"""
+estrutura_importacao.py
+Importação em lote da estrutura (BOM) a partir de CSV/XLSX.
+
+Fluxo (tudo em uma transação):
+1) Lê o arquivo (colunas: fkproduto, componente, quantidade, [dados])
+2) COPY para tabela temporária (_estrutura_import)
+3) Validação set-based em UMA query: IDs numéricos, produto/componente
+   cadastrados, quantidade > 0, produto == componente, linhas duplicadas
+4) Diff contra "Ekenox"."estrutura": adicionados / alterados / removidos
+5) Merge: INSERT ... ON CONFLICT ("dados") DO UPDATE (só quantidade) e,
+   no modo substituir, DELETE dos componentes que sumiram do arquivo
+6) simular=True faz tudo e dá ROLLBACK (prévia do relatório)
+
+Chave: "dados" é a PK da tabela. Para itens que já existem (mesmo
+fkproduto+componente) a chave atual é mantida; itens novos usam a coluna
+"dados" do arquivo ou, se vazia, "<fkproduto>-<componente>".
+
+Uso:
+    python estrutura_importacao.py arquivo.xlsx [--substituir] [--simular]
+"""
+
+import argparse
+import csv
+import io
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from openpyxl import load_workbook
+
+from ouvinte_alteracoes import avisar_recarga, silenciar_avisos
+
+
+TABELA_ESTRUTURA = '"Ekenox"."estrutura"'
+TABELA_PRODUTOS = '"Ekenox"."produtos"'
+
+# nomes aceitos no cabeçalho (minúsculo, sem espaços)
+COLUNAS_ACEITAS: Dict[str, Tuple[str, ...]] = {
+    "fkproduto": ("fkproduto", "produto", "produtoid", "codigoproduto", "codigo"),
+    "componente": ("componente", "codigocomponente", "insumo"),
+    "quantidade": ("quantidade", "qtd", "qtde"),
+    "dados": ("dados",),
+}
+
+MAX_ERROS_RELATORIO = 1000
+
+
+# ============================================================
+# RELATÓRIO
+# ============================================================
+
+@dataclass
+class RelatorioImportacao:
+    linhas_lidas: int = 0
+    produtos: int = 0
+    erros: List[Tuple[int, str]] = field(default_factory=list)
+    adicionados: List[Tuple[str, str, float]] = field(default_factory=list)
+    alterados: List[Tuple[str, str, Optional[float], float]] = field(default_factory=list)
+    removidos: List[Tuple[str, str, Optional[float]]] = field(default_factory=list)
+    inalterados: int = 0
+    aplicado: bool = False
+    simulado: bool = False
+    duracao_s: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return not self.erros
+
+    def resumo(self) -> str:
+        if self.erros:
+            linhas = "\n".join(f"  linha {ln}: {msg}" for ln, msg in self.erros[:15])
+            mais = f"\n  ... +{len(self.erros) - 15} erro(s)" if len(self.erros) > 15 else ""
+            return (f"{len(self.erros)} linha(s) com erro em {self.linhas_lidas} lida(s). "
+                    f"Nada foi gravado.\n{linhas}{mais}")
+        acao = "Prévia (nada gravado)" if self.simulado else ("Importado" if self.aplicado else "Sem alterações")
+        return (
+            f"{acao}: {self.linhas_lidas} linha(s), {self.produtos} produto(s)\n"
+            f"  adicionados: {len(self.adicionados)}\n"
+            f"  alterados:   {len(self.alterados)}\n"
+            f"  removidos:   {len(self.removidos)}\n"
+            f"  inalterados: {self.inalterados}\n"
+            f"  tempo: {self.duracao_s:.2f} s"
+        )
+
+
+def salvar_relatorio_csv(rel: RelatorioImportacao, caminho: str) -> str:
+    """Grava o diff (ou os erros) em CSV separado por ';'."""
+    with open(caminho, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f, delimiter=";")
+        if rel.erros:
+            w.writerow(["linha", "erro"])
+            w.writerows(rel.erros)
+            return caminho
+        w.writerow(["acao", "fkproduto", "componente", "quantidade_anterior", "quantidade_nova"])
+        for fk, comp, qtd in rel.adicionados:
+            w.writerow(["adicionado", fk, comp, "", qtd])
+        for fk, comp, antiga, nova in rel.alterados:
+            w.writerow(["alterado", fk, comp, antiga, nova])
+        for fk, comp, antiga in rel.removidos:
+            w.writerow(["removido", fk, comp, antiga, ""])
+    return caminho
+
+
+# ============================================================
+# LEITURA DO ARQUIVO
+# ============================================================
+
+def _norm_cab(txt: Any) -> str:
+    return "".join(str(txt or "").strip().lower().split()).replace("_", "")
+
+
+def _mapear_cabecalho(cab: Sequence[Any]) -> Dict[str, int]:
+    idx: Dict[str, int] = {}
+    normalizados = [_norm_cab(c) for c in cab]
+    for campo, aceitos in COLUNAS_ACEITAS.items():
+        for i, nome in enumerate(normalizados):
+            if nome in aceitos:
+                idx[campo] = i
+                break
+    faltando = [c for c in ("fkproduto", "componente", "quantidade") if c not in idx]
+    if faltando:
+        raise ValueError(f"Cabeçalho sem coluna(s): {', '.join(faltando)}")
+    return idx
+
+
+def _celula(v: Any) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v).strip()
+
+
+class _DialetoPontoVirgula(csv.excel):
+    delimiter = ";"
+
+
+def _extrair(vals: List[str], idx: Dict[str, int]) -> Tuple[str, str, str, str]:
+    def pega(campo: str) -> str:
+        i = idx.get(campo)
+        return vals[i] if i is not None and i < len(vals) else ""
+    return pega("fkproduto"), pega("componente"), pega("quantidade"), pega("dados")
+
+
+def ler_arquivo_estrutura(caminho: str) -> List[Tuple[int, str, str, str, str]]:
+    """
+    Retorna [(linha, fkproduto, componente, quantidade, dados), ...] como texto
+    (a validação é feita no banco). Linhas totalmente vazias são ignoradas.
+    """
+    ext = os.path.splitext(caminho)[1].lower()
+    linhas: List[Tuple[int, str, str, str, str]] = []
+
+    if ext in (".xlsx", ".xlsm"):
+        wb = load_workbook(caminho, read_only=True, data_only=True)
+        try:
+            ws = wb.worksheets[0]
+            it = ws.iter_rows(values_only=True)
+            idx = _mapear_cabecalho(next(it, ()) or ())
+            for n, row in enumerate(it, start=2):
+                vals = [_celula(v) for v in row]
+                if not any(vals):
+                    continue
+                linhas.append((n, *_extrair(vals, idx)))
+        finally:
+            wb.close()
+        return linhas
+
+    with open(caminho, "r", encoding="utf-8-sig", newline="") as f:
+        amostra = f.read(8192)
+        f.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=";,\t")
+        except csv.Error:
+            dialeto = _DialetoPontoVirgula
+        rd = csv.reader(f, dialeto)
+        idx = _mapear_cabecalho(next(rd, []) or [])
+        for n, row in enumerate(rd, start=2):
+            vals = [c.strip() for c in row]
+            if not any(vals):
+                continue
+            linhas.append((n, *_extrair(vals, idx)))
+    return linhas
+
+
+# ============================================================
+# IMPORTAÇÃO (set-based)
+# ============================================================
+
+def _copy_staging(cur, linhas: Sequence[Tuple[int, str, str, str, str]]) -> None:
+    cur.execute("""
+        CREATE TEMP TABLE _estrutura_import (
+            linha integer,
+            fkproduto text,
+            componente text,
+            quantidade text,
+            dados text
+        ) ON COMMIT DROP;
+    """)
+    buf = io.StringIO()
+    csv.writer(buf).writerows(linhas)
+    buf.seek(0)
+    cur.copy_expert(
+        "COPY _estrutura_import (linha, fkproduto, componente, quantidade, dados) FROM STDIN WITH (FORMAT csv)",
+        buf,
+    )
+
+
+def importar_estrutura(
+    conn,
+    linhas: Sequence[Tuple[int, str, str, str, str]],
+    substituir: bool = False,
+    simular: bool = False,
+    tabela_estrutura: str = TABELA_ESTRUTURA,
+    tabela_produtos: str = TABELA_PRODUTOS,
+) -> RelatorioImportacao:
+    """
+    Importa as linhas numa única transação de 'conn'.
+    substituir=True: para cada produto do arquivo, a estrutura passa a ser
+    exatamente a do arquivo (componentes ausentes são removidos).
+    Qualquer erro de validação -> ROLLBACK e relatório só com os erros.
+    """
+    t0 = time.perf_counter()
+    rel = RelatorioImportacao(linhas_lidas=len(linhas), simulado=simular)
+    if not linhas:
+        return rel
+
+    E, P = tabela_estrutura, tabela_produtos
+    cur = conn.cursor()
+    try:
+        _copy_staging(cur, linhas)
+
+        # ---------- 1) validação ----------
+        cur.execute(f"""
+            WITH s AS (
+                SELECT linha,
+                       COALESCE(TRIM(fkproduto), '')                     AS fk,
+                       COALESCE(TRIM(componente), '')                    AS comp,
+                       COALESCE(REPLACE(TRIM(quantidade), ',', '.'), '') AS qtd
+                  FROM _estrutura_import
+            ),
+            dup AS (
+                SELECT fk, comp FROM s GROUP BY fk, comp HAVING COUNT(*) > 1
+            ),
+            v AS (
+                SELECT s.linha,
+                       concat_ws('; ',
+                           CASE WHEN s.fk !~ '^[0-9]+$' THEN 'produto inválido' END,
+                           CASE WHEN s.comp !~ '^[0-9]+$' THEN 'componente inválido' END,
+                           CASE WHEN s.fk = s.comp THEN 'componente igual ao produto' END,
+                           CASE WHEN s.qtd !~ '^[0-9]*\\.?[0-9]+$' THEN 'quantidade inválida'
+                                WHEN s.qtd::numeric <= 0 THEN 'quantidade deve ser > 0' END,
+                           CASE WHEN s.fk ~ '^[0-9]+$' AND NOT EXISTS (
+                                    SELECT 1 FROM {P} p WHERE p."produtoId" = s.fk)
+                                THEN 'produto não cadastrado' END,
+                           CASE WHEN s.comp ~ '^[0-9]+$' AND NOT EXISTS (
+                                    SELECT 1 FROM {P} p WHERE p."produtoId" = s.comp)
+                                THEN 'componente não cadastrado' END,
+                           CASE WHEN d.fk IS NOT NULL THEN 'produto+componente repetido no arquivo' END
+                       ) AS erro
+                  FROM s
+                  LEFT JOIN dup d ON d.fk = s.fk AND d.comp = s.comp
+            )
+            SELECT linha, erro FROM v WHERE erro <> '' ORDER BY linha LIMIT {MAX_ERROS_RELATORIO};
+        """)
+        rel.erros = [(int(r[0]), r[1]) for r in cur.fetchall()]
+        if rel.erros:
+            conn.rollback()
+            return rel
+
+        # ---------- 2) normaliza + resolve a chave "dados" ----------
+        cur.execute(f"""
+            CREATE TEMP TABLE _estrutura_norm ON COMMIT DROP AS
+            SELECT DISTINCT ON (i.linha)
+                   i.linha,
+                   TRIM(i.fkproduto)                                       AS fk,
+                   TRIM(i.componente)                                      AS comp,
+                   REPLACE(TRIM(i.quantidade), ',', '.')::double precision AS quantidade,
+                   COALESCE(e."dados", NULLIF(TRIM(i.dados), ''),
+                            TRIM(i.fkproduto) || '-' || TRIM(i.componente)) AS dados,
+                   e."quantidade"                                          AS qtd_atual,
+                   (e."dados" IS NOT NULL)                                 AS existe
+              FROM _estrutura_import i
+              LEFT JOIN {E} e
+                ON TRIM(e."fkproduto") = TRIM(i.fkproduto)
+               AND TRIM(e."componente") = TRIM(i.componente)
+             ORDER BY i.linha, e."dados";
+        """)
+        cur.execute(f"""
+            SELECT n.linha, 'chave "dados" já usada por outro item: ' || n.dados
+              FROM _estrutura_norm n
+              JOIN {E} e ON e."dados" = n.dados
+             WHERE NOT n.existe
+            UNION ALL
+            SELECT MIN(n.linha), 'chave "dados" repetida no arquivo: ' || n.dados
+              FROM _estrutura_norm n
+             GROUP BY n.dados
+            HAVING COUNT(*) > 1
+             ORDER BY 1
+             LIMIT {MAX_ERROS_RELATORIO};
+        """)
+        rel.erros = [(int(r[0]), r[1]) for r in cur.fetchall()]
+        if rel.erros:
+            conn.rollback()
+            return rel
+
+        # ---------- 3) diff ----------
+        cur.execute("SELECT COUNT(DISTINCT fk) FROM _estrutura_norm;")
+        rel.produtos = int(cur.fetchone()[0] or 0)
+
+        cur.execute("""
+            SELECT fk, comp, qtd_atual, quantidade, existe
+              FROM _estrutura_norm
+             ORDER BY fk, comp;
+        """)
+        for fk, comp, atual, nova, existe in cur.fetchall():
+            if not existe:
+                rel.adicionados.append((fk, comp, float(nova)))
+            elif atual is None or float(atual) != float(nova):
+                rel.alterados.append((fk, comp, None if atual is None else float(atual), float(nova)))
+            else:
+                rel.inalterados += 1
+
+        if substituir:
+            cur.execute(f"""
+                SELECT TRIM(e."fkproduto"), TRIM(e."componente"), e."quantidade"
+                  FROM {E} e
+                 WHERE TRIM(e."fkproduto") IN (SELECT DISTINCT fk FROM _estrutura_norm)
+                   AND NOT EXISTS (
+                        SELECT 1 FROM _estrutura_norm n
+                         WHERE n.fk = TRIM(e."fkproduto") AND n.comp = TRIM(e."componente"))
+                 ORDER BY 1, 2;
+            """)
+            rel.removidos = [(r[0], r[1], None if r[2] is None else float(r[2])) for r in cur.fetchall()]
+
+        # ---------- 4) merge ----------
+        silenciar_avisos(cur)           # um aviso 'T' no fim, não um por linha
+        cur.execute(f"""
+            INSERT INTO {E} AS e ("fkproduto", "componente", "quantidade", "dados")
+            SELECT n.fk, n.comp, n.quantidade, n.dados
+              FROM _estrutura_norm n
+            ON CONFLICT ("dados") DO UPDATE
+               SET "quantidade" = EXCLUDED."quantidade"
+             WHERE e."quantidade" IS DISTINCT FROM EXCLUDED."quantidade";
+        """)
+        if substituir and rel.removidos:
+            cur.execute(f"""
+                DELETE FROM {E} e
+                 WHERE TRIM(e."fkproduto") IN (SELECT DISTINCT fk FROM _estrutura_norm)
+                   AND NOT EXISTS (
+                        SELECT 1 FROM _estrutura_norm n
+                         WHERE n.fk = TRIM(e."fkproduto") AND n.comp = TRIM(e."componente"));
+            """)
+
+        if simular:
+            conn.rollback()
+        else:
+            rel.aplicado = bool(rel.adicionados or rel.alterados or rel.removidos)
+            if rel.aplicado:
+                avisar_recarga(cur, E)
+            conn.commit()
+        return rel
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            cur.close()
+        except Exception:
+            pass
+        rel.duracao_s = time.perf_counter() - t0
+
+
+def importar_arquivo(conn, caminho: str, substituir: bool = False, simular: bool = False,
+                     tabela_estrutura: str = TABELA_ESTRUTURA,
+                     tabela_produtos: str = TABELA_PRODUTOS) -> RelatorioImportacao:
+    """Atalho: lê CSV/XLSX e importa."""
+    return importar_estrutura(conn, ler_arquivo_estrutura(caminho), substituir, simular,
+                              tabela_estrutura, tabela_produtos)
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import psycopg2
+    from tela_estrutura import env_override, load_config
+
+    ap = argparse.ArgumentParser(description="Importa estrutura (BOM) de CSV/XLSX.")
+    ap.add_argument("arquivo")
+    ap.add_argument("--substituir", action="store_true",
+                    help="remove componentes que não estão no arquivo (por produto)")
+    ap.add_argument("--simular", action="store_true", help="só mostra o relatório (ROLLBACK)")
+    ap.add_argument("--relatorio", help="grava o diff/erros em CSV")
+    args = ap.parse_args(argv)
+
+    cfg = env_override(load_config())
+    conn = psycopg2.connect(
+        host=cfg.db_host, database=cfg.db_database, user=cfg.db_user,
+        password=cfg.db_password, port=int(cfg.db_port), connect_timeout=5,
+    )
+    try:
+        rel = importar_arquivo(conn, args.arquivo, args.substituir, args.simular)
+    finally:
+        conn.close()
+
+    print(rel.resumo())
+    if args.relatorio:
+        print(f"Relatório: {salvar_relatorio_csv(rel, args.relatorio)}")
+    return 0 if rel.ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,8 +1,12 @@
 import os
+import re
 import sys
+import threading
+import time
+from datetime import datetime
 import tkinter as tk
 from tkinter import messagebox, ttk
-from reportlab.lib.pagesizes import mm
+from reportlab.lib.pagesizes import A4, mm
 from reportlab.pdfgen import canvas
 import psycopg2
 
@@ -53,6 +57,138 @@ def ultimo_caractere(texto: str):
     return texto[-1]
 
 
+# ===================== CATÁLOGO DE PRODUTOS (F12) =====================
+# Depois desse tempo (s) a próxima abertura do F12 relê o banco.
+CATALOGO_TTL = float(os.getenv("EKENOX_ETIQUETA_CATALOGO_TTL", "300") or 300)
+
+# "Ekenox".produto_ultimo_pedido (produto_ultimo_pedido.sql): uma linha por produto
+SQL_CATALOGO = '''
+    SELECT p."produtoId",
+           p."nomeProduto",
+           p."sku",
+           COALESCE(NULLIF(TRIM(p."descImetro"), ''), p."nomeProduto") AS imetro,
+           RIGHT(u."numero"::text, 4) AS numero_pedido
+      FROM "Ekenox"."produtos" AS p
+      LEFT JOIN "Ekenox"."produto_ultimo_pedido" AS u
+        ON u."fkProduto" = p."produtoId"
+     WHERE p."descImetro" IS NOT NULL AND TRIM(p."descImetro") <> ''
+     ORDER BY p."nomeProduto" ASC
+'''
+
+# sem produto_ultimo_pedido.sql aplicado: mesma regra, LATERAL por produto
+SQL_CATALOGO_LATERAL = '''
+    SELECT p."produtoId",
+           p."nomeProduto",
+           p."sku",
+           COALESCE(NULLIF(TRIM(p."descImetro"), ''), p."nomeProduto") AS imetro,
+           RIGHT(u."numero"::text, 4) AS numero_pedido
+      FROM "Ekenox"."produtos" AS p
+      LEFT JOIN LATERAL (
+          SELECT ped."numero"
+            FROM "Ekenox"."itens" AS i
+            JOIN "Ekenox"."pedidos" AS ped
+              ON ped."idPedido" = i."fkPedido"
+           WHERE i."fkProduto" = p."produtoId"
+           ORDER BY ped."data" DESC NULLS LAST, ped."idPedido" DESC
+           LIMIT 1
+      ) AS u ON true
+     WHERE p."descImetro" IS NOT NULL AND TRIM(p."descImetro") <> ''
+     ORDER BY p."nomeProduto" ASC
+'''
+
+PGCODE_TABELA_INEXISTENTE = "42P01"
+
+
+class CatalogoProdutos:
+    """
+    Lista da consulta de produtos (F12) em memória.
+
+    - carregada uma vez (a tela já começa a carregar ao abrir) e relida só
+      depois de CATALOGO_TTL segundos ou no "Atualizar" da consulta
+    - uma conexão para o catálogo, reaberta se cair
+    - filtrar(): todas as palavras digitadas em nome/SKU/desc. Inmetro/pedido,
+      sem ir ao banco
+    - produtos e chaves de busca trocam juntos (uma tupla numa atribuição):
+      a thread de carga não deixa a tela ver uma lista nova com chaves velhas
+    """
+
+    def __init__(self, conectar):
+        self.conectar = conectar
+        self.conn = None
+        # ([(id, nome, sku, imetro, numero_pedido)], [texto de busca minúsculo])
+        self._lista = ([], [])
+        self.carregado_em = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def produtos(self):
+        return self._lista[0]
+
+    def _consultar(self):
+        if self.conn is None or self.conn.closed:
+            self.conn = self.conectar()
+            self.conn.autocommit = True     # só leitura: nada de transação ociosa aberta
+        with self.conn.cursor() as cur:
+            try:
+                cur.execute(SQL_CATALOGO)
+            except psycopg2.Error as e:
+                if getattr(e, "pgcode", None) != PGCODE_TABELA_INEXISTENTE:
+                    raise
+                cur.execute(SQL_CATALOGO_LATERAL)
+            return cur.fetchall()
+
+    def carregar(self, forcar: bool = False):
+        """Lista completa (do cache enquanto estiver dentro do TTL)."""
+        with self._lock:
+            if (not forcar and self.produtos
+                    and time.monotonic() - self.carregado_em < CATALOGO_TTL):
+                return self.produtos
+            try:
+                linhas = self._consultar()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                self.fechar_conexao()       # conexão caiu: uma nova tentativa
+                linhas = self._consultar()
+
+            produtos = [
+                (pid, nome or "", sku or "", imetro or "", num or "")
+                for pid, nome, sku, imetro, num in linhas
+            ]
+            chaves = [" ".join(str(v) for v in prod).lower() for prod in produtos]
+            self._lista = (produtos, chaves)
+            self.carregado_em = time.monotonic()
+            return produtos
+
+    def carregar_em_segundo_plano(self):
+        def _rodar():
+            try:
+                self.carregar()
+            except Exception as e:
+                print(f"⚠ Catálogo de produtos não carregado: {e}")
+
+        threading.Thread(target=_rodar, name="etiqueta-catalogo", daemon=True).start()
+
+    def filtrar(self, texto: str):
+        produtos, chaves = self._lista
+        termos = (texto or "").lower().split()
+        if not termos:
+            return list(produtos)
+        return [
+            prod for prod, chave in zip(produtos, chaves)
+            if all(t in chave for t in termos)
+        ]
+
+    def fechar_conexao(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+        self.conn = None
+
+
+CATALOGO = CatalogoProdutos(lambda: psycopg2.connect(**DB_CONFIG))
+
+
 def listar_produtos(janela_pai, entry_produto, entry_modelo, entry_serie):
     """
     Abre uma janela para o usuário selecionar um produto.
@@ -61,45 +197,10 @@ def listar_produtos(janela_pai, entry_produto, entry_modelo, entry_serie):
       - campo 'Modelo' com SKU (removendo 'n'/'N' no final, se houver)
       - campo 'Número de Série (prefixo/base)' com o número do pedido
         de venda mais recente.
+    A lista vem do CATALOGO (memória); o campo Filtrar não consulta o banco.
     """
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
-
-        sql = '''
-            SELECT 
-                p."produtoId"                        AS Produto,
-                p."nomeProduto"                      AS Nome,
-                p."sku"                              AS SKU,
-                COALESCE(NULLIF(TRIM(p."descImetro"), ''), p."nomeProduto") AS Imetro,
-                (
-                    SELECT RIGHT(ped."numero"::text, 4) AS Numero
-                    FROM "Ekenox"."itens"   AS i
-                    JOIN "Ekenox"."pedidos" AS ped
-                      ON ped."idPedido" = i."fkPedido"
-                    WHERE i."fkProduto" = p."produtoId"
-                    ORDER BY ped."data" DESC
-                    LIMIT 1
-                ) AS numero_pedido
-            FROM "Ekenox"."produtos" AS p
-            LEFT JOIN "Ekenox"."infoProduto" AS ip
-              ON p."produtoId" = ip."fkProduto"
-            WHERE (p."descImetro"  IS NOT NULL AND TRIM(p."descImetro")  <> '')
-            ORDER BY p."nomeProduto" ASC;
-        '''
-        cur.execute(sql)
-        produtos = cur.fetchall()
-        cur.close()
-        conn.close()
-
-        if not produtos:
-            messagebox.showinfo(
-                "Produtos",
-                "Nenhum produto encontrado com os filtros configurados.",
-                parent=janela_pai,
-            )
-            return
-
+        produtos = CATALOGO.carregar()
     except Exception as e:
         messagebox.showerror(
             "Erro ao buscar produtos",
@@ -108,13 +209,30 @@ def listar_produtos(janela_pai, entry_produto, entry_modelo, entry_serie):
         )
         return
 
+    if not produtos:
+        messagebox.showinfo(
+            "Produtos",
+            "Nenhum produto encontrado com os filtros configurados.",
+            parent=janela_pai,
+        )
+        return
+
     # ----- Janela de seleção -----
     janela = tk.Toplevel(janela_pai)
     janela.title("Selecionar Produto")
-    janela.geometry("900x400")
+    janela.geometry("900x430")
     janela.transient(janela_pai)
     janela.grab_set()
 
+    barra = tk.Frame(janela, padx=10, pady=8)
+    barra.pack(fill="x")
+    tk.Label(barra, text="Filtrar:").pack(side=tk.LEFT)
+    var_filtro = tk.StringVar()
+    entry_filtro = tk.Entry(barra, textvariable=var_filtro, width=50)
+    entry_filtro.pack(side=tk.LEFT, padx=(6, 6))
+    lbl_total = tk.Label(barra, text="", fg="gray")
+    lbl_total.pack(side=tk.LEFT)
+
     frame = tk.Frame(janela, padx=10, pady=10)
     frame.pack(fill="both", expand=True)
 
@@ -144,32 +262,53 @@ def listar_produtos(janela_pai, entry_produto, entry_modelo, entry_serie):
     tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
     scrollbar.config(command=tree.yview)
 
-    # Preenche a lista com os produtos buscados
-    for prod_id, nome, sku, desc_inm, num_ped in produtos:
-        tree.insert(
-            "",
-            tk.END,
-            values=(
-                prod_id,
-                nome or "",
-                sku or "",
-                desc_inm or "",
-                num_ped or "",
-            ),
-        )
+    # iid -> linha do catálogo (os values do Treeview viram int: "0123" -> 123)
+    linhas = {}
+    agendado = {"id": None}
+
+    def preencher():
+        agendado["id"] = None
+        tree.delete(*tree.get_children())
+        linhas.clear()
+        visiveis = CATALOGO.filtrar(var_filtro.get())
+        for prod in visiveis:
+            iid = tree.insert("", tk.END, values=prod)
+            linhas[iid] = prod
+        primeiro = tree.get_children()[:1]
+        if primeiro:
+            tree.selection_set(primeiro)
+            tree.focus(primeiro[0])
+        lbl_total.config(text=f"{len(visiveis)} de {len(CATALOGO.produtos)}")
+
+    def ao_digitar(*_):
+        if agendado["id"] is not None:
+            janela.after_cancel(agendado["id"])
+        agendado["id"] = janela.after(150, preencher)
+
+    def atualizar():
+        try:
+            CATALOGO.carregar(forcar=True)
+        except Exception as e:
+            messagebox.showerror(
+                "Erro ao buscar produtos",
+                f"Ocorreu um erro ao consultar o banco de dados:\n{e}",
+                parent=janela,
+            )
+            return
+        preencher()
+
+    tk.Button(barra, text="Atualizar", command=atualizar).pack(side=tk.RIGHT)
+    var_filtro.trace_add("write", ao_digitar)
+    preencher()
 
     def selecionar_produto(event=None):
         selecao = tree.selection()
-        if not selecao:
+        if not selecao or selecao[0] not in linhas:
             return
 
-        valores = tree.item(selecao[0])["values"]
-
-        prod_id = valores[0]           # não usamos, mas deixei para referência
-        nome_produto = valores[1]      # idem
-        sku_val = (valores[2] or "").strip()
-        desc_inmetro = (valores[3] or "").strip()
-        numero_pedido = valores[4]
+        _prod_id, _nome, sku_val, desc_inmetro, numero_pedido = linhas[selecao[0]]
+        sku_val = str(sku_val).strip()
+        desc_inmetro = str(desc_inmetro).strip()
 
         # Produto = Desc. Inmetro
         texto_produto = desc_inmetro
@@ -193,14 +332,287 @@ def listar_produtos(janela_pai, entry_produto, entry_modelo, entry_serie):
 
         janela.destroy()
 
+    def descer(event=None):
+        filhos = tree.get_children()
+        if filhos:
+            tree.focus_set()
+            tree.focus(tree.selection()[0] if tree.selection() else filhos[0])
+
     tree.bind("<Double-Button-1>", selecionar_produto)
     tree.bind("<Return>", selecionar_produto)
+    entry_filtro.bind("<Return>", selecionar_produto)
+    entry_filtro.bind("<Down>", descer)
+    janela.bind("<F5>", lambda e: atualizar())
 
     # Centraliza a janela de consulta
     janela.update_idletasks()
     x = (janela.winfo_screenwidth() // 2) - (janela.winfo_width() // 2)
     y = (janela.winfo_screenheight() // 2) - (janela.winfo_height() // 2)
     janela.geometry(f"+{x}+{y}")
+    entry_filtro.focus_set()
+
+
+# ===================== PDF (modelo em XObject) =====================
+LARGURA_ETIQUETA, ALTURA_ETIQUETA = 100 * mm, 75 * mm
+
+# Acima disso a tela divide a saída em vários PDFs (etiquetas_parte01.pdf ...)
+ETIQUETAS_POR_ARQUIVO = int(os.getenv("EKENOX_ETIQUETAS_POR_ARQUIVO", "1000") or 1000)
+
+_NOME_MODELO = "etiqueta_modelo"
+
+# Pasta de saída dos PDFs (antes era sempre ./etiquetas.pdf, sobrescrito)
+PASTA_ETIQUETAS = os.getenv("EKENOX_PASTA_ETIQUETAS") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "etiquetas")
+
+
+def limpar_nome_arquivo(txt: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", txt or "").strip("_") or "SEM_SKU"
+
+
+def caminho_pdf_unico(pasta: str, serie_base: str) -> str:
+    """<pasta>/etiquetas_<serie>_<AAAAMMDD_HHMMSS>.pdf (cria a pasta)."""
+    os.makedirs(pasta, exist_ok=True)
+    base = f"etiquetas_{limpar_nome_arquivo(serie_base)}_{datetime.now():%Y%m%d_%H%M%S}"
+    caminho = os.path.join(pasta, base + ".pdf")
+    n = 2
+    while os.path.exists(caminho):
+        caminho = os.path.join(pasta, f"{base}_{n}.pdf")
+        n += 1
+    return caminho
+
+
+def etiquetas_por_folha_a4() -> int:
+    """Quantas etiquetas 100x75 mm cabem numa folha A4 (retrato)."""
+    colunas = int(A4[0] // LARGURA_ETIQUETA)
+    linhas = int(A4[1] // ALTURA_ETIQUETA)
+    return max(1, colunas * linhas)
+
+
+X_TITULO = 10
+X_VALOR = 70
+
+
+def layout_modelo(empresa: dict, produto: dict) -> dict:
+    """
+    Posições da parte fixa da etiqueta, em pontos (origem embaixo à esquerda,
+    como no ReportLab). Usado pelo PDF e pela saída ZPL/EPL (etiqueta_zpl.py):
+      linhas  [(y, titulo, valor)]
+      y_sep1, y_sep2  linhas separadoras; y_serie  base do "Nº Série"
+    """
+    altura = ALTURA_ETIQUETA
+    espaco = 10
+
+    campos_empresa = [
+        ("Endereço:", empresa["company_address"]),
+        ("Bairro:", empresa["company_district"]),
+        ("Cidade:",
+         f"{empresa['company_city']} - {empresa['company_state']}"),
+        ("CEP:", empresa["company_cep"]),
+        ("Telefone:", empresa["company_phone"]),
+        ("Email SAC:", empresa["company_email"]),
+    ]
+    produto_campos = [
+        ("Produto:", produto["product_title"]),
+        ("Modelo:", produto["product_model"]),
+        ("Classe:", produto["product_classe"]),
+        ("Tensão:", produto["voltage"]),
+        ("Potência:", produto["power"]),
+        ("Temp:", produto["temperature"]),
+        ("Freq:", produto["frequency"]),
+    ]
+
+    # posições (mesmo layout da versão página-a-página)
+    y = altura - 30
+    linhas: list = []
+    for titulo, valor in campos_empresa:
+        linhas.append((y, titulo, valor))
+        y -= espaco
+    y_sep1 = y
+    y -= espaco
+    for titulo, valor in produto_campos:
+        linhas.append((y, titulo, valor))
+        y -= espaco
+    y_sep2 = y
+    return {
+        "linhas": linhas,
+        "y_titulo": altura - 15,
+        "y_sep1": y_sep1,
+        "y_sep2": y_sep2,
+        "y_serie": y - espaco * 2,
+    }
+
+
+def _desenhar_modelo(c, empresa: dict, produto: dict) -> float:
+    """
+    Desenha a parte fixa da etiqueta (borda, empresa, produto) dentro de um
+    form XObject. Retorna o y onde vai o número de série.
+    Títulos e valores são agrupados para trocar de fonte só 2 vezes.
+    """
+    largura, altura = LARGURA_ETIQUETA, ALTURA_ETIQUETA
+    x_titulo, x_valor = X_TITULO, X_VALOR
+    lay = layout_modelo(empresa, produto)
+    linhas = lay["linhas"]
+    y_sep1, y_sep2, y_serie = lay["y_sep1"], lay["y_sep2"], lay["y_serie"]
+
+    c.beginForm(_NOME_MODELO, 0, 0, largura, altura)
+
+    c.setLineWidth(1)
+    c.rect(5, 5, largura - 10, altura - 10)
+    c.line(x_titulo, y_sep1, largura - 10, y_sep1)
+    c.line(x_titulo, y_sep2, largura - 10, y_sep2)
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawCentredString(largura / 2, lay["y_titulo"], empresa["company_name"])
+
+    c.setFont("Helvetica-Bold", 9)
+    for yy, titulo, _valor in linhas:
+        c.drawString(x_titulo, yy, titulo)
+
+    c.setFont("Helvetica", 9)
+    for yy, _titulo, valor in linhas:
+        c.drawString(x_valor, yy, valor or "")
+
+    c.endForm()
+    return y_serie
+
+
+def gerar_seriais(serie_base: str, quantidade: int, inicio: int = 1):
+    """Gera 'BASE-001', 'BASE-002', ... a partir de 'inicio'."""
+    for n in range(inicio, inicio + quantidade):
+        yield f"{serie_base}-{n:03d}"
+
+
+def gerar_pdf_etiquetas(caminho_pdf: str, empresa: dict, produto: dict,
+                        serie_base: str, quantidade: int,
+                        por_folha: int = 1, inicio: int = 1,
+                        seriais=None) -> str:
+    """
+    Gera o PDF de etiquetas e salva em caminho_pdf.
+    Sem Tk: usado pela tela e pelo benchmark.
+
+    A parte fixa é desenhada uma vez (form XObject) e cada etiqueta só
+    referencia o modelo + escreve o número de série.
+
+    por_folha = 1  -> 1 etiqueta por página (100x75 mm, impressora térmica)
+    por_folha > 1  -> folhas A4 com até etiquetas_por_folha_a4() etiquetas
+    seriais        -> iterável de números de série (senão usa serie_base)
+    """
+    largura, altura = LARGURA_ETIQUETA, ALTURA_ETIQUETA
+    if seriais is None:
+        seriais = gerar_seriais(serie_base, quantidade, inicio)
+
+    if por_folha <= 1:
+        c = canvas.Canvas(caminho_pdf, pagesize=(largura, altura))
+        y_serie = _desenhar_modelo(c, empresa, produto)
+        for serial in seriais:
+            c.doForm(_NOME_MODELO)
+            c.setFont("Helvetica-Bold", 12)
+            c.drawCentredString(largura / 2, y_serie, f"Nº Série: {serial}")
+            c.showPage()
+        c.save()
+        return caminho_pdf
+
+    # ----- várias por folha A4 -----
+    colunas = int(A4[0] // largura)
+    linhas = int(A4[1] // altura)
+    por_folha = max(1, min(int(por_folha), colunas * linhas))
+    margem_x = (A4[0] - colunas * largura) / 2
+    margem_y = (A4[1] - linhas * altura) / 2
+
+    c = canvas.Canvas(caminho_pdf, pagesize=A4)
+    y_serie = _desenhar_modelo(c, empresa, produto)
+
+    pos = 0
+    for serial in seriais:
+        if pos == por_folha:
+            c.showPage()
+            pos = 0
+        col = pos % colunas
+        lin = pos // colunas
+        x0 = margem_x + col * largura
+        y0 = A4[1] - margem_y - (lin + 1) * altura
+
+        c.saveState()
+        c.translate(x0, y0)
+        c.doForm(_NOME_MODELO)
+        c.setFont("Helvetica-Bold", 12)
+        c.drawCentredString(largura / 2, y_serie, f"Nº Série: {serial}")
+        c.restoreState()
+        pos += 1
+
+    if pos:
+        c.showPage()
+    c.save()
+    return caminho_pdf
+
+
+def gerar_pdf_etiquetas_em_partes(caminho_pdf: str, empresa: dict, produto: dict,
+                                  serie_base: str, quantidade: int,
+                                  por_folha: int = 1,
+                                  por_arquivo: int = ETIQUETAS_POR_ARQUIVO,
+                                  inicio: int = 1) -> list:
+    """
+    Para lotes muito grandes: grava em vários PDFs de até 'por_arquivo'
+    etiquetas (etiquetas_parte01.pdf, ...). O ReportLab mantém o documento
+    inteiro em memória até o save(), então fechar a cada parte mantém o uso
+    de memória constante. A numeração de série começa em 'inicio' e
+    continua entre as partes.
+    """
+    if quantidade <= por_arquivo:
+        return [gerar_pdf_etiquetas(caminho_pdf, empresa, produto,
+                                    serie_base, quantidade, por_folha, inicio)]
+
+    raiz, ext = os.path.splitext(caminho_pdf)
+    arquivos = []
+    feitas = 0
+    parte = 1
+    while feitas < quantidade:
+        n = min(por_arquivo, quantidade - feitas)
+        destino = f"{raiz}_parte{parte:02d}{ext or '.pdf'}"
+        arquivos.append(gerar_pdf_etiquetas(destino, empresa, produto,
+                                            serie_base, n, por_folha, inicio + feitas))
+        feitas += n
+        parte += 1
+    return arquivos
+
+
+def reservar_seriais_avulsos(modelo: str, quantidade: int) -> int:
+    """
+    Etiqueta avulsa da tela: reserva a faixa no mesmo contador do lote por OP
+    ('etq:<modelo>' em "Ekenox".sequenciadores) e devolve o primeiro número.
+    """
+    # import tardio: etiqueta_lote importa este módulo
+    from etiqueta_lote import reservar_seriais
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        inicio = reservar_seriais(conn, f"etq:{modelo}", quantidade)
+        conn.commit()
+        return inicio
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+LAYOUT_1_POR_PAGINA = "1 por página (100x75 mm)"
+LAYOUT_A4 = f"{etiquetas_por_folha_a4()} por folha A4"
+LAYOUTS_ETIQUETA = [LAYOUT_1_POR_PAGINA, LAYOUT_A4]
+
+
+SAIDA_PDF = "PDF"
+SAIDA_ZPL = "Impressora ZPL (Zebra)"
+SAIDA_EPL = "Impressora EPL"
+SAIDAS_ETIQUETA = [SAIDA_PDF, SAIDA_ZPL, SAIDA_EPL]
+
+# host:porta da térmica (ou arquivo .zpl/.epl) sugerido na tela
+IMPRESSORA_ETIQUETAS = os.getenv("EKENOX_IMPRESSORA_ETIQUETAS", "")
+
+
+def por_folha_do_layout(layout: str) -> int:
+    """Converte a opção do combobox de layout em etiquetas por página."""
+    return etiquetas_por_folha_a4() if layout == LAYOUT_A4 else 1
 
 
 def gerar_etiquetas(janela_pai,
@@ -220,8 +632,14 @@ def gerar_etiquetas(janela_pai,
                     entry_temperatura,
                     entry_frequencia,
                     entry_serie,
-                    entry_quantidade):
-    """Gera o PDF etiquetas.pdf com base nos dados preenchidos na tela."""
+                    entry_quantidade,
+                    combo_layout=None,
+                    combo_saida=None,
+                    entry_destino=None):
+    """
+    Gera o PDF (nome único em PASTA_ETIQUETAS) com base nos dados preenchidos na tela,
+    ou, com saída ZPL/EPL, manda direto para a impressora (etiqueta_zpl.py).
+    """
     try:
         # Dados da empresa
         empresa = {
@@ -284,82 +702,40 @@ def gerar_etiquetas(janela_pai,
             )
             return
 
-        largura, altura = 100 * mm, 75 * mm
-        c = canvas.Canvas("etiquetas.pdf", pagesize=(largura, altura))
-
-        # Colunas fixas
-        x_titulo = 10
-        x_valor = 70
-        espaco = 10
-
-        for i in range(quantidade):
-            serial = f"{serie_base}-{i+1:03d}"
-
-            # Borda
-            c.setLineWidth(1)
-            c.rect(5, 5, largura - 10, altura - 10)
-
-            # Cabeçalho (nome da empresa)
-            c.setFont("Helvetica-Bold", 12)
-            c.drawCentredString(largura / 2, altura - 15,
-                                empresa["company_name"])
-
-            y = altura - 30
-
-            # Dados da empresa
-            campos_empresa = [
-                ("Endereço:", empresa["company_address"]),
-                ("Bairro:", empresa["company_district"]),
-                ("Cidade:",
-                 f"{empresa['company_city']} - {empresa['company_state']}"),
-                ("CEP:", empresa["company_cep"]),
-                ("Telefone:", empresa["company_phone"]),
-                ("Email SAC:", empresa["company_email"]),
-            ]
-
-            for titulo, valor in campos_empresa:
-                c.setFont("Helvetica-Bold", 9)
-                c.drawString(x_titulo, y, titulo)
-                c.setFont("Helvetica", 9)
-                c.drawString(x_valor, y, valor)
-                y -= espaco
-
-            # Linha separadora
-            c.line(x_titulo, y, largura - 10, y)
-            y -= espaco
-
-            # Dados do produto
-            produto_campos = [
-                ("Produto:", produto["product_title"]),
-                ("Modelo:", produto["product_model"]),
-                ("Classe:", produto["product_classe"]),
-                ("Tensão:", produto["voltage"]),
-                ("Potência:", produto["power"]),
-                ("Temp:", produto["temperature"]),
-                ("Freq:", produto["frequency"]),
-            ]
-
-            for titulo, valor in produto_campos:
-                c.setFont("Helvetica-Bold", 9)
-                c.drawString(x_titulo, y, titulo)
-                c.setFont("Helvetica", 9)
-                c.drawString(x_valor, y, valor)
-                y -= espaco
+        saida = combo_saida.get() if combo_saida else SAIDA_PDF
+        destino = entry_destino.get().strip() if entry_destino else ""
+        if saida in (SAIDA_ZPL, SAIDA_EPL) and not destino:
+            messagebox.showerror(
+                "Erro",
+                "Informe a impressora (ex.: 192.168.0.50:9100) ou o arquivo de saída.",
+                parent=janela_pai,
+            )
+            return
 
-            # Linha separadora antes do número de série
-            c.line(x_titulo, y, largura - 10, y)
-            y -= espaco * 2
+        inicio = reservar_seriais_avulsos(produto["product_model"] or serie_base, quantidade)
+        faixa = f"Séries {inicio:03d} a {inicio + quantidade - 1:03d}."
 
-            # Número de série
-            c.setFont("Helvetica-Bold", 12)
-            c.drawCentredString(largura / 2, y, f"Nº Série: {serial}")
+        if saida in (SAIDA_ZPL, SAIDA_EPL):
+            # import tardio: etiqueta_zpl importa este módulo
+            from etiqueta_zpl import EPL, ZPL, imprimir_etiquetas
 
-            c.showPage()
+            enviadas = imprimir_etiquetas(destino, empresa, produto, serie_base, quantidade,
+                                          linguagem=ZPL if saida == SAIDA_ZPL else EPL,
+                                          inicio=inicio)
+            messagebox.showinfo(
+                "Sucesso",
+                f"{enviadas} etiqueta(s) enviada(s) para {destino}.\n{faixa}",
+                parent=janela_pai,
+            )
+            return
 
-        c.save()
+        por_folha = por_folha_do_layout(combo_layout.get() if combo_layout else "")
+        arquivos = gerar_pdf_etiquetas_em_partes(caminho_pdf_unico(PASTA_ETIQUETAS, serie_base),
+                                                 empresa, produto, serie_base, quantidade, por_folha,
+                                                 inicio=inicio)
         messagebox.showinfo(
             "Sucesso",
-            "PDF 'etiquetas.pdf' gerado com sucesso!",
+            "PDF gerado com sucesso!\n" + "\n".join(arquivos) + f"\n{faixa}",
             parent=janela_pai,
         )
 
@@ -373,7 +749,7 @@ class EtiquetaApp(tk.Tk):
         super().__init__()
 
         self.title("Gerador de Etiquetas EKENOX")
-        self.geometry("680x720")
+        self.geometry("680x820")
 
         # Ícone
         icon_path = obter_caminho_icone()
@@ -392,6 +768,9 @@ class EtiquetaApp(tk.Tk):
         # ---------- Montagem da interface ----------
         self._montar_interface()
 
+        # Catálogo do F12 já vai carregando enquanto a tela é preenchida
+        CATALOGO.carregar_em_segundo_plano()
+
     def _montar_interface(self):
         # --- Campos Empresa ---
         frame_empresa = tk.LabelFrame(
@@ -564,6 +943,43 @@ class EtiquetaApp(tk.Tk):
             row=8, column=1, columnspan=2, pady=2, sticky="w"
         )
 
+        tk.Label(frame_produto, text="Layout:").grid(
+            row=9, column=0, sticky="e"
+        )
+        self.combo_layout = ttk.Combobox(
+            frame_produto,
+            values=LAYOUTS_ETIQUETA,
+            state="readonly",
+            width=47,
+        )
+        self.combo_layout.grid(
+            row=9, column=1, columnspan=2, pady=2, sticky="w"
+        )
+        self.combo_layout.set(LAYOUT_1_POR_PAGINA)
+
+        tk.Label(frame_produto, text="Saída:").grid(
+            row=10, column=0, sticky="e"
+        )
+        self.combo_saida = ttk.Combobox(
+            frame_produto,
+            values=SAIDAS_ETIQUETA,
+            state="readonly",
+            width=47,
+        )
+        self.combo_saida.grid(
+            row=10, column=1, columnspan=2, pady=2, sticky="w"
+        )
+        self.combo_saida.set(SAIDA_PDF)
+
+        tk.Label(frame_produto, text="Impressora/arquivo:").grid(
+            row=11, column=0, sticky="e"
+        )
+        self.entry_destino = tk.Entry(frame_produto, width=50)
+        self.entry_destino.insert(0, IMPRESSORA_ETIQUETAS)
+        self.entry_destino.grid(
+            row=11, column=1, columnspan=2, pady=2, sticky="w"
+        )
+
         # Botões inferiores
         frame_botoes = tk.Frame(self, pady=10)
         frame_botoes.pack(fill="x")
@@ -590,6 +1006,9 @@ class EtiquetaApp(tk.Tk):
                 self.entry_frequencia,
                 self.entry_serie,
                 self.entry_quantidade,
+                self.combo_layout,
+                self.combo_saida,
+                self.entry_destino,
             ),
             bg="#2563eb",
             fg="white",
@@ -598,6 +1017,26 @@ class EtiquetaApp(tk.Tk):
         )
         btn_gerar.pack(side="left", padx=(40, 10))
 
+        def _ao_mudar_saida(_evt=None):
+            pdf = self.combo_saida.get() == SAIDA_PDF
+            btn_gerar.config(text="Gerar PDF" if pdf else "Imprimir")
+            self.combo_layout.config(state="readonly" if pdf else "disabled")
+            self.entry_destino.config(state="disabled" if pdf else "normal")
+
+        self.combo_saida.bind("<<ComboboxSelected>>", _ao_mudar_saida)
+        _ao_mudar_saida()
+
+        btn_lote = tk.Button(
+            frame_botoes,
+            text="Lote por OP...",
+            command=self._abrir_lote,
+            bg="#0f766e",
+            fg="white",
+            font=("Arial", 12, "bold"),
+            width=15,
+        )
+        btn_lote.pack(side="left", padx=(0, 10))
+
         btn_fechar = tk.Button(
             frame_botoes,
             text="Fechar",
@@ -620,12 +1059,49 @@ class EtiquetaApp(tk.Tk):
             ),
         )
 
+    def _padroes_lote(self):
+        """Empresa + campos de produto da tela, usados como padrão no lote."""
+        empresa = {
+            "company_name": self.entry_empresa.get().strip(),
+            "company_address": self.entry_endereco.get().strip(),
+            "company_district": self.entry_bairro.get().strip(),
+            "company_city": self.entry_cidade.get().strip(),
+            "company_state": self.entry_estado.get().strip(),
+            "company_cep": self.entry_cep.get().strip(),
+            "company_phone": self.entry_telefone.get().strip(),
+            "company_email": self.entry_email.get().strip(),
+        }
+        produto = {
+            "product_title": self.entry_produto.get().strip(),
+            "product_model": self.entry_modelo.get().strip(),
+            "product_classe": self.entry_classe.get().strip(),
+            "voltage": self.combo_tensao.get().strip(),
+            "power": self.entry_potencia.get().strip(),
+            "temperature": self.entry_temperatura.get().strip(),
+            "frequency": self.entry_frequencia.get().strip(),
+        }
+        return empresa, produto
+
+    def _abrir_lote(self):
+        # import tardio: etiqueta_lote importa este módulo
+        from etiqueta_lote import JanelaLoteEtiquetas
+
+        if getattr(self, "janela_lote", None) is None:
+            self.janela_lote = JanelaLoteEtiquetas(
+                self, lambda: psycopg2.connect(**DB_CONFIG), self._padroes_lote)
+        self.janela_lote.open()
+
 
 # ===================== MAIN =====================
 def main():
     app = EtiquetaApp()
-    app.mainloop()
+    try:
+        app.mainloop()
+    finally:
+        CATALOGO.fechar_conexao()
 
 
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,545 @@
+from __future__ import annotations
+
+"""
+etiqueta_lote.py
+Etiquetas em lote a partir das Ordens de Produção.
+
+- Lê as OPs ("Ekenox".ordem_producao, e o arquivo) pelos números informados ou pela data
+- Produto = descImetro (ou nomeProduto), Modelo = SKU sem 'N' final,
+  quantidade = quantidade da OP
+- Reserva faixas de número de série sem sobreposição na tabela
+  "Ekenox".sequenciadores (uma linha por modelo: 'etq:<SKU>'; chave com mais
+  de 30 caracteres vira prefixo + hash). A etiqueta avulsa da tela
+  (PDF/ZPL/EPL) reserva no mesmo contador
+- Renderiza os PDFs em paralelo (ProcessPoolExecutor) com progresso
+- Cada OP gera um arquivo próprio: <pasta>/<AAAAMMDD>/OP<numero>_<SKU>_<ini>-<fim>.pdf
+
+Uso pela tela (JanelaLoteEtiquetas) ou linha de comando:
+    python etiqueta_lote.py 1001 1002 1003
+    python etiqueta_lote.py --data 2026-10-19 --por-folha 6
+"""
+
+import argparse
+import hashlib
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import tkinter as tk
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass
+from datetime import date, datetime
+from math import ceil
+from tkinter import messagebox, ttk
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import psycopg2
+
+from arquivo_ordens import TABELA_ORDENS, VISAO_TODAS, arquivo_instalado
+from etiqueta import (
+    DB_CONFIG,
+    LAYOUT_1_POR_PAGINA,
+    LAYOUTS_ETIQUETA,
+    PASTA_ETIQUETAS,
+    gerar_pdf_etiquetas,
+    limpar_nome_arquivo,
+    por_folha_do_layout,
+)
+
+MAX_PROCESSOS = int(os.getenv("EKENOX_ETIQUETAS_PROCESSOS", "0") or 0) or max(1, (os.cpu_count() or 2) - 1)
+
+TAMANHO_CHAVE = 30      # "Ekenox".sequenciadores.tabela é varchar(30)
+
+
+# ============================================================
+# JOB
+# ============================================================
+
+@dataclass
+class JobEtiqueta:
+    numero_op: int
+    fkproduto: str
+    modelo: str
+    quantidade: int
+    serie_inicio: int
+    caminho_pdf: str
+    empresa: Dict[str, str]
+    produto: Dict[str, str]
+    por_folha: int = 1
+
+    @property
+    def serie_fim(self) -> int:
+        return self.serie_inicio + self.quantidade - 1
+
+
+def modelo_do_sku(sku: str) -> str:
+    """Mesmo tratamento da tela: remove o 'N'/'n' final do SKU."""
+    sku = (sku or "").strip()
+    if sku and sku[-1].upper() == "N":
+        sku = sku[:-1]
+    return sku
+
+
+# ============================================================
+# BANCO
+# ============================================================
+
+def buscar_ops(conn, numeros: Optional[Iterable[int]] = None,
+               data: Optional[date] = None) -> List[Dict[str, Any]]:
+    """
+    OPs por número (lista) ou por data (data_inicio, ou previsão de início
+    quando a OP ainda não começou). Ignora OPs sem quantidade. Acha também
+    OPs arquivadas (reimpressão), se o arquivo estiver instalado.
+    """
+    with conn.cursor() as cur:
+        origem = VISAO_TODAS if arquivo_instalado(cur) else TABELA_ORDENS
+
+    sql = f"""
+        SELECT op.numero,
+               op.fkprodutoid,
+               COALESCE(op.quantidade, 0)                                  AS quantidade,
+               p.sku,
+               COALESCE(NULLIF(TRIM(p."descImetro"), ''), p."nomeProduto") AS titulo
+          FROM {origem} op
+          LEFT JOIN "Ekenox".produtos p
+            ON p."produtoId" = op.fkprodutoid
+    """
+    if numeros is not None:
+        sql += " WHERE op.numero = ANY(%s) ORDER BY op.numero"
+        params: Tuple = ([int(n) for n in numeros],)
+    else:
+        sql += " WHERE COALESCE(op.data_inicio, op.data_previsao_inicio) = %s ORDER BY op.numero"
+        params = (data or date.today(),)
+
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+
+    ops = []
+    for numero, fk, qtd, sku, titulo in rows:
+        qtd_int = int(ceil(float(qtd or 0)))
+        if qtd_int <= 0:
+            continue
+        ops.append({
+            "numero": int(numero),
+            "fkproduto": str(fk),
+            "quantidade": qtd_int,
+            "sku": sku or "",
+            "titulo": titulo or "",
+        })
+    return ops
+
+
+def chave_sequenciador(chave: str) -> str:
+    """
+    Chave que cabe em sequenciadores.tabela. Até TAMANHO_CHAVE fica igual;
+    mais longa vira prefixo + hash (cortar juntava no mesmo contador os
+    modelos com o mesmo começo).
+    """
+    if len(chave) <= TAMANHO_CHAVE:
+        return chave
+    resumo = hashlib.sha1(chave.encode("utf-8")).hexdigest()[:10]
+    return f"{chave[:TAMANHO_CHAVE - len(resumo) - 1]}~{resumo}"
+
+
+def reservar_seriais(conn, chave: str, quantidade: int) -> int:
+    """
+    Reserva 'quantidade' números de série para 'chave' e devolve o primeiro.
+    O UPSERT trava a linha do sequenciador, então dois lotes simultâneos
+    nunca recebem faixas sobrepostas. Não faz commit.
+
+    Chave longa (com hash) começa depois do contador antigo cortado em 30
+    caracteres, se existir: as séries já impressas com ele não se repetem.
+    """
+    qtd = int(quantidade)
+    chave_db = chave_sequenciador(chave)
+    legado = chave[:TAMANHO_CHAVE] if chave_db != chave else None
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO "Ekenox".sequenciadores (tabela, sequenciador)
+            VALUES (%s, %s + COALESCE((SELECT s.sequenciador
+                                         FROM "Ekenox".sequenciadores s
+                                        WHERE s.tabela = %s), 0))
+            ON CONFLICT (tabela)
+            DO UPDATE SET sequenciador = "Ekenox".sequenciadores.sequenciador + %s
+            RETURNING sequenciador
+            """,
+            (chave_db, qtd, legado, qtd),
+        )
+        fim = int(cur.fetchone()[0])
+    return fim - qtd + 1
+
+
+def montar_jobs(conn, ops: List[Dict[str, Any]], empresa: Dict[str, str],
+                produto_padrao: Dict[str, str], por_folha: int = 1,
+                pasta: str = PASTA_ETIQUETAS) -> List[JobEtiqueta]:
+    """
+    Reserva as faixas de série (uma transação para o lote todo) e monta os
+    jobs. Se algo falhar, nada é reservado.
+    """
+    pasta_dia = os.path.join(pasta, datetime.now().strftime("%Y%m%d"))
+    os.makedirs(pasta_dia, exist_ok=True)
+
+    jobs: List[JobEtiqueta] = []
+    try:
+        for op in ops:
+            modelo = modelo_do_sku(op["sku"]) or op["fkproduto"]
+            inicio = reservar_seriais(conn, f"etq:{modelo}", op["quantidade"])
+            fim = inicio + op["quantidade"] - 1
+
+            produto = dict(produto_padrao)
+            produto["product_title"] = op["titulo"] or produto_padrao.get("product_title", "")
+            produto["product_model"] = modelo
+
+            nome = f"OP{op['numero']}_{limpar_nome_arquivo(modelo)}_{inicio:05d}-{fim:05d}.pdf"
+            jobs.append(JobEtiqueta(
+                numero_op=op["numero"],
+                fkproduto=op["fkproduto"],
+                modelo=modelo,
+                quantidade=op["quantidade"],
+                serie_inicio=inicio,
+                caminho_pdf=os.path.join(pasta_dia, nome),
+                empresa=dict(empresa),
+                produto=produto,
+                por_folha=por_folha,
+            ))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return jobs
+
+
+# ============================================================
+# RENDERIZAÇÃO
+# ============================================================
+
+def renderizar_job(job: Dict[str, Any]) -> str:
+    """Executado no processo filho (recebe dict para ser picklável)."""
+    return gerar_pdf_etiquetas(
+        job["caminho_pdf"], job["empresa"], job["produto"],
+        job["modelo"], job["quantidade"],
+        por_folha=job["por_folha"], inicio=job["serie_inicio"],
+    )
+
+
+def gerar_lote(jobs: List[JobEtiqueta],
+               progresso: Optional[Callable[[int, int, JobEtiqueta, Optional[str]], None]] = None,
+               max_processos: int = MAX_PROCESSOS) -> List[Tuple[JobEtiqueta, Optional[str]]]:
+    """
+    Renderiza os jobs em paralelo. Retorna [(job, erro|None)].
+    progresso(feitos, total, job, erro) é chamado a cada PDF concluído
+    (na thread que chamou gerar_lote).
+    Se o pool de processos não puder ser usado, cai para execução sequencial.
+    """
+    total = len(jobs)
+    resultados: List[Tuple[JobEtiqueta, Optional[str]]] = []
+    if not jobs:
+        return resultados
+
+    def _registrar(job: JobEtiqueta, erro: Optional[str]) -> None:
+        resultados.append((job, erro))
+        if progresso:
+            progresso(len(resultados), total, job, erro)
+
+    pendentes = list(jobs)
+    if total > 1 and max_processos > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(max_processos, total)) as pool:
+                futs = {pool.submit(renderizar_job, asdict(j)): j for j in jobs}
+                for fut in as_completed(futs):
+                    job = futs[fut]
+                    try:
+                        fut.result()
+                        _registrar(job, None)
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        _registrar(job, f"{type(e).__name__}: {e}")
+            return resultados
+        except (BrokenProcessPool, OSError):
+            feitos = {id(j) for j, _ in resultados}
+            pendentes = [j for j in jobs if id(j) not in feitos]
+
+    for job in pendentes:
+        try:
+            renderizar_job(asdict(job))
+            _registrar(job, None)
+        except Exception as e:
+            _registrar(job, f"{type(e).__name__}: {e}")
+    return resultados
+
+
+def parse_numeros_op(texto: str) -> List[int]:
+    """Aceita números separados por vírgula, espaço ou quebra de linha; '10-15' vira faixa."""
+    numeros: List[int] = []
+    for parte in re.split(r"[\s,;]+", texto or ""):
+        if not parte:
+            continue
+        m = re.fullmatch(r"(\d+)-(\d+)", parte)
+        if m:
+            a, b = int(m.group(1)), int(m.group(2))
+            numeros.extend(range(min(a, b), max(a, b) + 1))
+        elif parte.isdigit():
+            numeros.append(int(parte))
+        else:
+            raise ValueError(f"Número de OP inválido: {parte}")
+    return sorted(set(numeros))
+
+
+# ============================================================
+# TELA
+# ============================================================
+
+class JanelaLoteEtiquetas:
+    """
+    Janela "Etiquetas por OP (lote)".
+    conectar: callable que devolve uma conexão psycopg2 nova.
+    obter_padroes: callable que devolve (empresa, produto_padrao) com os
+    valores preenchidos na tela de etiquetas (classe, tensão, potência...).
+    """
+
+    def __init__(self, master: tk.Misc, conectar: Callable[[], Any],
+                 obter_padroes: Callable[[], Tuple[Dict[str, str], Dict[str, str]]]):
+        self.master = master
+        self.conectar = conectar
+        self.obter_padroes = obter_padroes
+        self.win: Optional[tk.Toplevel] = None
+        self._fila: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        self._rodando = False
+
+    def open(self, event=None):
+        if self.win is not None and self.win.winfo_exists():
+            try:
+                self.win.deiconify()
+                self.win.lift()
+                self.win.focus_force()
+            except Exception:
+                pass
+            return
+
+        self.win = tk.Toplevel(self.master)
+        self.win.title("Etiquetas por OP (lote)")
+        self.win.geometry("760x520")
+        self.win.transient(self.master)
+        self.win.bind("<Escape>", lambda e: self.close())
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+        self._montar_interface(self.win)
+        # a tela de etiquetas do Ordem_Producao segura o grab
+        self.win.grab_set()
+
+    def close(self):
+        if self._rodando:
+            if not messagebox.askyesno(
+                    "Etiquetas", "Geração em andamento. Fechar mesmo assim?", parent=self.win):
+                return
+        try:
+            if self.win and self.win.winfo_exists():
+                self.win.destroy()
+        except Exception:
+            pass
+        self.win = None
+        # geração em andamento segue no fundo; a próxima abertura começa limpa
+        self._rodando = False
+        self._fila = queue.Queue()
+        if isinstance(self.master, tk.Toplevel):
+            try:
+                self.master.grab_set()
+            except Exception:
+                pass
+
+    def _montar_interface(self, root):
+        frm = tk.Frame(root, padx=10, pady=10)
+        frm.pack(fill="both", expand=True)
+
+        tk.Label(frm, text="Números das OPs (vírgula, espaço ou faixa 10-15):").grid(
+            row=0, column=0, columnspan=4, sticky="w")
+        self.txt_ops = tk.Text(frm, height=4, width=80)
+        self.txt_ops.grid(row=1, column=0, columnspan=4, sticky="we", pady=(2, 6))
+
+        tk.Button(frm, text="OPs de hoje", command=self._carregar_hoje).grid(
+            row=2, column=0, sticky="w")
+
+        tk.Label(frm, text="Layout:").grid(row=2, column=1, sticky="e")
+        self.combo_layout = ttk.Combobox(frm, values=LAYOUTS_ETIQUETA, state="readonly", width=28)
+        self.combo_layout.grid(row=2, column=2, sticky="w", padx=4)
+        self.combo_layout.set(LAYOUT_1_POR_PAGINA)
+
+        self.btn_gerar = tk.Button(
+            frm, text="Gerar lote", command=self._gerar,
+            bg="#2563eb", fg="white", font=("Arial", 11, "bold"), width=14)
+        self.btn_gerar.grid(row=2, column=3, sticky="e")
+
+        self.var_status = tk.StringVar(value="Informe as OPs.")
+        self.progress = ttk.Progressbar(frm, mode="determinate")
+        self.progress.grid(row=3, column=0, columnspan=4, sticky="we", pady=(10, 2))
+        tk.Label(frm, textvariable=self.var_status, anchor="w").grid(
+            row=4, column=0, columnspan=4, sticky="we")
+
+        cols = ("op", "modelo", "qtd", "series", "arquivo")
+        self.tree = ttk.Treeview(frm, columns=cols, show="headings", height=12)
+        for col, titulo, w, anc in (
+            ("op", "OP", 70, "center"),
+            ("modelo", "Modelo", 110, "w"),
+            ("qtd", "Qtd", 60, "e"),
+            ("series", "Séries", 130, "center"),
+            ("arquivo", "Arquivo / erro", 340, "w"),
+        ):
+            self.tree.heading(col, text=titulo)
+            self.tree.column(col, width=w, anchor=anc)
+        self.tree.grid(row=5, column=0, columnspan=4, sticky="nsew", pady=(6, 0))
+
+        frm.columnconfigure(3, weight=1)
+        frm.rowconfigure(5, weight=1)
+
+    def _carregar_hoje(self):
+        try:
+            conn = self.conectar()
+            try:
+                ops = buscar_ops(conn, data=date.today())
+            finally:
+                conn.close()
+        except Exception as e:
+            messagebox.showerror("Etiquetas", f"{type(e).__name__}: {e}", parent=self.win)
+            return
+        self.txt_ops.delete("1.0", tk.END)
+        self.txt_ops.insert("1.0", ", ".join(str(o["numero"]) for o in ops))
+        self.var_status.set(f"{len(ops)} OP(s) de hoje.")
+
+    def _gerar(self):
+        if self._rodando:
+            return
+        try:
+            numeros = parse_numeros_op(self.txt_ops.get("1.0", tk.END))
+        except ValueError as e:
+            messagebox.showerror("Etiquetas", str(e), parent=self.win)
+            return
+        if not numeros:
+            messagebox.showwarning("Etiquetas", "Informe ao menos uma OP.", parent=self.win)
+            return
+
+        empresa, produto_padrao = self.obter_padroes()
+        por_folha = por_folha_do_layout(self.combo_layout.get())
+
+        self._rodando = True
+        self.btn_gerar.config(state="disabled")
+        self.tree.delete(*self.tree.get_children())
+        self.progress.config(value=0, maximum=1)
+        self.var_status.set("Reservando números de série...")
+
+        fila = self._fila
+
+        def worker():
+            try:
+                conn = self.conectar()
+                try:
+                    ops = buscar_ops(conn, numeros=numeros)
+                    jobs = montar_jobs(conn, ops, empresa, produto_padrao, por_folha)
+                finally:
+                    conn.close()
+
+                faltando = sorted(set(numeros) - {o["numero"] for o in ops})
+                fila.put(("inicio", (len(jobs), faltando)))
+                gerar_lote(jobs, progresso=lambda f, t, j, e: fila.put(("job", (f, t, j, e))))
+                fila.put(("fim", None))
+            except Exception as e:
+                fila.put(("erro", f"{type(e).__name__}: {e}"))
+
+        threading.Thread(target=worker, daemon=True).start()
+        self.win.after(100, self._drenar_fila)
+
+    def _drenar_fila(self):
+        if not self.win or not self.win.winfo_exists():
+            return
+        continuar = True
+        try:
+            while True:
+                tipo, dado = self._fila.get_nowait()
+                if tipo == "inicio":
+                    total, faltando = dado
+                    self.progress.config(maximum=max(1, total), value=0)
+                    msg = f"Gerando {total} PDF(s)..."
+                    if faltando:
+                        msg += f"  OPs não encontradas/sem quantidade: {', '.join(map(str, faltando))}"
+                    self.var_status.set(msg)
+                elif tipo == "job":
+                    feitos, total, job, erro = dado
+                    self.progress.config(value=feitos)
+                    self.tree.insert("", tk.END, values=(
+                        job.numero_op, job.modelo, job.quantidade,
+                        f"{job.serie_inicio:03d} a {job.serie_fim:03d}",
+                        erro or job.caminho_pdf,
+                    ))
+                    self.var_status.set(f"{feitos}/{total} PDF(s) gerado(s)...")
+                elif tipo in ("fim", "erro"):
+                    continuar = False
+                    self._rodando = False
+                    self.btn_gerar.config(state="normal")
+                    if tipo == "erro":
+                        self.var_status.set(f"Falha: {dado}")
+                        messagebox.showerror("Etiquetas", dado, parent=self.win)
+                    else:
+                        self.var_status.set(
+                            f"Concluído. {len(self.tree.get_children())} PDF(s) em {PASTA_ETIQUETAS}")
+        except queue.Empty:
+            pass
+        if continuar:
+            self.win.after(100, self._drenar_fila)
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Gera etiquetas a partir das OPs.")
+    ap.add_argument("ops", nargs="*", help="números das OPs (aceita faixa 10-15)")
+    ap.add_argument("--data", help="OPs da data AAAA-MM-DD (padrão: hoje, se nenhuma OP for informada)")
+    ap.add_argument("--por-folha", type=int, default=1)
+    ap.add_argument("--processos", type=int, default=MAX_PROCESSOS)
+    args = ap.parse_args(argv)
+
+    empresa = {
+        "company_name": "EKENOX DISTRIBUIDORA DE COZ. IND. LTDA",
+        "company_address": "Rua: José de Ribamar Souza, 499",
+        "company_district": "Pq. Industrial",
+        "company_city": "Catanduva",
+        "company_state": "SP",
+        "company_cep": "15803-290",
+        "company_phone": "(11)98740-3669",
+        "company_email": "sac@ekenox.com.br",
+    }
+    produto_padrao = {
+        "product_title": "",
+        "product_model": "",
+        "product_classe": "IPX4",
+        "voltage": "127V",
+        "power": "2000W",
+        "temperature": "30°C a 120°C",
+        "frequency": "60Hz",
+    }
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        if args.ops:
+            ops = buscar_ops(conn, numeros=parse_numeros_op(" ".join(args.ops)))
+        else:
+            dia = datetime.strptime(args.data, "%Y-%m-%d").date() if args.data else date.today()
+            ops = buscar_ops(conn, data=dia)
+        jobs = montar_jobs(conn, ops, empresa, produto_padrao, args.por_folha)
+    finally:
+        conn.close()
+
+    def _prog(feitos, total, job, erro):
+        print(f"[{feitos}/{total}] OP {job.numero_op} -> {erro or job.caminho_pdf}")
+
+    resultados = gerar_lote(jobs, progresso=_prog, max_processos=args.processos)
+    return 1 if any(e for _, e in resultados) else 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    raise SystemExit(main())
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+"""
+etiqueta_zpl.py
+Saída direta para impressora térmica (ZPL ou EPL2), sem PDF.
+
+- mesmo layout do PDF (etiqueta.layout_modelo), convertido de pontos para os
+  pontos da impressora (EKENOX_ETIQUETA_DPI, padrão 203)
+- a parte fixa (borda, empresa, produto) é compilada uma vez num formato
+  gravado na impressora (ZPL ^DF / EPL FS) com um campo variável; cada
+  etiqueta manda só o número de série (ZPL ^XF + ^FN1 / EPL FR + ?)
+- destino: "host:porta" ou "tcp://host" (socket TCP cru, porta 9100; IP sem
+  porta também vai para 9100) ou caminho de arquivo (.zpl/.epl, para conferir
+  num visualizador ou mandar depois com "copy /b arquivo \\\\servidor\\fila")
+- envia em blocos de BLOCO_BYTES: milhares de etiquetas não ficam na memória
+
+Teste sem impressora: impressora_mock.py (servidor local que recebe e conta).
+"""
+
+import os
+import re
+import socket
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from etiqueta import (
+    ALTURA_ETIQUETA,
+    LARGURA_ETIQUETA,
+    X_TITULO,
+    X_VALOR,
+    gerar_seriais,
+    layout_modelo,
+)
+
+
+ZPL = "zpl"
+EPL = "epl"
+LINGUAGENS = (ZPL, EPL)
+
+PORTA_PADRAO = 9100
+DPI_PADRAO = int(os.getenv("EKENOX_ETIQUETA_DPI", "203") or 203)
+BLOCO_BYTES = 64 * 1024
+NOME_FORMATO = "EKENOX"
+
+_RE_TCP = re.compile(r"^(?:tcp://)?([A-Za-z0-9.-]+)(?::(\d+))?$")
+_RE_IPV4 = re.compile(r"^\d{1,3}(?:\.\d{1,3}){3}$")
+
+
+def _pontos(pt: float, dpi: int) -> int:
+    """Pontos tipográficos (1/72") -> pontos da impressora."""
+    return int(round(pt * dpi / 72.0))
+
+
+def _topo(y_base_pt: float, tamanho_pt: float, dpi: int) -> int:
+    """Base do texto no PDF (origem embaixo) -> topo do texto na impressora (origem em cima)."""
+    return _pontos(ALTURA_ETIQUETA - y_base_pt - tamanho_pt * 0.75, dpi)
+
+
+def texto_serie(serial: str) -> str:
+    return f"Nº Série: {serial}"
+
+
+# ============================================================
+# ZPL
+# ============================================================
+
+def _zpl_dado(txt: Any) -> str:
+    """Texto para ^FH^FD: ^, ~ e _ viram hexa (_5E, _7E, _5F)."""
+    return (str(txt or "").replace("_", "_5F").replace("^", "_5E").replace("~", "_7E"))
+
+
+def compilar_zpl(empresa: dict, produto: dict, dpi: int = DPI_PADRAO,
+                 nome: str = NOME_FORMATO) -> bytes:
+    """Formato ^DF com a parte fixa; o número de série é o campo ^FN1."""
+    lay = layout_modelo(empresa, produto)
+    w, h = _pontos(LARGURA_ETIQUETA, dpi), _pontos(ALTURA_ETIQUETA, dpi)
+    f9, f12 = _pontos(9, dpi), _pontos(12, dpi)
+    borda = max(2, _pontos(1, dpi))
+    m5, m10 = _pontos(5, dpi), _pontos(10, dpi)
+    x_tit, x_val = _pontos(X_TITULO, dpi), _pontos(X_VALOR, dpi)
+
+    z: List[str] = [
+        "^XA",
+        f"^DFR:{nome}.ZPL^FS",
+        "^CI28",
+        f"^PW{w}",
+        f"^LL{h}",
+        "^LH0,0",
+        f"^FO{m5},{m5}^GB{w - 2 * m5},{h - 2 * m5},{borda}^FS",
+    ]
+    for y_sep in (lay["y_sep1"], lay["y_sep2"]):
+        y = _pontos(ALTURA_ETIQUETA - y_sep, dpi)
+        z.append(f"^FO{x_tit},{y}^GB{w - m10 - x_tit},{borda},{borda}^FS")
+
+    z.append(f"^FO0,{_topo(lay['y_titulo'], 12, dpi)}^FB{w},1,0,C"
+             f"^A0N,{f12},{f12}^FH^FD{_zpl_dado(empresa['company_name'])}^FS")
+    for y, titulo, valor in lay["linhas"]:
+        top = _topo(y, 9, dpi)
+        z.append(f"^FO{x_tit},{top}^A0N,{f9},{f9}^FH^FD{_zpl_dado(titulo)}^FS")
+        z.append(f"^FO{x_val},{top}^A0N,{f9},{f9}^FH^FD{_zpl_dado(valor)}^FS")
+
+    z.append(f"^FO0,{_topo(lay['y_serie'], 12, dpi)}^FB{w},1,0,C"
+             f"^A0N,{f12},{f12}^FH^FN1^FS")
+    z.append("^XZ")
+    return ("\n".join(z) + "\n").encode("utf-8")
+
+
+def etiqueta_zpl(serial: str, nome: str = NOME_FORMATO) -> bytes:
+    return (f"^XA^XFR:{nome}.ZPL^CI28^FN1^FH^FD{_zpl_dado(texto_serie(serial))}^FS^XZ\n"
+            ).encode("utf-8")
+
+
+# ============================================================
+# EPL2
+# ============================================================
+
+# fontes residentes a 203 dpi: (largura, altura) do caractere em pontos
+_EPL_FONTES = {1: (8, 12), 2: (10, 16), 3: (12, 20), 4: (14, 24)}
+
+
+def _epl_dado(txt: Any) -> str:
+    return str(txt or "").replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _epl_fonte(tamanho_pt: float, dpi: int) -> Tuple[int, int]:
+    """(fonte, largura do caractere) com a altura mais próxima do tamanho em pontos."""
+    alvo = _pontos(tamanho_pt, dpi)
+    escala = dpi / 203.0
+    fonte = min(_EPL_FONTES, key=lambda f: abs(_EPL_FONTES[f][1] * escala - alvo))
+    return fonte, int(round(_EPL_FONTES[fonte][0] * escala))
+
+
+def compilar_epl(empresa: dict, produto: dict, dpi: int = DPI_PADRAO,
+                 nome: str = NOME_FORMATO, exemplo_serie: str = "") -> bytes:
+    """
+    Formulário FS com a parte fixa; o número de série é a variável V00.
+    EPL não centraliza texto: o x do título e do número de série sai da
+    largura estimada (exemplo_serie dá o tamanho do texto variável).
+    """
+    lay = layout_modelo(empresa, produto)
+    w, h = _pontos(LARGURA_ETIQUETA, dpi), _pontos(ALTURA_ETIQUETA, dpi)
+    borda = max(2, _pontos(1, dpi))
+    m5, m10 = _pontos(5, dpi), _pontos(10, dpi)
+    x_tit, x_val = _pontos(X_TITULO, dpi), _pontos(X_VALOR, dpi)
+    fn9, _cw9 = _epl_fonte(9, dpi)
+    fn12, cw12 = _epl_fonte(12, dpi)
+
+    def centro(txt: str) -> int:
+        return max(m5, (w - len(txt) * cw12) // 2)
+
+    serie_ex = texto_serie(exemplo_serie or "XXXXXXX-000")
+    e: List[str] = [
+        "",
+        "I8,A,055",
+        f"q{w}",
+        f"Q{h},24",
+        f'FK"{nome}"',
+        f'FS"{nome}"',
+        f'V00,{max(40, len(serie_ex) + 10)},N,"Serie"',
+        f"X{m5},{m5},{borda},{w - m5},{h - m5}",
+    ]
+    for y_sep in (lay["y_sep1"], lay["y_sep2"]):
+        y = _pontos(ALTURA_ETIQUETA - y_sep, dpi)
+        e.append(f"LO{x_tit},{y},{w - m10 - x_tit},{borda}")
+
+    nome_empresa = str(empresa["company_name"] or "")
+    e.append(f'A{centro(nome_empresa)},{_topo(lay["y_titulo"], 12, dpi)},0,{fn12},1,1,N,'
+             f'"{_epl_dado(nome_empresa)}"')
+    for y, titulo, valor in lay["linhas"]:
+        top = _topo(y, 9, dpi)
+        e.append(f'A{x_tit},{top},0,{fn9},1,1,N,"{_epl_dado(titulo)}"')
+        e.append(f'A{x_val},{top},0,{fn9},1,1,N,"{_epl_dado(valor)}"')
+
+    e.append(f"A{centro(serie_ex)},{_topo(lay['y_serie'], 12, dpi)},0,{fn12},1,1,N,V00")
+    e.append("FE")
+    return ("\n".join(e) + "\n").encode("cp1252", errors="replace")
+
+
+def etiqueta_epl(serial: str, nome: str = NOME_FORMATO) -> bytes:
+    return (f'FR"{nome}"\n?\n{texto_serie(serial)}\nP1\n').encode("cp1252", errors="replace")
+
+
+# ============================================================
+# FLUXO / DESTINO
+# ============================================================
+
+def gerar_fluxo(linguagem: str, empresa: dict, produto: dict, seriais: Iterable[str],
+                dpi: int = DPI_PADRAO, exemplo_serie: str = "") -> Iterator[bytes]:
+    """Formato (uma vez) e depois só os dados variáveis de cada etiqueta."""
+    if linguagem == ZPL:
+        yield compilar_zpl(empresa, produto, dpi)
+        por_etiqueta = etiqueta_zpl
+    elif linguagem == EPL:
+        yield compilar_epl(empresa, produto, dpi, exemplo_serie=exemplo_serie)
+        por_etiqueta = etiqueta_epl
+    else:
+        raise ValueError(f"Linguagem de impressora desconhecida: {linguagem!r} (use zpl ou epl).")
+    for serial in seriais:
+        yield por_etiqueta(serial)
+
+
+def endereco_tcp(destino: str) -> Optional[Tuple[str, int]]:
+    """(host, porta) se destino for impressora de rede; None se for arquivo."""
+    d = (destino or "").strip()
+    m = _RE_TCP.match(d)
+    if not m:
+        return None
+    host, porta = m.group(1), m.group(2)
+    if porta or d.startswith("tcp://") or _RE_IPV4.match(host):
+        return host, int(porta or PORTA_PADRAO)
+    return None
+
+
+class SaidaImpressora:
+    """Socket TCP cru (porta 9100) ou arquivo; junta as escritas em blocos de BLOCO_BYTES."""
+
+    def __init__(self, destino: str, timeout: float = 10.0) -> None:
+        self.destino = (destino or "").strip()
+        if not self.destino:
+            raise ValueError("Informe a impressora (host:9100) ou o arquivo de saída.")
+        self.timeout = timeout
+        self.bytes_enviados = 0
+        self._buf = bytearray()
+        self._sock: Optional[socket.socket] = None
+        self._arq: Any = None
+
+    def __enter__(self) -> "SaidaImpressora":
+        tcp = endereco_tcp(self.destino)
+        if tcp is not None:
+            self._sock = socket.create_connection(tcp, timeout=self.timeout)
+        else:
+            pasta = os.path.dirname(os.path.abspath(self.destino))
+            os.makedirs(pasta, exist_ok=True)
+            self._arq = open(self.destino, "wb")
+        return self
+
+    def write(self, dados: bytes) -> None:
+        self._buf += dados
+        if len(self._buf) >= BLOCO_BYTES:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buf:
+            return
+        if self._sock is not None:
+            self._sock.sendall(self._buf)
+        else:
+            self._arq.write(self._buf)
+        self.bytes_enviados += len(self._buf)
+        self._buf.clear()
+
+    def __exit__(self, tipo: Any, *exc: Any) -> None:
+        try:
+            if tipo is None:
+                self.flush()
+        finally:
+            if self._sock is not None:
+                try:
+                    self._sock.shutdown(socket.SHUT_WR)
+                except OSError:
+                    pass
+                self._sock.close()
+            if self._arq is not None:
+                self._arq.close()
+
+
+def imprimir_etiquetas(destino: str, empresa: dict, produto: dict,
+                       serie_base: str, quantidade: int,
+                       linguagem: str = ZPL, inicio: int = 1,
+                       dpi: int = DPI_PADRAO, seriais: Optional[Iterable[str]] = None) -> int:
+    """
+    Manda as etiquetas para destino (impressora ou arquivo). Sem Tk: usado
+    pela tela e pelo benchmark. Devolve quantas etiquetas foram enviadas.
+    """
+    if seriais is None:
+        seriais = gerar_seriais(serie_base, quantidade, inicio)
+    exemplo = f"{serie_base}-{inicio + max(0, quantidade - 1):03d}"
+
+    enviadas = -1       # o primeiro bloco é o formato
+    with SaidaImpressora(destino) as saida:
+        for dados in gerar_fluxo(linguagem, empresa, produto, seriais, dpi, exemplo):
+            saida.write(dados)
+            enviadas += 1
+    return max(0, enviadas)
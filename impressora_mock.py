@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+"""
+impressora_mock.py
+Servidor TCP local que faz o papel da impressora térmica (porta 9100), para
+testar o etiqueta_zpl sem impressora.
+
+- guarda tudo o que recebe (recebido) e, se pedido, grava em arquivo
+- etiquetas(): quantas etiquetas chegaram (ZPL ^XF... / EPL FR"...")
+- formatos(): quantos formatos foram gravados (ZPL ^DF / EPL FS)
+
+Uso em código:
+    with ImpressoraFalsa() as imp:
+        imprimir_etiquetas(imp.endereco, empresa, produto, "EKX2024", 500)
+        assert imp.etiquetas() == 500
+
+Ou avulso (a tela imprime em 127.0.0.1:9100):
+    python impressora_mock.py --porta 9100 --arquivo recebido.zpl
+"""
+
+import argparse
+import re
+import socketserver
+import threading
+import time
+from typing import Any, List, Optional
+
+_RE_ETIQUETA_EPL = re.compile(rb'^FR"', re.M)
+_RE_FORMATO_EPL = re.compile(rb'^FS"', re.M)
+
+
+class _Receptor(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        imp: "ImpressoraFalsa" = self.server.impressora     # type: ignore[attr-defined]
+        with imp._lock:
+            imp.conexoes += 1
+        while True:
+            dados = self.request.recv(65536)
+            if not dados:
+                break
+            imp._receber(dados)
+
+
+class _Servidor(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ImpressoraFalsa:
+    def __init__(self, porta: int = 0, arquivo: Optional[str] = None) -> None:
+        self.arquivo = arquivo
+        self.conexoes = 0
+        self._partes: List[bytes] = []
+        self._lock = threading.Lock()
+        self._srv = _Servidor(("127.0.0.1", porta), _Receptor)
+        self._srv.impressora = self     # type: ignore[attr-defined]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def porta(self) -> int:
+        return int(self._srv.server_address[1])
+
+    @property
+    def endereco(self) -> str:
+        return f"127.0.0.1:{self.porta}"
+
+    @property
+    def recebido(self) -> bytes:
+        with self._lock:
+            return b"".join(self._partes)
+
+    def _receber(self, dados: bytes) -> None:
+        with self._lock:
+            self._partes.append(dados)
+        if self.arquivo:
+            with open(self.arquivo, "ab") as f:
+                f.write(dados)
+
+    def etiquetas(self) -> int:
+        dados = self.recebido
+        return dados.count(b"^XF") + len(_RE_ETIQUETA_EPL.findall(dados))
+
+    def formatos(self) -> int:
+        dados = self.recebido
+        return dados.count(b"^DF") + len(_RE_FORMATO_EPL.findall(dados))
+
+    def iniciar(self) -> "ImpressoraFalsa":
+        self._thread = threading.Thread(target=self._srv.serve_forever, name="impressora-falsa",
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self) -> None:
+        self._srv.shutdown()
+        self._srv.server_close()
+
+    def __enter__(self) -> "ImpressoraFalsa":
+        return self.iniciar()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.parar()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Servidor local que faz o papel da impressora (porta 9100).")
+    ap.add_argument("--porta", type=int, default=9100)
+    ap.add_argument("--arquivo", help="grava o que receber neste arquivo")
+    args = ap.parse_args(argv)
+
+    imp = ImpressoraFalsa(args.porta, args.arquivo).iniciar()
+    print(f"Impressora falsa em {imp.endereco} (Ctrl+C para sair)")
+    visto = 0
+    try:
+        while True:
+            time.sleep(1.0)
+            n = imp.etiquetas()
+            if n != visto:
+                print(f"{n} etiqueta(s) recebida(s), {imp.formatos()} formato(s)")
+                visto = n
+    except KeyboardInterrupt:
+        pass
+    finally:
+        imp.parar()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,7 +1,8 @@
 import os
 from typing import Dict, Optional, Tuple
 import psycopg2
-from security import email_hash, verify_password
+import credenciais
+from security import email_hash
 
 EMAIL_KEY = os.getenv("APP_EMAIL_KEY", "")
 
@@ -34,8 +35,15 @@ def auth_login(cfg, email: str, senha: str) -> Tuple[bool, str, Optional[int], D
         if not ativo:
             return False, "Usuário inativo.", None, {}
 
-        if not verify_password(senha, senha_hash_db):
+        res = credenciais.verificar(senha, senha_hash_db)
+        if not res.ok:
             return False, "Usuário ou senha inválidos.", None, {}
+        if res.novo_hash:
+            # formato/custo antigo: regrava já no login
+            try:
+                credenciais.atualizar_hash(conn, int(usuario_id), res.novo_hash, senha_hash_db)
+            except Exception:
+                conn.rollback()
 
         cur.execute("""
             SELECT pr."codigo", up."nivel"
@@ -9,22 +9,30 @@ CORREÇÕES INCLUÍDAS:
 - Menu NÃO é destruído ao abrir outro programa: ele oculta e volta quando o filho fecha
 - Resolve automaticamente .py/.exe e procura em APP_DIR/BASE_DIR
 - Passa --usuario-id para todos os programas abertos pelo menu
-- Controle de acesso por nível (se nível = 0, bloqueia; se programa não existir em 'programas', abre e avisa no log)
+- Controle de acesso por nível (se nível = 0, bloqueia; se programa não existir em 'programas', abre e avisa no log);
+  a matriz de permissões é relida ao abrir um programa depois de VALIDADE_PERMISSOES_S
 """
 
+import base64
 import hashlib
 import json
 import os
 import subprocess
 import sys
 import threading
+import time
 import tkinter as tk
-from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from tkinter import messagebox, ttk
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 import psycopg2
 
+import credenciais
+from sistema_log import log_write
+
 
 # ============================================================
 # PATHS
@@ -46,14 +54,7 @@ os.makedirs(BASE_DIR, exist_ok=True)
 # ============================================================
 
 def _log_write(filename: str, msg: str) -> None:
-    try:
-        log_dir = os.path.join(BASE_DIR, "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        log_path = os.path.join(log_dir, filename)
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(msg + "\n")
-    except Exception:
-        pass
+    log_write(os.path.join(BASE_DIR, "logs"), filename, msg)
 
 
 def log(msg: str) -> None:
@@ -144,28 +145,21 @@ def apply_window_icon(win: tk.Misc) -> None:
         log(f"apply_window_icon fatal: {type(e).__name__}: {e}")
 
 
-def load_png_icon(rel_path: str, max_side: int = 48) -> Optional[tk.PhotoImage]:
+# PNG em base64 já lido do disco (pré-carga do splash, em paralelo);
+# o PhotoImage em si só pode ser criado na thread do Tk
+_ICONES_LIDOS: Dict[str, str] = {}
+_icones_lock = threading.Lock()
+
+
+def icon_path(rel_path: str) -> Optional[str]:
     candidates = [
         os.path.join(BASE_DIR, rel_path),
         os.path.join(APP_DIR, rel_path),
     ]
-    path = next((p for p in candidates if os.path.isfile(p)), None)
-    if not path:
-        return None
-    try:
-        img = tk.PhotoImage(file=path)
-        w, h = img.width(), img.height()
-        maior = max(w, h)
-        if maior > max_side:
-            fator = max(1, int(maior / max_side))
-            img = img.subsample(fator, fator)
-        return img
-    except Exception as e:
-        log(f"load_png_icon failed: {path} | {type(e).__name__}: {e}")
-        return None
+    return next((p for p in candidates if os.path.isfile(p)), None)
 
 
-def load_avatar_image(max_side: int = 220) -> Optional[tk.PhotoImage]:
+def avatar_path() -> Optional[str]:
     candidates = [
         # BASE_DIR
         os.path.join(BASE_DIR, "imagens", "avatar_ekenox.png"),
@@ -178,17 +172,62 @@ def load_avatar_image(max_side: int = 220) -> Optional[tk.PhotoImage]:
         os.path.join(APP_DIR, "imagens", "Ekenox.png"),
         os.path.join(APP_DIR, "Ekenox.png"),
     ]
-    path = next((p for p in candidates if os.path.isfile(p)), None)
+    return next((p for p in candidates if os.path.isfile(p)), None)
+
+
+def _ler_icone(path: str) -> None:
+    with open(path, "rb") as f:
+        data = base64.b64encode(f.read()).decode("ascii")
+    with _icones_lock:
+        _ICONES_LIDOS[path] = data
+
+
+def preload_icons(paths: List[Optional[str]], max_workers: int = 8) -> int:
+    """Lê os PNGs em paralelo (thread do splash). Devolve quantos foram lidos."""
+    unicos = sorted({p for p in paths if p})
+    if not unicos:
+        return 0
+    lidos = 0
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unicos)),
+                            thread_name_prefix="icones") as ex:
+        for path, fut in [(p, ex.submit(_ler_icone, p)) for p in unicos]:
+            try:
+                fut.result()
+                lidos += 1
+            except Exception as e:
+                log(f"preload_icons failed: {path} | {type(e).__name__}: {e}")
+    return lidos
+
+
+def _photo(path: str, max_side: int) -> tk.PhotoImage:
+    with _icones_lock:
+        data = _ICONES_LIDOS.pop(path, None)
+    img = tk.PhotoImage(data=data) if data else tk.PhotoImage(file=path)
+    w, h = img.width(), img.height()
+    maior = max(w, h)
+    if maior > max_side:
+        fator = max(1, int(maior / max_side))
+        img = img.subsample(fator, fator)
+    return img
+
+
+def load_png_icon(rel_path: str, max_side: int = 48) -> Optional[tk.PhotoImage]:
+    path = icon_path(rel_path)
     if not path:
         return None
     try:
-        img = tk.PhotoImage(file=path)
-        w, h = img.width(), img.height()
-        maior = max(w, h)
-        if maior > max_side:
-            fator = max(1, int(maior / max_side))
-            img = img.subsample(fator, fator)
-        return img
+        return _photo(path, max_side)
+    except Exception as e:
+        log(f"load_png_icon failed: {path} | {type(e).__name__}: {e}")
+        return None
+
+
+def load_avatar_image(max_side: int = 220) -> Optional[tk.PhotoImage]:
+    path = avatar_path()
+    if not path:
+        return None
+    try:
+        return _photo(path, max_side)
     except Exception as e:
         log(f"load_avatar_image failed: {path} | {type(e).__name__}: {e}")
         return None
@@ -235,17 +274,8 @@ def db_connect(cfg: AppConfig):
     )
 
 
-def try_connect_db(cfg: AppConfig) -> Tuple[bool, str]:
-    try:
-        conn = db_connect(cfg)
-        conn.close()
-        return True, ""
-    except Exception as e:
-        return False, f"{type(e).__name__}: {e}"
-
-
 # ============================================================
-# SEGURANÇA: email_hash + senha_hash (salt$hash PBKDF2)
+# SEGURANÇA: email_hash (senha: credenciais.py)
 # ============================================================
 
 def _norm_email(email: str) -> str:
@@ -257,28 +287,8 @@ def email_hash(email: str) -> str:
     return hashlib.sha256(e.encode("utf-8")).hexdigest()
 
 
-def hash_password(password: str, salt: str) -> str:
-    dk = hashlib.pbkdf2_hmac(
-        "sha256",
-        password.encode("utf-8"),
-        salt.encode("utf-8"),
-        120_000,
-        dklen=32,
-    )
-    return dk.hex()
-
-
-def verify_password(password: str, stored: str) -> bool:
-    try:
-        if not stored or "$" not in stored:
-            return False
-        salt, ph = stored.split("$", 1)
-        return hash_password(password, salt) == ph
-    except Exception:
-        return False
-
-
-def fetch_user_by_email(cfg: AppConfig, email: str) -> Optional[dict]:
+def fetch_user_by_email(cfg: AppConfig, email: str, conn: Any = None) -> Optional[dict]:
+    """conn: conexão já aberta (a do menu); sem ela abre e fecha uma."""
     eh = email_hash(email)
     sql = """
         SELECT u."usuarioId", u."email_hash", u."senha_hash", u."nome", u."ativo"
@@ -286,11 +296,13 @@ def fetch_user_by_email(cfg: AppConfig, email: str) -> Optional[dict]:
          WHERE u."email_hash" = %s
          LIMIT 1
     """
-    conn = db_connect(cfg)
+    propria = conn is None
+    if propria:
+        conn = db_connect(cfg)
     try:
-        cur = conn.cursor()
-        cur.execute(sql, (eh,))
-        row = cur.fetchone()
+        with conn.cursor() as cur:
+            cur.execute(sql, (eh,))
+            row = cur.fetchone()
         if not row:
             return None
         return {
@@ -301,7 +313,8 @@ def fetch_user_by_email(cfg: AppConfig, email: str) -> Optional[dict]:
             "ativo": bool(row[4]),
         }
     finally:
-        conn.close()
+        if propria:
+            conn.close()
 
 
 # ============================================================
@@ -362,6 +375,110 @@ def fetch_user_nivel_por_programa(cfg: AppConfig, usuario_id: int, termo_program
             pass
 
 
+# a matriz é relida ao abrir um programa se tiver mais que isso: nível
+# revogado em outra estação vale no próximo clique depois do prazo
+VALIDADE_PERMISSOES_S = float(os.getenv("EKENOX_PERMISSOES_VALIDADE_S", "30") or 30)
+
+
+@dataclass
+class MatrizPermissoes:
+    """
+    Nível do usuário em todos os programas, lido numa consulta só.
+    nivel() segue a regra de fetch_user_nivel_por_programa sem ir ao banco.
+    """
+    usuario_id: int
+    programas: List[Tuple[int, str, str, int]] = field(default_factory=list)  # programaId DESC
+    lida_em: float = field(default_factory=time.monotonic)
+
+    def vencida(self, validade_s: float = VALIDADE_PERMISSOES_S) -> bool:
+        return time.monotonic() - self.lida_em > validade_s
+
+    def nivel(self, termo_programa: str) -> Tuple[int, bool]:
+        termo = (termo_programa or "").strip().lower()
+        if not termo:
+            return 1, False
+        for _pid, nome, codigo, nivel in self.programas:
+            if termo in nome.lower() or termo in codigo.lower():
+                return (nivel if nivel in (0, 1, 2, 3) else 1), True
+        return 1, False
+
+
+def fetch_matriz_permissoes(conn: Any, usuario_id: int) -> MatrizPermissoes:
+    sql = """
+        SELECT pr."programaId", COALESCE(pr."nome",''), COALESCE(pr."codigo",''),
+               COALESCE(up."nivel", 0)
+          FROM "Ekenox"."programas" pr
+          LEFT JOIN "Ekenox"."usuario_programa" up
+                 ON up."programaId" = pr."programaId"
+                AND up."usuarioId" = %s
+         ORDER BY pr."programaId" DESC
+    """
+    with conn.cursor() as cur:
+        cur.execute(sql, (int(usuario_id),))
+        rows = cur.fetchall()
+    return MatrizPermissoes(
+        int(usuario_id),
+        [(int(r[0]), str(r[1]), str(r[2]), int(r[3] or 0)) for r in rows],
+    )
+
+
+# ============================================================
+# PRÉ-CARGA DO SPLASH
+# ============================================================
+
+# tabelas pequenas que toda tela filha lê ao abrir: lidas uma vez no splash,
+# ficam no cache do servidor
+TABELAS_REFERENCIA = ("programas", "situacao", "deposito", "categoria", "fornecedor")
+
+# meta: do "Entrar" aceito até o menu na tela
+META_LOGIN_MS = 1000.0
+
+
+def warm_reference_tables(conn: Any) -> int:
+    """Lê as tabelas de referência (conn em autocommit). Devolve quantas existiam."""
+    lidas = 0
+    with conn.cursor() as cur:
+        for t in TABELAS_REFERENCIA:
+            try:
+                cur.execute(f'SELECT count(*) FROM "Ekenox"."{t}"')
+                cur.fetchone()
+                lidas += 1
+            except psycopg2.Error as e:
+                log(f"warm_reference_tables: {t} | {type(e).__name__}: {e}")
+    return lidas
+
+
+class Cronometro:
+    """Tempo por etapa (ms), preenchido pelas threads da pré-carga."""
+
+    def __init__(self) -> None:
+        self.inicio = time.perf_counter()
+        self.etapas: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def etapa(self, nome: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.etapas[nome] = round((time.perf_counter() - t0) * 1000.0, 1)
+
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self.inicio) * 1000.0, 1)
+
+    def resumo(self) -> str:
+        with self._lock:
+            return " | ".join(f"{k} {v:.0f} ms" for k, v in self.etapas.items())
+
+    def registrar(self, msg: str, **campos: Any) -> None:
+        with self._lock:
+            etapas = {f"{k}_ms": v for k, v in self.etapas.items()}
+        log_write(os.path.join(BASE_DIR, "logs"), "menu_principal.log", msg,
+                  total_ms=self.total_ms(), **etapas, **campos)
+
+
 # ============================================================
 # RESOLVER ARQUIVO (.py/.exe) E PROCURAR EM APP_DIR/BASE_DIR
 # ============================================================
@@ -463,6 +580,15 @@ PROGRAMAS: List[Dict[str, Any]] = [
 ]
 
 
+def programas_faltando() -> List[str]:
+    faltando: List[str] = []
+    for p in PROGRAMAS:
+        arq = p.get("arquivo", "")
+        if not resolve_program_file(arq):
+            faltando.append(f'{p.get("menu")} -> {p.get("nome")} ({arq})')
+    return faltando
+
+
 # ============================================================
 # LOGIN SCROLLÁVEL (corrigido bg)
 # ============================================================
@@ -644,6 +770,13 @@ class MenuPrincipalApp(tk.Tk):
         self._icons: Dict[str, tk.PhotoImage] = {}
 
         self.user: Optional[dict] = None
+        self.permissoes: Optional[MatrizPermissoes] = None
+
+        # conexão do menu (login e permissões), aberta na pré-carga
+        self._conn: Any = None
+        self._pool_login = ThreadPoolExecutor(max_workers=2, thread_name_prefix="login")
+        self._programas_faltando: List[str] = []
+        self._lbl_usuario: Optional[ttk.Label] = None
 
         # controle do processo filho
         self._child_proc: Optional[subprocess.Popen] = None
@@ -656,21 +789,69 @@ class MenuPrincipalApp(tk.Tk):
     # ---------------- STARTUP ----------------
 
     def _startup(self) -> None:
+        """
+        Pré-carga em paralelo enquanto o splash aparece: conexão + tabelas de
+        referência, leitura dos ícones, localização dos programas e calibração
+        do custo de senha. Tempo de cada etapa no splash e no log.
+        """
         splash = Splash(self, "Inicializando")
         splash.set_text("Conectando ao banco...")
+        crono = Cronometro()
+
+        def mostrar_etapas() -> None:
+            try:
+                splash.set_info(crono.resumo())
+            except Exception:
+                pass
+
+        def etapa_banco() -> None:
+            with crono.etapa("banco"):
+                conn = db_connect(self.cfg)
+                conn.autocommit = True
+            self._conn = conn
+            with crono.etapa("referencias"):
+                warm_reference_tables(conn)
+
+        def etapa_icones() -> None:
+            with crono.etapa("icones"):
+                preload_icons([icon_path(p.get("icone", "")) for p in PROGRAMAS] + [avatar_path()])
+
+        def etapa_programas() -> None:
+            with crono.etapa("programas"):
+                self._programas_faltando = programas_faltando()
+
+        def etapa_calibrar() -> None:
+            # custo do PBKDF2 nesta máquina: pronto antes do "Entrar"
+            with crono.etapa("calibrar"):
+                credenciais.calibrar()
 
         def worker() -> None:
-            ok, err = try_connect_db(self.cfg)
+            ok, err = True, ""
+            with ThreadPoolExecutor(max_workers=4, thread_name_prefix="inicio") as ex:
+                futs = {ex.submit(etapa_banco): "banco", ex.submit(etapa_icones): "icones",
+                        ex.submit(etapa_programas): "programas", ex.submit(etapa_calibrar): "calibrar"}
+                for fut in as_completed(futs):
+                    try:
+                        fut.result()
+                    except Exception as e:
+                        if futs[fut] == "banco":
+                            ok, err = False, f"{type(e).__name__}: {e}"
+                        else:
+                            log(f"pré-carga {futs[fut]}: {type(e).__name__}: {e}")
+                    self.after(0, mostrar_etapas)
 
             def finish() -> None:
                 self.connected = bool(ok)
                 self.db_err = str(err)
 
                 try:
-                    splash.set_info("Conectado" if ok else (
+                    splash.set_info(crono.resumo() if ok else (
                         self.db_err[:70] + ("..." if len(self.db_err) > 70 else "")))
                     splash.set_text("Carregando menu...")
-                    self._build_ui_once()
+                    with crono.etapa("menu"):
+                        self._build_ui_once()
+                    crono.registrar("inicio", conectado=self.connected,
+                                    iteracoes_senha=credenciais.iteracoes_atuais())
                 finally:
                     try:
                         splash.destroy()
@@ -693,6 +874,59 @@ class MenuPrincipalApp(tk.Tk):
         self._build_ui()
         self._log_programas_faltando()
 
+    def _conexao(self) -> Any:
+        """Conexão do menu (autocommit); reabre se caiu."""
+        if self._conn is None or self._conn.closed:
+            self._conn = db_connect(self.cfg)
+            self._conn.autocommit = True
+        return self._conn
+
+    def _com_conexao(self, fn: Callable[[Any], Any]) -> Any:
+        """fn(conn); conexão caída -> reabre e tenta uma vez mais."""
+        try:
+            return fn(self._conexao())
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            if self._conn is not None and not self._conn.closed:
+                raise
+            self._conn = None
+            return fn(self._conexao())
+
+    def _carregar_permissoes(self, uid: int) -> Optional[MatrizPermissoes]:
+        try:
+            return self._com_conexao(lambda conn: fetch_matriz_permissoes(conn, uid))
+        except Exception as e:
+            log(f"fetch_matriz_permissoes error: {type(e).__name__}: {e}")
+            return None
+
+    def _estado_entrar(self, btn: ttk.Button, ativo: bool, texto: str = "Entrar") -> None:
+        try:
+            btn.state(["!disabled"] if ativo else ["disabled"])
+            btn.config(text=texto)
+        except tk.TclError:
+            pass
+
+    def _regravar_hash(self, uid: int, novo_hash: str, anterior: str) -> None:
+        """Senha conferiu com parâmetros antigos: grava o hash novo sem segurar o login."""
+        def gravar() -> None:
+            try:
+                ok = self._com_conexao(lambda conn: credenciais.atualizar_hash(conn, uid, novo_hash, anterior))
+                log(f"rehash senha usuarioId={uid}: {'ok' if ok else 'registro mudou, ignorado'}")
+            except Exception as e:
+                log(f"rehash senha usuarioId={uid} falhou: {type(e).__name__}: {e}")
+
+        self._pool_login.submit(gravar)
+
+    def _atualizar_usuario(self) -> None:
+        if self._lbl_usuario is None:
+            return
+        user_txt = ""
+        if self.user:
+            user_txt = f"Usuário: {self.user.get('nome') or self.user.get('usuarioId')}"
+        try:
+            self._lbl_usuario.config(text=user_txt)
+        except tk.TclError:
+            pass
+
     def _show_menu(self) -> None:
         if self._closing:
             return
@@ -820,7 +1054,11 @@ class MenuPrincipalApp(tk.Tk):
         )
         ent_senha.pack(fill="x", pady=(6, 10))
 
+        aguardando = {"ativo": False}
+
         def do_login(event=None) -> None:
+            if aguardando["ativo"]:
+                return
             if not self.connected:
                 messagebox.showerror(
                     "Banco de dados", "Sem conexão com o banco.\n\nVerifique rede/configuração.")
@@ -839,7 +1077,9 @@ class MenuPrincipalApp(tk.Tk):
                 return
 
             try:
-                u = fetch_user_by_email(self.cfg, email)
+                crono = Cronometro()
+                with crono.etapa("usuario"):
+                    u = self._com_conexao(lambda conn: fetch_user_by_email(self.cfg, email, conn))
                 if not u:
                     messagebox.showerror("Entrada", "Usuário não encontrado.")
                     return
@@ -847,25 +1087,60 @@ class MenuPrincipalApp(tk.Tk):
                     messagebox.showerror("Entrada", "Usuário inativo.")
                     return
 
+                # senha numa thread (credenciais.py) enquanto a matriz de permissões
+                # vem do banco; a tela continua respondendo
                 stored = (u.get("senha_hash") or "").strip()
-                if not verify_password(senha, stored):
-                    messagebox.showerror("Entrada", "Senha incorreta.")
-                    return
-
-                self.user = u
-                set_session_skip_entrada()
-
-                try:
-                    tela.grab_release()
-                except Exception:
-                    pass
-                tela.destroy()
+                uid = int(u["usuarioId"])
+                f_senha = credenciais.verificar_async(senha, stored)
+                f_perm = self._pool_login.submit(self._carregar_permissoes, uid)
+                aguardando["ativo"] = True
+                self._estado_entrar(btn_entrar, False, "Verificando...")
+                tela.after(15, lambda: aguardar_login(u, stored, f_senha, f_perm, crono))
 
-                self._show_menu()
+            except Exception as e:
+                log(f"Falha no login: {type(e).__name__}: {e}")
+                messagebox.showerror("Erro", f"Falha no login:\n{e}")
 
+        def aguardar_login(u: dict, stored: str, f_senha: Future, f_perm: Future,
+                           crono: Cronometro) -> None:
+            if not (f_senha.done() and f_perm.done()):
+                tela.after(15, lambda: aguardar_login(u, stored, f_senha, f_perm, crono))
+                return
+            aguardando["ativo"] = False
+            try:
+                res = f_senha.result()
             except Exception as e:
+                self._estado_entrar(btn_entrar, True)
                 log(f"Falha no login: {type(e).__name__}: {e}")
                 messagebox.showerror("Erro", f"Falha no login:\n{e}")
+                return
+            crono.etapas["senha"] = res.duracao_ms
+            if not res.ok:
+                self._estado_entrar(btn_entrar, True)
+                messagebox.showerror("Entrada", "Senha incorreta.")
+                ent_senha.focus_set()
+                return
+
+            uid = int(u["usuarioId"])
+            if res.novo_hash:
+                self._regravar_hash(uid, res.novo_hash, stored)
+
+            self.user = u
+            self.permissoes = f_perm.result()
+            set_session_skip_entrada()
+            self._atualizar_usuario()
+
+            try:
+                tela.grab_release()
+            except Exception:
+                pass
+            tela.destroy()
+
+            self._show_menu()
+            self.update_idletasks()
+            total = crono.total_ms()
+            crono.registrar("login", usuario_id=uid, rehash=bool(res.novo_hash),
+                            acima_da_meta=total > META_LOGIN_MS)
 
         botoes = tk.Frame(frame, bg="#121212")
         botoes.pack(fill="x", pady=(14, 0))
@@ -934,11 +1209,9 @@ class MenuPrincipalApp(tk.Tk):
         ttk.Label(status_frame, text=status_txt, foreground=status_fg,
                   font=("Segoe UI", 10, "bold")).pack(side="left")
 
-        user_txt = ""
-        if self.user:
-            user_txt = f"Usuário: {self.user.get('nome') or self.user.get('usuarioId')}"
-        ttk.Label(status_frame, text=user_txt,
-                  foreground="gray").pack(side="right")
+        self._lbl_usuario = ttk.Label(status_frame, text="", foreground="gray")
+        self._lbl_usuario.pack(side="right")
+        self._atualizar_usuario()
 
         ttk.Separator(main, orient="horizontal").pack(fill="x", pady=12)
 
@@ -992,8 +1265,15 @@ class MenuPrincipalApp(tk.Tk):
         uid = int(self.user["usuarioId"]) if self.user and self.user.get(
             "usuarioId") else 0
         if uid > 0:
-            nivel, cadastrado = fetch_user_nivel_por_programa(
-                self.cfg, uid, termo_permissao)
+            if self.permissoes is not None and self.permissoes.usuario_id == uid \
+                    and self.permissoes.vencida():
+                # uma consulta na conexão do menu; falhou -> consulta por programa
+                self.permissoes = self._carregar_permissoes(uid)
+            if self.permissoes is not None and self.permissoes.usuario_id == uid:
+                nivel, cadastrado = self.permissoes.nivel(termo_permissao)
+            else:
+                nivel, cadastrado = fetch_user_nivel_por_programa(
+                    self.cfg, uid, termo_permissao)
             if not cadastrado:
                 log(f'AVISO: programa "{termo_permissao}" não encontrado em Ekenox.programas. Abrindo mesmo assim (nível default=1).')
             else:
@@ -1044,10 +1324,23 @@ class MenuPrincipalApp(tk.Tk):
             pass
 
         # filho terminou -> volta menu
+        if self._child_nome == "Usuários" and self.permissoes is not None:
+            self._recarregar_permissoes()
         self._child_proc = None
         self._child_nome = ""
         self._show_menu()
 
+    def _recarregar_permissoes(self) -> None:
+        """As permissões podem ter mudado na tela de usuários: relê em segundo plano."""
+        uid = self.permissoes.usuario_id if self.permissoes else 0
+
+        def worker() -> None:
+            m = self._carregar_permissoes(uid)
+            self.after(0, lambda: setattr(self, "permissoes", m))
+
+        if uid > 0:
+            threading.Thread(target=worker, daemon=True).start()
+
     def open_program(self, programa: Dict[str, Any]) -> None:
         nome = programa.get("nome", "Programa")
         arquivo = programa.get("arquivo", "")
@@ -1067,13 +1360,9 @@ class MenuPrincipalApp(tk.Tk):
                                termo_permissao=str(termo))
 
     def _log_programas_faltando(self) -> None:
-        faltando: List[str] = []
-        for p in PROGRAMAS:
-            arq = p.get("arquivo", "")
-            if not resolve_program_file(arq):
-                faltando.append(f'{p.get("menu")} -> {p.get("nome")} ({arq})')
-        if faltando:
-            log("PROGRAMAS FALTANDO:\n" + "\n".join(faltando))
+        # lista montada na pré-carga (etapa "programas")
+        if self._programas_faltando:
+            log("PROGRAMAS FALTANDO:\n" + "\n".join(self._programas_faltando))
 
     # ---------------- fechar ----------------
 
@@ -1083,6 +1372,12 @@ class MenuPrincipalApp(tk.Tk):
         try:
             if force or messagebox.askokcancel("Sair", "Deseja realmente sair?"):
                 self._closing = True
+                self._pool_login.shutdown(wait=False)
+                try:
+                    if self._conn is not None:
+                        self._conn.close()
+                except Exception:
+                    pass
                 clear_session_skip_entrada()
                 self.destroy()
         except Exception:
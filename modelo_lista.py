@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+"""
+modelo_lista.py
+Modelo das listas (ttk.Treeview) das telas de cadastro.
+
+- Guarda o índice chave -> item das linhas exibidas e a ordem da lista
+  (bisect), para que um salvar/excluir mexa só na linha afetada:
+  o resultado do INSERT/UPDATE ... RETURNING vai direto para aplicar(),
+  o DELETE ... RETURNING para remover(); nada de relistar tudo
+- O iid de cada item do Treeview é a própria chave
+- carregar() continua sendo o caminho do "Atualizar"/filtro
+- remendar() aplica os avisos do ouvinte_alteracoes (LISTEN/NOTIFY)
+
+Uso na tela:
+    self.modelo = ModeloLista(self.tree, chave=lambda a: a.sku,
+                              valores=self._valores, ordem=lambda a: a.sku)
+    self.modelo.carregar(self.service.listar(termo))
+    ...
+    self.modelo.aplicar(linha_salva, chave_anterior=sku_original, selecionar=True)
+    self.modelo.remover(sku)
+"""
+
+import bisect
+from typing import Any, Callable, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+from ouvinte_alteracoes import EventoAlteracao
+
+
+T = TypeVar("T")
+
+
+class ModeloLista(Generic[T]):
+    def __init__(self, tree: Any, chave: Callable[[T], Any],
+                 valores: Callable[[T], Tuple[Any, ...]],
+                 ordem: Optional[Callable[[T], Any]] = None,
+                 decrescente: bool = False) -> None:
+        """
+        chave(linha)   -> identificador da linha (vira o iid, como texto)
+        valores(linha) -> tupla das colunas do Treeview
+        ordem(linha)   -> mesma ordenação do ORDER BY do listar
+                          (sem ordem: linhas novas vão para o fim)
+        """
+        self.tree = tree
+        self._chave = chave
+        self._valores = valores
+        self._ordem = ordem
+        self.decrescente = bool(decrescente)
+
+        # sempre crescente; com 'decrescente' a posição no Treeview é espelhada
+        self._ordenados: List[Tuple[Any, str]] = []
+        self._por_chave: Dict[str, Tuple[Any, str]] = {}
+        self._seq = 0
+
+    # ---------- helpers ----------
+
+    def chave(self, linha: T) -> str:
+        return str(self._chave(linha))
+
+    def _posicao(self, iid: str, linha: T) -> Tuple[Any, str]:
+        if self._ordem is not None:
+            return (self._ordem(linha), iid)
+        # sem ordem: ordem de chegada
+        self._seq += 1
+        return (self._seq, iid)
+
+    def _indice_tree(self, i: int) -> int:
+        return len(self._ordenados) - 1 - i if self.decrescente else i
+
+    def _tirar(self, iid: str) -> None:
+        pos = self._por_chave.pop(iid, None)
+        if pos is None:
+            return
+        i = bisect.bisect_left(self._ordenados, pos)
+        if i < len(self._ordenados) and self._ordenados[i] == pos:
+            del self._ordenados[i]
+
+    def _por(self, iid: str, pos: Tuple[Any, str]) -> int:
+        i = bisect.bisect_left(self._ordenados, pos)
+        self._ordenados.insert(i, pos)
+        self._por_chave[iid] = pos
+        return self._indice_tree(i)
+
+    # ---------- consulta ----------
+
+    def __len__(self) -> int:
+        return len(self._por_chave)
+
+    def __contains__(self, chave: Any) -> bool:
+        return str(chave) in self._por_chave
+
+    def chaves(self) -> List[str]:
+        out = [iid for _pos, iid in self._ordenados]
+        return out[::-1] if self.decrescente else out
+
+    # ---------- lista inteira ----------
+
+    def limpar(self) -> None:
+        filhos = self.tree.get_children()
+        if filhos:
+            self.tree.delete(*filhos)
+        self._ordenados = []
+        self._por_chave = {}
+        self._seq = 0
+
+    def carregar(self, linhas: Iterable[T]) -> None:
+        """Recarrega tudo (Atualizar / filtro). As linhas já vêm na ordem do SQL."""
+        self.limpar()
+        for linha in linhas:
+            iid = self.chave(linha)
+            if iid in self._por_chave:
+                continue
+            pos = self._posicao(iid, linha)
+            self._por_chave[iid] = pos
+            self._ordenados.append(pos)
+            self.tree.insert("", "end", iid=iid, values=self._valores(linha))
+        self._ordenados.sort()
+
+    # ---------- uma linha ----------
+
+    def aplicar(self, linha: T, chave_anterior: Optional[Any] = None,
+                selecionar: bool = False) -> str:
+        """
+        Insere ou atualiza a linha no lugar certo da ordem.
+        chave_anterior: a linha trocou de chave (ex.: SKU renomeado).
+        """
+        iid = self.chave(linha)
+        ant = None if chave_anterior is None else str(chave_anterior)
+        if ant and ant != iid:
+            self.remover(ant)
+
+        existia = iid in self._por_chave
+        self._tirar(iid)
+        idx = self._por(iid, self._posicao(iid, linha))
+
+        if existia and self.tree.exists(iid):
+            self.tree.item(iid, values=self._valores(linha))
+            self.tree.move(iid, "", idx)
+        else:
+            if self.tree.exists(iid):
+                self.tree.delete(iid)
+            self.tree.insert("", idx, iid=iid, values=self._valores(linha))
+
+        if selecionar:
+            self.tree.selection_set(iid)
+            self.tree.see(iid)
+        return iid
+
+    def remover(self, chave: Any) -> bool:
+        iid = str(chave)
+        self._tirar(iid)
+        if self.tree.exists(iid):
+            self.tree.delete(iid)
+            return True
+        return False
+
+    # ---------- avisos de outras estações ----------
+
+    def remendar(self, eventos: List[EventoAlteracao],
+                 buscar: Callable[[List[str]], Iterable[T]],
+                 recarregar: Callable[[], None]) -> None:
+        """
+        Aplica os eventos do ouvinte_alteracoes.
+        buscar(chaves) -> linhas (mesmo filtro da tela) só dessas chaves:
+        uma consulta por entrega; chave alterada que não volta saiu do filtro.
+        """
+        if any(ev.recarregar for ev in eventos):
+            recarregar()
+            return
+
+        for ev in eventos:
+            if ev.chave_anterior:
+                self.remover(ev.chave_anterior)
+            if ev.op == "D" and ev.chave:
+                self.remover(ev.chave)
+
+        chaves = [ev.chave for ev in eventos if ev.op != "D" and ev.chave]
+        if not chaves:
+            return
+
+        vistos = set()
+        for linha in buscar(chaves):
+            vistos.add(self.aplicar(linha))
+
+        for k in chaves:
+            if k not in vistos:
+                self.remover(k)
@@ -0,0 +1,105 @@
+-- notificacao_alteracoes.sql
+-- Avisa as telas abertas (LISTEN ekenox_alteracoes) quando uma linha muda.
+-- Rodar depois do Criacao_arquivo.sql. Idempotente.
+--
+-- Payload (JSON, texto):
+--   {"t": "<tabela>", "op": "I|U|D|T", "k": "<chave>", "k_ant": "<chave antiga>"}
+--   k_ant só vem em UPDATE que trocou a chave; op 'T' (TRUNCATE) não tem chave.
+--
+-- Chave por tabela (argumento do trigger):
+--   ordem_producao -> id
+--   estoque        -> fkProduto
+--   estrutura      -> dados
+--   arranjo        -> sku
+--
+-- O NOTIFY só é entregue no COMMIT; payloads iguais na mesma transação
+-- são entregues uma vez só.
+--
+-- Carga em massa desliga o aviso por linha com
+-- set_config('ekenox.notificar', 'off', true) e manda um 'T' no fim:
+-- fn_arquivar_ordens e, pelo Python (ouvinte_alteracoes.silenciar_avisos /
+-- avisar_recarga), importação de estrutura, sincronização de estoque (também
+-- a do bling_sync) e baixa de OPs.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION "Ekenox".fn_notificar_alteracao()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    coluna text := TG_ARGV[0];
+    chave text;
+    chave_ant text;
+BEGIN
+    IF COALESCE(current_setting('ekenox.notificar', true), '') = 'off' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('ekenox_alteracoes',
+            json_build_object('t', TG_TABLE_NAME, 'op', 'T')::text);
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP <> 'DELETE' THEN
+        chave := to_jsonb(NEW) ->> coluna;
+    END IF;
+    IF TG_OP <> 'INSERT' THEN
+        chave_ant := to_jsonb(OLD) ->> coluna;
+    END IF;
+
+    PERFORM pg_notify('ekenox_alteracoes', json_build_object(
+        't', TG_TABLE_NAME,
+        'op', left(TG_OP, 1),
+        'k', COALESCE(chave, chave_ant),
+        'k_ant', CASE WHEN TG_OP = 'UPDATE' AND chave IS DISTINCT FROM chave_ant
+                      THEN chave_ant END
+    )::text);
+    RETURN NULL;
+END;
+$$;
+
+
+DROP TRIGGER IF EXISTS trg_notificar_ordem_producao ON "Ekenox".ordem_producao;
+CREATE TRIGGER trg_notificar_ordem_producao
+    AFTER INSERT OR UPDATE OR DELETE ON "Ekenox".ordem_producao
+    FOR EACH ROW EXECUTE FUNCTION "Ekenox".fn_notificar_alteracao('id');
+
+DROP TRIGGER IF EXISTS trg_notificar_estoque ON "Ekenox".estoque;
+CREATE TRIGGER trg_notificar_estoque
+    AFTER INSERT OR UPDATE OR DELETE ON "Ekenox".estoque
+    FOR EACH ROW EXECUTE FUNCTION "Ekenox".fn_notificar_alteracao('fkProduto');
+
+DROP TRIGGER IF EXISTS trg_notificar_estrutura ON "Ekenox".estrutura;
+CREATE TRIGGER trg_notificar_estrutura
+    AFTER INSERT OR UPDATE OR DELETE ON "Ekenox".estrutura
+    FOR EACH ROW EXECUTE FUNCTION "Ekenox".fn_notificar_alteracao('dados');
+
+DROP TRIGGER IF EXISTS trg_notificar_arranjo ON "Ekenox".arranjo;
+CREATE TRIGGER trg_notificar_arranjo
+    AFTER INSERT OR UPDATE OR DELETE ON "Ekenox".arranjo
+    FOR EACH ROW EXECUTE FUNCTION "Ekenox".fn_notificar_alteracao('sku');
+
+
+DROP TRIGGER IF EXISTS trg_notificar_ordem_producao_truncate ON "Ekenox".ordem_producao;
+CREATE TRIGGER trg_notificar_ordem_producao_truncate
+    AFTER TRUNCATE ON "Ekenox".ordem_producao
+    FOR EACH STATEMENT EXECUTE FUNCTION "Ekenox".fn_notificar_alteracao();
+
+DROP TRIGGER IF EXISTS trg_notificar_estoque_truncate ON "Ekenox".estoque;
+CREATE TRIGGER trg_notificar_estoque_truncate
+    AFTER TRUNCATE ON "Ekenox".estoque
+    FOR EACH STATEMENT EXECUTE FUNCTION "Ekenox".fn_notificar_alteracao();
+
+DROP TRIGGER IF EXISTS trg_notificar_estrutura_truncate ON "Ekenox".estrutura;
+CREATE TRIGGER trg_notificar_estrutura_truncate
+    AFTER TRUNCATE ON "Ekenox".estrutura
+    FOR EACH STATEMENT EXECUTE FUNCTION "Ekenox".fn_notificar_alteracao();
+
+DROP TRIGGER IF EXISTS trg_notificar_arranjo_truncate ON "Ekenox".arranjo;
+CREATE TRIGGER trg_notificar_arranjo_truncate
+    AFTER TRUNCATE ON "Ekenox".arranjo
+    FOR EACH STATEMENT EXECUTE FUNCTION "Ekenox".fn_notificar_alteracao();
+
+END;
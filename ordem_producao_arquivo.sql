@@ -0,0 +1,191 @@
+-- ordem_producao_arquivo.sql
+-- OPs finalizadas antigas saem da tabela de trabalho para o arquivo.
+-- Rodar depois do Criacao_arquivo.sql. Idempotente.
+--
+-- "Ekenox".ordem_producao          -> tabela quente: OPs pendentes + finalizadas
+--                                     recentes (é a que a tela lê/grava)
+-- "Ekenox".ordem_producao_arquivo  -> finalizadas antigas, particionada por ano
+--                                     de data_fim (uma partição por ano, criada
+--                                     sob demanda pelo arquivamento)
+-- "Ekenox".ordem_producao_todas    -> view com as duas (consultas históricas)
+--
+-- Arquivar (mover em lotes as finalizadas antes de uma data):
+--   SELECT "Ekenox".fn_arquivar_ordens(current_date - 180, 5000);
+-- ou agendar: python arquivo_ordens.py --dias 180
+--
+-- OP arquivada não volta a ser editada: finalização, exclusão e gravação
+-- continuam só na tabela quente.
+
+BEGIN;
+
+-- bancos antigos com deposito_destino/deposito_origem: mesmos nomes do
+-- Criacao_arquivo.sql (a tela, a finalização e a view usam deposito_id_*)
+DO $$
+DECLARE
+    par text[];
+BEGIN
+    FOREACH par SLICE 1 IN ARRAY ARRAY[['deposito_destino', 'deposito_id_destino'],
+                                       ['deposito_origem', 'deposito_id_origem']]
+    LOOP
+        IF EXISTS (SELECT 1 FROM information_schema.columns
+                    WHERE table_schema = 'Ekenox' AND table_name = 'ordem_producao'
+                      AND column_name = par[1])
+           AND NOT EXISTS (SELECT 1 FROM information_schema.columns
+                    WHERE table_schema = 'Ekenox' AND table_name = 'ordem_producao'
+                      AND column_name = par[2]) THEN
+            EXECUTE format('ALTER TABLE "Ekenox".ordem_producao RENAME COLUMN %I TO %I', par[1], par[2]);
+        END IF;
+    END LOOP;
+END
+$$;
+
+-- pendentes: F11 (listar_ordens_sem_data_fim) e finalização; mesmo predicado da consulta
+CREATE INDEX IF NOT EXISTS ix_ordem_producao_pendentes
+    ON "Ekenox".ordem_producao (id DESC)
+    WHERE ("data_fim" IS NULL OR "data_fim" = '1970-01-01');
+
+-- candidatas ao arquivamento
+CREATE INDEX IF NOT EXISTS ix_ordem_producao_data_fim
+    ON "Ekenox".ordem_producao (data_fim)
+    WHERE data_fim > '1970-01-01';
+
+
+CREATE TABLE IF NOT EXISTS "Ekenox".ordem_producao_arquivo
+(
+    id bigint NOT NULL,
+    numero bigint NOT NULL,
+    deposito_id_destino bigint,
+    deposito_id_origem bigint,
+    situacao_id bigint,
+    responsavel text COLLATE pg_catalog."default",
+    fkprodutoid text COLLATE pg_catalog."default" NOT NULL,
+    data_previsao_inicio date,
+    data_previsao_final date,
+    data_inicio date,
+    data_fim date NOT NULL,
+    valor numeric(10, 2),
+    observacao text COLLATE pg_catalog."default",
+    quantidade numeric(10, 2),
+    arquivada_em timestamp with time zone NOT NULL DEFAULT now(),
+    CONSTRAINT ordem_producao_arquivo_pkey PRIMARY KEY (id, data_fim)
+) PARTITION BY RANGE (data_fim);
+
+-- segurança: data fora de qualquer ano criado não derruba o arquivamento
+CREATE TABLE IF NOT EXISTS "Ekenox".ordem_producao_arquivo_outros
+    PARTITION OF "Ekenox".ordem_producao_arquivo DEFAULT;
+
+CREATE INDEX IF NOT EXISTS ix_ordem_producao_arquivo_numero
+    ON "Ekenox".ordem_producao_arquivo (numero);
+
+CREATE INDEX IF NOT EXISTS ix_ordem_producao_arquivo_id
+    ON "Ekenox".ordem_producao_arquivo (id);
+
+-- o histórico de situação continua apontando para OPs arquivadas
+ALTER TABLE IF EXISTS "Ekenox".ordem_producao_situacao_audit
+    DROP CONSTRAINT IF EXISTS fk_audit_op;
+
+
+CREATE OR REPLACE VIEW "Ekenox".ordem_producao_todas AS
+SELECT o.id, o.numero, o.deposito_id_destino, o.deposito_id_origem, o.situacao_id,
+       o.responsavel, o.fkprodutoid, o.data_previsao_inicio, o.data_previsao_final,
+       o.data_inicio, o.data_fim, o.valor, o.observacao, o.quantidade,
+       false AS arquivada
+  FROM "Ekenox".ordem_producao o
+UNION ALL
+SELECT a.id, a.numero, a.deposito_id_destino, a.deposito_id_origem, a.situacao_id,
+       a.responsavel, a.fkprodutoid, a.data_previsao_inicio, a.data_previsao_final,
+       a.data_inicio, a.data_fim, a.valor, a.observacao, a.quantidade,
+       true
+  FROM "Ekenox".ordem_producao_arquivo a;
+
+
+-- partição do ano (cria se faltar)
+CREATE OR REPLACE FUNCTION "Ekenox".fn_ordem_producao_arquivo_particao(p_ano integer)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_nome text := format('ordem_producao_arquivo_%s', p_ano);
+BEGIN
+    IF to_regclass(format('"Ekenox".%I', v_nome)) IS NOT NULL THEN
+        RETURN;
+    END IF;
+
+    -- linhas do ano que caíram na DEFAULT antes da partição existir
+    IF EXISTS (SELECT 1 FROM "Ekenox".ordem_producao_arquivo_outros
+                WHERE data_fim >= make_date(p_ano, 1, 1)
+                  AND data_fim < make_date(p_ano + 1, 1, 1)) THEN
+        RAISE EXCEPTION 'ordem_producao_arquivo_outros tem OPs de %: mover antes de criar a partição', p_ano;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE "Ekenox".%I PARTITION OF "Ekenox".ordem_producao_arquivo
+             FOR VALUES FROM (%L) TO (%L)',
+        v_nome, make_date(p_ano, 1, 1), make_date(p_ano + 1, 1, 1));
+END;
+$$;
+
+
+-- move até p_limite OPs finalizadas antes de p_antes; devolve quantas moveu
+-- (chamar de novo até voltar 0; cada chamada é um lote curto)
+CREATE OR REPLACE FUNCTION "Ekenox".fn_arquivar_ordens(
+    p_antes date,
+    p_limite integer DEFAULT 5000
+)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_ano integer;
+    v_movidas integer;
+BEGIN
+    CREATE TEMP TABLE IF NOT EXISTS _op_arquivar (id bigint PRIMARY KEY) ON COMMIT DROP;
+    TRUNCATE _op_arquivar;
+
+    INSERT INTO _op_arquivar (id)
+    SELECT o.id
+      FROM "Ekenox".ordem_producao o
+     WHERE o.data_fim > '1970-01-01'
+       AND o.data_fim < p_antes
+     ORDER BY o.data_fim, o.id
+     LIMIT GREATEST(p_limite, 1)
+       FOR UPDATE SKIP LOCKED;
+
+    FOR v_ano IN
+        SELECT DISTINCT extract(year FROM o.data_fim)::integer
+          FROM "Ekenox".ordem_producao o
+          JOIN _op_arquivar x ON x.id = o.id
+    LOOP
+        PERFORM "Ekenox".fn_ordem_producao_arquivo_particao(v_ano);
+    END LOOP;
+
+    -- um aviso só para as telas abertas (em vez de um por OP movida)
+    PERFORM set_config('ekenox.notificar', 'off', true);
+
+    WITH mov AS (
+        DELETE FROM "Ekenox".ordem_producao o
+         USING _op_arquivar x
+         WHERE o.id = x.id
+        RETURNING o.id, o.numero, o.deposito_id_destino, o.deposito_id_origem, o.situacao_id,
+                  o.responsavel, o.fkprodutoid, o.data_previsao_inicio, o.data_previsao_final,
+                  o.data_inicio, o.data_fim, o.valor, o.observacao, o.quantidade
+    )
+    INSERT INTO "Ekenox".ordem_producao_arquivo
+           (id, numero, deposito_id_destino, deposito_id_origem, situacao_id,
+            responsavel, fkprodutoid, data_previsao_inicio, data_previsao_final,
+            data_inicio, data_fim, valor, observacao, quantidade)
+    SELECT * FROM mov;
+
+    GET DIAGNOSTICS v_movidas = ROW_COUNT;
+    PERFORM set_config('ekenox.notificar', '', true);
+    IF v_movidas > 0 THEN
+        PERFORM pg_notify('ekenox_alteracoes',
+            json_build_object('t', 'ordem_producao', 'op', 'T')::text);
+    END IF;
+
+    TRUNCATE _op_arquivar;
+    RETURN v_movidas;
+END;
+$$;
+
+END;
@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+"""
+ouvinte_alteracoes.py
+Recebe os NOTIFY de notificacao_alteracoes.sql e entrega para as telas.
+
+- Uma thread por processo (por banco), com conexão própria em autocommit,
+  LISTEN ekenox_alteracoes e select() no socket: fica parada até o banco
+  avisar. Conexão com keepalive TCP e, ociosa há PING_OCIOSO_S, um
+  SELECT 1: conexão morta (queda de VPN/servidor) vira reconexão em vez de
+  um select() esperando para sempre
+- Cada tela se inscreve por tabela; os eventos vão para a fila da
+  inscrição e são entregues na thread do Tk (widget.after), já agrupados:
+  uma chave alterada várias vezes chega uma vez só, com a última operação
+- Muitos eventos de uma vez (carga em lote) ou reconexão (pode ter perdido
+  avisos) -> um evento op="*" ("recarregue a lista inteira")
+- A inscrição é cancelada sozinha quando o widget é destruído
+- Quem grava em massa (importação de estrutura, sincronização de estoque,
+  baixa de OPs) chama silenciar_avisos() na transação e avisar_recarga()
+  antes do COMMIT: um aviso 'T' por tabela em vez de um por linha
+
+Uso na tela:
+    obter_ouvinte(cfg).inscrever(self, "estoque", self._on_alteracoes)
+
+    def _on_alteracoes(self, eventos: List[EventoAlteracao]) -> None:
+        self.modelo.remendar(eventos, buscar, self.atualizar_lista)   # modelo_lista.py
+"""
+
+import json
+import os
+import select
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+from conexao_resiliente import PARAMETROS_KEEPALIVE
+from sistema_log import log_write
+
+
+CANAL = "ekenox_alteracoes"
+
+# acima disso por entrega, a tela recarrega a lista em vez de remendar
+MAX_EVENTOS_POR_ENTREGA = int(os.getenv("EKENOX_ALTERACOES_MAX", "200") or 200)
+
+INTERVALO_ENTREGA_MS = 150
+RECONEXAO_MAX_S = 30.0
+
+# sem aviso há este tempo: testa a conexão (SELECT 1); falhou -> reconecta
+PING_OCIOSO_S = float(os.getenv("EKENOX_ALTERACOES_PING_S", "60") or 60)
+
+
+@dataclass(frozen=True)
+class EventoAlteracao:
+    tabela: str
+    op: str                            # I, U, D; "*" = recarregar tudo
+    chave: Optional[str] = None
+    chave_anterior: Optional[str] = None
+
+    @property
+    def recarregar(self) -> bool:
+        return self.op in ("*", "T")
+
+
+def _parse(payload: str) -> Optional[EventoAlteracao]:
+    try:
+        d = json.loads(payload)
+        return EventoAlteracao(
+            tabela=str(d["t"]),
+            op=str(d.get("op") or "*"),
+            chave=None if d.get("k") is None else str(d["k"]),
+            chave_anterior=None if d.get("k_ant") is None else str(d["k_ant"]),
+        )
+    except Exception:
+        return None
+
+
+def agrupar(eventos: List[EventoAlteracao]) -> List[EventoAlteracao]:
+    """Última operação por chave (mantém a ordem da primeira vez que a chave apareceu)."""
+    por_chave: Dict[Optional[str], EventoAlteracao] = {}
+    for ev in eventos:
+        if ev.recarregar:
+            return [EventoAlteracao(ev.tabela, "*")]
+        anterior = por_chave.get(ev.chave)
+        if anterior is not None and anterior.chave_anterior and not ev.chave_anterior:
+            ev = EventoAlteracao(ev.tabela, ev.op, ev.chave, anterior.chave_anterior)
+        por_chave[ev.chave] = ev
+    out = list(por_chave.values())
+    if len(out) > MAX_EVENTOS_POR_ENTREGA:
+        return [EventoAlteracao(out[0].tabela, "*")]
+    return out
+
+
+# ============================================================
+# INSCRIÇÃO (lado Tk)
+# ============================================================
+
+class Inscricao:
+    def __init__(self, ouvinte: "OuvinteAlteracoes", widget: Any, tabela: str,
+                 callback: Callable[[List[EventoAlteracao]], None], intervalo_ms: int,
+                 adiar: Optional[Callable[[], bool]] = None) -> None:
+        self.ouvinte = ouvinte
+        self.widget = widget
+        self.tabela = tabela
+        self.callback = callback
+        self.intervalo_ms = int(intervalo_ms)
+        self.adiar = adiar
+        self._fila: List[EventoAlteracao] = []
+        self._lock = threading.Lock()
+        self.ativa = True
+
+    def receber(self, ev: EventoAlteracao) -> None:
+        """Thread do ouvinte."""
+        with self._lock:
+            self._fila.append(ev)
+
+    def _entregar(self) -> None:
+        """Thread do Tk."""
+        if not self.ativa:
+            return
+        try:
+            if not self.widget.winfo_exists():
+                self.cancelar()
+                return
+        except Exception:
+            self.cancelar()
+            return
+
+        if self.adiar is not None and self.adiar():
+            eventos = []        # conexão da tela ocupada: os eventos esperam na fila
+        else:
+            with self._lock:
+                eventos, self._fila = self._fila, []
+        if eventos:
+            try:
+                self.callback(agrupar(eventos))
+            except Exception as e:
+                log_write(self.ouvinte.log_dir, "alteracoes.log",
+                          f"callback {self.tabela}: {type(e).__name__}: {e}")
+        try:
+            self.widget.after(self.intervalo_ms, self._entregar)
+        except Exception:
+            self.cancelar()
+
+    def cancelar(self) -> None:
+        self.ativa = False
+        self.ouvinte._remover(self)
+
+
+# ============================================================
+# THREAD
+# ============================================================
+
+class OuvinteAlteracoes(threading.Thread):
+    def __init__(self, conectar: Callable[[], Any], log_dir: str = "logs") -> None:
+        super().__init__(name="ouvinte-alteracoes", daemon=True)
+        self.conectar = conectar
+        self.log_dir = log_dir
+        self._inscricoes: List[Inscricao] = []
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self.conectado = False
+
+    def inscrever(self, widget: Any, tabela: str, callback: Callable[[List[EventoAlteracao]], None],
+                  intervalo_ms: int = INTERVALO_ENTREGA_MS,
+                  adiar: Optional[Callable[[], bool]] = None) -> Inscricao:
+        """adiar(): True segura a entrega (ex.: consulta cancelável usando a conexão)."""
+        insc = Inscricao(self, widget, tabela, callback, intervalo_ms, adiar)
+        with self._lock:
+            self._inscricoes.append(insc)
+        widget.after(insc.intervalo_ms, insc._entregar)
+        return insc
+
+    def _remover(self, insc: Inscricao) -> None:
+        with self._lock:
+            if insc in self._inscricoes:
+                self._inscricoes.remove(insc)
+
+    def _distribuir(self, ev: EventoAlteracao, todas: bool = False) -> None:
+        with self._lock:
+            alvos = list(self._inscricoes)
+        for insc in alvos:
+            if todas:
+                insc.receber(EventoAlteracao(insc.tabela, "*"))
+            elif insc.tabela == ev.tabela:
+                insc.receber(ev)
+
+    def parar(self) -> None:
+        self._parar.set()
+
+    def run(self) -> None:
+        espera = 1.0
+        primeira = True
+        while not self._parar.is_set():
+            conn = None
+            try:
+                conn = self.conectar()
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CANAL};")
+                self.conectado = True
+                if not primeira:
+                    # pode ter perdido avisos enquanto estava fora
+                    self._distribuir(EventoAlteracao("", "*"), todas=True)
+                primeira = False
+                espera = 1.0
+                ultimo = time.monotonic()
+
+                while not self._parar.is_set():
+                    if select.select([conn], [], [], 5.0) == ([], [], []):
+                        if time.monotonic() - ultimo < PING_OCIOSO_S:
+                            continue
+                        # avisos que chegarem junto com a resposta ficam em conn.notifies
+                        with conn.cursor() as cur:
+                            cur.execute("SELECT 1;")
+                    else:
+                        conn.poll()
+                    ultimo = time.monotonic()
+                    while conn.notifies:
+                        n = conn.notifies.pop(0)
+                        ev = _parse(n.payload)
+                        if ev is not None:
+                            self._distribuir(ev)
+            except Exception as e:
+                self.conectado = False
+                log_write(self.log_dir, "alteracoes.log",
+                          f"ouvinte: {type(e).__name__}: {e} (nova tentativa em {espera:.0f}s)")
+                self._parar.wait(espera)
+                espera = min(RECONEXAO_MAX_S, espera * 2)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+# ============================================================
+# UM OUVINTE POR BANCO NO PROCESSO
+# ============================================================
+
+_ouvintes: Dict[Tuple[Any, ...], OuvinteAlteracoes] = {}
+_ouvintes_lock = threading.Lock()
+
+
+def obter_ouvinte(cfg: Any, log_dir: str = "logs") -> OuvinteAlteracoes:
+    """
+    'cfg' = qualquer AppConfig das telas (db_host, db_port, db_database,
+    db_user, db_password). Cria e inicia a thread na primeira chamada.
+    """
+    chave = (cfg.db_host, int(cfg.db_port), cfg.db_database, cfg.db_user)
+
+    def conectar():
+        return psycopg2.connect(
+            host=cfg.db_host, database=cfg.db_database, user=cfg.db_user,
+            password=cfg.db_password, port=int(cfg.db_port), connect_timeout=5,
+            **PARAMETROS_KEEPALIVE,
+        )
+
+    with _ouvintes_lock:
+        ouv = _ouvintes.get(chave)
+        if ouv is None or not ouv.is_alive():
+            ouv = OuvinteAlteracoes(conectar, log_dir)
+            ouv.start()
+            _ouvintes[chave] = ouv
+        return ouv
+
+
+def parar_ouvintes() -> None:
+    with _ouvintes_lock:
+        for ouv in _ouvintes.values():
+            ouv.parar()
+        _ouvintes.clear()
+
+
+# ============================================================
+# CARGA EM MASSA (lado de quem grava)
+# ============================================================
+
+def silenciar_avisos(cur: Any) -> None:
+    """Desliga o aviso por linha (fn_notificar_alteracao) até o fim da transação."""
+    cur.execute("SELECT set_config('ekenox.notificar', 'off', true);")
+
+
+def avisar_recarga(cur: Any, tabela: str) -> None:
+    """
+    Um aviso op 'T' (recarregar tudo) para a tabela, entregue no COMMIT
+    (rollback descarta). 'tabela' pode vir com schema/aspas: '"Ekenox".estoque'.
+    """
+    nome = tabela.rsplit(".", 1)[-1].strip('"')
+    cur.execute("SELECT pg_notify(%s, json_build_object('t', %s::text, 'op', 'T')::text);",
+                (CANAL, nome))
+
@@ -0,0 +1,200 @@
+-- produto_ultimo_pedido.sql
+-- Último pedido de venda de cada produto ("Ekenox".produto_ultimo_pedido),
+-- usado pela consulta de produtos (F12) do etiqueta.py.
+-- Rodar depois do Criacao_arquivo.sql. Idempotente.
+--
+-- Antes: uma subconsulta correlacionada por produto (itens x pedidos,
+-- ORDER BY data DESC LIMIT 1) a cada abertura da consulta.
+-- Agora: uma linha por produto, mantida por triggers por comando
+-- (transition tables) e recalculada só para os produtos afetados:
+--   itens   INSERT/UPDATE/DELETE -> produtos das linhas novas/antigas
+--   pedidos UPDATE de data/numero -> produtos dos itens desses pedidos
+--   (pedidos INSERT/DELETE não mexem: o item referencia o pedido por FK,
+--    então o pedido existe antes do item e só sai depois dele)
+--
+-- Último pedido = maior data (sem data fica por último), empate pelo maior
+-- idPedido. Produto sem pedido não tem linha.
+--
+-- Concorrência: o recálculo trava cada produto (pg_advisory_xact_lock) antes
+-- de ler itens/pedidos. Sem isso, dois INSERTs simultâneos em itens
+-- recalculavam sem ver um ao outro e o último COMMIT vencia, mesmo com o
+-- pedido mais antigo. Com a trava, o segundo espera o primeiro terminar e
+-- recalcula já vendo a linha dele. Acima de 200 produtos (carga em lote,
+-- reconstrução) a trava é uma só para a tabela toda.
+--
+-- Reconstrução completa: SELECT "Ekenox".fn_ultimo_pedido_reconstruir();
+
+BEGIN;
+
+-- busca do recálculo (LATERAL por produto): sai do índice, sem ler a tabela
+CREATE INDEX IF NOT EXISTS ix_itens_produto_pedido
+    ON "Ekenox".itens ("fkProduto") INCLUDE ("fkPedido");
+
+CREATE INDEX IF NOT EXISTS ix_pedidos_id_data
+    ON "Ekenox".pedidos ("idPedido", data) INCLUDE (numero);
+
+-- trigger de pedidos: itens de um pedido
+CREATE INDEX IF NOT EXISTS ix_itens_pedido
+    ON "Ekenox".itens ("fkPedido");
+
+CREATE TABLE IF NOT EXISTS "Ekenox".produto_ultimo_pedido
+(
+    "fkProduto" text COLLATE pg_catalog."default" NOT NULL,
+    "fkPedido" bigint NOT NULL,
+    numero bigint,
+    data date,
+    atualizado_em timestamp with time zone NOT NULL DEFAULT now(),
+    CONSTRAINT produto_ultimo_pedido_pkey PRIMARY KEY ("fkProduto")
+);
+
+
+CREATE OR REPLACE FUNCTION "Ekenox".fn_ultimo_pedido_recalcular(produtos text[])
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    lista text[];
+BEGIN
+    lista := ARRAY(SELECT DISTINCT a.p FROM unnest(produtos) AS a(p) WHERE a.p IS NOT NULL ORDER BY 1);
+    IF cardinality(lista) = 0 THEN
+        RETURN;
+    END IF;
+
+    -- trava até o fim da transação; ordem fixa (ORDER BY) evita deadlock
+    IF cardinality(lista) > 200 THEN
+        PERFORM pg_advisory_xact_lock(hashtext('produto_ultimo_pedido'), 0);
+    ELSE
+        PERFORM pg_advisory_xact_lock_shared(hashtext('produto_ultimo_pedido'), 0);
+        PERFORM pg_advisory_xact_lock(hashtext('produto_ultimo_pedido:produto'), hashtext(a.p))
+           FROM unnest(lista) AS a(p);
+    END IF;
+
+    -- comando novo: em READ COMMITTED já enxerga o que foi gravado por quem
+    -- segurava a trava
+    WITH alvo AS (
+        SELECT a.p FROM unnest(lista) AS a(p)
+    ),
+    calc AS (
+        SELECT alvo.p AS "fkProduto", u."idPedido", u.numero, u.data
+          FROM alvo
+          LEFT JOIN LATERAL (
+              SELECT ped."idPedido", ped.numero, ped.data
+                FROM "Ekenox".itens i
+                JOIN "Ekenox".pedidos ped ON ped."idPedido" = i."fkPedido"
+               WHERE i."fkProduto" = alvo.p
+               ORDER BY ped.data DESC NULLS LAST, ped."idPedido" DESC
+               LIMIT 1
+          ) u ON true
+    ),
+    sem_pedido AS (
+        DELETE FROM "Ekenox".produto_ultimo_pedido t
+         USING calc c
+         WHERE t."fkProduto" = c."fkProduto"
+           AND c."idPedido" IS NULL
+    )
+    INSERT INTO "Ekenox".produto_ultimo_pedido ("fkProduto", "fkPedido", numero, data)
+    SELECT c."fkProduto", c."idPedido", c.numero, c.data
+      FROM calc c
+     WHERE c."idPedido" IS NOT NULL
+    ON CONFLICT ("fkProduto") DO UPDATE
+       SET "fkPedido" = EXCLUDED."fkPedido",
+           numero = EXCLUDED.numero,
+           data = EXCLUDED.data,
+           atualizado_em = now()
+     WHERE (produto_ultimo_pedido."fkPedido", produto_ultimo_pedido.numero, produto_ultimo_pedido.data)
+           IS DISTINCT FROM (EXCLUDED."fkPedido", EXCLUDED.numero, EXCLUDED.data);
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION "Ekenox".fn_ultimo_pedido_reconstruir()
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    n bigint;
+BEGIN
+    DELETE FROM "Ekenox".produto_ultimo_pedido t
+     WHERE NOT EXISTS (SELECT 1 FROM "Ekenox".itens i WHERE i."fkProduto" = t."fkProduto");
+
+    PERFORM "Ekenox".fn_ultimo_pedido_recalcular(
+        ARRAY(SELECT DISTINCT i."fkProduto" FROM "Ekenox".itens i WHERE i."fkProduto" IS NOT NULL));
+
+    SELECT count(*) INTO n FROM "Ekenox".produto_ultimo_pedido;
+    RETURN n;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION "Ekenox".fn_ultimo_pedido_itens()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM "Ekenox".fn_ultimo_pedido_recalcular(
+            ARRAY(SELECT DISTINCT n."fkProduto" FROM novas n));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM "Ekenox".fn_ultimo_pedido_recalcular(
+            ARRAY(SELECT DISTINCT o."fkProduto" FROM antigas o));
+    ELSE
+        PERFORM "Ekenox".fn_ultimo_pedido_recalcular(ARRAY(
+            SELECT n."fkProduto"
+              FROM novas n JOIN antigas o ON o.id = n.id
+             WHERE n."fkProduto" IS DISTINCT FROM o."fkProduto"
+                OR n."fkPedido" IS DISTINCT FROM o."fkPedido"
+            UNION
+            SELECT o."fkProduto"
+              FROM novas n JOIN antigas o ON o.id = n.id
+             WHERE n."fkProduto" IS DISTINCT FROM o."fkProduto"
+                OR n."fkPedido" IS DISTINCT FROM o."fkPedido"));
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION "Ekenox".fn_ultimo_pedido_pedidos()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM "Ekenox".fn_ultimo_pedido_recalcular(ARRAY(
+        SELECT DISTINCT i."fkProduto"
+          FROM novas n
+          JOIN antigas o ON o."idPedido" = n."idPedido"
+          JOIN "Ekenox".itens i ON i."fkPedido" = n."idPedido"
+         WHERE n.data IS DISTINCT FROM o.data
+            OR n.numero IS DISTINCT FROM o.numero));
+    RETURN NULL;
+END;
+$$;
+
+
+DROP TRIGGER IF EXISTS trg_ultimo_pedido_itens_ins ON "Ekenox".itens;
+CREATE TRIGGER trg_ultimo_pedido_itens_ins
+    AFTER INSERT ON "Ekenox".itens
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION "Ekenox".fn_ultimo_pedido_itens();
+
+DROP TRIGGER IF EXISTS trg_ultimo_pedido_itens_upd ON "Ekenox".itens;
+CREATE TRIGGER trg_ultimo_pedido_itens_upd
+    AFTER UPDATE ON "Ekenox".itens
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION "Ekenox".fn_ultimo_pedido_itens();
+
+DROP TRIGGER IF EXISTS trg_ultimo_pedido_itens_del ON "Ekenox".itens;
+CREATE TRIGGER trg_ultimo_pedido_itens_del
+    AFTER DELETE ON "Ekenox".itens
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT EXECUTE FUNCTION "Ekenox".fn_ultimo_pedido_itens();
+
+DROP TRIGGER IF EXISTS trg_ultimo_pedido_pedidos_upd ON "Ekenox".pedidos;
+CREATE TRIGGER trg_ultimo_pedido_pedidos_upd
+    AFTER UPDATE ON "Ekenox".pedidos
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION "Ekenox".fn_ultimo_pedido_pedidos();
+
+SELECT "Ekenox".fn_ultimo_pedido_reconstruir();
+
+COMMIT;
@@ -327,6 +327,9 @@ class ProdutosCRUDMixin:
 
     def aux_categoria_list(self, limit: int = 500, offset: int = 0, nome_like: str = "") -> List[Dict[str, Any]]:
         """Carrega categorias para combos."""
+        if hasattr(self, "ref_categorias"):
+            return [dict(c) for c in self.ref_filtrar(
+                self.ref_categorias(), "nomeCategoria", nome_like, limit, offset)]
         try:
             nome_like = (nome_like or "").strip()
             if nome_like:
@@ -387,6 +390,9 @@ class ProdutosCRUDMixin:
 
     def aux_deposito_list(self, limit: int = 500, offset: int = 0, descricao_like: str = "") -> List[Dict[str, Any]]:
         """Carrega depósitos para combos."""
+        if hasattr(self, "ref_depositos"):
+            return [dict(d) for d in self.ref_filtrar(
+                self.ref_depositos(), "descricao", descricao_like, limit, offset)]
         try:
             descricao_like = (descricao_like or "").strip()
             if descricao_like:
@@ -0,0 +1,278 @@
+# referencia_cache.py
+from __future__ import annotations
+
+import os
+import time
+from typing import Optional, Dict, Any, List, Set
+
+from psycopg2 import extensions as pg_ext
+
+from sistema_log import log_write
+from sistema_metricas import METRICAS
+
+
+# Depois desse tempo (s) a próxima leitura faz a checagem de versão.
+REF_CACHE_TTL = float(os.getenv("EKENOX_REF_CACHE_TTL", "30") or 30)
+
+# Lista fixa de antes do "filtroProducao": vale só enquanto nenhuma categoria
+# tiver filtro (categoria_hierarquia.sql não aplicado ou cache ainda vazio).
+CATEGORIAS_EXCLUIDAS_LEGADO = frozenset({
+    3844533, 3983855, 7879429, 3869959, 4241123,
+    3870601, 3844542, 7651801, 3983399, 959867,
+    897565, 3984869, 3862825, 7879102, 7911660,
+    4828356, 6568231,
+})
+
+
+class ReferenciaCacheMixin:
+    """
+    Cache em memória das tabelas de referência (pequenas e quase estáticas):
+      - "Ekenox"."situacao"
+      - "Ekenox"."deposito"
+      - "Ekenox"."categoria"
+
+    - Carrega as 3 tabelas numa única ida ao banco (json_agg)
+    - Versão = count(*) + max(xmin) de cada tabela: INSERT/UPDATE/DELETE
+      feitos por qualquer tela/processo mudam a versão
+    - A versão só é checada depois de REF_CACHE_TTL segundos; escritas feitas
+      pelos CRUDMixins deste objeto chamam ref_invalidar() na hora
+    - Se o banco falhar, continua respondendo com o último snapshot; com uma
+      transação do chamador em aberto, a carga roda num SAVEPOINT e a falha
+      desfaz só a parte do cache
+
+    Requer self._q, self.cursor e self.conn (igual aos CRUDMixins).
+    """
+
+    SQL_REF_VERSAO = """
+        SELECT
+            (SELECT count(*) || ':' || COALESCE(max(s.xmin::text::bigint), 0) FROM "Ekenox"."situacao" s)
+            || '|' ||
+            (SELECT count(*) || ':' || COALESCE(max(d.xmin::text::bigint), 0) FROM "Ekenox"."deposito" d)
+            || '|' ||
+            (SELECT count(*) || ':' || COALESCE(max(c.xmin::text::bigint), 0) FROM "Ekenox"."categoria" c);
+    """
+
+    SQL_REF_CARGA = """
+        SELECT
+            (SELECT COALESCE(json_agg(json_build_object(
+                        'id', s."id", 'nome', s."nome", 'idHerdado', s."idHerdado")
+                    ORDER BY s."nome"), '[]'::json)
+               FROM "Ekenox"."situacao" s),
+            (SELECT COALESCE(json_agg(json_build_object(
+                        'id', d."id", 'descricao', d."descricao", 'situacao', d."situacao",
+                        'padrao', d."padrao", 'desconsiderarsaldo', d."desconsiderarsaldo")
+                    ORDER BY d."descricao"), '[]'::json)
+               FROM "Ekenox"."deposito" d),
+            (SELECT COALESCE(json_agg(row_to_json(c) ORDER BY c."nomeCategoria"), '[]'::json)
+               FROM "Ekenox"."categoria" c),
+            (""" + SQL_REF_VERSAO.strip().rstrip(";") + """);
+    """
+
+    # ----------------------------
+    # ESTADO / CARGA
+    # ----------------------------
+
+    def _ref_estado(self) -> Dict[str, Any]:
+        est = getattr(self, "_ref", None)
+        if est is None:
+            est = {
+                "versao": None,
+                "checado_em": 0.0,
+                "situacoes": [],
+                "depositos": [],
+                "categorias": [],
+                "situacao_por_id": {},
+                "deposito_por_id": {},
+                "categoria_por_id": {},
+                "categoria_filhos": {},
+                "categorias_excluidas": set(CATEGORIAS_EXCLUIDAS_LEGADO),
+            }
+            self._ref = est
+        return est
+
+    def ref_invalidar(self) -> None:
+        """Força recarga na próxima leitura (chamado após escrita nas 3 tabelas)."""
+        est = self._ref_estado()
+        est["versao"] = None
+        est["checado_em"] = 0.0
+
+    def ref_carregar(self, forcar: bool = False) -> bool:
+        """
+        Garante o cache atualizado. Retorna False se não conseguiu falar com
+        o banco (o snapshot anterior continua valendo).
+        """
+        est = self._ref_estado()
+        agora = time.monotonic()
+        if not forcar and est["versao"] is not None and agora - est["checado_em"] < REF_CACHE_TTL:
+            return True
+
+        conn = getattr(self, "conn", None)
+        ponto = conn is not None and not conn.closed and not conn.autocommit \
+            and conn.get_transaction_status() == pg_ext.TRANSACTION_STATUS_INTRANS
+        try:
+            if ponto:
+                self.cursor.execute("SAVEPOINT ref_cache")
+            self._ref_atualizar(est, agora, forcar)
+            if ponto and self.conn is conn:     # reconectou: o savepoint ficou na conexão antiga
+                self.cursor.execute("RELEASE SAVEPOINT ref_cache")
+            return True
+        except Exception:
+            self._ref_desfazer(conn if ponto else None)
+            return False
+
+    def _ref_atualizar(self, est: Dict[str, Any], agora: float, forcar: bool) -> None:
+        if est["versao"] is not None and not forcar:
+            self._q(self.SQL_REF_VERSAO, ())
+            r = self.cursor.fetchone()
+            if r and r[0] == est["versao"]:
+                est["checado_em"] = agora
+                return
+
+        self._q(self.SQL_REF_CARGA, ())
+        situacoes, depositos, categorias, versao = self.cursor.fetchone()
+
+        est["situacoes"] = list(situacoes or [])
+        est["depositos"] = list(depositos or [])
+        est["categorias"] = list(categorias or [])
+        est["situacao_por_id"] = {int(s["id"]): s for s in est["situacoes"]}
+        est["deposito_por_id"] = {int(d["id"]): d for d in est["depositos"]}
+        est["categoria_por_id"] = {int(c["categoriaId"]): c for c in est["categorias"]}
+        self._ref_montar_hierarquia(est)
+        est["versao"] = versao
+        est["checado_em"] = agora
+
+    def _ref_desfazer(self, conn_ponto: Any) -> None:
+        """
+        Falha na carga. conn_ponto = conexão em que o SAVEPOINT foi criado
+        (transação do chamador): volta só até ele. Sem savepoint a transação
+        foi aberta pelo cache e o rollback não leva trabalho de ninguém.
+        """
+        conn = getattr(self, "conn", None)
+        if not conn or conn.closed:
+            return
+        try:
+            if conn_ponto is conn:
+                self.cursor.execute("ROLLBACK TO SAVEPOINT ref_cache")
+                self.cursor.execute("RELEASE SAVEPOINT ref_cache")
+            else:
+                conn.rollback()
+        except Exception:
+            pass
+
+    # ----------------------------
+    # HIERARQUIA DE CATEGORIAS
+    # ----------------------------
+
+    @staticmethod
+    def _ref_montar_hierarquia(est: Dict[str, Any]) -> None:
+        """
+        Filhos por categoria e conjunto de categorias excluídas da produção:
+        vale o "filtroProducao" do ancestral mais próximo (inclusive ela
+        mesma) que tiver filtro. Ciclos em categoriaPai são ignorados.
+        Nenhuma categoria com filtro (categoria_hierarquia.sql não aplicado,
+        que é a única fonte da carga inicial): vale CATEGORIAS_EXCLUIDAS_LEGADO
+        e fica o aviso em referencia_cache.log.
+        """
+        por_id: Dict[int, Dict[str, Any]] = est["categoria_por_id"]
+        filhos: Dict[int, List[int]] = {}
+        for cid, c in por_id.items():
+            pai = c.get("categoriaPai")
+            if pai is not None:
+                filhos.setdefault(int(pai), []).append(cid)
+
+        filtros = {cid: c.get("filtroProducao") for cid, c in por_id.items() if c.get("filtroProducao")}
+        if not filtros and por_id and METRICAS.log_dir:
+            log_write(METRICAS.log_dir, "referencia_cache.log",
+                      "nenhuma categoria com filtroProducao: aplique categoria_hierarquia.sql "
+                      "(listagens de produção usando a lista fixa antiga)",
+                      categorias=len(por_id))
+
+        excluidas: Set[int] = set()
+        for cid in set(por_id) | set(filtros):
+            atual: Optional[int] = cid
+            vistos: Set[int] = set()
+            while atual is not None and atual not in vistos:
+                vistos.add(atual)
+                f = filtros.get(atual)
+                if f:
+                    if str(f).strip().upper() == "E":
+                        excluidas.add(cid)
+                    break
+                pai = (por_id.get(atual) or {}).get("categoriaPai")
+                atual = int(pai) if pai is not None else None
+
+        est["categoria_filhos"] = filhos
+        est["categorias_excluidas"] = excluidas if filtros else set(CATEGORIAS_EXCLUIDAS_LEGADO)
+
+    def ref_categoria_subarvore(self, categoria_id: Any) -> Set[int]:
+        """A categoria e todos os descendentes."""
+        self.ref_carregar()
+        filhos = self._ref_estado()["categoria_filhos"]
+        try:
+            raiz = int(categoria_id)
+        except (TypeError, ValueError):
+            return set()
+        out: Set[int] = set()
+        pilha = [raiz]
+        while pilha:
+            cid = pilha.pop()
+            if cid in out:
+                continue
+            out.add(cid)
+            pilha.extend(filhos.get(cid, ()))
+        return out
+
+    def ref_categorias_excluidas(self) -> Set[int]:
+        """Categorias com filtro efetivo 'E' (fora das listagens de produção)."""
+        self.ref_carregar()
+        return self._ref_estado()["categorias_excluidas"]
+
+    # ----------------------------
+    # LEITURAS (memória)
+    # ----------------------------
+
+    def ref_situacoes(self) -> List[Dict[str, Any]]:
+        """[{id, nome, idHerdado}, ...] ordenado por nome."""
+        self.ref_carregar()
+        return self._ref_estado()["situacoes"]
+
+    def ref_situacao(self, situacao_id: Any) -> Optional[Dict[str, Any]]:
+        self.ref_carregar()
+        try:
+            return self._ref_estado()["situacao_por_id"].get(int(situacao_id))
+        except (TypeError, ValueError):
+            return None
+
+    def ref_depositos(self) -> List[Dict[str, Any]]:
+        """[{id, descricao, situacao, padrao, desconsiderarsaldo}, ...] ordenado por descrição."""
+        self.ref_carregar()
+        return self._ref_estado()["depositos"]
+
+    def ref_deposito(self, deposito_id: Any) -> Optional[Dict[str, Any]]:
+        self.ref_carregar()
+        try:
+            return self._ref_estado()["deposito_por_id"].get(int(deposito_id))
+        except (TypeError, ValueError):
+            return None
+
+    def ref_categorias(self) -> List[Dict[str, Any]]:
+        """[{categoriaId, nomeCategoria, categoriaPai, filtroProducao?}, ...] ordenado por nome."""
+        self.ref_carregar()
+        return self._ref_estado()["categorias"]
+
+    def ref_categoria(self, categoria_id: Any) -> Optional[Dict[str, Any]]:
+        self.ref_carregar()
+        try:
+            return self._ref_estado()["categoria_por_id"].get(int(categoria_id))
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def ref_filtrar(linhas: List[Dict[str, Any]], campo: str, like: str = "",
+                    limit: int = 500, offset: int = 0) -> List[Dict[str, Any]]:
+        """Equivalente em memória de WHERE campo ILIKE '%like%' LIMIT/OFFSET."""
+        like = (like or "").strip().casefold()
+        if like:
+            linhas = [r for r in linhas if like in str(r.get(campo) or "").casefold()]
+        ini = max(0, int(offset))
+        return linhas[ini:ini + int(limit)] if limit else linhas[ini:]
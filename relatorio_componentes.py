@@ -14,6 +14,9 @@ Como usar (no seu app):
     from relatorio_componentes import gerar_relatorio_componentes_excel
     caminho = gerar_relatorio_componentes_excel(cfg, base_dir=BASE_DIR)
 
+Tempo limite: classe RELATORIO (tempo_limite.py). Para cancelar de outra
+thread, passe ao_conectar e chame tempo_limite.cancelar(conn).
+
 Autor: gerado pelo ChatGPT
 """
 
@@ -22,7 +25,7 @@ from __future__ import annotations
 import os
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 import psycopg2
 
@@ -30,6 +33,8 @@ from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
 
+from tempo_limite import RELATORIO, CursorLimitado, aplicar_limite
+
 
 # -------------------------
 # Helpers
@@ -181,6 +186,7 @@ def gerar_relatorio_componentes_excel(
     somente_skus_do_arranjo: bool = True,
     tipos_produto_final: Optional[Iterable[str]] = None,
     nome_arquivo: Optional[str] = None,
+    ao_conectar: Optional[Callable[[Any], None]] = None,
 ) -> str:
     """
     Gera o Excel do relatório e devolve o caminho do arquivo.
@@ -191,6 +197,7 @@ def gerar_relatorio_componentes_excel(
     - somente_skus_do_arranjo: se True, remove produtos com qtd_produzir=0
     - tipos_produto_final: se informado, filtra p.tipo (case-sensitive no Postgres se não estiver com UPPER)
     - nome_arquivo: se None, gera um nome com timestamp
+    - ao_conectar: recebe a conexão aberta (para cancelar a consulta de outra thread)
 
     Saída
     - caminho .xlsx
@@ -212,8 +219,12 @@ def gerar_relatorio_componentes_excel(
         connect_timeout=10,
     )
 
+    if ao_conectar is not None:
+        ao_conectar(conn)
+
     try:
-        cur = conn.cursor()
+        cur = conn.cursor(cursor_factory=CursorLimitado)
+        aplicar_limite(cur, RELATORIO)
         cur.execute(SQL_RELATORIO)
         rows = cur.fetchall()
         cols = [d[0] for d in cur.description]
@@ -3,7 +3,6 @@ from __future__ import annotations
 import hashlib
 import json
 import os
-import secrets
 import subprocess
 import sys
 import tkinter as tk
@@ -13,6 +12,9 @@ from typing import Optional, Tuple
 
 import psycopg2
 
+from credenciais import gerar_hash
+from sistema_log import log_write
+
 
 # ============================================================
 # CONFIG
@@ -24,17 +26,12 @@ os.makedirs(BASE_DIR, exist_ok=True)
 
 LOG_PATH = os.path.join(BASE_DIR, "logs")
 os.makedirs(LOG_PATH, exist_ok=True)
-LOG_FILE = os.path.join(LOG_PATH, "reset_senha.log")
 
 CONFIG_FILE = os.path.join(BASE_DIR, "config_op.json")
 
 
 def log(msg: str) -> None:
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(msg + "\n")
-    except Exception:
-        pass
+    log_write(LOG_PATH, "reset_senha.log", msg)
 
 
 @dataclass
@@ -140,21 +137,9 @@ def email_hash(email: str) -> str:
     return hashlib.sha256(e.encode("utf-8")).hexdigest()
 
 
-def hash_password(password: str, salt: str) -> str:
-    dk = hashlib.pbkdf2_hmac(
-        "sha256",
-        password.encode("utf-8"),
-        salt.encode("utf-8"),
-        120_000,
-        dklen=32,
-    )
-    return dk.hex()
-
-
 def make_password_record(password: str) -> str:
-    salt = secrets.token_hex(16)
-    ph = hash_password(password, salt)
-    return f"{salt}${ph}"
+    # formato e custo únicos para todas as telas (credenciais.py)
+    return gerar_hash(password)
 
 
 # ============================================================
@@ -1,11 +1,10 @@
 import os
 import hashlib
-from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+import credenciais
 
 EMAIL_PEPPER = os.getenv("APP_EMAIL_PEPPER", "")
-PWD_PEPPER = os.getenv("APP_PWD_PEPPER", "")
+PWD_PEPPER = credenciais.PWD_PEPPER
 
 
 def normalize_email(email: str) -> str:
@@ -19,10 +18,9 @@ def email_hash(email: str) -> str:
 
 
 def hash_password(password: str) -> str:
-    p = (password or "") + PWD_PEPPER
-    return pwd_context.hash(p)
+    # mesmo formato das outras telas; bcrypt antigo continua sendo verificado
+    return credenciais.gerar_hash(password or "")
 
 
 def verify_password(password: str, hashed: str) -> bool:
-    p = (password or "") + PWD_PEPPER
-    return pwd_context.verify(p, hashed)
+    return credenciais.verificar(password or "", hashed).ok
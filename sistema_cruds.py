@@ -6,6 +6,8 @@ from typing import Optional, Any, Tuple
 import psycopg2
 import psycopg2.extras
 
+from sistema_metricas import METRICAS
+
 # ---- Mixins CRUD (seus arquivos) ----
 from info_produto_crud import InfoProdutoCRUDMixin
 from arranjo_crud import ArranjoCRUDMixin
@@ -101,7 +103,8 @@ class SistemaOrdemProducao(
                 "Sem conexão com o banco. Chame conectar() antes.")
 
         try:
-            self.cursor.execute(sql, params)
+            with METRICAS.medir(sql, params, self.cursor):
+                self.cursor.execute(sql, params)
             self._ultimo_erro_bd = None
         except Exception as e:
             self._ultimo_erro_bd = f"{type(e).__name__}: {e}"
@@ -5,6 +5,8 @@ import psycopg2
 from psycopg2.extensions import connection as PGConn
 from psycopg2.extensions import cursor as PGCursor
 
+from sistema_metricas import METRICAS
+
 
 # ---------------------------------------------------------------------
 # IMPORTA OS MIXINS CRUD (ajuste os nomes conforme seus arquivos)
@@ -18,6 +20,7 @@ from estrutura_crud import EstruturaCRUDMixin
 from fornecedor_crud import FornecedorCRUDMixin
 from produtos_crud import ProdutosCRUDMixin
 from situacao_crud import SituacaoCRUDMixin
+from referencia_cache import ReferenciaCacheMixin
 
 
 class SistemaOrdemProducao(
@@ -30,12 +33,14 @@ class SistemaOrdemProducao(
     FornecedorCRUDMixin,
     ProdutosCRUDMixin,
     SituacaoCRUDMixin,
+    ReferenciaCacheMixin,
 ):
     """
     Loader principal do sistema:
     - gerencia conexão (conn/cursor)
     - fornece _q() para os mixins
     - agrega todos os CRUDs em um único objeto: self.sistema
+    - cache de situação/depósito/categoria (ReferenciaCacheMixin)
     """
 
     def __init__(self, cfg):
@@ -62,6 +67,7 @@ class SistemaOrdemProducao(
                 connect_timeout=5,
             )
             self.cursor = self.conn.cursor()
+            self.ref_invalidar()
             return True, ""
         except Exception as e:
             self.ultimo_erro = f"{type(e).__name__}: {e}"
@@ -87,10 +93,12 @@ class SistemaOrdemProducao(
     def _q(self, sql: str, params: tuple = ()) -> None:
         """
         Execute helper (usado pelos CRUDMixins).
+        Toda execução passa pelo METRICAS (fingerprint, duração, linhas, chamador).
         """
         if not self.cursor:
             raise RuntimeError("Sem cursor (não conectado).")
-        self.cursor.execute(sql, params)
+        with METRICAS.medir(sql, params, self.cursor):
+            self.cursor.execute(sql, params)
 
     def commit(self) -> None:
         if self.conn:
@@ -0,0 +1,543 @@
+from __future__ import annotations
+
+"""
+sistema_log.py
+Python 3.12+ | logging (stdlib)
+
+Log compartilhado por todos os programas (menu, telas, OP).
+
+Antes cada módulo abria o arquivo (no Z: / BASE_DIR\\logs), gravava uma linha
+e fechava, em toda chamada. Em rede isso custa milissegundos por linha e as
+linhas de processos diferentes se misturavam.
+
+Agora:
+- A chamada de log só coloca o registro numa fila (não bloqueia a UI)
+- Uma thread gravadora esvazia a fila em lotes: 1 write + 1 flush por lote
+- Saída em JSON-lines (1 objeto por linha) com ts, nível, pid, host,
+  programa e campos de tempo (duracao_ms) quando informados
+- Rotação por tamanho (padrão) ou diária
+- Modo "processo": 1 arquivo por processo  -> <nome>.<pid>.jsonl
+  Modo "coletor" : envia as linhas por TCP para um coletor único
+                   (python sistema_log.py --coletor), que grava 1 arquivo
+                   por programa. Se o coletor cair, volta para arquivo local.
+
+Variáveis de ambiente (opcionais):
+  EKENOX_LOG_MODO        processo | coletor            (padrão: processo)
+  EKENOX_LOG_COLETOR     host:porta                    (padrão: 127.0.0.1:9020)
+  EKENOX_LOG_ROTACAO     tamanho | diaria              (padrão: tamanho)
+  EKENOX_LOG_MAX_MB      tamanho máx. por arquivo      (padrão: 5)
+  EKENOX_LOG_BACKUPS     arquivos rotacionados mantidos (padrão: 5)
+  EKENOX_LOG_RETENCAO    dias para apagar .jsonl antigos (padrão: 30)
+
+Uso:
+    from sistema_log import log_write, medir
+    log_write(log_dir, "tela_estrutura.log", "mensagem")
+    with medir(log_dir, "tela_estrutura.log", "listar", termo=termo):
+        ...
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+# ============================================================
+# CONFIG
+# ============================================================
+
+def _env_int(nome: str, padrao: int) -> int:
+    try:
+        return int((os.getenv(nome) or "").strip() or padrao)
+    except ValueError:
+        return padrao
+
+
+LOG_MODO = (os.getenv("EKENOX_LOG_MODO") or "processo").strip().lower()
+LOG_COLETOR = (os.getenv("EKENOX_LOG_COLETOR") or "127.0.0.1:9020").strip()
+LOG_ROTACAO = (os.getenv("EKENOX_LOG_ROTACAO") or "tamanho").strip().lower()
+LOG_MAX_BYTES = _env_int("EKENOX_LOG_MAX_MB", 5) * 1024 * 1024
+LOG_BACKUPS = _env_int("EKENOX_LOG_BACKUPS", 5)
+LOG_RETENCAO_DIAS = _env_int("EKENOX_LOG_RETENCAO", 30)
+
+LOTE_MAX = 500          # registros por write
+INTERVALO_FLUSH = 0.5   # segundos sem registro antes de checar de novo
+FILA_MAX = 20_000       # acima disso descarta (nunca trava a UI)
+
+_HOST = socket.gethostname()
+_PID = os.getpid()
+
+
+# ============================================================
+# FORMATO (JSON-lines)
+# ============================================================
+
+class JsonLinhaFormatter(logging.Formatter):
+    """Formata o LogRecord como 1 objeto JSON por linha."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        d: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "programa": getattr(record, "programa", record.name),
+            "host": _HOST,
+            "pid": record.process,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        campos = getattr(record, "campos", None)
+        if campos:
+            d.update(campos)
+        if record.exc_info:
+            d["exc"] = "".join(traceback.format_exception(*record.exc_info))
+        return json.dumps(d, ensure_ascii=False, default=str)
+
+
+# ============================================================
+# HANDLERS DE SAÍDA (rodam só na thread gravadora)
+# ============================================================
+
+class _FlushEmLote:
+    """
+    Mixin: durante um lote o flush() vira no-op; o gravador chama
+    flush_lote() uma vez no fim. Assim são N linhas -> 1 flush.
+    """
+    _em_lote = False
+
+    def flush(self) -> None:  # type: ignore[override]
+        if not self._em_lote:
+            super().flush()  # type: ignore[misc]
+
+    def flush_lote(self) -> None:
+        self._em_lote = False
+        self.flush()
+
+
+class _ArquivoTamanho(_FlushEmLote, logging.handlers.RotatingFileHandler):
+    pass
+
+
+class _ArquivoDiario(_FlushEmLote, logging.handlers.TimedRotatingFileHandler):
+    pass
+
+
+class _HandlerColetor(logging.Handler):
+    """
+    Envia as linhas JSON por TCP para o coletor.
+    Em falha de conexão grava o lote no arquivo local (fallback) e tenta
+    reconectar a cada 30 s.
+    """
+
+    RECONECTAR_S = 30.0
+
+    def __init__(self, endereco: Tuple[str, int], fallback: logging.Handler) -> None:
+        super().__init__()
+        self.endereco = endereco
+        self.fallback = fallback
+        self.sock: Optional[socket.socket] = None
+        self._proxima_tentativa = 0.0
+        self._pendentes: List[logging.LogRecord] = []
+
+    def _conectar(self) -> bool:
+        if self.sock:
+            return True
+        agora = time.monotonic()
+        if agora < self._proxima_tentativa:
+            return False
+        try:
+            self.sock = socket.create_connection(self.endereco, timeout=2)
+            return True
+        except OSError:
+            self.sock = None
+            self._proxima_tentativa = agora + self.RECONECTAR_S
+            return False
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self._pendentes.append(record)
+
+    def flush_lote(self) -> None:
+        if not self._pendentes:
+            return
+        lote, self._pendentes = self._pendentes, []
+        if self._conectar():
+            try:
+                assert self.sock is not None
+                dados = "".join(self.format(r) + "\n" for r in lote)
+                self.sock.sendall(dados.encode("utf-8"))
+                return
+            except OSError:
+                self._fechar_sock()
+                self._proxima_tentativa = time.monotonic() + self.RECONECTAR_S
+
+        # fallback: grava o lote no arquivo local do processo
+        if isinstance(self.fallback, _FlushEmLote):
+            self.fallback._em_lote = True
+        for r in lote:
+            self.fallback.handle(r)
+        if isinstance(self.fallback, _FlushEmLote):
+            self.fallback.flush_lote()
+
+    def _fechar_sock(self) -> None:
+        try:
+            if self.sock:
+                self.sock.close()
+        except Exception:
+            pass
+        self.sock = None
+
+    def close(self) -> None:
+        self.flush_lote()
+        self._fechar_sock()
+        try:
+            self.fallback.close()
+        except Exception:
+            pass
+        super().close()
+
+
+def _nome_base(filename: str) -> str:
+    base = os.path.basename(filename or "app.log")
+    base, _ext = os.path.splitext(base)
+    return base or "app"
+
+
+def _criar_handler_arquivo(path: str) -> logging.Handler:
+    if LOG_ROTACAO == "diaria":
+        h: logging.Handler = _ArquivoDiario(
+            path, when="midnight", backupCount=LOG_BACKUPS, encoding="utf-8", delay=True)
+    else:
+        h = _ArquivoTamanho(
+            path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8", delay=True)
+    h.setFormatter(JsonLinhaFormatter())
+    return h
+
+
+def _parse_endereco(s: str) -> Tuple[str, int]:
+    host, _, porta = (s or "").rpartition(":")
+    try:
+        return (host or "127.0.0.1", int(porta))
+    except ValueError:
+        return ("127.0.0.1", 9020)
+
+
+def _limpar_antigos(log_dir: str, base: str) -> None:
+    """Apaga arquivos por-processo antigos deste programa (retenção)."""
+    if LOG_RETENCAO_DIAS <= 0:
+        return
+    limite = time.time() - LOG_RETENCAO_DIAS * 86400
+    try:
+        for nome in os.listdir(log_dir):
+            if not nome.startswith(base + ".") or ".jsonl" not in nome:
+                continue
+            p = os.path.join(log_dir, nome)
+            try:
+                if os.path.getmtime(p) < limite:
+                    os.remove(p)
+            except OSError:
+                pass
+    except OSError:
+        pass
+
+
+# ============================================================
+# GRAVADOR (thread única por processo)
+# ============================================================
+
+_FIM = object()
+
+
+class _Gravador(threading.Thread):
+    """
+    Consome a fila e grava em lotes. Cada destino (handler) recebe
+    todos os registros do lote e só então faz flush.
+    """
+
+    def __init__(self, fila: "queue.Queue[Any]") -> None:
+        super().__init__(name="sistema_log", daemon=True)
+        self.fila = fila
+        self.destinos: Dict[str, logging.Handler] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, chave: str, handler: logging.Handler) -> None:
+        with self._lock:
+            self.destinos[chave] = handler
+
+    def run(self) -> None:
+        while True:
+            try:
+                item = self.fila.get(timeout=INTERVALO_FLUSH)
+            except queue.Empty:
+                continue
+
+            lote = [item]
+            while len(lote) < LOTE_MAX:
+                try:
+                    lote.append(self.fila.get_nowait())
+                except queue.Empty:
+                    break
+
+            fim = any(x is _FIM for x in lote)
+            self._gravar([x for x in lote if x is not _FIM])
+            if fim:
+                break
+
+    def _gravar(self, lote: List[Tuple[str, logging.LogRecord]]) -> None:
+        usados: Dict[str, logging.Handler] = {}
+        for chave, record in lote:
+            with self._lock:
+                h = self.destinos.get(chave)
+            if h is None:
+                continue
+            try:
+                if isinstance(h, _FlushEmLote):
+                    h._em_lote = True
+                h.handle(record)
+                usados[chave] = h
+            except Exception:
+                pass
+        for h in usados.values():
+            try:
+                if hasattr(h, "flush_lote"):
+                    h.flush_lote()  # type: ignore[attr-defined]
+                else:
+                    h.flush()
+            except Exception:
+                pass
+
+    def fechar(self) -> None:
+        with self._lock:
+            hs = list(self.destinos.values())
+        for h in hs:
+            try:
+                h.close()
+            except Exception:
+                pass
+
+
+_fila: "queue.Queue[Any]" = queue.Queue(maxsize=FILA_MAX)
+_gravador: Optional[_Gravador] = None
+_gravador_lock = threading.Lock()
+_loggers: Dict[Tuple[str, str], "LogPrograma"] = {}
+_loggers_lock = threading.Lock()
+
+
+def _get_gravador() -> _Gravador:
+    global _gravador
+    with _gravador_lock:
+        if _gravador is None:
+            _gravador = _Gravador(_fila)
+            _gravador.start()
+            atexit.register(encerrar)
+        return _gravador
+
+
+def encerrar(timeout: float = 3.0) -> None:
+    """Esvazia a fila e fecha os arquivos (chamado no atexit)."""
+    global _gravador
+    g = _gravador
+    if g is None:
+        return
+    try:
+        _fila.put(_FIM, timeout=1)
+    except queue.Full:
+        pass
+    g.join(timeout=timeout)
+    g.fechar()
+    with _gravador_lock:
+        _gravador = None
+    _loggers.clear()
+
+
+# ============================================================
+# API
+# ============================================================
+
+class LogPrograma:
+    """
+    Logger de um programa (equivale a um antigo arquivo .log).
+    Não faz I/O na thread chamadora: só cria o record e enfileira.
+    """
+
+    def __init__(self, log_dir: str, filename: str) -> None:
+        self.log_dir = log_dir
+        self.programa = _nome_base(filename)
+        self.chave = f"{os.path.abspath(log_dir)}|{self.programa}"
+
+        os.makedirs(log_dir, exist_ok=True)
+        _limpar_antigos(log_dir, self.programa)
+
+        local = _criar_handler_arquivo(caminho_log(log_dir, filename))
+        if LOG_MODO == "coletor":
+            h: logging.Handler = _HandlerColetor(
+                _parse_endereco(LOG_COLETOR), fallback=local)
+            h.setFormatter(JsonLinhaFormatter())
+        else:
+            h = local
+
+        _get_gravador().registrar(self.chave, h)
+
+    def log(self, msg: str, nivel: int = logging.INFO, exc: Optional[BaseException] = None,
+            **campos: Any) -> None:
+        exc_info = (type(exc), exc, exc.__traceback__) if exc is not None else None
+        record = logging.LogRecord(
+            name=self.programa, level=nivel, pathname="", lineno=0,
+            msg=str(msg), args=None, exc_info=exc_info,
+        )
+        record.programa = self.programa
+        record.campos = campos or None
+        try:
+            _fila.put_nowait((self.chave, record))
+        except queue.Full:
+            pass
+
+    def info(self, msg: str, **campos: Any) -> None:
+        self.log(msg, logging.INFO, **campos)
+
+    def erro(self, msg: str, exc: Optional[BaseException] = None, **campos: Any) -> None:
+        self.log(msg, logging.ERROR, exc=exc, **campos)
+
+
+def obter_log(log_dir: str, filename: str) -> LogPrograma:
+    """Retorna (e reaproveita) o logger do programa para esse diretório."""
+    key = (os.path.abspath(log_dir), _nome_base(filename))
+    lg = _loggers.get(key)
+    if lg is not None:
+        return lg
+    with _loggers_lock:
+        lg = _loggers.get(key)
+        if lg is None:
+            lg = LogPrograma(log_dir, filename)
+            _loggers[key] = lg
+    return lg
+
+
+def caminho_log(log_dir: str, filename: str) -> str:
+    """Caminho do arquivo local deste processo (para mostrar ao usuário)."""
+    return os.path.join(log_dir, f"{_nome_base(filename)}.{_PID}.jsonl")
+
+
+def log_write(log_dir: str, filename: str, msg: str, **campos: Any) -> None:
+    """
+    Substitui os antigos _log_write(filename, msg): nunca levanta exception.
+    Só enfileira; a gravação (em lote, JSON-lines) é feita pela thread
+    gravadora, então os wrappers log()/_log_write() das telas podem chamar
+    daqui direto da UI.
+    """
+    try:
+        obter_log(log_dir, filename).info(msg, **campos)
+    except Exception:
+        pass
+
+
+def log_exception(log_dir: str, filename: str, err: BaseException, context: str = "") -> None:
+    """Registra exception com traceback completo (campo 'exc')."""
+    try:
+        obter_log(log_dir, filename).erro(context or type(err).__name__, exc=err)
+    except Exception:
+        pass
+
+
+@contextmanager
+def medir(log_dir: str, filename: str, operacao: str, **campos: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Mede a duração de um bloco e grava 1 linha com 'op' e 'duracao_ms'.
+    O dict devolvido pode receber campos extras dentro do bloco (ex.: linhas).
+    """
+    extra: Dict[str, Any] = dict(campos)
+    t0 = time.perf_counter()
+    erro: Optional[BaseException] = None
+    try:
+        yield extra
+    except BaseException as e:
+        erro = e
+        raise
+    finally:
+        dur = (time.perf_counter() - t0) * 1000.0
+        extra["op"] = operacao
+        extra["duracao_ms"] = round(dur, 3)
+        try:
+            lg = obter_log(log_dir, filename)
+            if erro is not None:
+                lg.erro(f"{operacao} falhou", exc=erro, **extra)
+            else:
+                lg.info(operacao, **extra)
+        except Exception:
+            pass
+
+
+# ============================================================
+# COLETOR (processo único que recebe de todas as máquinas)
+# ============================================================
+
+class _ColetorHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        srv: "_ColetorServer" = self.server  # type: ignore[assignment]
+        for raw in self.rfile:
+            linha = raw.decode("utf-8", errors="replace").strip()
+            if not linha:
+                continue
+            try:
+                programa = str(json.loads(linha).get("programa") or "app")
+            except Exception:
+                programa = "app"
+            srv.gravar(programa, linha)
+
+
+class _ColetorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, endereco: Tuple[str, int], log_dir: str) -> None:
+        super().__init__(endereco, _ColetorHandler)
+        self.log_dir = log_dir
+        self._arquivos: Dict[str, logging.Handler] = {}
+        self._lock = threading.Lock()
+        os.makedirs(log_dir, exist_ok=True)
+
+    def gravar(self, programa: str, linha: str) -> None:
+        programa = "".join(ch for ch in programa if ch.isalnum() or ch in "_-") or "app"
+        with self._lock:
+            h = self._arquivos.get(programa)
+            if h is None:
+                h = _criar_handler_arquivo(os.path.join(self.log_dir, f"{programa}.jsonl"))
+                h.setFormatter(logging.Formatter("%(message)s"))
+                self._arquivos[programa] = h
+            h.handle(logging.LogRecord(programa, logging.INFO, "", 0, linha, None, None))
+
+
+def rodar_coletor(log_dir: str, host: str = "0.0.0.0", porta: int = 9020) -> None:
+    """Inicia o coletor (bloqueante)."""
+    with _ColetorServer((host, int(porta)), log_dir) as srv:
+        print(f"Coletor de log em {host}:{porta} -> {log_dir}")
+        srv.serve_forever()
+
+
+if __name__ == "__main__":
+    if "--coletor" in sys.argv:
+        args = sys.argv[1:]
+
+        def _arg(flag: str, padrao: str) -> str:
+            if flag in args:
+                i = args.index(flag)
+                if i + 1 < len(args):
+                    return args[i + 1]
+            return padrao
+
+        rodar_coletor(
+            log_dir=_arg("--dir", os.path.join(os.getcwd(), "logs")),
+            host=_arg("--host", "0.0.0.0"),
+            porta=int(_arg("--porta", "9020")),
+        )
+    else:
+        print("Uso: python sistema_log.py --coletor [--dir PASTA] [--host 0.0.0.0] [--porta 9020]")
@@ -0,0 +1,463 @@
+from __future__ import annotations
+
+"""
+sistema_metricas.py
+Python 3.12+ | Tkinter
+
+Instrumentação do _q(sql, params) do SistemaOrdemProducao
+(Ordem_Producao.py, sistema_loader.py e sistema_cruds.py).
+
+Para cada execução registra:
+- fingerprint da query (literais e parâmetros viram "?")
+- duração (ms), linhas retornadas/afetadas (cursor.rowcount)
+- quem chamou (método do sistema + arquivo:linha)
+
+Agrega em memória por fingerprint: qtd, total, p50, p95, máx, linhas.
+Queries acima de METRICAS.limite_lento_ms (padrão 200 ms, ou env
+EKENOX_SQL_LENTA_MS) são guardadas como amostra e gravadas em
+logs/query_lenta.log (via sistema_log).
+
+Janela de diagnóstico (oculta): Ctrl+Shift+D na tela de OP.
+Mostra os fingerprints ordenados por tempo total — um "qtd" alto com
+duração baixa e o mesmo chamador é o sinal típico de N+1. A aba
+"Preparadas" (consultas_preparadas.py) mostra preparo x execução e, sob
+demanda, planejamento x execução no servidor; a aba "Interrompidas"
+(tempo_limite.py) lista as consultas cortadas por tempo limite ou canceladas.
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+import tkinter as tk
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from tkinter import ttk
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from sistema_log import log_write
+
+
+# ============================================================
+# FINGERPRINT
+# ============================================================
+
+_RE_COMENTARIO = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_RE_PARAM = re.compile(r"%\((\w+)\)s|%s")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACO = re.compile(r"\s+")
+
+_fp_cache: Dict[str, str] = {}
+
+
+def fingerprint(sql: str) -> str:
+    """
+    Normaliza o SQL para agrupar execuções da mesma query:
+    remove comentários, troca literais/parâmetros por '?',
+    colapsa listas IN (?, ?, ...) e espaços.
+    """
+    fp = _fp_cache.get(sql)
+    if fp is not None:
+        return fp
+    s = _RE_COMENTARIO.sub(" ", sql or "")
+    s = _RE_STRING.sub("?", s)
+    s = _RE_PARAM.sub("?", s)
+    s = _RE_NUMERO.sub("?", s)
+    s = _RE_LISTA.sub("(?...)", s)
+    s = _RE_ESPACO.sub(" ", s).strip().rstrip(";").strip()
+    if len(_fp_cache) < 5000:
+        _fp_cache[sql] = s
+    return s
+
+
+# ============================================================
+# CHAMADOR
+# ============================================================
+
+_IGNORAR_FUNCOES = {"_q", "_qp", "_qp_executar", "executar", "_executar_resiliente", "<lambda>",
+                    "__enter__", "__exit__", "medir", "_executar"}
+_ESTE_ARQUIVO = os.path.abspath(__file__)
+
+
+def _chamador() -> str:
+    """Primeiro frame fora do executor (_q) e deste módulo."""
+    f = sys._getframe(1)
+    while f is not None:
+        co = f.f_code
+        if co.co_name not in _IGNORAR_FUNCOES and os.path.abspath(co.co_filename) != _ESTE_ARQUIVO \
+                and not co.co_filename.endswith("contextlib.py"):
+            return f"{co.co_name} ({os.path.basename(co.co_filename)}:{f.f_lineno})"
+        f = f.f_back
+    return "?"
+
+
+# ============================================================
+# AGREGAÇÃO
+# ============================================================
+
+@dataclass
+class EstatQuery:
+    fingerprint: str
+    qtd: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    linhas: int = 0
+    erros: int = 0
+    amostras: Deque[float] = field(default_factory=lambda: deque(maxlen=1024))
+    chamadores: Counter = field(default_factory=Counter)
+
+    def percentil(self, p: float) -> float:
+        if not self.amostras:
+            return 0.0
+        v = sorted(self.amostras)
+        k = min(len(v) - 1, max(0, int(round((p / 100.0) * (len(v) - 1)))))
+        return v[k]
+
+    @property
+    def media_ms(self) -> float:
+        return self.total_ms / self.qtd if self.qtd else 0.0
+
+    def resumo(self) -> Dict[str, Any]:
+        chamador, n = (self.chamadores.most_common(1) or [("", 0)])[0]
+        return {
+            "fingerprint": self.fingerprint,
+            "qtd": self.qtd,
+            "total_ms": round(self.total_ms, 3),
+            "media_ms": round(self.media_ms, 3),
+            "p50_ms": round(self.percentil(50), 3),
+            "p95_ms": round(self.percentil(95), 3),
+            "max_ms": round(self.max_ms, 3),
+            "linhas": self.linhas,
+            "erros": self.erros,
+            "chamador": chamador,
+            "chamador_qtd": n,
+        }
+
+
+@dataclass
+class AmostraLenta:
+    ts: datetime
+    fingerprint: str
+    sql: str
+    params: str
+    duracao_ms: float
+    linhas: int
+    chamador: str
+    erro: str = ""
+
+
+def _env_float(nome: str, padrao: float) -> float:
+    try:
+        return float((os.getenv(nome) or "").strip() or padrao)
+    except ValueError:
+        return padrao
+
+
+class MetricasQuery:
+    """Agregador thread-safe (um por processo: METRICAS)."""
+
+    def __init__(self, limite_lento_ms: float = 200.0, max_amostras_lentas: int = 200) -> None:
+        self.limite_lento_ms = float(limite_lento_ms)
+        self.ativo = True
+        self.log_dir: Optional[str] = None
+        self._stats: Dict[str, EstatQuery] = {}
+        self._lentas: Deque[AmostraLenta] = deque(maxlen=max_amostras_lentas)
+        self._lock = threading.Lock()
+        self.inicio = datetime.now()
+
+    def registrar(
+        self,
+        sql: str,
+        params: Any,
+        duracao_ms: float,
+        linhas: int,
+        chamador: str,
+        erro: str = "",
+    ) -> None:
+        fp = fingerprint(sql)
+        with self._lock:
+            st = self._stats.get(fp)
+            if st is None:
+                st = self._stats[fp] = EstatQuery(fp)
+            st.qtd += 1
+            st.total_ms += duracao_ms
+            st.max_ms = max(st.max_ms, duracao_ms)
+            st.linhas += max(0, int(linhas or 0))
+            st.amostras.append(duracao_ms)
+            st.chamadores[chamador] += 1
+            if erro:
+                st.erros += 1
+
+        if duracao_ms >= self.limite_lento_ms:
+            amostra = AmostraLenta(
+                ts=datetime.now(),
+                fingerprint=fp,
+                sql=_RE_ESPACO.sub(" ", sql or "").strip(),
+                params=repr(params)[:500],
+                duracao_ms=round(duracao_ms, 3),
+                linhas=int(linhas or 0),
+                chamador=chamador,
+                erro=erro,
+            )
+            with self._lock:
+                self._lentas.append(amostra)
+            if self.log_dir:
+                log_write(
+                    self.log_dir, "query_lenta.log", "query lenta",
+                    fingerprint=fp, params=amostra.params, duracao_ms=amostra.duracao_ms,
+                    linhas=amostra.linhas, chamador=chamador, erro=erro or None,
+                )
+
+    @contextmanager
+    def medir(self, sql: str, params: Any, cursor: Any) -> Iterator[None]:
+        """
+        Envolve o cursor.execute(). Custo fixo: 2 perf_counter + 1 dict lookup
+        + caminhada curta na pilha.
+        """
+        if not self.ativo:
+            yield
+            return
+        t0 = time.perf_counter()
+        erro = ""
+        try:
+            yield
+        except Exception as e:
+            erro = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            dur = (time.perf_counter() - t0) * 1000.0
+            try:
+                linhas = int(getattr(cursor, "rowcount", -1) or 0) if not erro else 0
+            except Exception:
+                linhas = 0
+            self.registrar(sql, params, dur, linhas, _chamador(), erro)
+
+    # -------- leitura --------
+
+    def top(self, n: int = 50, ordem: str = "total_ms") -> List[Dict[str, Any]]:
+        with self._lock:
+            res = [st.resumo() for st in self._stats.values()]
+        res.sort(key=lambda d: d.get(ordem, 0), reverse=True)
+        return res[:n]
+
+    def lentas(self) -> List[AmostraLenta]:
+        with self._lock:
+            return list(self._lentas)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self._lentas.clear()
+        self.inicio = datetime.now()
+
+    def despejar_log(self, n: int = 30) -> None:
+        """Grava o top-N agregado no log (útil ao fechar o app)."""
+        if not self.log_dir:
+            return
+        for d in self.top(n):
+            log_write(self.log_dir, "query_stats.log", "resumo", **d)
+
+
+METRICAS = MetricasQuery(limite_lento_ms=_env_float("EKENOX_SQL_LENTA_MS", 200.0))
+
+
+# ============================================================
+# JANELA DE DIAGNÓSTICO (Ctrl+Shift+D)
+# ============================================================
+
+class JanelaDiagnostico:
+    """
+    Janela oculta com os piores fingerprints (por tempo total, qtd, p95
+    ou máx) e as amostras lentas. Atualiza a cada 2 s enquanto aberta.
+    """
+
+    ORDENS = {
+        "Tempo total": "total_ms",
+        "Qtd (N+1)": "qtd",
+        "p95": "p95_ms",
+        "Máximo": "max_ms",
+    }
+
+    def __init__(self, master: tk.Misc, metricas: MetricasQuery = METRICAS,
+                 preparadas: Optional[Callable[..., List[Dict[str, Any]]]] = None,
+                 interrompidas: Optional[Callable[[], List[Any]]] = None) -> None:
+        self.master = master
+        self.metricas = metricas
+        self.preparadas = preparadas    # relatorio_preparadas(medir=False) do sistema
+        self.interrompidas = interrompidas  # tempo_limite.interrupcoes
+        self.win: Optional[tk.Toplevel] = None
+
+    def open(self, event=None):
+        if self.win is not None and self.win.winfo_exists():
+            self.win.deiconify()
+            self.win.lift()
+            return
+
+        win = self.win = tk.Toplevel(self.master)
+        win.title("Diagnóstico - Queries")
+        win.geometry("1200x620")
+        win.bind("<Escape>", lambda e: self.close())
+        win.protocol("WM_DELETE_WINDOW", self.close)
+
+        top = ttk.Frame(win, padding=8)
+        top.pack(fill=tk.X)
+
+        ttk.Label(top, text="Ordenar por:").pack(side=tk.LEFT)
+        self.ordem_var = tk.StringVar(value="Tempo total")
+        cb = ttk.Combobox(top, textvariable=self.ordem_var, values=list(self.ORDENS),
+                          state="readonly", width=14)
+        cb.pack(side=tk.LEFT, padx=(4, 12))
+        cb.bind("<<ComboboxSelected>>", lambda e: self.atualizar())
+
+        ttk.Label(top, text="Lenta a partir de (ms):").pack(side=tk.LEFT)
+        self.limite_var = tk.StringVar(value=f"{self.metricas.limite_lento_ms:g}")
+        ent = ttk.Entry(top, textvariable=self.limite_var, width=8)
+        ent.pack(side=tk.LEFT, padx=(4, 12))
+        ent.bind("<Return>", lambda e: self._aplicar_limite())
+
+        ttk.Button(top, text="Zerar", command=self._zerar).pack(side=tk.RIGHT)
+        ttk.Button(top, text="Gravar no log", command=self.metricas.despejar_log).pack(
+            side=tk.RIGHT, padx=6)
+        self.info = ttk.Label(top, text="", foreground="gray")
+        self.info.pack(side=tk.RIGHT, padx=10)
+
+        nb = ttk.Notebook(win)
+        nb.pack(fill=tk.BOTH, expand=True, padx=8, pady=(0, 8))
+
+        cols = ("qtd", "total", "media", "p50", "p95", "max", "linhas", "erros", "chamador", "sql")
+        self.tree = self._tree(nb, cols, {
+            "qtd": ("Qtd", 60, "e"), "total": ("Total ms", 90, "e"),
+            "media": ("Média", 70, "e"), "p50": ("p50", 70, "e"), "p95": ("p95", 70, "e"),
+            "max": ("Máx", 70, "e"), "linhas": ("Linhas", 70, "e"), "erros": ("Erros", 50, "e"),
+            "chamador": ("Chamador (mais frequente)", 230, "w"), "sql": ("Fingerprint", 600, "w"),
+        })
+        nb.add(self.tree.master, text="Top queries")
+
+        cols_l = ("ts", "dur", "linhas", "chamador", "params", "sql")
+        self.tree_l = self._tree(nb, cols_l, {
+            "ts": ("Hora", 90, "w"), "dur": ("ms", 80, "e"), "linhas": ("Linhas", 70, "e"),
+            "chamador": ("Chamador", 230, "w"), "params": ("Parâmetros", 200, "w"),
+            "sql": ("SQL", 600, "w"),
+        })
+        nb.add(self.tree_l.master, text="Amostras lentas")
+
+        if self.preparadas is not None:
+            aba = ttk.Frame(nb)
+            barra = ttk.Frame(aba, padding=(0, 6))
+            barra.pack(fill=tk.X)
+            cols_p = ("nome", "preparos", "preparo", "execucoes", "media",
+                      "genericos", "custom", "planejamento", "execucao")
+            self.tree_p = self._tree(aba, cols_p, {
+                "nome": ("Consulta", 160, "w"), "preparos": ("Preparos", 70, "e"),
+                "preparo": ("Preparo ms", 90, "e"), "execucoes": ("Execuções", 80, "e"),
+                "media": ("Média ms", 80, "e"), "genericos": ("Planos genéricos", 110, "e"),
+                "custom": ("Planos custom", 100, "e"), "planejamento": ("Planejamento ms", 110, "e"),
+                "execucao": ("Execução ms (servidor)", 150, "e"),
+            })
+            self.tree_p.master.pack(fill=tk.BOTH, expand=True)
+            ttk.Button(barra, text="Atualizar",
+                       command=lambda: self._atualizar_preparadas(False)).pack(side=tk.LEFT)
+            ttk.Button(barra, text="Medir planejamento (EXPLAIN ANALYZE)",
+                       command=lambda: self._atualizar_preparadas(True)).pack(side=tk.LEFT, padx=6)
+            nb.add(aba, text="Preparadas")
+            self._atualizar_preparadas(False)
+
+        self.tree_i: Optional[ttk.Treeview] = None
+        if self.interrompidas is not None:
+            cols_i = ("ts", "classe", "motivo", "limite", "dur", "sql")
+            self.tree_i = self._tree(nb, cols_i, {
+                "ts": ("Hora", 90, "w"), "classe": ("Classe", 90, "w"),
+                "motivo": ("Motivo", 90, "w"), "limite": ("Limite ms", 80, "e"),
+                "dur": ("ms", 80, "e"), "sql": ("Fingerprint", 600, "w"),
+            })
+            nb.add(self.tree_i.master, text="Interrompidas")
+
+        self.atualizar()
+
+    def _atualizar_preparadas(self, medir: bool) -> None:
+        """Sob demanda (não no ciclo de 2 s): usa a conexão da tela."""
+        def fmt(v: Any) -> str:
+            return "" if v is None else (f"{v:.3f}" if isinstance(v, float) else str(v))
+
+        self.tree_p.delete(*self.tree_p.get_children())
+        for d in self.preparadas(medir=medir):
+            self.tree_p.insert("", tk.END, values=(
+                d["nome"], d["preparos"], fmt(d["preparo_ms"]), d["execucoes"], fmt(d["media_ms"]),
+                fmt(d["planos_genericos"]), fmt(d["planos_custom"]),
+                fmt(d["planejamento_ms"]), fmt(d["execucao_servidor_ms"]),
+            ))
+
+    def _tree(self, nb: tk.Misc, cols, spec) -> ttk.Treeview:
+        frame = ttk.Frame(nb)
+        tree = ttk.Treeview(frame, columns=cols, show="headings")
+        vsb = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+        hsb = ttk.Scrollbar(frame, orient=tk.HORIZONTAL, command=tree.xview)
+        tree.configure(yscrollcommand=vsb.set, xscrollcommand=hsb.set)
+        for c in cols:
+            titulo, w, anchor = spec[c]
+            tree.heading(c, text=titulo)
+            tree.column(c, width=w, anchor=anchor, stretch=(c == "sql"))
+        frame.grid_rowconfigure(0, weight=1)
+        frame.grid_columnconfigure(0, weight=1)
+        tree.grid(row=0, column=0, sticky="nsew")
+        vsb.grid(row=0, column=1, sticky="ns")
+        hsb.grid(row=1, column=0, sticky="ew")
+        return tree
+
+    def _aplicar_limite(self) -> None:
+        try:
+            self.metricas.limite_lento_ms = float(self.limite_var.get().replace(",", "."))
+        except ValueError:
+            self.limite_var.set(f"{self.metricas.limite_lento_ms:g}")
+
+    def _zerar(self) -> None:
+        self.metricas.limpar()
+        self.atualizar(reagendar=False)
+
+    def atualizar(self, reagendar: bool = True) -> None:
+        if self.win is None or not self.win.winfo_exists():
+            return
+        ordem = self.ORDENS.get(self.ordem_var.get(), "total_ms")
+
+        self.tree.delete(*self.tree.get_children())
+        top = self.metricas.top(100, ordem)
+        for d in top:
+            self.tree.insert("", tk.END, values=(
+                d["qtd"], f"{d['total_ms']:.1f}", f"{d['media_ms']:.2f}",
+                f"{d['p50_ms']:.2f}", f"{d['p95_ms']:.2f}", f"{d['max_ms']:.2f}",
+                d["linhas"], d["erros"], d["chamador"], d["fingerprint"],
+            ))
+
+        self.tree_l.delete(*self.tree_l.get_children())
+        for a in reversed(self.metricas.lentas()):
+            self.tree_l.insert("", tk.END, values=(
+                a.ts.strftime("%H:%M:%S"), f"{a.duracao_ms:.1f}", a.linhas,
+                a.chamador, a.params, a.sql,
+            ))
+
+        if self.tree_i is not None:
+            self.tree_i.delete(*self.tree_i.get_children())
+            for it in reversed(self.interrompidas()):
+                self.tree_i.insert("", tk.END, values=(
+                    it.ts.strftime("%H:%M:%S"), it.classe, it.motivo,
+                    "" if it.limite_ms is None else it.limite_ms, f"{it.duracao_ms:.1f}", it.fingerprint,
+                ))
+
+        total_q = sum(d["qtd"] for d in top)
+        self.info.config(
+            text=f"Desde {self.metricas.inicio:%H:%M:%S} | {len(top)} fingerprints | {total_q} execuções")
+        if reagendar:
+            self.win.after(2000, self.atualizar)
+
+    def close(self) -> None:
+        try:
+            if self.win and self.win.winfo_exists():
+                self.win.destroy()
+        except Exception:
+            pass
+        self.win = None
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+"""
+situacao_auditoria.py
+Consultas no histórico de situação das OPs (situacao_auditoria.sql).
+
+- historico_op(): mudanças de uma OP, da mais recente para a mais antiga,
+  paginado por audit_id (sem OFFSET)
+- tempos_situacao(): quanto tempo as OPs ficam em cada situação no período,
+  numa query só (LEAD por OP + agregação por situação)
+
+CLI:
+    python situacao_auditoria.py --op 123
+    python situacao_auditoria.py --tempos --dias 90
+"""
+
+import argparse
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from conexao_resiliente import executar_com_cursor
+
+
+Quando = Union[date, datetime]
+
+
+def _inicio_do_dia(quando: Quando) -> datetime:
+    if isinstance(quando, datetime):
+        return quando
+    return datetime.combine(quando, dtime.min)
+
+
+def historico_op(cur: Any, ordem_id: int, limite: int = 50,
+                 antes_de_id: Optional[int] = None) -> List[Tuple[Any, ...]]:
+    """
+    [(audit_id, changed_at, situacao_id_old, nome_old, situacao_id_new, nome_new, changed_by)]
+    Próxima página: antes_de_id = audit_id da última linha recebida.
+    """
+    cur.execute(
+        """
+        SELECT a.audit_id, a.changed_at,
+               a.situacao_id_old, so."nome",
+               a.situacao_id_new, sn."nome",
+               a.changed_by
+          FROM "Ekenox".ordem_producao_situacao_audit a
+          LEFT JOIN "Ekenox"."situacao" so ON so."id" = a.situacao_id_old
+          LEFT JOIN "Ekenox"."situacao" sn ON sn."id" = a.situacao_id_new
+         WHERE a.ordem_producao_id = %s
+           AND (%s::bigint IS NULL OR a.audit_id < %s::bigint)
+         ORDER BY a.audit_id DESC
+         LIMIT %s
+        """,
+        (int(ordem_id), antes_de_id, antes_de_id, int(limite)),
+    )
+    return cur.fetchall() or []
+
+
+def tempos_situacao(cur: Any, inicio: Quando, fim: Optional[Quando] = None) -> List[Dict[str, Any]]:
+    """
+    Por situação, passagens que começaram em [inicio, fim):
+    {"situacao_id", "nome", "passagens", "concluidas", "media_h", "mediana_h", "max_h"}.
+    A passagem termina na próxima mudança da mesma OP (mesmo depois de 'fim');
+    sem próxima mudança ela conta em "passagens" mas não nos tempos.
+    """
+    ini = _inicio_do_dia(inicio)
+    ate = _inicio_do_dia(fim) if fim is not None else None
+    cur.execute(
+        """
+        WITH passagens AS (
+            SELECT a.situacao_id_new AS situacao_id,
+                   a.changed_at      AS entrou,
+                   LEAD(a.changed_at) OVER (PARTITION BY a.ordem_producao_id
+                                            ORDER BY a.changed_at, a.audit_id) AS saiu
+              FROM "Ekenox".ordem_producao_situacao_audit a
+             WHERE a.changed_at >= %s
+        ),
+        duracoes AS (
+            SELECT p.situacao_id,
+                   EXTRACT(EPOCH FROM (p.saiu - p.entrou)) / 3600.0 AS horas
+              FROM passagens p
+             WHERE p.situacao_id IS NOT NULL
+               AND (%s::timestamptz IS NULL OR p.entrou < %s::timestamptz)
+        )
+        SELECT d.situacao_id, s."nome",
+               COUNT(*)                                                AS passagens,
+               COUNT(d.horas)                                          AS concluidas,
+               AVG(d.horas)                                            AS media_h,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY d.horas)    AS mediana_h,
+               MAX(d.horas)                                            AS max_h
+          FROM duracoes d
+          LEFT JOIN "Ekenox"."situacao" s ON s."id" = d.situacao_id
+         GROUP BY d.situacao_id, s."nome"
+         ORDER BY media_h DESC NULLS LAST, d.situacao_id
+        """,
+        (ini, ate, ate),
+    )
+    out: List[Dict[str, Any]] = []
+    for sid, nome, passagens, concluidas, media, mediana, maximo in cur.fetchall():
+        out.append({
+            "situacao_id": int(sid),
+            "nome": nome or "",
+            "passagens": int(passagens),
+            "concluidas": int(concluidas),
+            "media_h": None if media is None else float(media),
+            "mediana_h": None if mediana is None else float(mediana),
+            "max_h": None if maximo is None else float(maximo),
+        })
+    return out
+
+
+# ============================================================
+# MIXIN
+# ============================================================
+
+class AuditoriaSituacaoMixin:
+    """
+    Requer self.cursor e self.conn (igual aos CRUDMixins). Leituras via
+    executar_com_cursor: histórico em CONSULTA, tempos por situação em RELATORIO.
+    """
+
+    def _auditoria_ler(self, fn: Callable[[Any], Any], relatorio: bool = False) -> Any:
+        # tempo_limite só aqui dentro: ele traz o Tk e a CLI deste módulo roda sem
+        from tempo_limite import CONSULTA, RELATORIO
+        return executar_com_cursor(self, fn, True, RELATORIO if relatorio else CONSULTA)
+
+    def _auditoria_rollback(self) -> None:
+        if self.conn and not self.conn.closed:
+            self.conn.rollback()
+
+    def historico_situacao(self, ordem_id: int, limite: int = 50,
+                           antes_de_id: Optional[int] = None) -> List[Tuple[Any, ...]]:
+        try:
+            return self._auditoria_ler(lambda cur: historico_op(cur, ordem_id, limite, antes_de_id))
+        except Exception:
+            self._auditoria_rollback()
+            return []
+
+    def tempos_por_situacao(self, inicio: Quando, fim: Optional[Quando] = None) -> List[Dict[str, Any]]:
+        try:
+            return self._auditoria_ler(lambda cur: tempos_situacao(cur, inicio, fim), True)
+        except Exception:
+            self._auditoria_rollback()
+            return []
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+def _fmt_h(v: Optional[float]) -> str:
+    return "-" if v is None else f"{v:.1f}h"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import psycopg2
+    from Ordem_Producao import load_config
+
+    ap = argparse.ArgumentParser(description="Histórico de situação das OPs.")
+    ap.add_argument("--op", type=int, metavar="ID", help="histórico de uma OP")
+    ap.add_argument("--tempos", action="store_true", help="tempo médio por situação")
+    ap.add_argument("--dias", type=int, default=90, help="período de --tempos (padrão 90)")
+    args = ap.parse_args(argv)
+
+    cfg = load_config()
+    conn = psycopg2.connect(
+        host=cfg.db_host, database=cfg.db_database, user=cfg.db_user,
+        password=cfg.db_password, port=int(cfg.db_port), connect_timeout=5,
+    )
+    try:
+        with conn.cursor() as cur:
+            if args.op:
+                for (aid, quando, _sold, nome_old, _snew, nome_new, quem) in historico_op(cur, args.op, 500):
+                    print(f"{quando:%d/%m/%Y %H:%M}\t{nome_old or '-'} -> {nome_new or '-'}\t{quem}")
+            if args.tempos:
+                inicio = date.today() - timedelta(days=args.dias)
+                for t in tempos_situacao(cur, inicio):
+                    print(f"{t['nome'] or t['situacao_id']}\t{t['passagens']} passagem(ns)\t"
+                          f"média {_fmt_h(t['media_h'])}\tmediana {_fmt_h(t['mediana_h'])}\t"
+                          f"máx {_fmt_h(t['max_h'])}")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,64 @@
+-- situacao_auditoria.sql
+-- Histórico de situação das OPs ("Ekenox".ordem_producao_situacao_audit).
+-- Rodar depois do Criacao_arquivo.sql. Idempotente.
+--
+-- Quem grava: trigger por comando em "Ekenox".ordem_producao (transition
+-- tables). Uma finalização em massa (N OPs num UPDATE) grava as N linhas num
+-- INSERT só, sem um disparo por linha.
+--   INSERT da OP            -> situacao_id_old NULL, situacao_id_new = situação inicial
+--   UPDATE que muda situação -> old/new
+--   DELETE/arquivamento     -> nada (o histórico fica)
+--
+-- Consultas (situacao_auditoria.py):
+--   histórico de uma OP      -> (ordem_producao_id, audit_id)
+--   período / tempos         -> (changed_at)
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS ix_op_situacao_audit_op
+    ON "Ekenox".ordem_producao_situacao_audit (ordem_producao_id, audit_id);
+
+CREATE INDEX IF NOT EXISTS ix_op_situacao_audit_data
+    ON "Ekenox".ordem_producao_situacao_audit (changed_at);
+
+-- excluir/arquivar OP não pode falhar por causa do histórico
+ALTER TABLE IF EXISTS "Ekenox".ordem_producao_situacao_audit
+    DROP CONSTRAINT IF EXISTS fk_audit_op;
+
+
+CREATE OR REPLACE FUNCTION "Ekenox".fn_auditar_situacao()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO "Ekenox".ordem_producao_situacao_audit
+               (ordem_producao_id, fkprodutoid, situacao_id_old, situacao_id_new)
+        SELECT n.id, n.fkprodutoid, NULL, n.situacao_id
+          FROM novas n
+         WHERE n.situacao_id IS NOT NULL;
+    ELSE
+        INSERT INTO "Ekenox".ordem_producao_situacao_audit
+               (ordem_producao_id, fkprodutoid, situacao_id_old, situacao_id_new)
+        SELECT n.id, n.fkprodutoid, a.situacao_id, n.situacao_id
+          FROM novas n
+          JOIN antigas a ON a.id = n.id
+         WHERE n.situacao_id IS DISTINCT FROM a.situacao_id;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_auditar_situacao_ins ON "Ekenox".ordem_producao;
+CREATE TRIGGER trg_auditar_situacao_ins
+    AFTER INSERT ON "Ekenox".ordem_producao
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION "Ekenox".fn_auditar_situacao();
+
+DROP TRIGGER IF EXISTS trg_auditar_situacao_upd ON "Ekenox".ordem_producao;
+CREATE TRIGGER trg_auditar_situacao_upd
+    AFTER UPDATE ON "Ekenox".ordem_producao
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT EXECUTE FUNCTION "Ekenox".fn_auditar_situacao();
+
+END;
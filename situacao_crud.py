@@ -194,7 +194,10 @@ class SituacaoCRUDMixin:
         Retorna lista leve: [{"id":..., "nome":...}, ...]
         'somente_ativas' fica aqui para você reaproveitar caso depois exista alguma regra
         (como tabela de status ativa/inativa). Hoje não filtra porque a tabela não tem campo.
+        Com ReferenciaCacheMixin, responde da memória.
         """
+        if hasattr(self, "ref_situacoes"):
+            return [{"id": s["id"], "nome": s["nome"]} for s in self.ref_situacoes()]
         try:
             sql = """
                 SELECT s."id", s."nome"
@@ -238,6 +241,8 @@ class SituacaoCRUDMixin:
             self._q(sql, (sid, nome, int(id_herdado)
                     if id_herdado is not None else None))
             self.conn.commit()
+            if hasattr(self, "ref_invalidar"):
+                self.ref_invalidar()
             return True, ""
         except Exception as e:
             if getattr(self, "conn", None):
@@ -275,6 +280,8 @@ class SituacaoCRUDMixin:
                 return False, f"Nenhum registro encontrado para situação id={sid}."
 
             self.conn.commit()
+            if hasattr(self, "ref_invalidar"):
+                self.ref_invalidar()
             return True, ""
         except Exception as e:
             if getattr(self, "conn", None):
@@ -327,6 +334,8 @@ class SituacaoCRUDMixin:
                 return False, f"Nenhum registro para excluir (id={sid})."
 
             self.conn.commit()
+            if hasattr(self, "ref_invalidar"):
+                self.ref_invalidar()
             return True, ""
         except Exception as e:
             if getattr(self, "conn", None):
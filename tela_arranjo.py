@@ -9,13 +9,17 @@ import sys
 import tempfile
 import tkinter as tk
 from dataclasses import dataclass
-from datetime import datetime
 from decimal import Decimal, InvalidOperation
 from tkinter import messagebox, ttk
 from typing import Any, List, Optional, Tuple
 
 import psycopg2
 
+from sistema_log import log_write
+from modelo_lista import ModeloLista
+from ouvinte_alteracoes import EventoAlteracao, obter_ouvinte
+from tempo_limite import CONSULTA, GRAVACAO, LISTA, CursorLimitado, aplicar_limite
+
 
 # ============================================================
 # PROGRAMA / PERMISSÕES
@@ -61,15 +65,7 @@ os.makedirs(BASE_DIR, exist_ok=True)
 # ============================================================
 
 def _log_write(filename: str, msg: str) -> None:
-    try:
-        log_dir = os.path.join(BASE_DIR, "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        log_path = os.path.join(log_dir, filename)
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(f"[{ts}] {msg}\n")
-    except Exception:
-        pass
+    log_write(os.path.join(BASE_DIR, "logs"), filename, msg)
 
 
 def log_arranjo(msg: str) -> None:
@@ -208,11 +204,13 @@ class Database:
         self.cursor = None
         self.ultimo_erro: Optional[str] = None
 
-    def conectar(self) -> bool:
+    def conectar(self, classe: str = CONSULTA) -> bool:
+        """classe: tempo limite das consultas desta operação (tempo_limite.py)."""
         self.ultimo_erro = None
         try:
             self.conn = db_connect(self.cfg)
-            self.cursor = self.conn.cursor()
+            self.cursor = self.conn.cursor(cursor_factory=CursorLimitado)
+            aplicar_limite(self.cursor, classe)
             return True
         except Exception as e:
             self.ultimo_erro = f"{type(e).__name__}: {e}"
@@ -895,23 +893,26 @@ class ArranjoRepo:
     def __init__(self, db: Database) -> None:
         self.db = db
 
-    def listar(self, termo: Optional[str] = None, limit: int = 500) -> list[Arranjo]:
+    def listar(self, termo: Optional[str] = None, limit: int = 500,
+               chaves: Optional[List[str]] = None) -> list[Arranjo]:
+        """chaves: só esses sku (remendo da lista após NOTIFY)."""
         like = f"%{termo}%" if termo else None
 
         sql = f"""
             SELECT a."sku", a."nomeproduto", a."quantidade", a."chapa", a."material"
             FROM {ARRANJO_TABLE} AS a
-            WHERE (%s IS NULL)
+            WHERE ((%s IS NULL)
                OR (COALESCE(a."sku",'') ILIKE %s)
                OR (COALESCE(a."nomeproduto",'') ILIKE %s)
                OR (COALESCE(a."chapa",'') ILIKE %s)
-               OR (COALESCE(a."material",'') ILIKE %s)
+               OR (COALESCE(a."material",'') ILIKE %s))
+              AND (CAST(%s AS TEXT[]) IS NULL OR a."sku" = ANY(CAST(%s AS TEXT[])))
             ORDER BY a."sku"
             LIMIT %s
         """
-        params = (termo, like, like, like, like, limit)
+        params = (termo, like, like, like, like, chaves, chaves, limit)
 
-        if not self.db.conectar():
+        if not self.db.conectar(LISTA):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
 
         try:
@@ -922,17 +923,6 @@ class ArranjoRepo:
         finally:
             self.db.desconectar()
 
-    def exists(self, sku: str) -> bool:
-        sql = f'SELECT 1 FROM {ARRANJO_TABLE} WHERE "sku" = %s'
-        if not self.db.conectar():
-            raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
-        try:
-            assert self.db.cursor is not None
-            self.db.cursor.execute(sql, (sku,))
-            return self.db.cursor.fetchone() is not None
-        finally:
-            self.db.desconectar()
-
     def proximo_sku_numerico(self) -> str:
         sql = f"""
             SELECT COALESCE(MAX(CAST("sku" AS BIGINT)), 0)
@@ -949,27 +939,14 @@ class ArranjoRepo:
         finally:
             self.db.desconectar()
 
-    def inserir(self, a: Arranjo) -> None:
-        sql = f"""
-            INSERT INTO {ARRANJO_TABLE} ("sku","nomeproduto","quantidade","chapa","material")
-            VALUES (%s,%s,%s,%s,%s)
+    def salvar(self, a: Arranjo, sku_original: Optional[str]) -> Tuple[bool, Arranjo]:
         """
-        params = (a.sku, a.nomeproduto, a.quantidade, a.chapa, a.material)
-
-        if not self.db.conectar():
-            raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
-        try:
-            assert self.db.cursor is not None
-            self.db.cursor.execute(sql, params)
-            self.db.commit()
-        except Exception:
-            self.db.rollback()
-            raise
-        finally:
-            self.db.desconectar()
-
-    def atualizar(self, a: Arranjo, sku_original: str) -> None:
-        sql = f"""
+        Grava e devolve (inserido, linha como ficou no banco).
+        Editando (sku_original): UPDATE ... RETURNING; se a linha sumiu
+        nesse meio tempo, cai no INSERT. SKU novo que já existe -> ValueError.
+        """
+        cols = '"sku","nomeproduto","quantidade","chapa","material"'
+        sql_upd = f"""
             UPDATE {ARRANJO_TABLE}
                SET "sku" = %s,
                    "nomeproduto" = %s,
@@ -977,30 +954,50 @@ class ArranjoRepo:
                    "chapa" = %s,
                    "material" = %s
              WHERE "sku" = %s
+            RETURNING {cols}
         """
-        params = (a.sku, a.nomeproduto, a.quantidade,
-                  a.chapa, a.material, sku_original)
+        sql_ins = f"""
+            INSERT INTO {ARRANJO_TABLE} ({cols})
+            VALUES (%s,%s,%s,%s,%s)
+            ON CONFLICT ("sku") DO NOTHING
+            RETURNING {cols}
+        """
+        params = (a.sku, a.nomeproduto, a.quantidade, a.chapa, a.material)
 
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
-            self.db.cursor.execute(sql, params)
+            if sku_original:
+                self.db.cursor.execute(sql_upd, params + (sku_original,))
+                row = self.db.cursor.fetchone()
+                if row is not None:
+                    self.db.commit()
+                    return False, Arranjo(*row)
+
+            self.db.cursor.execute(sql_ins, params)
+            row = self.db.cursor.fetchone()
+            if row is None:
+                raise ValueError(
+                    "SKU já existe. Selecione na lista para editar ou clique em Novo.")
             self.db.commit()
+            return True, Arranjo(*row)
         except Exception:
             self.db.rollback()
             raise
         finally:
             self.db.desconectar()
 
-    def excluir(self, sku: str) -> None:
-        sql = f'DELETE FROM {ARRANJO_TABLE} WHERE "sku" = %s'
-        if not self.db.conectar():
+    def excluir(self, sku: str) -> bool:
+        sql = f'DELETE FROM {ARRANJO_TABLE} WHERE "sku" = %s RETURNING "sku"'
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
             self.db.cursor.execute(sql, (sku,))
+            apagou = self.db.cursor.fetchone() is not None
             self.db.commit()
+            return apagou
         except Exception:
             self.db.rollback()
             raise
@@ -1039,7 +1036,7 @@ class ArranjoRepo:
         """
         params = (termo, like, like, limit)
 
-        if not self.db.conectar():
+        if not self.db.conectar(LISTA):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
 
         try:
@@ -1059,14 +1056,15 @@ class ArranjoService:
     def __init__(self, repo: ArranjoRepo) -> None:
         self.repo = repo
 
-    def listar(self, termo: Optional[str]) -> list[Arranjo]:
+    def listar(self, termo: Optional[str], chaves: Optional[List[str]] = None) -> list[Arranjo]:
         termo = (termo or "").strip() or None
-        return self.repo.listar(termo=termo)
+        return self.repo.listar(termo=termo, chaves=chaves)
 
     def proximo_sku(self) -> str:
         return self.repo.proximo_sku_numerico()
 
-    def salvar_from_form(self, form: dict[str, Any], sku_original: Optional[str]) -> str:
+    def salvar_from_form(self, form: dict[str, Any],
+                         sku_original: Optional[str]) -> Tuple[str, Arranjo]:
         sku = (form.get("sku") or "").strip()
         if not sku:
             raise ValueError("SKU é obrigatório.")
@@ -1082,19 +1080,11 @@ class ArranjoService:
         if a.quantidade < 0:
             raise ValueError("Quantidade não pode ser negativa.")
 
-        if sku_original and self.repo.exists(sku_original):
-            self.repo.atualizar(a, sku_original=sku_original)
-            return "atualizado"
-
-        if self.repo.exists(a.sku):
-            raise ValueError(
-                "SKU já existe. Selecione na lista para editar ou clique em Novo.")
-
-        self.repo.inserir(a)
-        return "inserido"
+        inserido, salvo = self.repo.salvar(a, sku_original=sku_original)
+        return ("inserido" if inserido else "atualizado"), salvo
 
-    def excluir(self, sku: str) -> None:
-        self.repo.excluir(sku)
+    def excluir(self, sku: str) -> bool:
+        return self.repo.excluir(sku)
 
     def preencher_nome_por_sku(self, sku: str) -> Optional[Tuple[str, str]]:
         sku = (sku or "").strip()
@@ -1234,6 +1224,10 @@ class TelaArranjo(ttk.Frame):
         self._aplicar_permissoes()
         self.atualizar_lista()
 
+        # outras telas/usuários gravando em arranjo -> remenda só as linhas afetadas
+        obter_ouvinte(self.service.repo.db.cfg, os.path.join(BASE_DIR, "logs")).inscrever(
+            self, "arranjo", self._on_alteracoes)
+
         # aviso pós render
         if self.acesso.aviso:
             self.after(200, lambda: messagebox.showwarning(
@@ -1374,6 +1368,10 @@ class TelaArranjo(ttk.Frame):
 
         self.tree.bind("<<TreeviewSelect>>", self.on_select)
 
+        self.modelo: ModeloLista[Arranjo] = ModeloLista(
+            self.tree, chave=lambda a: a.sku, valores=self._valores,
+            ordem=lambda a: a.sku)
+
     def _add_field(self, parent: ttk.Frame, row: int, col: int, key: str, width: int | None = None) -> None:
         label = dict(CAMPOS)[key]
         ttk.Label(parent, text=f"{label}:").grid(
@@ -1435,19 +1433,26 @@ class TelaArranjo(ttk.Frame):
 
     def atualizar_lista(self) -> None:
         termo = self.var_filtro.get().strip() or None
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
         try:
             itens = self.service.listar(termo)
         except Exception as e:
+            self.modelo.limpar()
             messagebox.showerror("Erro", f"Falha ao listar Arranjo:\n{e}")
             return
 
-        for a in itens:
-            values = [a.sku, a.nomeproduto or "", str(
-                a.quantidade), a.chapa or "", a.material or ""]
-            self.tree.insert("", "end", values=values)
+        self.modelo.carregar(itens)
+
+    @staticmethod
+    def _valores(a: Arranjo) -> Tuple[Any, ...]:
+        return (a.sku, a.nomeproduto or "", str(a.quantidade), a.chapa or "", a.material or "")
+
+    def _on_alteracoes(self, eventos: List[EventoAlteracao]) -> None:
+        termo = self.var_filtro.get().strip() or None
+        self.modelo.remendar(
+            eventos,
+            lambda chaves: self.service.listar(termo, chaves=chaves),
+            self.atualizar_lista,
+        )
 
     def on_select(self, _event=None) -> None:
         sel = self.tree.selection()
@@ -1498,15 +1503,16 @@ class TelaArranjo(ttk.Frame):
         form = {k: self.vars[k].get() for k, _ in CAMPOS}
 
         try:
-            status = self.service.salvar_from_form(
+            status, salvo = self.service.salvar_from_form(
                 form, sku_original=self._sku_original)
         except Exception as e:
             messagebox.showerror("Validação/Erro", str(e))
             return
 
+        # só a linha salva muda na lista (SKU renomeado sai da posição antiga)
+        self.modelo.aplicar(salvo, chave_anterior=self._sku_original, selecionar=True)
+        self._sku_original = salvo.sku
         messagebox.showinfo("OK", f"Arranjo {status} com sucesso.")
-        self.atualizar_lista()
-        self._sku_original = (self.vars["sku"].get().strip() or None)
 
     def excluir(self) -> None:
         if not self._can_delete():
@@ -1530,9 +1536,9 @@ class TelaArranjo(ttk.Frame):
             messagebox.showerror("Erro", f"Falha ao excluir:\n{e}")
             return
 
+        self.modelo.remover(sku_target)
         messagebox.showinfo("OK", "Arranjo excluído.")
         self.limpar_form()
-        self.atualizar_lista()
 
     def buscar_produto_popup(self) -> None:
         if not self._can_edit():
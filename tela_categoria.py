@@ -12,6 +12,10 @@ from typing import Optional, Any, List, Tuple
 
 import psycopg2
 
+from modelo_lista import ModeloLista
+from sistema_log import log_write
+from tempo_limite import CONSULTA, GRAVACAO, LISTA, CursorLimitado, aplicar_limite
+
 
 # ============================================================
 # PASTAS / BASE DIR
@@ -33,14 +37,7 @@ os.makedirs(BASE_DIR, exist_ok=True)
 # ============================================================
 
 def _log_write(filename: str, msg: str) -> None:
-    try:
-        log_dir = os.path.join(BASE_DIR, "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        log_path = os.path.join(log_dir, filename)
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(msg + "\n")
-    except Exception:
-        pass
+    log_write(os.path.join(BASE_DIR, "logs"), filename, msg)
 
 
 def log_categoria(msg: str) -> None:
@@ -159,11 +156,13 @@ class Database:
         self.cursor = None
         self.ultimo_erro: Optional[str] = None
 
-    def conectar(self) -> bool:
+    def conectar(self, classe: str = CONSULTA) -> bool:
+        """classe: tempo limite das consultas desta operação (tempo_limite.py)."""
         self.ultimo_erro = None
         try:
             self.conn = db_connect(self.cfg)
-            self.cursor = self.conn.cursor()
+            self.cursor = self.conn.cursor(cursor_factory=CursorLimitado)
+            aplicar_limite(self.cursor, classe)
             return True
         except Exception as e:
             self.ultimo_erro = f"{type(e).__name__}: {e}"
@@ -628,7 +627,7 @@ class CategoriaRepo:
         """
         params = (termo or None, like, like, like, limit)
 
-        if not self.db.conectar():
+        if not self.db.conectar(LISTA):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
@@ -658,19 +657,14 @@ class CategoriaRepo:
         finally:
             self.db.desconectar()
 
-    def existe(self, codigo_txt: str) -> bool:
+    def _returning(self) -> str:
+        """Colunas no formato da lista (mesmas do listar)."""
         pk = _qident(self.pk_col)
-        sql = f"SELECT 1 FROM {self.categoria_table} WHERE {pk}::text = %s"
-        if not self.db.conectar():
-            raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
-        try:
-            assert self.db.cursor is not None
-            self.db.cursor.execute(sql, (str(codigo_txt),))
-            return self.db.cursor.fetchone() is not None
-        finally:
-            self.db.desconectar()
+        nm = _qident(self.nome_col)
+        pai = _qident(self.pai_col)
+        return f"{pk}::text, COALESCE({nm}::text,''), COALESCE({pai}::text,'')"
 
-    def inserir(self, codigo_int: int, nome: str, pai_txt: str) -> str:
+    def inserir(self, codigo_int: int, nome: str, pai_txt: str) -> Categoria:
         pk = _qident(self.pk_col)
         nm = _qident(self.nome_col)
         pai = _qident(self.pai_col)
@@ -681,23 +675,24 @@ class CategoriaRepo:
         sql = f"""
             INSERT INTO {self.categoria_table} ({pk},{nm},{pai})
             VALUES (%s,%s,%s)
-            RETURNING {pk}::text
+            RETURNING {self._returning()}
         """
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
             self.db.cursor.execute(sql, (codigo_param, nome, pai_param))
-            new_code = self.db.cursor.fetchone()[0]
+            r = self.db.cursor.fetchone()
             self.db.commit()
-            return str(new_code)
+            return Categoria(codigo=str(r[0] or ""), nome=str(r[1] or ""), pai=str(r[2] or ""))
         except Exception:
             self.db.rollback()
             raise
         finally:
             self.db.desconectar()
 
-    def atualizar(self, codigo_txt: str, nome: str, pai_txt: str) -> None:
+    def atualizar(self, codigo_txt: str, nome: str, pai_txt: str) -> Optional[Categoria]:
+        """None = código não existe (o service insere)."""
         pk = _qident(self.pk_col)
         nm = _qident(self.nome_col)
         pai = _qident(self.pai_col)
@@ -709,28 +704,35 @@ class CategoriaRepo:
                SET {nm} = %s,
                    {pai} = %s
              WHERE {pk}::text = %s
+            RETURNING {self._returning()}
         """
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
             self.db.cursor.execute(sql, (nome, pai_param, str(codigo_txt)))
+            r = self.db.cursor.fetchone()
             self.db.commit()
+            if r is None:
+                return None
+            return Categoria(codigo=str(r[0] or ""), nome=str(r[1] or ""), pai=str(r[2] or ""))
         except Exception:
             self.db.rollback()
             raise
         finally:
             self.db.desconectar()
 
-    def excluir(self, codigo_txt: str) -> None:
+    def excluir(self, codigo_txt: str) -> bool:
         pk = _qident(self.pk_col)
-        sql = f"DELETE FROM {self.categoria_table} WHERE {pk}::text = %s"
-        if not self.db.conectar():
+        sql = f"DELETE FROM {self.categoria_table} WHERE {pk}::text = %s RETURNING {pk}::text"
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
             self.db.cursor.execute(sql, (str(codigo_txt),))
+            apagou = self.db.cursor.fetchone() is not None
             self.db.commit()
+            return apagou
         except Exception:
             self.db.rollback()
             raise
@@ -759,7 +761,7 @@ class CategoriaService:
             return ""
         return self.repo.buscar_nome_por_codigo(codigo_txt)
 
-    def salvar(self, codigo_txt: str, nome: str, pai_txt: str) -> Tuple[str, str]:
+    def salvar(self, codigo_txt: str, nome: str, pai_txt: str) -> Tuple[str, Categoria]:
         nome = (nome or "").strip()
         if not nome:
             raise ValueError("Nome Categoria é obrigatório.")
@@ -769,8 +771,7 @@ class CategoriaService:
 
         if not codigo_txt:
             codigo_int = self.repo.proximo_codigo()
-            codigo_salvo = self.repo.inserir(codigo_int, nome, pai_txt)
-            return ("inserido", codigo_salvo)
+            return ("inserido", self.repo.inserir(codigo_int, nome, pai_txt))
 
         try:
             int(codigo_txt)
@@ -778,15 +779,15 @@ class CategoriaService:
             raise ValueError(
                 "Código inválido (não numérico). Use o botão NOVO para gerar automaticamente.")
 
-        if self.repo.existe(codigo_txt):
-            self.repo.atualizar(codigo_txt, nome, pai_txt)
-            return ("atualizado", codigo_txt)
+        # UPDATE ... RETURNING primeiro: editar (o caso comum) é um comando só
+        c = self.repo.atualizar(codigo_txt, nome, pai_txt)
+        if c is not None:
+            return ("atualizado", c)
 
-        codigo_salvo = self.repo.inserir(int(codigo_txt), nome, pai_txt)
-        return ("inserido", codigo_salvo)
+        return ("inserido", self.repo.inserir(int(codigo_txt), nome, pai_txt))
 
-    def excluir(self, codigo_txt: str) -> None:
-        self.repo.excluir(codigo_txt)
+    def excluir(self, codigo_txt: str) -> bool:
+        return self.repo.excluir(codigo_txt)
 
 
 # ============================================================
@@ -1054,19 +1055,21 @@ class TelaCategoria(ttk.Frame):
 
         self.tree.bind("<<TreeviewSelect>>", self.on_select)
 
+        # mesma ordem do listar ({pk}::text)
+        self.modelo: ModeloLista[Categoria] = ModeloLista(
+            self.tree, chave=lambda c: c.codigo,
+            valores=lambda c: (c.codigo, c.nome, c.pai), ordem=lambda c: c.codigo)
+
     def atualizar_lista(self) -> None:
         termo = self.var_filtro.get().strip() or None
-        for it in self.tree.get_children():
-            self.tree.delete(it)
-
         try:
             rows = self.service.listar(termo)
         except Exception as e:
+            self.modelo.limpar()
             messagebox.showerror("Erro", f"Falha ao listar categoria:\n{e}")
             return
 
-        for c in rows:
-            self.tree.insert("", "end", values=(c.codigo, c.nome, c.pai))
+        self.modelo.carregar(rows)
 
     def on_select(self, _event=None) -> None:
         sel = self.tree.selection()
@@ -1132,7 +1135,7 @@ class TelaCategoria(ttk.Frame):
             return
 
         try:
-            status, codigo = self.service.salvar(
+            status, c = self.service.salvar(
                 self.var_codigo.get(),
                 self.var_nome.get(),
                 self.var_pai_id.get(),
@@ -1141,11 +1144,11 @@ class TelaCategoria(ttk.Frame):
             messagebox.showerror("Validação/Erro", str(e))
             return
 
-        self.var_codigo.set(str(codigo))
+        self.modelo.aplicar(c, selecionar=True)
+        self.var_codigo.set(c.codigo)
         self._atualizar_pai_nome()
         messagebox.showinfo(
-            "OK", f"Categoria {status} com sucesso.\nCódigo: {codigo}")
-        self.atualizar_lista()
+            "OK", f"Categoria {status} com sucesso.\nCódigo: {c.codigo}")
 
     def excluir(self) -> None:
         if not self._can_edit():
@@ -1167,9 +1170,9 @@ class TelaCategoria(ttk.Frame):
             messagebox.showerror("Erro", f"Falha ao excluir:\n{e}")
             return
 
+        self.modelo.remover(codigo)
         messagebox.showinfo("OK", "Registro excluído.")
         self.limpar_form()
-        self.atualizar_lista()
 
 
 # ============================================================
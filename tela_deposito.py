@@ -12,6 +12,9 @@ from typing import Optional, Any, List, Tuple
 
 import psycopg2
 
+from sistema_log import log_write
+from tempo_limite import CONSULTA, GRAVACAO, LISTA, CursorLimitado, aplicar_limite
+
 
 # ============================================================
 # PASTAS / BASE DIR
@@ -33,14 +36,7 @@ os.makedirs(BASE_DIR, exist_ok=True)
 # ============================================================
 
 def _log_write(filename: str, msg: str) -> None:
-    try:
-        log_dir = os.path.join(BASE_DIR, "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        log_path = os.path.join(log_dir, filename)
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(msg + "\n")
-    except Exception:
-        pass
+    log_write(os.path.join(BASE_DIR, "logs"), filename, msg)
 
 
 def log_deposito(msg: str) -> None:
@@ -159,11 +155,13 @@ class Database:
         self.cursor = None
         self.ultimo_erro: Optional[str] = None
 
-    def conectar(self) -> bool:
+    def conectar(self, classe: str = CONSULTA) -> bool:
+        """classe: tempo limite das consultas desta operação (tempo_limite.py)."""
         self.ultimo_erro = None
         try:
             self.conn = db_connect(self.cfg)
-            self.cursor = self.conn.cursor()
+            self.cursor = self.conn.cursor(cursor_factory=CursorLimitado)
+            aplicar_limite(self.cursor, classe)
             return True
         except Exception as e:
             self.ultimo_erro = f"{type(e).__name__}: {e}"
@@ -650,7 +648,7 @@ class DepositoRepo:
         """
         params = (termo or None, like, like, limit)
 
-        if not self.db.conectar():
+        if not self.db.conectar(LISTA):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
@@ -709,7 +707,7 @@ class DepositoRepo:
             VALUES (%s,%s,%s,%s,%s)
             RETURNING {pk}::text
         """
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
@@ -746,7 +744,7 @@ class DepositoRepo:
                    {c_descons} = %s
              WHERE {pk}::text = %s
         """
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
@@ -762,7 +760,7 @@ class DepositoRepo:
     def excluir(self, codigo_txt: str) -> None:
         pk = _qident(self.pk_col)
         sql = f"DELETE FROM {self.deposito_table} WHERE {pk}::text = %s"
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
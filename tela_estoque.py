@@ -12,6 +12,11 @@ from typing import Optional, Any, List, Tuple
 
 import psycopg2
 
+from sistema_log import log_write
+from modelo_lista import ModeloLista
+from ouvinte_alteracoes import EventoAlteracao, obter_ouvinte
+from tempo_limite import CONSULTA, GRAVACAO, LISTA, CursorLimitado, aplicar_limite
+
 
 # ============================================================
 # PASTAS / BASE DIR
@@ -34,14 +39,7 @@ os.makedirs(BASE_DIR, exist_ok=True)
 # ============================================================
 
 def _log_write(filename: str, msg: str) -> None:
-    try:
-        log_dir = os.path.join(BASE_DIR, "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        log_path = os.path.join(log_dir, filename)
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(msg + "\n")
-    except Exception:
-        pass
+    log_write(os.path.join(BASE_DIR, "logs"), filename, msg)
 
 
 def log_estoque(msg: str) -> None:
@@ -149,7 +147,8 @@ class Database:
         self.cursor = None
         self.ultimo_erro: Optional[str] = None
 
-    def conectar(self) -> bool:
+    def conectar(self, classe: str = CONSULTA) -> bool:
+        """classe: tempo limite das consultas desta operação (tempo_limite.py)."""
         self.ultimo_erro = None
         try:
             self.conn = psycopg2.connect(
@@ -160,7 +159,8 @@ class Database:
                 port=int(self.cfg.db_port),
                 connect_timeout=5,
             )
-            self.cursor = self.conn.cursor()
+            self.cursor = self.conn.cursor(cursor_factory=CursorLimitado)
+            aplicar_limite(self.cursor, classe)
             return True
         except Exception as e:
             self.ultimo_erro = f"{type(e).__name__}: {e}"
@@ -553,35 +553,6 @@ class EstoqueRepo:
 
     # ---------- PRODUTOS ----------
 
-    def produto_existe(self, produto_id: int) -> bool:
-        # ✅ comparação por TEXT evita text=bigint
-        sql = f'SELECT 1 FROM {self.produtos_table} WHERE CAST("produtoId" AS TEXT) = %s'
-        if not self.db.conectar():
-            raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
-        try:
-            assert self.db.cursor is not None
-            self.db.cursor.execute(sql, (str(produto_id),))
-            return self.db.cursor.fetchone() is not None
-        finally:
-            self.db.desconectar()
-
-    def inserir_produto(self, produto_id: int, nome_produto: str) -> None:
-        # ✅ insere com tipo correto (se produtoId for TEXT, manda str; se for numérico, manda int)
-        sql = f'INSERT INTO {self.produtos_table} ("produtoId","nomeProduto") VALUES (%s,%s)'
-        pid_param = self._produtoid_param(produto_id)
-
-        if not self.db.conectar():
-            raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
-        try:
-            assert self.db.cursor is not None
-            self.db.cursor.execute(sql, (pid_param, nome_produto))
-            self.db.commit()
-        except Exception:
-            self.db.rollback()
-            raise
-        finally:
-            self.db.desconectar()
-
     def nome_produto_por_fk(self, fk: int) -> str:
         # ✅ comparação por TEXT evita text=bigint
         sql = f"""
@@ -602,7 +573,9 @@ class EstoqueRepo:
 
     # ---------- CRUD ESTOQUE ----------
 
-    def listar(self, termo: Optional[str] = None, limit: int = 1200) -> List[Estoque]:
+    def listar(self, termo: Optional[str] = None, limit: int = 1200,
+               chaves: Optional[List[str]] = None) -> List[Estoque]:
+        """chaves: só esses fkProduto (remendo da lista após NOTIFY)."""
         like = f"%{termo}%" if termo else None
         # ✅ join por TEXT evita mismatch se um lado for text e outro bigint
         sql = f"""
@@ -614,15 +587,17 @@ class EstoqueRepo:
             FROM {self.estoque_table} AS e
             LEFT JOIN {self.produtos_table} AS p
                    ON CAST(p."produtoId" AS TEXT) = CAST(e."fkProduto" AS TEXT)
-            WHERE (%s IS NULL)
+            WHERE ((%s IS NULL)
                OR (CAST(e."fkProduto" AS TEXT) ILIKE %s)
-               OR (COALESCE(p."nomeProduto",'') ILIKE %s)
+               OR (COALESCE(p."nomeProduto",'') ILIKE %s))
+              AND (CAST(%s AS TEXT[]) IS NULL
+               OR CAST(e."fkProduto" AS TEXT) = ANY(CAST(%s AS TEXT[])))
             ORDER BY CAST(e."fkProduto" AS TEXT)
             LIMIT %s
         """
-        params = (termo, like, like, limit)
+        params = (termo, like, like, chaves, chaves, limit)
 
-        if not self.db.conectar():
+        if not self.db.conectar(LISTA):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
 
         try:
@@ -643,68 +618,71 @@ class EstoqueRepo:
         finally:
             self.db.desconectar()
 
-    def existe_fk(self, fk: int) -> bool:
-        # ✅ comparação por TEXT evita mismatch
-        sql = f'SELECT 1 FROM {self.estoque_table} WHERE CAST("fkProduto" AS TEXT) = %s'
-        if not self.db.conectar():
-            raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
-        try:
-            assert self.db.cursor is not None
-            self.db.cursor.execute(sql, (str(fk),))
-            return self.db.cursor.fetchone() is not None
-        finally:
-            self.db.desconectar()
-
-    def inserir(self, fk: int, fisico: Decimal, virtual: Decimal) -> int:
-        sql = f"""
-            INSERT INTO {self.estoque_table} ("fkProduto","saldoFisico","saldoVirtual")
-            VALUES (%s,%s,%s)
-            RETURNING "fkProduto"
+    def salvar(self, fk: int, nome_produto: str, fisico: Decimal,
+               virtual: Decimal) -> Tuple[bool, Estoque]:
+        """
+        Um comando só: cria o produto (se veio nome e ainda não existe) e faz
+        o upsert do saldo; devolve (inserido, linha já no formato da lista).
         """
-        fk_param = self._fk_param(fk)
-
-        if not self.db.conectar():
-            raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
-        try:
-            assert self.db.cursor is not None
-            self.db.cursor.execute(sql, (fk_param, fisico, virtual))
-            new_fk = self.db.cursor.fetchone()[0]
-            self.db.commit()
-            return int(str(new_fk))
-        except Exception:
-            self.db.rollback()
-            raise
-        finally:
-            self.db.desconectar()
-
-    def atualizar(self, fk: int, fisico: Decimal, virtual: Decimal) -> None:
-        # atualiza por TEXT no WHERE, mas grava com tipo correto em fk_param
         sql = f"""
-            UPDATE {self.estoque_table}
-               SET "saldoFisico" = %s,
-                   "saldoVirtual" = %s
-             WHERE CAST("fkProduto" AS TEXT) = %s
+            WITH prod AS (
+                INSERT INTO {self.produtos_table} ("produtoId","nomeProduto")
+                SELECT %s, %s
+                 WHERE %s <> ''
+                ON CONFLICT DO NOTHING
+                RETURNING "nomeProduto"
+            ),
+            w AS (
+                INSERT INTO {self.estoque_table} ("fkProduto","saldoFisico","saldoVirtual")
+                VALUES (%s,%s,%s)
+                ON CONFLICT ("fkProduto") DO UPDATE
+                   SET "saldoFisico" = EXCLUDED."saldoFisico",
+                       "saldoVirtual" = EXCLUDED."saldoVirtual"
+                RETURNING "fkProduto","saldoFisico","saldoVirtual",(xmax = 0) AS inserido
+            )
+            SELECT
+                w."fkProduto",
+                COALESCE((SELECT "nomeProduto" FROM prod), p."nomeProduto", '') AS "nomeProduto",
+                w."saldoFisico",
+                w."saldoVirtual",
+                w.inserido
+            FROM w
+            LEFT JOIN {self.produtos_table} AS p
+                   ON CAST(p."produtoId" AS TEXT) = CAST(w."fkProduto" AS TEXT)
         """
-        if not self.db.conectar():
+        nome_produto = (nome_produto or "").strip()
+        params = (self._produtoid_param(fk), nome_produto, nome_produto,
+                  self._fk_param(fk), fisico, virtual)
+
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
-            self.db.cursor.execute(sql, (fisico, virtual, str(fk)))
+            self.db.cursor.execute(sql, params)
+            r = self.db.cursor.fetchone()
             self.db.commit()
+            return bool(r[4]), Estoque(
+                fkProduto=int(str(r[0])),
+                nomeProduto=str(r[1] or ""),
+                saldoFisico=Decimal(str(r[2] if r[2] is not None else "0")),
+                saldoVirtual=Decimal(str(r[3] if r[3] is not None else "0")),
+            )
         except Exception:
             self.db.rollback()
             raise
         finally:
             self.db.desconectar()
 
-    def excluir(self, fk: int) -> None:
-        sql = f'DELETE FROM {self.estoque_table} WHERE CAST("fkProduto" AS TEXT) = %s'
-        if not self.db.conectar():
+    def excluir(self, fk: int) -> bool:
+        sql = f'DELETE FROM {self.estoque_table} WHERE CAST("fkProduto" AS TEXT) = %s RETURNING "fkProduto"'
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
             self.db.cursor.execute(sql, (str(fk),))
+            apagou = self.db.cursor.fetchone() is not None
             self.db.commit()
+            return apagou
         except Exception:
             self.db.rollback()
             raise
@@ -723,9 +701,9 @@ class EstoqueService:
     def proximo_fk_nextval(self) -> int:
         return self.repo.proximo_fk_nextval()
 
-    def listar(self, termo: Optional[str]) -> List[Estoque]:
+    def listar(self, termo: Optional[str], chaves: Optional[List[str]] = None) -> List[Estoque]:
         termo = (termo or "").strip() or None
-        return self.repo.listar(termo)
+        return self.repo.listar(termo, chaves=chaves)
 
     def preencher_nome_produto(self, fk_txt: str) -> Tuple[str, bool]:
         fk_txt = (fk_txt or "").strip()
@@ -739,7 +717,8 @@ class EstoqueService:
         nome = self.repo.nome_produto_por_fk(fk)
         return (nome, bool(nome.strip()))
 
-    def salvar(self, fk_txt: str, nome_txt: str, fisico_txt: str, virtual_txt: str) -> tuple[str, int]:
+    def salvar(self, fk_txt: str, nome_txt: str, fisico_txt: str,
+               virtual_txt: str) -> Tuple[str, Estoque]:
         fk_txt = (fk_txt or "").strip()
         if not fk_txt:
             fk_prod = self.repo.proximo_fk_nextval()
@@ -753,19 +732,12 @@ class EstoqueService:
         fisico = _to_decimal(fisico_txt, "saldoFisico")
         virtual = _to_decimal(virtual_txt, "saldoVirtual")
 
-        # Se digitou nome e ainda não existe produto, cria na tabela produtos
-        if nome_txt and not self.repo.produto_existe(fk_prod):
-            self.repo.inserir_produto(fk_prod, nome_txt)
-
-        if self.repo.existe_fk(fk_prod):
-            self.repo.atualizar(fk_prod, fisico, virtual)
-            return ("atualizado", fk_prod)
+        # se digitou nome e ainda não existe produto, o repo cria em produtos
+        inserido, e = self.repo.salvar(fk_prod, nome_txt, fisico, virtual)
+        return ("inserido" if inserido else "atualizado", e)
 
-        new_fk = self.repo.inserir(fk_prod, fisico, virtual)
-        return ("inserido", new_fk)
-
-    def excluir(self, fk: int) -> None:
-        self.repo.excluir(fk)
+    def excluir(self, fk: int) -> bool:
+        return self.repo.excluir(fk)
 
 
 # ============================================================
@@ -795,6 +767,10 @@ class TelaEstoque(ttk.Frame):
         self._build_ui()
         self.atualizar_lista()
 
+        # outras telas/usuários gravando em estoque -> remenda só as linhas afetadas
+        obter_ouvinte(self.service.repo.db.cfg, os.path.join(BASE_DIR, "logs")).inscrever(
+            self, "estoque", self._on_alteracoes)
+
     def _set_nome_editavel(self, editavel: bool) -> None:
         if not self.ent_nome:
             return
@@ -890,6 +866,11 @@ class TelaEstoque(ttk.Frame):
 
         self.tree.bind("<<TreeviewSelect>>", self.on_select)
 
+        # mesma ordem do listar (CAST("fkProduto" AS TEXT))
+        self.modelo: ModeloLista[Estoque] = ModeloLista(
+            self.tree, chave=lambda e: e.fkProduto, valores=self._valores,
+            ordem=lambda e: str(e.fkProduto))
+
     def _preencher_nome(self) -> None:
         nome, encontrado = self.service.preencher_nome_produto(
             self.var_fk.get())
@@ -903,22 +884,26 @@ class TelaEstoque(ttk.Frame):
 
     def atualizar_lista(self) -> None:
         termo = self.var_filtro.get().strip() or None
-        for it in self.tree.get_children():
-            self.tree.delete(it)
-
         try:
             rows = self.service.listar(termo)
         except Exception as e:
+            self.modelo.limpar()
             messagebox.showerror("Erro", f"Falha ao listar estoque:\n{e}")
             return
 
-        for e in rows:
-            self.tree.insert("", "end", values=(
-                e.fkProduto,
-                e.nomeProduto,
-                str(e.saldoFisico),
-                str(e.saldoVirtual),
-            ))
+        self.modelo.carregar(rows)
+
+    @staticmethod
+    def _valores(e: Estoque) -> Tuple[Any, ...]:
+        return (e.fkProduto, e.nomeProduto, str(e.saldoFisico), str(e.saldoVirtual))
+
+    def _on_alteracoes(self, eventos: List[EventoAlteracao]) -> None:
+        termo = self.var_filtro.get().strip() or None
+        self.modelo.remendar(
+            eventos,
+            lambda chaves: self.service.listar(termo, chaves=chaves),
+            self.atualizar_lista,
+        )
 
     def on_select(self, _event=None) -> None:
         sel = self.tree.selection()
@@ -961,20 +946,22 @@ class TelaEstoque(ttk.Frame):
 
     def salvar(self) -> None:
         try:
-            status, fk = self.service.salvar(
+            status, e = self.service.salvar(
                 self.var_fk.get(),
                 self.var_nome.get(),
                 self.var_fisico.get(),
                 self.var_virtual.get()
             )
-        except Exception as e:
-            messagebox.showerror("Validação/Erro", str(e))
+        except Exception as ex:
+            messagebox.showerror("Validação/Erro", str(ex))
             return
 
-        self.var_fk.set(str(fk))
-        self._preencher_nome()
-        messagebox.showinfo("OK", f"Estoque {status} com sucesso.\nFK: {fk}")
-        self.atualizar_lista()
+        # a linha devolvida pelo RETURNING já é a da lista: só ela muda
+        self.modelo.aplicar(e, selecionar=True)
+        self.var_fk.set(str(e.fkProduto))
+        self.var_nome.set(e.nomeProduto)
+        self._set_nome_editavel(not e.nomeProduto.strip())
+        messagebox.showinfo("OK", f"Estoque {status} com sucesso.\nFK: {e.fkProduto}")
 
     def excluir(self) -> None:
         fk_txt = (self.var_fk.get() or "").strip()
@@ -997,9 +984,9 @@ class TelaEstoque(ttk.Frame):
             messagebox.showerror("Erro", f"Falha ao excluir:\n{e}")
             return
 
+        self.modelo.remover(fk)
         messagebox.showinfo("OK", "Registro excluído.")
         self.limpar_form()
-        self.atualizar_lista()
 
 
 # ============================================================
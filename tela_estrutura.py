@@ -25,13 +25,19 @@ import os
 import sys
 import subprocess
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 from dataclasses import dataclass
 from decimal import Decimal, InvalidOperation
 from typing import Optional, Any, List, Tuple
 
 import psycopg2
 
+from sistema_log import log_write
+from modelo_lista import ModeloLista
+from ouvinte_alteracoes import EventoAlteracao, obter_ouvinte
+from estrutura_importacao import RelatorioImportacao, importar_arquivo, salvar_relatorio_csv
+from tempo_limite import CONSULTA, GRAVACAO, LISTA, CursorLimitado, aplicar_limite
+
 
 # ============================================================
 # PASTAS / BASE DIR
@@ -54,14 +60,7 @@ os.makedirs(BASE_DIR, exist_ok=True)
 # ============================================================
 
 def _log_write(filename: str, msg: str) -> None:
-    try:
-        log_dir = os.path.join(BASE_DIR, "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        log_path = os.path.join(log_dir, filename)
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(msg + "\n")
-    except Exception:
-        pass
+    log_write(os.path.join(BASE_DIR, "logs"), filename, msg)
 
 
 def log_estrutura(msg: str) -> None:
@@ -169,7 +168,8 @@ class Database:
         self.cursor = None
         self.ultimo_erro: Optional[str] = None
 
-    def conectar(self) -> bool:
+    def conectar(self, classe: str = CONSULTA) -> bool:
+        """classe: tempo limite das consultas desta operação (tempo_limite.py)."""
         self.ultimo_erro = None
         try:
             self.conn = psycopg2.connect(
@@ -180,7 +180,8 @@ class Database:
                 port=int(self.cfg.db_port),
                 connect_timeout=5,
             )
-            self.cursor = self.conn.cursor()
+            self.cursor = self.conn.cursor(cursor_factory=CursorLimitado)
+            aplicar_limite(self.cursor, classe)
             return True
         except Exception as e:
             self.ultimo_erro = f"{type(e).__name__}: {e}"
@@ -387,7 +388,7 @@ class EstruturaRepo:
         """
         params = (termo, like, like, limit)
 
-        if not self.db.conectar():
+        if not self.db.conectar(LISTA):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
@@ -397,7 +398,9 @@ class EstruturaRepo:
         finally:
             self.db.desconectar()
 
-    def listar(self, termo: Optional[str] = None, limit: int = 1500) -> List[EstruturaRow]:
+    def listar(self, termo: Optional[str] = None, limit: int = 1500,
+               chaves: Optional[List[str]] = None) -> List[EstruturaRow]:
+        """chaves: só esses "dados" (remendo da lista após NOTIFY)."""
         like = f"%{termo}%" if termo else None
         sql = f"""
             SELECT
@@ -412,17 +415,18 @@ class EstruturaRepo:
                    ON p1."produtoId" = e."fkproduto"
             LEFT JOIN {self.produtos_table} AS p2
                    ON p2."produtoId" = e."componente"
-            WHERE (%s IS NULL)
+            WHERE ((%s IS NULL)
                OR (CAST(e."fkproduto" AS TEXT) ILIKE %s)
                OR (CAST(e."componente" AS TEXT) ILIKE %s)
                OR (COALESCE(p1."nomeProduto",'') ILIKE %s)
-               OR (COALESCE(p2."nomeProduto",'') ILIKE %s)
+               OR (COALESCE(p2."nomeProduto",'') ILIKE %s))
+              AND (CAST(%s AS TEXT[]) IS NULL OR e."dados" = ANY(CAST(%s AS TEXT[])))
             ORDER BY e."fkproduto", e."componente"
             LIMIT %s
         """
-        params = (termo, like, like, like, like, limit)
+        params = (termo, like, like, like, like, chaves, chaves, limit)
 
-        if not self.db.conectar():
+        if not self.db.conectar(LISTA):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
 
         try:
@@ -443,57 +447,112 @@ class EstruturaRepo:
         finally:
             self.db.desconectar()
 
-    def existe(self, fkproduto: int, componente: int) -> bool:
-        sql = f'SELECT 1 FROM {self.estrutura_table} WHERE "fkproduto"=%s AND "componente"=%s'
-        if not self.db.conectar():
-            raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
-        try:
-            assert self.db.cursor is not None
-            self.db.cursor.execute(sql, (fkproduto, componente))
-            return self.db.cursor.fetchone() is not None
-        finally:
-            self.db.desconectar()
-
-    def inserir(self, fkproduto: int, componente: int, quantidade: Decimal, dados: Optional[str]) -> None:
+    def salvar(self, fkproduto: int, componente: int, quantidade: Decimal,
+               dados: Optional[str]) -> Tuple[bool, EstruturaRow, Optional[str]]:
+        """
+        Um comando só (acha o item por produto/componente, atualiza ou insere)
+        e devolve (inserido, linha no formato da lista, "dados" anterior).
+        Sem "dados" informado, mantém o atual ou usa "<fkproduto>-<componente>".
+        """
         sql = f"""
-            INSERT INTO {self.estrutura_table} ("fkproduto","componente","quantidade","dados")
-            VALUES (%s,%s,%s,%s)
+            WITH alvo AS (
+                SELECT e."dados"
+                  FROM {self.estrutura_table} AS e
+                 WHERE CAST(e."fkproduto" AS TEXT) = %s
+                   AND CAST(e."componente" AS TEXT) = %s
+                 LIMIT 1
+            ),
+            upd AS (
+                UPDATE {self.estrutura_table} AS e
+                   SET "quantidade" = %s,
+                       "dados" = COALESCE(%s, e."dados")
+                  FROM alvo
+                 WHERE e."dados" = alvo."dados"
+                RETURNING e."fkproduto", e."componente", e."quantidade", e."dados",
+                          alvo."dados" AS dados_anterior
+            ),
+            ins AS (
+                INSERT INTO {self.estrutura_table} ("fkproduto","componente","quantidade","dados")
+                SELECT %s, %s, %s, COALESCE(%s, %s || '-' || %s)
+                 WHERE NOT EXISTS (SELECT 1 FROM alvo)
+                RETURNING "fkproduto", "componente", "quantidade", "dados",
+                          NULL::text AS dados_anterior
+            ),
+            w AS (
+                SELECT * FROM upd
+                UNION ALL
+                SELECT * FROM ins
+            )
+            SELECT
+                w."fkproduto",
+                COALESCE(p1."nomeProduto",''),
+                w."componente",
+                COALESCE(p2."nomeProduto",''),
+                w."quantidade",
+                w."dados",
+                w.dados_anterior
+            FROM w
+            LEFT JOIN {self.produtos_table} AS p1
+                   ON CAST(p1."produtoId" AS TEXT) = CAST(w."fkproduto" AS TEXT)
+            LEFT JOIN {self.produtos_table} AS p2
+                   ON CAST(p2."produtoId" AS TEXT) = CAST(w."componente" AS TEXT)
         """
-        if not self.db.conectar():
+        fk, comp = str(fkproduto), str(componente)
+        params = (fk, comp, quantidade, dados,
+                  fk, comp, quantidade, dados, fk, comp)
+
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
-            self.db.cursor.execute(
-                sql, (fkproduto, componente, quantidade, dados))
+            self.db.cursor.execute(sql, params)
+            r = self.db.cursor.fetchone()
             self.db.commit()
+            row = EstruturaRow(
+                fkproduto=int(r[0]),
+                produto_nome=str(r[1] or ""),
+                componente=int(r[2]),
+                componente_nome=str(r[3] or ""),
+                quantidade=Decimal(str(r[4] if r[4] is not None else "0")),
+                dados=_clean_text(r[5]),
+            )
+            return r[6] is None, row, _clean_text(r[6])
+        except Exception:
+            self.db.rollback()
+            raise
         finally:
             self.db.desconectar()
 
-    def atualizar(self, fkproduto: int, componente: int, quantidade: Decimal, dados: Optional[str]) -> None:
+    def excluir(self, fkproduto: int, componente: int) -> List[str]:
+        """Devolve os "dados" apagados (chaves das linhas da lista)."""
         sql = f"""
-            UPDATE {self.estrutura_table}
-               SET "quantidade"=%s,
-                   "dados"=%s
-             WHERE "fkproduto"=%s AND "componente"=%s
+            DELETE FROM {self.estrutura_table}
+             WHERE CAST("fkproduto" AS TEXT) = %s AND CAST("componente" AS TEXT) = %s
+            RETURNING "dados"
         """
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
-            self.db.cursor.execute(
-                sql, (quantidade, dados, fkproduto, componente))
+            self.db.cursor.execute(sql, (str(fkproduto), str(componente)))
+            apagados = [str(r[0]) for r in self.db.cursor.fetchall()]
             self.db.commit()
+            return apagados
+        except Exception:
+            self.db.rollback()
+            raise
         finally:
             self.db.desconectar()
 
-    def excluir(self, fkproduto: int, componente: int) -> None:
-        sql = f'DELETE FROM {self.estrutura_table} WHERE "fkproduto"=%s AND "componente"=%s'
-        if not self.db.conectar():
+    def importar(self, caminho: str, substituir: bool, simular: bool) -> RelatorioImportacao:
+        """Importação em lote (COPY + merge) numa única conexão/transação."""
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
-            assert self.db.cursor is not None
-            self.db.cursor.execute(sql, (fkproduto, componente))
-            self.db.commit()
+            return importar_arquivo(
+                self.db.conn, caminho, substituir=substituir, simular=simular,
+                tabela_estrutura=self.estrutura_table, tabela_produtos=self.produtos_table,
+            )
         finally:
             self.db.desconectar()
 
@@ -522,9 +581,9 @@ class EstruturaService:
         termo = (termo or "").strip() or None
         return self.repo.buscar_produtos(termo)
 
-    def listar(self, termo: Optional[str]) -> List[EstruturaRow]:
+    def listar(self, termo: Optional[str], chaves: Optional[List[str]] = None) -> List[EstruturaRow]:
         termo = (termo or "").strip() or None
-        return self.repo.listar(termo)
+        return self.repo.listar(termo, chaves=chaves)
 
     def preencher_nome(self, produto_id_txt: str) -> str:
         produto_id_txt = (produto_id_txt or "").strip()
@@ -537,7 +596,8 @@ class EstruturaService:
         nome = self.repo.nome_produto(pid)
         return nome if nome else "(não encontrado)"
 
-    def salvar(self, fkproduto_txt: str, componente_txt: str, quantidade_txt: str, dados_txt: str) -> str:
+    def salvar(self, fkproduto_txt: str, componente_txt: str, quantidade_txt: str,
+               dados_txt: str) -> Tuple[str, EstruturaRow, Optional[str]]:
         fkproduto_txt = (fkproduto_txt or "").strip()
         componente_txt = (componente_txt or "").strip()
 
@@ -565,15 +625,11 @@ class EstruturaService:
 
         dados = _clean_text(dados_txt)
 
-        if self.repo.existe(fkproduto, componente):
-            self.repo.atualizar(fkproduto, componente, quantidade, dados)
-            return "atualizado"
-        else:
-            self.repo.inserir(fkproduto, componente, quantidade, dados)
-            return "inserido"
+        inserido, row, dados_anterior = self.repo.salvar(fkproduto, componente, quantidade, dados)
+        return ("inserido" if inserido else "atualizado"), row, dados_anterior
 
-    def excluir(self, fkproduto: int, componente: int) -> None:
-        self.repo.excluir(fkproduto, componente)
+    def excluir(self, fkproduto: int, componente: int) -> List[str]:
+        return self.repo.excluir(fkproduto, componente)
 
 
 # ============================================================
@@ -702,6 +758,10 @@ class TelaEstrutura(ttk.Frame):
         self._build_ui()
         self.atualizar_lista()
 
+        # outras telas/usuários gravando em estrutura -> remenda só as linhas afetadas
+        obter_ouvinte(self.service.repo.db.cfg, os.path.join(BASE_DIR, "logs")).inscrever(
+            self, "estrutura", self._on_alteracoes)
+
     def buscar_produto_popup(self) -> None:
         def on_pick(pid: int, nome: str) -> None:
             self.var_fkproduto.set(str(pid))
@@ -742,7 +802,9 @@ class TelaEstrutura(ttk.Frame):
         ttk.Button(top, text="Excluir", command=self.excluir).grid(
             row=0, column=5, padx=(0, 6))
         ttk.Button(top, text="Limpar", command=self.limpar_form).grid(
-            row=0, column=6)
+            row=0, column=6, padx=(0, 6))
+        ttk.Button(top, text="Importar...", command=self.importar).grid(
+            row=0, column=7)
 
         # Form
         form = ttk.LabelFrame(self, text="Estrutura")
@@ -827,6 +889,11 @@ class TelaEstrutura(ttk.Frame):
 
         self.tree.bind("<<TreeviewSelect>>", self.on_select)
 
+        # mesma ordem do listar (fkproduto, componente são texto no banco)
+        self.modelo: ModeloLista[EstruturaRow] = ModeloLista(
+            self.tree, chave=lambda r: r.dados, valores=self._valores,
+            ordem=lambda r: (str(r.fkproduto), str(r.componente)))
+
     def _preencher_nome_fk(self) -> None:
         self.var_fk_nome.set(self.service.repo.nome_produto(int(self.var_fkproduto.get() or "0"))
                              if (self.var_fkproduto.get().strip().isdigit()) else "")
@@ -837,22 +904,27 @@ class TelaEstrutura(ttk.Frame):
 
     def atualizar_lista(self) -> None:
         termo = self.var_filtro.get().strip() or None
-        for it in self.tree.get_children():
-            self.tree.delete(it)
-
         try:
             rows = self.service.listar(termo)
         except Exception as e:
+            self.modelo.limpar()
             messagebox.showerror("Erro", f"Falha ao listar estrutura:\n{e}")
             return
 
-        for r in rows:
-            self.tree.insert("", "end", values=(
-                r.fkproduto, r.produto_nome,
-                r.componente, r.componente_nome,
-                str(r.quantidade),
-                r.dados or "",
-            ))
+        self.modelo.carregar(rows)
+
+    @staticmethod
+    def _valores(r: EstruturaRow) -> Tuple[Any, ...]:
+        return (r.fkproduto, r.produto_nome, r.componente, r.componente_nome,
+                str(r.quantidade), r.dados or "")
+
+    def _on_alteracoes(self, eventos: List[EventoAlteracao]) -> None:
+        termo = self.var_filtro.get().strip() or None
+        self.modelo.remendar(
+            eventos,
+            lambda chaves: self.service.listar(termo, chaves=chaves),
+            self.atualizar_lista,
+        )
 
     def on_select(self, _event=None) -> None:
         sel = self.tree.selection()
@@ -885,7 +957,7 @@ class TelaEstrutura(ttk.Frame):
 
     def salvar(self) -> None:
         try:
-            status = self.service.salvar(
+            status, row, dados_anterior = self.service.salvar(
                 self.var_fkproduto.get(),
                 self.var_componente.get(),
                 self.var_quantidade.get(),
@@ -895,12 +967,75 @@ class TelaEstrutura(ttk.Frame):
             messagebox.showerror("Validação/Erro", str(e))
             return
 
-        self._preencher_nome_fk()
-        self._preencher_nome_comp()
+        # nomes e chave já vêm no RETURNING: só a linha salva muda na lista
+        self.modelo.aplicar(row, chave_anterior=dados_anterior, selecionar=True)
+        self.var_fk_nome.set(row.produto_nome or "(não encontrado)")
+        self.var_comp_nome.set(row.componente_nome or "(não encontrado)")
+        self.var_dados.set(row.dados or "")
 
         messagebox.showinfo("OK", f"Estrutura {status} com sucesso.")
+
+    def importar(self) -> None:
+        caminho = filedialog.askopenfilename(
+            title="Importar estrutura",
+            filetypes=[("Planilha/CSV", "*.xlsx *.xlsm *.csv *.txt"), ("Todos", "*.*")],
+        )
+        if not caminho:
+            return
+
+        substituir = messagebox.askyesnocancel(
+            "Importar estrutura",
+            "Substituir a estrutura dos produtos do arquivo?\n\n"
+            "Sim: componentes que não estão no arquivo serão REMOVIDOS.\n"
+            "Não: só adiciona/atualiza quantidades.",
+        )
+        if substituir is None:
+            return
+
+        try:
+            previa = self.service.repo.importar(caminho, substituir, simular=True)
+        except Exception as e:
+            log_estrutura(f"IMPORTAR ERRO: {type(e).__name__}: {e}")
+            messagebox.showerror("Erro", f"Falha ao ler/validar o arquivo:\n{e}")
+            return
+
+        if not previa.ok:
+            messagebox.showerror("Importar estrutura", previa.resumo())
+            self._oferecer_relatorio(previa)
+            return
+
+        if not (previa.adicionados or previa.alterados or previa.removidos):
+            messagebox.showinfo("Importar estrutura", previa.resumo())
+            return
+
+        if not messagebox.askyesno("Confirmar importação", previa.resumo() + "\n\nAplicar?"):
+            return
+
+        try:
+            rel = self.service.repo.importar(caminho, substituir, simular=False)
+        except Exception as e:
+            log_estrutura(f"IMPORTAR ERRO: {type(e).__name__}: {e}")
+            messagebox.showerror("Erro", f"Falha ao importar:\n{e}")
+            return
+
+        log_estrutura(
+            f"IMPORTAR {os.path.basename(caminho)}: +{len(rel.adicionados)} "
+            f"~{len(rel.alterados)} -{len(rel.removidos)} ({rel.duracao_s:.2f}s)")
+        messagebox.showinfo("Importar estrutura", rel.resumo())
+        self._oferecer_relatorio(rel)
         self.atualizar_lista()
 
+    def _oferecer_relatorio(self, rel: RelatorioImportacao) -> None:
+        if not messagebox.askyesno("Relatório", "Salvar relatório (CSV) da importação?"):
+            return
+        destino = filedialog.asksaveasfilename(
+            title="Salvar relatório", defaultextension=".csv",
+            initialfile="relatorio_importacao_estrutura.csv",
+            filetypes=[("CSV", "*.csv")],
+        )
+        if destino:
+            salvar_relatorio_csv(rel, destino)
+
     def excluir(self) -> None:
         fk_txt = (self.var_fkproduto.get() or "").strip()
         comp_txt = (self.var_componente.get() or "").strip()
@@ -917,14 +1052,15 @@ class TelaEstrutura(ttk.Frame):
             return
 
         try:
-            self.service.excluir(fk, comp)
+            apagados = self.service.excluir(fk, comp)
         except Exception as e:
             messagebox.showerror("Erro", f"Falha ao excluir:\n{e}")
             return
 
+        for dados in apagados:
+            self.modelo.remover(dados)
         messagebox.showinfo("OK", "Registro excluído.")
         self.limpar_form()
-        self.atualizar_lista()
 
 
 # ============================================================
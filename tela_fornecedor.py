@@ -28,6 +28,9 @@ from typing import Optional, Any, List, Dict, Tuple
 
 import psycopg2
 
+from sistema_log import log_write
+from tempo_limite import CONSULTA, GRAVACAO, LISTA, CursorLimitado, aplicar_limite
+
 
 # ============================================================
 # PASTAS / BASE DIR
@@ -50,14 +53,7 @@ os.makedirs(BASE_DIR, exist_ok=True)
 # ============================================================
 
 def _log_write(filename: str, msg: str) -> None:
-    try:
-        log_dir = os.path.join(BASE_DIR, "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        log_path = os.path.join(log_dir, filename)
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(msg + "\n")
-    except Exception:
-        pass
+    log_write(os.path.join(BASE_DIR, "logs"), filename, msg)
 
 
 def log_fornecedor(msg: str) -> None:
@@ -249,7 +245,8 @@ class Database:
         self.cursor = None
         self.ultimo_erro: Optional[str] = None
 
-    def conectar(self) -> bool:
+    def conectar(self, classe: str = CONSULTA) -> bool:
+        """classe: tempo limite das consultas desta operação (tempo_limite.py)."""
         self.ultimo_erro = None
         try:
             self.conn = psycopg2.connect(
@@ -260,7 +257,8 @@ class Database:
                 port=int(self.cfg.db_port),
                 connect_timeout=5,
             )
-            self.cursor = self.conn.cursor()
+            self.cursor = self.conn.cursor(cursor_factory=CursorLimitado)
+            aplicar_limite(self.cursor, classe)
             return True
         except Exception as e:
             self.ultimo_erro = f"{type(e).__name__}: {e}"
@@ -606,7 +604,7 @@ class FornecedorRepo:
 
         params = (termo, like, like, like, like, like, like, like, limit)
 
-        if not self.db.conectar():
+        if not self.db.conectar(LISTA):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
 
         try:
@@ -648,7 +646,7 @@ class FornecedorRepo:
             VALUES (%s,%s,%s,%s,%s,%s,%s)
             RETURNING "idFornecedor"
         """
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
@@ -675,7 +673,7 @@ class FornecedorRepo:
                    "celular"=%s
              WHERE "idFornecedor"=%s
         """
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
@@ -690,7 +688,7 @@ class FornecedorRepo:
 
     def excluir(self, fornecedor_id: int) -> None:
         sql = f'DELETE FROM {self.table} WHERE "idFornecedor"=%s'
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
@@ -9,13 +9,15 @@ import sys
 import tempfile
 import tkinter as tk
 from dataclasses import dataclass
-from datetime import datetime
 from decimal import Decimal, InvalidOperation
 from tkinter import messagebox, ttk
 from typing import Any, Dict, List, Optional, Tuple
 
 import psycopg2
 
+from sistema_log import log_write
+from tempo_limite import CONSULTA, GRAVACAO, LISTA, CursorLimitado, aplicar_limite
+
 
 # ============================================================
 # PROGRAMA / PERMISSÕES
@@ -60,15 +62,7 @@ os.makedirs(BASE_DIR, exist_ok=True)
 # ============================================================
 
 def _log_write(filename: str, msg: str) -> None:
-    try:
-        log_dir = os.path.join(BASE_DIR, "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        log_path = os.path.join(log_dir, filename)
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(f"[{ts}] {msg}\n")
-    except Exception:
-        pass
+    log_write(os.path.join(BASE_DIR, "logs"), filename, msg)
 
 
 def log_info_produto(msg: str) -> None:
@@ -207,11 +201,13 @@ class Database:
         self.cursor = None
         self.ultimo_erro: Optional[str] = None
 
-    def conectar(self) -> bool:
+    def conectar(self, classe: str = CONSULTA) -> bool:
+        """classe: tempo limite das consultas desta operação (tempo_limite.py)."""
         self.ultimo_erro = None
         try:
             self.conn = db_connect(self.cfg)
-            self.cursor = self.conn.cursor()
+            self.cursor = self.conn.cursor(cursor_factory=CursorLimitado)
+            aplicar_limite(self.cursor, classe)
             return True
         except Exception as e:
             self.ultimo_erro = f"{type(e).__name__}: {e}"
@@ -1077,7 +1073,7 @@ class ProdutoRepo:
         """
         params.append(limit)
 
-        if not self.db.conectar():
+        if not self.db.conectar(LISTA):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
 
         try:
@@ -1130,7 +1126,7 @@ class ProdutoRepo:
         sql = f'INSERT INTO {PRODUTOS_TABLE} ({cols_sql}) VALUES ({placeholders})'
         params = [values[c] for c in cols]
 
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
 
         try:
@@ -1154,7 +1150,7 @@ class ProdutoRepo:
 
         sql = f'UPDATE {PRODUTOS_TABLE} SET {sets} WHERE "{self.col_sku}"=%s'
 
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
 
         try:
@@ -1169,7 +1165,7 @@ class ProdutoRepo:
 
     def excluir(self, sku: str) -> None:
         sql = f'DELETE FROM {PRODUTOS_TABLE} WHERE "{self.col_sku}"=%s'
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
@@ -30,13 +30,15 @@ import sys
 import tempfile
 import tkinter as tk
 from dataclasses import dataclass
-from datetime import datetime
 from decimal import Decimal, InvalidOperation
 from tkinter import messagebox, ttk
 from typing import Any, List, Optional, Tuple
 
 import psycopg2
 
+from sistema_log import log_write
+from tempo_limite import CONSULTA, GRAVACAO, LISTA, CursorLimitado, aplicar_limite
+
 
 # ============================================================
 # PROGRAMA / PERMISSÕES
@@ -73,15 +75,7 @@ os.makedirs(BASE_DIR, exist_ok=True)
 # ============================================================
 
 def _log_write(filename: str, msg: str) -> None:
-    try:
-        log_dir = os.path.join(BASE_DIR, "logs")
-        os.makedirs(log_dir, exist_ok=True)
-        log_path = os.path.join(log_dir, filename)
-        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(f"[{ts}] {msg}\n")
-    except Exception:
-        pass
+    log_write(os.path.join(BASE_DIR, "logs"), filename, msg)
 
 
 def log_estoque(msg: str) -> None:
@@ -864,11 +858,13 @@ class Database:
         self.cursor = None
         self.ultimo_erro: Optional[str] = None
 
-    def conectar(self) -> bool:
+    def conectar(self, classe: str = CONSULTA) -> bool:
+        """classe: tempo limite das consultas desta operação (tempo_limite.py)."""
         self.ultimo_erro = None
         try:
             self.conn = db_connect(self.cfg)
-            self.cursor = self.conn.cursor()
+            self.cursor = self.conn.cursor(cursor_factory=CursorLimitado)
+            aplicar_limite(self.cursor, classe)
             return True
         except Exception as e:
             self.ultimo_erro = f"{type(e).__name__}: {e}"
@@ -1195,7 +1191,7 @@ class EstoqueRepo:
         sql = f'INSERT INTO {self.produtos_table} ("produtoId","nomeProduto") VALUES (%s,%s)'
         pid_param = self._produtoid_param(produto_id)
 
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
@@ -1245,7 +1241,7 @@ class EstoqueRepo:
         """
         params = (termo, like, like, limit)
 
-        if not self.db.conectar():
+        if not self.db.conectar(LISTA):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
 
         try:
@@ -1287,7 +1283,7 @@ class EstoqueRepo:
         """
         fk_param = self._fk_param(fk)
 
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
@@ -1308,7 +1304,7 @@ class EstoqueRepo:
                    "saldoVirtual" = %s
              WHERE CAST("fkProduto" AS TEXT) = %s
         """
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
@@ -1322,7 +1318,7 @@ class EstoqueRepo:
 
     def excluir(self, fk: int) -> None:
         sql = f'DELETE FROM {self.estoque_table} WHERE CAST("fkProduto" AS TEXT) = %s'
-        if not self.db.conectar():
+        if not self.db.conectar(GRAVACAO):
             raise RuntimeError(f"Falha ao conectar: {self.db.ultimo_erro}")
         try:
             assert self.db.cursor is not None
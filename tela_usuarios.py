@@ -5,7 +5,6 @@ import binascii
 import hashlib
 import json
 import os
-import secrets
 import string
 import sys
 import tkinter as tk
@@ -14,6 +13,10 @@ from tkinter import messagebox, ttk
 from typing import Any, Dict, List, Optional, Tuple
 
 import psycopg2
+from psycopg2.extras import execute_values
+
+from credenciais import gerar_hash
+from sistema_log import log_write
 
 
 # ============================================================
@@ -26,16 +29,11 @@ os.makedirs(BASE_DIR, exist_ok=True)
 
 LOG_DIR = os.path.join(BASE_DIR, "logs")
 os.makedirs(LOG_DIR, exist_ok=True)
-LOG_FILE = os.path.join(LOG_DIR, "tela_usuarios.log")
 CONFIG_FILE = os.path.join(BASE_DIR, "config_op.json")
 
 
 def log(msg: str) -> None:
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(msg + "\n")
-    except Exception:
-        pass
+    log_write(LOG_DIR, "tela_usuarios.log", msg)
 
 
 # ============================================================
@@ -199,52 +197,52 @@ def apply_window_icon(win: tk.Misc) -> None:
 # DETECÇÃO DE TIPOS (email_hash / email_enc)
 # ============================================================
 
-_EMAIL_HASH_IS_BYTEA: Optional[bool] = None
-_EMAIL_ENC_IS_BYTEA: Optional[bool] = None
+# {(host, porta, database): {coluna: data_type}} de "Ekenox".usuarios.
+# Uma consulta ao information_schema por banco; falha não fica em cache
+# (a próxima chamada tenta de novo).
+_TIPOS_USUARIOS: Dict[Tuple[str, int, str], Dict[str, str]] = {}
 
 
-def _column_is_bytea(cfg: AppConfig, schema: str, table: str, column: str) -> bool:
-    """
-    Detecta se coluna é BYTEA (tenta information_schema; não depende de existir linha).
-    """
-    conn = db_connect(cfg)
+def usuarios_column_types(cfg: AppConfig, conn: Any = None) -> Dict[str, str]:
+    """Tipos das colunas de "Ekenox".usuarios (usa conn se vier, senão abre uma)."""
+    chave = (cfg.db_host, int(cfg.db_port), cfg.db_database)
+    tipos = _TIPOS_USUARIOS.get(chave)
+    if tipos is not None:
+        return tipos
+
+    propria = conn is None
     try:
+        if propria:
+            conn = db_connect(cfg)
         with conn.cursor() as cur:
             cur.execute(
                 """
-                SELECT data_type
+                SELECT column_name, data_type
                   FROM information_schema.columns
-                 WHERE table_schema=%s
-                   AND table_name=%s
-                   AND column_name=%s
-                 LIMIT 1
+                 WHERE table_schema = %s
+                   AND table_name = %s
                 """,
-                (schema, table, column),
+                ("Ekenox", "usuarios"),
             )
-            r = cur.fetchone()
-            if r and r[0]:
-                return str(r[0]).lower() == "bytea"
+            tipos = {str(c): str(t).lower() for c, t in cur.fetchall()}
     except Exception as e:
-        log(f"_column_is_bytea error {schema}.{table}.{column}: {type(e).__name__}: {e}")
+        log(f"usuarios_column_types error: {type(e).__name__}: {e}")
+        return {}
     finally:
-        conn.close()
-    return False
+        if propria and conn is not None:
+            conn.close()
 
+    if tipos:
+        _TIPOS_USUARIOS[chave] = tipos
+    return tipos
 
-def is_email_hash_bytea(cfg: AppConfig) -> bool:
-    global _EMAIL_HASH_IS_BYTEA
-    if _EMAIL_HASH_IS_BYTEA is None:
-        _EMAIL_HASH_IS_BYTEA = _column_is_bytea(
-            cfg, "Ekenox", "usuarios", "email_hash")
-    return bool(_EMAIL_HASH_IS_BYTEA)
 
+def is_email_hash_bytea(cfg: AppConfig, conn: Any = None) -> bool:
+    return usuarios_column_types(cfg, conn).get("email_hash") == "bytea"
 
-def is_email_enc_bytea(cfg: AppConfig) -> bool:
-    global _EMAIL_ENC_IS_BYTEA
-    if _EMAIL_ENC_IS_BYTEA is None:
-        _EMAIL_ENC_IS_BYTEA = _column_is_bytea(
-            cfg, "Ekenox", "usuarios", "email_enc")
-    return bool(_EMAIL_ENC_IS_BYTEA)
+
+def is_email_enc_bytea(cfg: AppConfig, conn: Any = None) -> bool:
+    return usuarios_column_types(cfg, conn).get("email_enc") == "bytea"
 
 
 def email_hash_value(cfg: AppConfig, email: str) -> Any:
@@ -269,72 +267,93 @@ def email_hash_candidates(email: str) -> Tuple[str, bytes]:
 # PASSWORD
 # ============================================================
 
-def hash_password(password: str, salt: str) -> str:
-    dk = hashlib.pbkdf2_hmac(
-        "sha256",
-        password.encode("utf-8"),
-        salt.encode("utf-8"),
-        120_000,
-        dklen=32,
-    )
-    return dk.hex()
-
-
 def make_password_record(password: str) -> str:
-    salt = secrets.token_hex(16)
-    ph = hash_password(password, salt)
-    return f"{salt}${ph}"
+    # formato e custo únicos para todas as telas (credenciais.py)
+    return gerar_hash(password)
 
 
 # ============================================================
 # DB: USUÁRIOS
 # ============================================================
 
-def fetch_users(cfg: AppConfig, filtro: str = "") -> List[dict]:
-    """
-    - Lista usuários
-    - Mostra email de forma legível (se estiver em email_enc OU em email_hash)
-    - Se vier bytea/cripto/lixo, mostra [hash:xxxx]
-    """
-    filtro = (filtro or "").strip()
-    where = ""
-    params: List[Any] = []
+PAGINA_USUARIOS = 200
 
-    # filtro por nome e, se possível, por email (somente colunas text)
-    if filtro:
-        like = f"%{filtro.lower()}%"
-        clauses = ['LOWER(COALESCE(u."nome",\'\')) LIKE %s']
-        params.append(like)
+_SQL_USUARIOS = """
+    SELECT u."usuarioId",
+           COALESCE(u."nome",'') AS nome,
+           u."email_enc" AS email_enc,
+           u."email_hash" AS email_hash,
+           COALESCE(u."ativo", true) AS ativo
+      FROM "Ekenox"."usuarios" u
+     {where}
+     ORDER BY u."usuarioId" DESC
+     LIMIT %s
+"""
 
-        # se email_enc NÃO for bytea, dá pra filtrar também
-        if not is_email_enc_bytea(cfg):
-            clauses.append('LOWER(COALESCE(u."email_enc",\'\')) LIKE %s')
-            params.append(like)
 
-        # se email_hash NÃO for bytea, pode ser texto (às vezes o e-mail está aqui)
-        if not is_email_hash_bytea(cfg):
-            clauses.append(
-                'LOWER(COALESCE(u."email_hash"::text,\'\')) LIKE %s')
-            params.append(like)
+def _like(filtro: str) -> str:
+    """%trecho% em minúsculas, com %, _ e \\ do usuário escapados."""
+    t = filtro.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{t}%"
 
-        where = "WHERE " + " OR ".join(clauses)
 
-    sql = f"""
-        SELECT u."usuarioId",
-               COALESCE(u."nome",'') AS nome,
-               u."email_enc" AS email_enc,
-               u."email_hash" AS email_hash,
-               COALESCE(u."ativo", true) AS ativo
-          FROM "Ekenox"."usuarios" u
-          {where}
-         ORDER BY u."usuarioId" DESC
+def fetch_users(cfg: AppConfig, filtro: str = "", limite: int = PAGINA_USUARIOS,
+                antes_de_id: Optional[int] = None) -> Tuple[List[dict], bool]:
     """
-
+    Uma página da lista, do usuarioId maior para o menor, e se ela é a última.
+    Próxima página: antes_de_id = usuarioId da última linha recebida (sem OFFSET).
+
+    - filtro com cara de e-mail: primeiro email_hash = sha256(e-mail) (índice,
+      no máximo uma linha, e a busca acaba aí: não há "próxima página" por
+      trecho); sem resultado, cai na busca por trecho (e-mail antigo gravado
+      em texto)
+    - trecho: nome/e-mail com LIKE em lower(COALESCE(...)), a mesma expressão
+      dos índices GIN pg_trgm de usuarios_busca.sql (colunas bytea ficam de fora)
+    - mostra email de forma legível (se estiver em email_enc OU em email_hash);
+      se vier bytea/cripto/lixo, mostra [hash:xxxx]
+    """
+    filtro = (filtro or "").strip()
     conn = db_connect(cfg)
     try:
+        hash_bytea = is_email_hash_bytea(cfg, conn)
+        enc_bytea = is_email_enc_bytea(cfg, conn)
+
         with conn.cursor() as cur:
-            cur.execute(sql, tuple(params))
-            rows = cur.fetchall()
+            rows: List[Tuple[Any, ...]] = []
+            exato = False
+            if filtro and looks_like_email(filtro) and antes_de_id is None:
+                cur.execute(
+                    _SQL_USUARIOS.format(where='WHERE u."email_hash" = %s'),
+                    (email_hash_value(cfg, filtro), 1),
+                )
+                rows = cur.fetchall()
+                exato = bool(rows)
+
+            if not rows:
+                where: List[str] = []
+                params: List[Any] = []
+                if filtro:
+                    like = _like(filtro)
+                    clauses = ['lower(COALESCE(u."nome",\'\')) LIKE %s']
+                    params.append(like)
+                    if not enc_bytea:
+                        clauses.append('lower(COALESCE(u."email_enc",\'\')) LIKE %s')
+                        params.append(like)
+                    # às vezes o e-mail está em texto no email_hash
+                    if not hash_bytea:
+                        clauses.append('lower(COALESCE(u."email_hash",\'\')) LIKE %s')
+                        params.append(like)
+                    where.append("(" + " OR ".join(clauses) + ")")
+                if antes_de_id is not None:
+                    where.append('u."usuarioId" < %s')
+                    params.append(int(antes_de_id))
+                params.append(int(limite))
+
+                cur.execute(
+                    _SQL_USUARIOS.format(where=("WHERE " + " AND ".join(where)) if where else ""),
+                    tuple(params),
+                )
+                rows = cur.fetchall()
 
         out: List[dict] = []
         for r in rows:
@@ -347,7 +366,7 @@ def fetch_users(cfg: AppConfig, filtro: str = "") -> List[dict]:
                     "ativo": bool(r[4]),
                 }
             )
-        return out
+        return out, exato or len(out) < int(limite)
     finally:
         conn.close()
 
@@ -546,24 +565,60 @@ def fetch_user_program_levels(cfg: AppConfig, usuario_id: int) -> Dict[int, int]
         conn.close()
 
 
+# sem índice único em (usuarioId, programaId): ON CONFLICT não tem alvo
+PGCODE_SEM_ALVO_CONFLITO = "42P10"
+
+
 def save_user_permissions(cfg: AppConfig, usuario_id: int, perms: Dict[int, int]) -> None:
     """
     Regras:
       - nivel 0 => NÃO grava (fica sem linha na usuario_programa)
       - nivel 1/2/3 => grava
+
+    Numa transação: DELETE do que saiu + um upsert em lote (execute_values);
+    linha com o mesmo nível não é regravada. Sem o índice único de
+    usuarios_busca.sql, volta para DELETE + INSERT em lote.
     """
+    uid = int(usuario_id)
+    linhas = [(uid, int(pid), int(nv)) for pid, nv in perms.items() if int(nv) > 0]
+    mantidos = [pid for (_u, pid, _n) in linhas]
+
     conn = db_connect(cfg)
     try:
-        with conn.cursor() as cur:
-            cur.execute(
-                'DELETE FROM "Ekenox"."usuario_programa" WHERE "usuarioId" = %s', (int(usuario_id),))
-            for programa_id, nivel in perms.items():
-                if int(nivel) <= 0:
-                    continue
+        try:
+            with conn.cursor() as cur:
                 cur.execute(
-                    'INSERT INTO "Ekenox"."usuario_programa" ("usuarioId","programaId","nivel") VALUES (%s,%s,%s)',
-                    (int(usuario_id), int(programa_id), int(nivel)),
+                    'DELETE FROM "Ekenox"."usuario_programa" '
+                    'WHERE "usuarioId" = %s AND NOT ("programaId" = ANY(%s))',
+                    (uid, mantidos),
                 )
+                if linhas:
+                    execute_values(
+                        cur,
+                        """
+                        INSERT INTO "Ekenox"."usuario_programa" ("usuarioId","programaId","nivel")
+                        VALUES %s
+                        ON CONFLICT ("usuarioId","programaId") DO UPDATE
+                           SET "nivel" = EXCLUDED."nivel"
+                         WHERE "Ekenox"."usuario_programa"."nivel" IS DISTINCT FROM EXCLUDED."nivel"
+                        """,
+                        linhas,
+                        page_size=len(linhas),
+                    )
+        except psycopg2.Error as e:
+            if getattr(e, "pgcode", None) != PGCODE_SEM_ALVO_CONFLITO:
+                raise
+            conn.rollback()
+            log("save_user_permissions: sem índice único em usuario_programa (rodar usuarios_busca.sql)")
+            with conn.cursor() as cur:
+                cur.execute('DELETE FROM "Ekenox"."usuario_programa" WHERE "usuarioId" = %s', (uid,))
+                if linhas:
+                    execute_values(
+                        cur,
+                        'INSERT INTO "Ekenox"."usuario_programa" ("usuarioId","programaId","nivel") VALUES %s',
+                        linhas,
+                        page_size=len(linhas),
+                    )
         conn.commit()
     finally:
         conn.close()
@@ -760,16 +815,14 @@ class TelaUsuariosApp(tk.Tk):
             messagebox.showerror(
                 "Banco de Dados", f"Falha ao conectar:\n{err}")
 
-        # aquece caches
-        try:
-            is_email_hash_bytea(self.cfg)
-            is_email_enc_bytea(self.cfg)
-        except Exception:
-            pass
+        # aquece o cache dos tipos de coluna (uma consulta)
+        usuarios_column_types(self.cfg)
 
         self.programs = fetch_programs(self.cfg)
 
         self.selected_user_id: Optional[int] = None
+        self._filtro_usuarios = ""
+        self._ultimo_usuario_id: Optional[int] = None
         self.program_rows: Dict[str, dict] = {}
 
         self._btn_novo: Optional[ttk.Button] = None
@@ -777,6 +830,7 @@ class TelaUsuariosApp(tk.Tk):
         self._btn_senha: Optional[ttk.Button] = None
         self._btn_toggle: Optional[ttk.Button] = None
         self._btn_salvar_perms: Optional[ttk.Button] = None
+        self._btn_mais: Optional[ttk.Button] = None
 
         self._ent_nome: Optional[ttk.Entry] = None
         self._ent_email: Optional[ttk.Entry] = None
@@ -899,6 +953,10 @@ class TelaUsuariosApp(tk.Tk):
         ttk.Button(btn_col_users, text="Recarregar",
                    command=self._load_users).pack(fill="x")
 
+        self._btn_mais = ttk.Button(
+            btn_col_users, text="Carregar mais", command=self._load_more_users)
+        self._btn_mais.pack(fill="x", pady=(6, 0))
+
         # Posicionamento Tree + Scroll (grid)
         self.tree_users.grid(row=0, column=0, sticky="nsew")
         sb.grid(row=0, column=1, sticky="ns")
@@ -1043,16 +1101,22 @@ class TelaUsuariosApp(tk.Tk):
         self._load_users()
 
     def _load_users(self) -> None:
-        filtro = self.var_search.get()
+        """Primeira página com o filtro atual (a lista é refeita)."""
+        self._filtro_usuarios = self.var_search.get()
+        self._ultimo_usuario_id = None
+        for i in self.tree_users.get_children():
+            self.tree_users.delete(i)
+        self._load_more_users()
+
+    def _load_more_users(self) -> None:
+        """Próxima página (keyset pelo último usuarioId da lista)."""
         try:
-            users = fetch_users(self.cfg, filtro=filtro)
+            users, fim = fetch_users(self.cfg, filtro=self._filtro_usuarios,
+                                     antes_de_id=self._ultimo_usuario_id)
         except Exception as e:
             messagebox.showerror("Erro", f"Falha ao buscar usuários:\n{e}")
             return
 
-        for i in self.tree_users.get_children():
-            self.tree_users.delete(i)
-
         for u in users:
             self.tree_users.insert(
                 "",
@@ -1060,6 +1124,11 @@ class TelaUsuariosApp(tk.Tk):
                 values=(u["usuarioId"], u["nome"], u["email_disp"],
                         "Sim" if u["ativo"] else "Não"),
             )
+        if users:
+            self._ultimo_usuario_id = int(users[-1]["usuarioId"])
+
+        if self._btn_mais:
+            self._btn_mais.state(["disabled"] if fim else ["!disabled"])
 
     def _new_user(self) -> None:
         if self.acesso_nivel < 2:
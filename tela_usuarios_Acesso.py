@@ -4,7 +4,6 @@ import argparse
 import hashlib
 import json
 import os
-import secrets
 import sys
 import tkinter as tk
 from dataclasses import dataclass
@@ -13,6 +12,9 @@ from typing import Dict, List, Optional, Tuple, Union
 
 import psycopg2
 
+from credenciais import gerar_hash
+from sistema_log import log_write
+
 
 # ============================================================
 # PATHS / LOG
@@ -24,16 +26,11 @@ os.makedirs(BASE_DIR, exist_ok=True)
 
 LOG_DIR = os.path.join(BASE_DIR, "logs")
 os.makedirs(LOG_DIR, exist_ok=True)
-LOG_FILE = os.path.join(LOG_DIR, "tela_usuarios.log")
 CONFIG_FILE = os.path.join(BASE_DIR, "config_op.json")
 
 
 def log(msg: str) -> None:
-    try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(msg + "\n")
-    except Exception:
-        pass
+    log_write(LOG_DIR, "tela_usuarios.log", msg)
 
 
 # ============================================================
@@ -143,21 +140,9 @@ def email_hash(email: str) -> str:
     return hashlib.sha256(e.encode("utf-8")).hexdigest()
 
 
-def hash_password(password: str, salt: str) -> str:
-    dk = hashlib.pbkdf2_hmac(
-        "sha256",
-        password.encode("utf-8"),
-        salt.encode("utf-8"),
-        120_000,
-        dklen=32,
-    )
-    return dk.hex()
-
-
 def make_password_record(password: str) -> str:
-    salt = secrets.token_hex(16)
-    ph = hash_password(password, salt)
-    return f"{salt}${ph}"
+    # formato e custo únicos para todas as telas (credenciais.py)
+    return gerar_hash(password)
 
 
 # ============================================================
@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+"""
+tempo_limite.py
+Tempo máximo por classe de consulta e cancelamento pela tela.
+
+Classes (ms; AppConfig.limite_<classe>_ms ou env EKENOX_LIMITE_<CLASSE>_MS;
+0 = sem limite):
+- CONSULTA  (3 s)    busca interativa: produto, saldo, nome, referência
+- LISTA     (15 s)   listas das telas (F10, CRUDs)
+- RELATORIO (120 s)  F7/F9, relatório de componentes
+- GRAVACAO  (10 s)   INSERT/UPDATE/DELETE, finalização
+
+- aplicar_limite(cur, classe): SET LOCAL statement_timeout — vale até o fim
+  da transação (commit/rollback volta ao padrão do servidor). Com o
+  CursorLimitado numa ConexaoLimitada o SET não se repete enquanto a
+  transação e a classe são as mesmas (um round-trip a mais por transação,
+  não por consulta); sem a ConexaoLimitada o SET vai sempre
+- ConexaoLimitada (connection_factory): conta commit/rollback, para o
+  cursor saber se o SET que ele lembra é da transação atual
+- CursorLimitado (cursor_factory do psycopg2): consulta interrompida
+  (SQLSTATE 57014, por tempo ou por cancelamento) é registrada em memória
+  e em logs/consulta_interrompida.log
+- cancelar(conn): conn.cancel() — pode ser chamado de outra thread; a
+  consulta em andamento termina com QueryCanceled e a conexão continua boa
+- executar_com_cancelar(): roda fn numa thread e mostra "Aguarde" com botão
+  Cancelar; a janela continua respondendo enquanto o banco trabalha
+"""
+
+import os
+import threading
+import time
+import tkinter as tk
+from collections import Counter, deque
+from dataclasses import dataclass
+from datetime import datetime
+from tkinter import ttk
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from psycopg2 import errors as pg_errors
+from psycopg2 import extensions as pg_ext
+
+from sistema_log import log_write
+from sistema_metricas import METRICAS, fingerprint
+
+
+CONSULTA = "consulta"
+LISTA = "lista"
+RELATORIO = "relatorio"
+GRAVACAO = "gravacao"
+
+LIMITES_PADRAO_MS: Dict[str, int] = {
+    CONSULTA: 3_000,
+    LISTA: 15_000,
+    RELATORIO: 120_000,
+    GRAVACAO: 10_000,
+}
+
+_limites: Dict[str, int] = dict(LIMITES_PADRAO_MS)
+
+
+class ConsultaCancelada(RuntimeError):
+    """A execução foi cancelada pelo usuário (as consultas seguintes nem vão ao banco)."""
+
+
+def configurar(cfg: Any) -> None:
+    """Lê limite_<classe>_ms do AppConfig (campos ausentes ficam no padrão)."""
+    for classe in LIMITES_PADRAO_MS:
+        v = getattr(cfg, f"limite_{classe}_ms", None)
+        if v is None:
+            continue
+        try:
+            _limites[classe] = max(0, int(v))
+        except (TypeError, ValueError):
+            pass
+
+
+def limite_ms(classe: str) -> int:
+    env = (os.getenv(f"EKENOX_LIMITE_{classe.upper()}_MS") or "").strip()
+    if env:
+        try:
+            return max(0, int(env))
+        except ValueError:
+            pass
+    return _limites.get(classe, _limites[CONSULTA])
+
+
+# ============================================================
+# CONEXÃO / CURSOR
+# ============================================================
+
+class ConexaoLimitada(pg_ext.connection):
+    """
+    connection_factory: transacao muda a cada commit/rollback. Transação
+    aberta por outro caminho (mixins com cursor próprio, rollback depois
+    de erro) não herda o SET de uma transação já encerrada.
+    """
+
+    transacao: int = 0
+
+    def commit(self):
+        try:
+            return super().commit()
+        finally:
+            self.transacao += 1
+
+    def rollback(self):
+        try:
+            return super().rollback()
+        finally:
+            self.transacao += 1
+
+
+class CursorLimitado(pg_ext.cursor):
+    """cursor_factory: lembra o limite aplicado e registra as interrupções."""
+
+    classe_limite: str = CONSULTA
+    limite_ativo_ms: Optional[int] = None
+    limite_transacao: Optional[int] = None      # ConexaoLimitada.transacao do SET
+
+    def execute(self, query, vars=None):
+        t0 = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        except pg_errors.QueryCanceled as e:
+            _registrar(self.connection, self.classe_limite, self.limite_ativo_ms,
+                       query, (time.perf_counter() - t0) * 1000.0, e)
+            raise
+
+
+def aplicar_limite(cur: Any, classe: str) -> int:
+    """SET LOCAL statement_timeout da classe (em autocommit, SET da sessão)."""
+    ms = limite_ms(classe)
+    conn = cur.connection
+    transacao = getattr(conn, "transacao", None)    # só na ConexaoLimitada
+    limitado = isinstance(cur, CursorLimitado)
+    if limitado:
+        cur.classe_limite = classe
+        if cur.limite_ativo_ms == ms and transacao is not None \
+                and cur.limite_transacao == transacao and not conn.autocommit \
+                and conn.get_transaction_status() != pg_ext.TRANSACTION_STATUS_IDLE:
+            return ms
+    escopo = "" if conn.autocommit else "LOCAL "
+    cur.execute(f"SET {escopo}statement_timeout = %s", (int(ms),))
+    if limitado:
+        cur.limite_ativo_ms = ms
+        cur.limite_transacao = transacao
+    return ms
+
+
+# ============================================================
+# REGISTRO DAS INTERRUPÇÕES
+# ============================================================
+
+@dataclass
+class Interrupcao:
+    ts: datetime
+    classe: str
+    motivo: str                 # "tempo" | "cancelada"
+    limite_ms: Optional[int]
+    duracao_ms: float
+    fingerprint: str
+
+
+_interrupcoes: Deque[Interrupcao] = deque(maxlen=200)
+_contagem: Counter = Counter()
+_cancelando: set = set()        # id(conn) com cancelamento pedido pela tela
+_lock = threading.Lock()
+
+
+def _registrar(conn: Any, classe: str, limite: Optional[int], sql: Any,
+               duracao_ms: float, err: BaseException) -> None:
+    with _lock:
+        motivo = "cancelada" if id(conn) in _cancelando else "tempo"
+        _cancelando.discard(id(conn))
+        it = Interrupcao(datetime.now(), classe, motivo, limite, round(duracao_ms, 3),
+                         fingerprint(sql if isinstance(sql, str) else str(sql)))
+        _interrupcoes.append(it)
+        _contagem[(classe, motivo)] += 1
+    if METRICAS.log_dir:
+        log_write(METRICAS.log_dir, "consulta_interrompida.log", f"consulta {motivo}",
+                  classe=classe, motivo=motivo, limite_ms=limite, duracao_ms=it.duracao_ms,
+                  fingerprint=it.fingerprint, erro=str(err).strip()[:300])
+
+
+def interrupcoes() -> List[Interrupcao]:
+    with _lock:
+        return list(_interrupcoes)
+
+
+def contagem_interrupcoes() -> Dict[Tuple[str, str], int]:
+    """{(classe, motivo): n} desde o início do processo."""
+    with _lock:
+        return dict(_contagem)
+
+
+def total_interrupcoes() -> int:
+    with _lock:
+        return sum(_contagem.values())
+
+
+def cancelar(conn: Any) -> bool:
+    """Pede ao servidor para interromper a consulta em andamento em conn."""
+    if conn is None or getattr(conn, "closed", 1):
+        return False
+    with _lock:
+        _cancelando.add(id(conn))
+    try:
+        conn.cancel()
+        return True
+    except Exception:
+        with _lock:
+            _cancelando.discard(id(conn))
+        return False
+
+
+# ============================================================
+# EXECUÇÃO CANCELÁVEL
+# ============================================================
+
+class ExecucaoCancelavel:
+    """
+    fn() numa thread. conexao() devolve a conexão usada por fn no momento do
+    cancelamento (o sistema pode ter reconectado no meio).
+    """
+
+    def __init__(self, fn: Callable[[], Any], conexao: Callable[[], Any],
+                 ao_cancelar: Optional[Callable[[], None]] = None) -> None:
+        self.fn = fn
+        self.conexao = conexao
+        self.ao_cancelar = ao_cancelar
+        self.resultado: Any = None
+        self.erro: Optional[BaseException] = None
+        self.cancelada = False
+        self._fim = threading.Event()
+        self._thread = threading.Thread(target=self._rodar, name="consulta-cancelavel", daemon=True)
+
+    def iniciar(self) -> "ExecucaoCancelavel":
+        self._thread.start()
+        return self
+
+    @property
+    def terminou(self) -> bool:
+        return self._fim.is_set()
+
+    def _rodar(self) -> None:
+        try:
+            self.resultado = self.fn()
+        except BaseException as e:
+            self.erro = e
+        finally:
+            conn = self.conexao()
+            with _lock:
+                _cancelando.discard(id(conn))
+            self._fim.set()
+
+    def cancelar(self) -> None:
+        if self.cancelada or self.terminou:
+            return
+        self.cancelada = True
+        if self.ao_cancelar is not None:
+            self.ao_cancelar()
+        cancelar(self.conexao())
+
+
+def executar_com_cancelar(parent: tk.Misc, titulo: str, mensagem: str,
+                          fn: Callable[[], Any], conexao: Callable[[], Any],
+                          ao_cancelar: Optional[Callable[[], None]] = None,
+                          atraso_ms: int = 300) -> ExecucaoCancelavel:
+    """
+    Roda fn numa thread e espera (sem travar o Tk). A janela "Aguarde" só
+    aparece se passar de atraso_ms. Devolve a execução: ver .cancelada,
+    .erro e .resultado.
+    """
+    ex = ExecucaoCancelavel(fn, conexao, ao_cancelar).iniciar()
+    ex._fim.wait(atraso_ms / 1000.0)
+    if ex.terminou:
+        return ex
+
+    win = tk.Toplevel(parent)
+    win.title(titulo)
+    win.resizable(False, False)
+    win.transient(parent)
+    frm = ttk.Frame(win, padding=16)
+    frm.pack(fill=tk.BOTH, expand=True)
+    ttk.Label(frm, text=mensagem).pack(anchor="w")
+    barra = ttk.Progressbar(frm, mode="indeterminate", length=280)
+    barra.pack(fill=tk.X, pady=(10, 10))
+    barra.start(15)
+    btn = ttk.Button(frm, text="Cancelar")
+    btn.pack(anchor="e")
+
+    def clicar():
+        btn.config(state="disabled", text="Cancelando...")
+        ex.cancelar()
+
+    btn.config(command=clicar)
+    win.protocol("WM_DELETE_WINDOW", clicar)
+    win.bind("<Escape>", lambda e: clicar())
+
+    def vigiar():
+        if ex.terminou:
+            win.destroy()
+        else:
+            win.after(100, vigiar)
+
+    try:
+        win.grab_set()
+    except tk.TclError:
+        pass
+    win.after(100, vigiar)
+    parent.wait_window(win)
+    ex._fim.wait()
+    return ex
+
+
+# ============================================================
+# MIXIN
+# ============================================================
+
+class LimiteConsultaMixin:
+    """Requer self.cursor e self.conn (igual aos CRUDMixins)."""
+
+    @property
+    def ocupado(self) -> bool:
+        """Uma execução cancelável está usando a conexão em outra thread."""
+        return bool(getattr(self, "_execucao_ativa", None))
+
+    def _limitar(self, classe: str) -> None:
+        """Antes de cada execute: cancelado -> nem vai ao banco; senão SET LOCAL da classe."""
+        if getattr(self, "_cancelar_pedido", False):
+            raise ConsultaCancelada("Consulta cancelada.")
+        aplicar_limite(self.cursor, classe)
+
+    def executar_cancelavel(self, parent: tk.Misc, titulo: str, mensagem: str,
+                            fn: Callable[[], Any]) -> ExecucaoCancelavel:
+        """
+        fn usa os métodos do sistema numa thread; Cancelar faz conn.cancel()
+        e as consultas seguintes de fn falham na hora (ConsultaCancelada).
+        """
+        self._cancelar_pedido = False
+
+        def pedir():
+            self._cancelar_pedido = True
+
+        self._execucao_ativa = True
+        try:
+            ex = executar_com_cancelar(parent, titulo, mensagem, fn,
+                                       lambda: self.conn, ao_cancelar=pedir)
+        finally:
+            self._execucao_ativa = False
+            self._cancelar_pedido = False
+        if ex.cancelada and self.conn:
+            try:
+                self.conn.rollback()
+            except Exception:
+                pass
+        return ex
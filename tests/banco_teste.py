@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+"""
+banco_teste.py
+Conexão dos testes que precisam de Postgres.
+
+EKENOX_TEST_DSN aponta para um banco DESCARTÁVEL (os testes criam o schema
+"Ekenox" se ele não existir e gravam/apagam dados de teste). Sem a variável,
+os testes de banco são pulados (unittest.SkipTest).
+
+    EKENOX_TEST_DSN="dbname=ekenox_teste user=postgres" python -m unittest discover -s tests -t .
+"""
+
+import os
+import unittest
+from typing import Any
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_preparado = False
+
+
+def conectar_teste(autocommit: bool = False) -> Any:
+    """Conexão psycopg2 no banco de teste; pula o teste se não houver DSN."""
+    dsn = os.getenv("EKENOX_TEST_DSN", "").strip()
+    if not dsn:
+        raise unittest.SkipTest("EKENOX_TEST_DSN não definido (banco de teste)")
+    import psycopg2
+
+    conn = psycopg2.connect(dsn, connect_timeout=5)
+    conn.autocommit = autocommit
+    return conn
+
+
+def aplicar_sql(conn: Any, *arquivos: str) -> None:
+    """Roda scripts .sql da raiz do projeto (cada um tem o próprio BEGIN/COMMIT)."""
+    antes = conn.autocommit
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for nome in arquivos:
+                with open(os.path.join(RAIZ, nome), "r", encoding="utf-8") as f:
+                    cur.execute(f.read())
+    finally:
+        conn.autocommit = antes
+
+
+def preparar_schema(conn: Any, *extras: str) -> None:
+    """
+    Cria o schema "Ekenox" pelo Criacao_arquivo.sql se ele ainda não existir
+    (o script não é idempotente) e aplica os .sql extras (idempotentes).
+    """
+    global _preparado
+    if not _preparado:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_namespace WHERE nspname = 'Ekenox';")
+            existe = cur.fetchone() is not None
+        conn.rollback()
+        if not existe:
+            with conn.cursor() as cur:
+                cur.execute('CREATE SCHEMA "Ekenox";')
+            conn.commit()
+            aplicar_sql(conn, "Criacao_arquivo.sql")
+        _preparado = True
+    if extras:
+        aplicar_sql(conn, *extras)
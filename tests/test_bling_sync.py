@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+"""
+bling_sync contra o bling_mock (servidor HTTP local): páginas em ordem sob
+o limitador de taxa e com 429, renovação do token vencido/rejeitado por
+"Ekenox".token, cursor incremental em "Ekenox".sequenciadores e upsert
+idempotente (segunda carga igual não grava nada).
+
+Os casos com banco gravam com COMMIT (a sincronização faz o próprio) e
+apagam os IDs do servidor falso no fim.
+"""
+
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from bling_mock import CLIENT_ID, CLIENT_SECRET, ServidorBlingFalso
+from bling_sync import ClienteBling, SincronizadorBling, TokenBling, ler_cursor
+from tests.banco_teste import conectar_teste, preparar_schema
+
+INTEGRACAO_TESTE = "bling-teste"
+TOKEN_ID = 990000001
+
+
+class _TokenFixo:
+    """O que o ClienteBling usa do TokenBling, sem banco (access_token inicial do mock)."""
+
+    def obter(self) -> str:
+        return "token-0"
+
+    def renovar(self, rejeitado: Optional[str] = None) -> str:
+        return "token-0"
+
+
+# ============================================================
+# HTTP (sem banco)
+# ============================================================
+
+class PaginasLimitadorTest(unittest.TestCase):
+    def test_paginas_em_ordem_mesmo_com_429(self) -> None:
+        with ServidorBlingFalso(produtos=250, pedidos=0, erro_429_a_cada=3) as srv:
+            cli = ClienteBling(srv.base_url, _TokenFixo(), req_por_s=50, paralelo=3)
+            t0 = time.monotonic()
+            paginas = list(cli.paginas("produtos"))
+            duracao = time.monotonic() - t0
+            total = srv.total
+
+        self.assertEqual([len(p) for p in paginas], [100, 100, 50])
+        ids = [p["id"] for pagina in paginas for p in pagina]
+        self.assertEqual(ids, [16000000000 + i for i in range(250)])
+        # o 429 foi repetido (e contado) depois do Retry-After de 0,2 s
+        self.assertGreater(total, 3)
+        self.assertEqual(cli.requisicoes, total)
+        self.assertGreaterEqual(duracao, 0.2)
+
+    def test_limitador_espaca_as_requisicoes_de_todas_as_threads(self) -> None:
+        with ServidorBlingFalso(produtos=450, pedidos=0) as srv:
+            cli = ClienteBling(srv.base_url, _TokenFixo(), req_por_s=20, paralelo=3)
+            t0 = time.monotonic()
+            lidos = sum(len(p) for p in cli.paginas("produtos"))
+            duracao = time.monotonic() - t0
+            total = srv.total
+
+        self.assertEqual(lidos, 450)
+        self.assertEqual(total, 6)                  # duas ondas de 3 páginas
+        self.assertGreaterEqual(duracao, (total - 1) * cli.limitador.intervalo - 0.01)
+
+
+# ============================================================
+# TOKEN ("Ekenox".token)
+# ============================================================
+
+class TokenBancoTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.conn = conectar_teste()
+        preparar_schema(self.conn)
+        self._apagar()
+
+    def tearDown(self) -> None:
+        self.conn.rollback()
+        self._apagar()
+        self.conn.close()
+
+    def _apagar(self) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute('DELETE FROM "Ekenox".token WHERE id = %s;', (TOKEN_ID,))
+        self.conn.commit()
+
+    def _gravar(self, access: str, refresh: str, expira: datetime) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute(
+                'INSERT INTO "Ekenox".token (id, integracao, client_id, client_secret, '
+                'access_token, refresh_token, expires_at) VALUES (%s, %s, %s, %s, %s, %s, %s);',
+                (TOKEN_ID, INTEGRACAO_TESTE, CLIENT_ID, CLIENT_SECRET, access, refresh, expira))
+        self.conn.commit()
+
+    def _linha(self):
+        with self.conn.cursor() as cur:
+            cur.execute('SELECT access_token, refresh_token, expires_at FROM "Ekenox".token '
+                        'WHERE id = %s;', (TOKEN_ID,))
+            r = cur.fetchone()
+        self.conn.rollback()
+        return r
+
+    def _cliente(self, srv: ServidorBlingFalso):
+        token = TokenBling(conectar_teste, srv.base_url, integracao=INTEGRACAO_TESTE)
+        return token, ClienteBling(srv.base_url, token, req_por_s=50)
+
+    def test_token_vencido_e_renovado_antes_da_chamada(self) -> None:
+        self._gravar("token-velho", "refresh-0", datetime.now(timezone.utc) - timedelta(hours=1))
+        with ServidorBlingFalso(produtos=5, pedidos=0) as srv:
+            token, cli = self._cliente(srv)
+            dados = cli.get("produtos")
+            oauth = srv.requisicoes["oauth"]
+
+        self.assertEqual(len(dados["data"]), 5)
+        self.assertEqual((oauth, token.renovacoes), (1, 1))
+        access, refresh, expira = self._linha()
+        self.assertEqual((access, refresh), ("token-1", "refresh-1"))
+        self.assertGreater(expira, datetime.now(timezone.utc))
+
+    def test_401_renova_e_repete(self) -> None:
+        self._gravar("token-0", "refresh-0", datetime.now(timezone.utc) + timedelta(hours=6))
+        with ServidorBlingFalso(produtos=5, pedidos=0, requisicoes_por_token=2) as srv:
+            token, cli = self._cliente(srv)
+            for _ in range(3):
+                cli.get("produtos")
+            rejeitadas = srv.total - 3
+
+        self.assertEqual(rejeitadas, 1)
+        self.assertEqual(token.renovacoes, 1)
+        self.assertEqual(self._linha()[:2], ("token-1", "refresh-1"))
+
+    def test_outro_processo_usa_o_token_ja_renovado(self) -> None:
+        self._gravar("token-velho", "refresh-0", datetime.now(timezone.utc) - timedelta(hours=1))
+        with ServidorBlingFalso(produtos=5, pedidos=0) as srv:
+            primeiro, _ = self._cliente(srv)
+            segundo, _ = self._cliente(srv)
+            self.assertEqual(primeiro.obter(), "token-1")
+            # o refresh-0 já foi gasto: o segundo lê a linha em vez de renovar de novo
+            self.assertEqual(segundo.renovar(rejeitado="token-velho"), "token-1")
+            oauth = srv.requisicoes["oauth"]
+
+        self.assertEqual(oauth, 1)
+        self.assertEqual(segundo.renovacoes, 0)
+
+
+# ============================================================
+# SINCRONIZAÇÃO (cursor e upsert)
+# ============================================================
+
+class SincronizacaoBancoTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.conn = conectar_teste()
+        preparar_schema(self.conn)
+        self._apagar()
+
+    def tearDown(self) -> None:
+        self.conn.rollback()
+        self._apagar()
+        self.conn.close()
+
+    def _apagar(self) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute('DELETE FROM "Ekenox".itens WHERE "fkPedido" BETWEEN 20000000000 AND 20000999999;')
+            cur.execute('DELETE FROM "Ekenox".pedidos WHERE "idPedido" BETWEEN 20000000000 AND 20000999999;')
+            cur.execute('DELETE FROM "Ekenox".contatos WHERE "idContato" BETWEEN 30000000000 AND 30000000999;')
+            cur.execute("""DELETE FROM "Ekenox".produtos WHERE "produtoId" ~ '^1600000[0-9]{4}$';""")
+            cur.execute("""DELETE FROM "Ekenox".sequenciadores WHERE tabela IN ('sync:produtos', 'sync:pedidos');""")
+        self.conn.commit()
+
+    def _sincronizador(self, srv: ServidorBlingFalso, tentativas: int = 5) -> SincronizadorBling:
+        cli = ClienteBling(srv.base_url, _TokenFixo(), req_por_s=50, tentativas=tentativas)
+        return SincronizadorBling(self.conn, cli)
+
+    def _cursor(self, entidade: str) -> Optional[datetime]:
+        quando = ler_cursor(self.conn, entidade)
+        self.conn.rollback()
+        return quando
+
+    def test_cursor_pede_so_o_alterado(self) -> None:
+        with ServidorBlingFalso(produtos=150, pedidos=0) as srv:
+            sinc = self._sincronizador(srv)
+            antes = datetime.now().replace(microsecond=0)
+            (r1,) = sinc.sincronizar(["produtos"])
+            cursor1 = self._cursor("produtos")
+            (r2,) = sinc.sincronizar(["produtos"])
+            srv.dados.tocar(3)
+            (r3,) = sinc.sincronizar(["produtos"])
+
+        self.assertEqual(r1.erro, "")
+        self.assertIsNone(r1.desde)
+        self.assertEqual((r1.lidos, r1.gravados), (150, 150))
+        self.assertGreaterEqual(cursor1, antes)
+
+        self.assertEqual(r2.desde, cursor1 - timedelta(minutes=2))
+        self.assertEqual(r2.lidos, 0)
+        self.assertEqual((r3.lidos, r3.gravados), (3, 3))
+
+    def test_erro_desfaz_e_mantem_o_cursor(self) -> None:
+        with ServidorBlingFalso(produtos=150, pedidos=0) as srv:
+            self._sincronizador(srv).sincronizar(["produtos"])
+            antes = self._cursor("produtos")
+            srv.dados.tocar(5)
+            srv.erro_429_a_cada = 1                 # toda requisição -> 429
+            (r,) = self._sincronizador(srv, tentativas=2).sincronizar(["produtos"])
+
+        self.assertIn("desistiu", r.erro)
+        self.assertEqual(self._cursor("produtos"), antes)
+
+    def test_upsert_repetido_nao_regrava(self) -> None:
+        with ServidorBlingFalso(produtos=120, pedidos=40) as srv:
+            sinc = self._sincronizador(srv)
+            primeira = sinc.sincronizar(["produtos", "pedidos"], completo=True)
+            segunda = sinc.sincronizar(["produtos", "pedidos"], completo=True)
+
+        self.assertEqual([r.erro for r in primeira + segunda], [""] * 4)
+        self.assertEqual([r.lidos for r in primeira], [120, 40])
+        self.assertTrue(all(r.gravados > 0 for r in primeira))
+        self.assertEqual([r.lidos for r in segunda], [120, 40])
+        self.assertEqual([(r.gravados, r.removidos) for r in segunda], [(0, 0), (0, 0)])
+
+        with self.conn.cursor() as cur:
+            cur.execute("""SELECT count(*) FROM "Ekenox".produtos WHERE "produtoId" ~ '^1600000[0-9]{4}$';""")
+            self.assertEqual(cur.fetchone()[0], 120)
+            cur.execute('SELECT count(*) FROM "Ekenox".pedidos WHERE "idPedido" BETWEEN 20000000000 AND 20000999999;')
+            self.assertEqual(cur.fetchone()[0], 40)
+
+
+if __name__ == "__main__":
+    unittest.main()
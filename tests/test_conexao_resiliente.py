@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+"""
+Sem banco, saldo/produto/estoque máximo do SistemaOrdemProducao levantam
+ConexaoIndisponivel em vez de devolver 0/None (número errado na tela), e
+reconexoes conta cada conexão reaberta (a tela descarta o que foi
+calculado durante a queda).
+"""
+
+import unittest
+
+from conexao_resiliente import ConexaoIndisponivel
+
+
+class SemBancoTest(unittest.TestCase):
+    def setUp(self) -> None:
+        from Ordem_Producao import AppConfig, SistemaOrdemProducao
+
+        self.sistema = SistemaOrdemProducao(AppConfig())
+        self.sistema.conectar = lambda: False       # servidor fora do ar
+
+    def test_saldo_sem_banco_nao_e_zero(self) -> None:
+        with self.assertRaises(ConexaoIndisponivel):
+            self.sistema.saldo_fisico(1)
+        self.assertTrue(self.sistema.degradado)
+
+    def test_produto_sem_banco_nao_e_nao_encontrado(self) -> None:
+        with self.assertRaises(ConexaoIndisponivel):
+            self.sistema.validar_produto(1)
+
+    def test_estoque_maximo_sem_banco(self) -> None:
+        with self.assertRaises(ConexaoIndisponivel):
+            self.sistema.buscar_estoque_maximo(1)
+
+    def test_reconexoes_conta_so_as_que_deram_certo(self) -> None:
+        self.assertFalse(self.sistema.reconectar(forcar=True))
+        self.assertEqual(self.sistema.reconexoes, 0)
+        self.sistema.conectar = lambda: True
+        self.assertTrue(self.sistema.reconectar(forcar=True))
+        self.assertEqual(self.sistema.reconexoes, 1)
+        self.assertFalse(self.sistema.degradado)
+
+
+if __name__ == "__main__":
+    unittest.main()
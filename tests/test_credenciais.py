@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+"""
+credenciais (sem banco): registro antigo salt$hash e atual pbkdf2_sha256$...,
+senha errada, rehash só quando o custo gravado é menor que o calibrado,
+bcrypt com pepper (pulado sem bcrypt/passlib) e atualizar_hash só
+regravando o hash que foi verificado.
+"""
+
+import hashlib
+import unittest
+from typing import Any, List, Optional, Tuple
+from unittest import mock
+
+import credenciais
+from credenciais import (
+    ITERACOES_ANTIGO,
+    PREFIXO,
+    atualizar_hash,
+    gerar_hash,
+    precisa_rehash,
+    verificar,
+)
+
+CALIBRADO = 150_000
+
+
+def _hash_antigo(senha: str, salt: str = "0123456789abcdef") -> str:
+    h = hashlib.pbkdf2_hmac("sha256", senha.encode("utf-8"), salt.encode("utf-8"),
+                            ITERACOES_ANTIGO, dklen=32).hex()
+    return f"{salt}${h}"
+
+
+def _bcrypt_disponivel() -> bool:
+    for modulo in ("bcrypt", "passlib"):
+        try:
+            __import__(modulo)
+            return True
+        except ImportError:
+            pass
+    return False
+
+
+class _CalibradoFixo(unittest.TestCase):
+    """Custo calibrado fixo: o teste não depende da velocidade da máquina."""
+
+    def setUp(self) -> None:
+        self._antes = credenciais._calibrado
+        credenciais._calibrado = CALIBRADO
+
+    def tearDown(self) -> None:
+        credenciais._calibrado = self._antes
+
+
+# ============================================================
+# VERIFICAÇÃO
+# ============================================================
+
+class VerificarTest(_CalibradoFixo):
+    def test_registro_antigo_confere_e_pede_rehash(self) -> None:
+        armazenado = _hash_antigo("s3nha")
+        r = verificar("s3nha", armazenado)
+        self.assertTrue(r.ok)
+        self.assertIsNotNone(r.novo_hash)
+        self.assertTrue(r.novo_hash.startswith(f"{PREFIXO}${CALIBRADO}$"))
+        self.assertTrue(verificar("s3nha", r.novo_hash).ok)
+
+    def test_registro_atual_confere_sem_rehash(self) -> None:
+        armazenado = gerar_hash("s3nha")
+        self.assertEqual(armazenado.split("$")[:2], [PREFIXO, str(CALIBRADO)])
+        r = verificar("s3nha", armazenado)
+        self.assertTrue(r.ok)
+        self.assertIsNone(r.novo_hash)
+
+    def test_senha_errada(self) -> None:
+        for armazenado in (_hash_antigo("s3nha"), gerar_hash("s3nha")):
+            r = verificar("outra", armazenado)
+            self.assertFalse(r.ok)
+            self.assertIsNone(r.novo_hash)
+
+    def test_registro_vazio_ou_invalido(self) -> None:
+        self.assertFalse(verificar("s3nha", "").ok)
+        self.assertFalse(verificar("s3nha", "sem-separador").ok)
+        self.assertFalse(verificar("s3nha", f"{PREFIXO}$muitas$salt$hash").ok)
+
+
+class PrecisaRehashTest(_CalibradoFixo):
+    def test_custo_menor_que_o_calibrado(self) -> None:
+        self.assertTrue(precisa_rehash(gerar_hash("x", iteracoes=CALIBRADO - 10_000)))
+        r = verificar("x", gerar_hash("x", iteracoes=CALIBRADO - 10_000))
+        self.assertTrue(r.ok)
+        self.assertIsNotNone(r.novo_hash)
+
+    def test_custo_igual_ou_maior_nao_desce(self) -> None:
+        self.assertFalse(precisa_rehash(gerar_hash("x", iteracoes=CALIBRADO)))
+        self.assertFalse(precisa_rehash(gerar_hash("x", iteracoes=CALIBRADO + 20_000)))
+
+    def test_formato_antigo_sempre_pede(self) -> None:
+        self.assertTrue(precisa_rehash(_hash_antigo("x")))
+
+
+@unittest.skipUnless(_bcrypt_disponivel(), "bcrypt/passlib não instalado")
+class BcryptTest(_CalibradoFixo):
+    PEPPER = "pimenta"
+
+    def _bcrypt(self, senha: str) -> str:
+        p = (senha + self.PEPPER).encode("utf-8")
+        try:
+            import bcrypt
+        except ImportError:
+            from passlib.context import CryptContext
+            return CryptContext(schemes=["bcrypt"]).hash(p)
+        return bcrypt.hashpw(p, bcrypt.gensalt(rounds=4)).decode("ascii")
+
+    def test_bcrypt_com_pepper_confere_e_migra(self) -> None:
+        armazenado = self._bcrypt("s3nha")
+        with mock.patch.object(credenciais, "PWD_PEPPER", self.PEPPER):
+            r = verificar("s3nha", armazenado)
+            self.assertTrue(r.ok)
+            self.assertTrue(r.novo_hash.startswith(PREFIXO + "$"))
+            self.assertFalse(verificar("outra", armazenado).ok)
+
+    def test_bcrypt_sem_o_pepper_nao_confere(self) -> None:
+        armazenado = self._bcrypt("s3nha")
+        with mock.patch.object(credenciais, "PWD_PEPPER", ""):
+            self.assertFalse(verificar("s3nha", armazenado).ok)
+
+
+# ============================================================
+# ATUALIZAR_HASH (conexão falsa)
+# ============================================================
+
+class _CursorFalso:
+    def __init__(self, conn: "_ConexaoFalsa") -> None:
+        self.conn = conn
+        self.rowcount = -1
+
+    def __enter__(self) -> "_CursorFalso":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+    def execute(self, sql: str, params: Tuple) -> None:
+        self.conn.comandos.append((sql, params))
+        novo, _usuario, anterior = params
+        if self.conn.senha_hash == anterior:
+            self.conn.senha_hash = novo
+            self.rowcount = 1
+        else:
+            self.rowcount = 0
+
+
+class _ConexaoFalsa:
+    """Uma linha de usuarios: o UPDATE só vale se o senha_hash ainda for o verificado."""
+
+    def __init__(self, senha_hash: str, autocommit: bool = False) -> None:
+        self.senha_hash = senha_hash
+        self.autocommit = autocommit
+        self.commits = 0
+        self.comandos: List[Tuple[str, Optional[Tuple]]] = []
+
+    def cursor(self) -> _CursorFalso:
+        return _CursorFalso(self)
+
+    def commit(self) -> None:
+        self.commits += 1
+
+
+class AtualizarHashTest(_CalibradoFixo):
+    def test_regrava_o_hash_verificado(self) -> None:
+        antigo = _hash_antigo("s3nha")
+        conn = _ConexaoFalsa(antigo)
+        r = verificar("s3nha", antigo)
+        self.assertTrue(atualizar_hash(conn, 7, r.novo_hash, antigo))
+        self.assertEqual(conn.senha_hash, r.novo_hash)
+        self.assertEqual(conn.commits, 1)
+        self.assertEqual(conn.comandos[0][1], (r.novo_hash, 7, antigo))
+
+    def test_reset_no_meio_do_caminho_nao_e_sobrescrito(self) -> None:
+        antigo = _hash_antigo("s3nha")
+        resetado = gerar_hash("nova")
+        conn = _ConexaoFalsa(resetado)
+        r = verificar("s3nha", antigo)
+        self.assertFalse(atualizar_hash(conn, 7, r.novo_hash, antigo))
+        self.assertEqual(conn.senha_hash, resetado)
+
+    def test_autocommit_nao_chama_commit(self) -> None:
+        antigo = _hash_antigo("s3nha")
+        conn = _ConexaoFalsa(antigo, autocommit=True)
+        self.assertTrue(atualizar_hash(conn, 7, gerar_hash("s3nha"), antigo))
+        self.assertEqual(conn.commits, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
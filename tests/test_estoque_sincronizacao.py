@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+"""
+Proteções do zerar_ausentes de estoque_sincronizacao.sincronizar_estoque:
+snapshot vazio nunca zera; snapshot truncado só zera com forcar=True.
+A carga manda um único aviso 'T' às telas, não um por produto.
+Os casos com banco usam tabelas temporárias (não tocam "Ekenox").
+"""
+
+import json
+import unittest
+
+from estoque_sincronizacao import RelatorioSincronizacao, sincronizar_estoque
+from ouvinte_alteracoes import CANAL
+from tests.banco_teste import conectar_teste
+
+PRODUTOS = [str(1000 + i) for i in range(11)]
+
+
+class SnapshotVazioTest(unittest.TestCase):
+    def test_vazio_com_zerar_ausentes_e_recusado_sem_abrir_transacao(self) -> None:
+        # conn=None: a recusa acontece antes de qualquer acesso ao banco
+        rel = sincronizar_estoque(None, [], zerar_ausentes=True)
+        self.assertTrue(rel.recusa)
+        self.assertFalse(rel.ok)
+        self.assertEqual(rel.zerados, 0)
+        self.assertIn("Nada foi gravado", rel.resumo())
+
+    def test_vazio_com_forcar_continua_recusado(self) -> None:
+        rel = sincronizar_estoque(None, [], zerar_ausentes=True, forcar=True)
+        self.assertTrue(rel.recusa)
+
+    def test_vazio_sem_zerar_ausentes_nao_faz_nada(self) -> None:
+        rel = sincronizar_estoque(None, [])
+        self.assertEqual(rel.recusa, "")
+        self.assertTrue(rel.ok)
+        self.assertFalse(rel.aplicado)
+
+
+class ZerarAusentesBancoTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.conn = conectar_teste()
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                CREATE TEMP TABLE t_produtos ("produtoId" text PRIMARY KEY);
+                CREATE TEMP TABLE t_estoque (
+                    "fkProduto" text PRIMARY KEY,
+                    "saldoFisico" double precision,
+                    "saldoVirtual" double precision
+                );
+            """)
+            for p in PRODUTOS:
+                cur.execute("INSERT INTO t_produtos VALUES (%s);", (p,))
+                cur.execute("INSERT INTO t_estoque VALUES (%s, 5, 5);", (p,))
+        self.conn.commit()
+
+    def tearDown(self) -> None:
+        self.conn.close()
+
+    def _sincronizar(self, produtos, **kw) -> RelatorioSincronizacao:
+        linhas = [(n, p, "7", "7") for n, p in enumerate(produtos, start=1)]
+        return sincronizar_estoque(self.conn, linhas, zerar_ausentes=True,
+                                   tabela_estoque="t_estoque", tabela_produtos="t_produtos", **kw)
+
+    def _com_saldo(self) -> int:
+        with self.conn.cursor() as cur:
+            cur.execute('SELECT count(*) FROM t_estoque WHERE "saldoFisico" <> 0;')
+            n = int(cur.fetchone()[0])
+        self.conn.rollback()
+        return n
+
+    def test_snapshot_truncado_e_recusado(self) -> None:
+        rel = self._sincronizar(PRODUTOS[:2])
+        self.assertTrue(rel.recusa)
+        self.assertEqual(rel.zerados, 0)
+        self.assertEqual(self._com_saldo(), len(PRODUTOS))
+
+    def test_snapshot_truncado_com_forcar_zera(self) -> None:
+        rel = self._sincronizar(PRODUTOS[:2], forcar=True)
+        self.assertTrue(rel.ok)
+        self.assertEqual(rel.zerados, len(PRODUTOS) - 2)
+        self.assertEqual(self._com_saldo(), 2)
+
+    def test_snapshot_quase_completo_zera_so_ausentes(self) -> None:
+        rel = self._sincronizar(PRODUTOS[:8])
+        self.assertTrue(rel.ok)
+        self.assertEqual(rel.atualizados, 8)
+        self.assertEqual(rel.zerados, 3)
+
+    def test_carga_avisa_uma_vez_so(self) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute(f"LISTEN {CANAL};")
+        self.conn.commit()
+        rel = self._sincronizar(PRODUTOS[:8])
+        self.conn.poll()
+        avisos = [json.loads(n.payload) for n in self.conn.notifies if n.channel == CANAL]
+        self.assertTrue(rel.aplicado)
+        self.assertEqual(avisos, [{"t": "t_estoque", "op": "T"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
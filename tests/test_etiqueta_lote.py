@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+"""
+Chave do sequenciador de séries (etiqueta_lote): modelos longos com o mesmo
+começo não dividem o contador, e a reserva não sobrepõe faixas.
+"""
+
+import unittest
+
+from etiqueta_lote import TAMANHO_CHAVE, chave_sequenciador, reservar_seriais
+from tests.banco_teste import conectar_teste, preparar_schema
+
+
+class ChaveSequenciadorTest(unittest.TestCase):
+    def test_chave_curta_fica_igual(self) -> None:
+        self.assertEqual(chave_sequenciador("etq:EKX100"), "etq:EKX100")
+
+    def test_modelos_com_mesmo_prefixo_longo_tem_chaves_diferentes(self) -> None:
+        prefixo = "etq:" + "FORNO-COMBINADO-ELETR"
+        a = chave_sequenciador(prefixo + "ICO-10GN")
+        b = chave_sequenciador(prefixo + "ICO-20GN")
+        self.assertNotEqual(a, b)
+        self.assertLessEqual(len(a), TAMANHO_CHAVE)
+        self.assertLessEqual(len(b), TAMANHO_CHAVE)
+
+    def test_chave_longa_e_estavel(self) -> None:
+        chave = "etq:" + "M" * 60
+        self.assertEqual(chave_sequenciador(chave), chave_sequenciador(chave))
+
+
+class ReservarSeriaisBancoTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.conn = conectar_teste()
+        preparar_schema(self.conn)
+
+    def tearDown(self) -> None:
+        self.conn.rollback()
+        self.conn.close()
+
+    def test_faixas_consecutivas_sem_sobreposicao(self) -> None:
+        chave = "etq:TESTE-FAIXA"
+        a = reservar_seriais(self.conn, chave, 10)
+        b = reservar_seriais(self.conn, chave, 5)
+        self.assertEqual(b, a + 10)
+
+    def test_chave_longa_continua_depois_do_contador_cortado(self) -> None:
+        chave = "etq:" + "X" * 26 + "-MODELO-LONGO"
+        with self.conn.cursor() as cur:
+            cur.execute('INSERT INTO "Ekenox".sequenciadores (tabela, sequenciador) VALUES (%s, 40) '
+                        'ON CONFLICT (tabela) DO UPDATE SET sequenciador = 40;', (chave[:TAMANHO_CHAVE],))
+        inicio = reservar_seriais(self.conn, chave, 3)
+        self.assertEqual(inicio, 41)
+        # o modelo que compartilhava o prefixo não anda junto
+        outro = reservar_seriais(self.conn, "etq:" + "X" * 26 + "-OUTRO-MODELO", 3)
+        self.assertEqual(outro, 41)
+
+
+if __name__ == "__main__":
+    unittest.main()
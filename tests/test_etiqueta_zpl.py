@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+"""
+Saída ZPL/EPL (etiqueta_zpl) contra a impressora_mock: o formato vai uma
+vez só e depois N dados variáveis, em blocos de BLOCO_BYTES; escape do
+^FD, campo ^FN1 / variável V00 e leitura do destino (host:9100, tcp://,
+arquivo).
+"""
+
+import time
+import unittest
+
+from etiqueta_zpl import (
+    BLOCO_BYTES,
+    EPL,
+    NOME_FORMATO,
+    ZPL,
+    SaidaImpressora,
+    _zpl_dado,
+    compilar_epl,
+    compilar_zpl,
+    endereco_tcp,
+    etiqueta_epl,
+    etiqueta_zpl,
+    gerar_fluxo,
+    imprimir_etiquetas,
+    texto_serie,
+)
+from impressora_mock import ImpressoraFalsa
+
+EMPRESA = {
+    "company_name": "Ekenox^Teste_Ltda",
+    "company_address": "Rua A, 100",
+    "company_district": "Centro",
+    "company_city": "São Paulo",
+    "company_state": "SP",
+    "company_cep": "01000-000",
+    "company_phone": "(11) 0000-0000",
+    "company_email": "sac@ekenox.com.br",
+}
+PRODUTO = {
+    "product_title": "Forno ~ Combinado",
+    "product_model": "EKX-10GN",
+    "product_classe": "I",
+    "voltage": "220V",
+    "power": "9000W",
+    "temperature": "300°C",
+    "frequency": "60Hz",
+}
+
+
+def _esperar(imp: ImpressoraFalsa, tamanho: int, limite_s: float = 5.0) -> bytes:
+    """O servidor recebe em outra thread: espera chegar tudo o que foi mandado."""
+    fim = time.monotonic() + limite_s
+    while time.monotonic() < fim:
+        dados = imp.recebido
+        if len(dados) >= tamanho:
+            return dados
+        time.sleep(0.01)
+    return imp.recebido
+
+
+# ============================================================
+# COMPILAÇÃO (sem rede)
+# ============================================================
+
+class CompilacaoTest(unittest.TestCase):
+    def test_zpl_dado_escapa_circunflexo_til_e_sublinhado(self) -> None:
+        self.assertEqual(_zpl_dado("a_b^c~d"), "a_5Fb_5Ec_7Ed")
+        self.assertEqual(_zpl_dado("_5E"), "_5F5E")     # o próprio "_" não vira escape
+        self.assertEqual(_zpl_dado(None), "")
+
+    def test_formato_zpl_tem_campo_fn1_e_texto_escapado(self) -> None:
+        fmt = compilar_zpl(EMPRESA, PRODUTO).decode("utf-8")
+        self.assertTrue(fmt.startswith("^XA\n^DFR:" + NOME_FORMATO + ".ZPL^FS"))
+        self.assertEqual(fmt.count("^FN1"), 1)
+        self.assertIn("^FH^FN1^FS", fmt)
+        self.assertIn("^FDEkenox_5ETeste_5FLtda^FS", fmt)
+        self.assertIn("^FDForno _7E Combinado^FS", fmt)
+        self.assertNotIn("Nº Série", fmt)
+        self.assertTrue(fmt.rstrip().endswith("^XZ"))
+
+    def test_etiqueta_zpl_recupera_o_formato_e_preenche_fn1(self) -> None:
+        dados = etiqueta_zpl("EKX^1-001").decode("utf-8")
+        self.assertEqual(
+            dados,
+            f"^XA^XFR:{NOME_FORMATO}.ZPL^CI28^FN1^FH^FD{_zpl_dado(texto_serie('EKX^1-001'))}^FS^XZ\n")
+        self.assertIn("EKX_5E1-001", dados)
+
+    def test_formato_epl_declara_e_usa_v00(self) -> None:
+        fmt = compilar_epl(EMPRESA, PRODUTO, exemplo_serie="EKX-001").decode("cp1252")
+        linhas = fmt.splitlines()
+        self.assertIn(f'FS"{NOME_FORMATO}"', linhas)
+        self.assertEqual(sum(1 for l in linhas if l.startswith("V00,")), 1)
+        self.assertTrue([l for l in linhas if l.startswith("A") and l.endswith(",V00")])
+        self.assertEqual(linhas[-1], "FE")
+
+    def test_etiqueta_epl_preenche_v00(self) -> None:
+        self.assertEqual(etiqueta_epl("EKX-007"),
+                         f'FR"{NOME_FORMATO}"\n?\n{texto_serie("EKX-007")}\nP1\n'.encode("cp1252"))
+
+    def test_fluxo_formato_primeiro_e_uma_vez(self) -> None:
+        partes = list(gerar_fluxo(ZPL, EMPRESA, PRODUTO, ["A-1", "A-2", "A-3"]))
+        self.assertEqual(len(partes), 4)
+        self.assertEqual(partes[0], compilar_zpl(EMPRESA, PRODUTO))
+        self.assertEqual(partes[1:], [etiqueta_zpl(s) for s in ("A-1", "A-2", "A-3")])
+
+    def test_linguagem_desconhecida(self) -> None:
+        with self.assertRaises(ValueError):
+            list(gerar_fluxo("pdf", EMPRESA, PRODUTO, ["A-1"]))
+
+
+class EnderecoTcpTest(unittest.TestCase):
+    def test_impressora_de_rede(self) -> None:
+        self.assertEqual(endereco_tcp("192.168.0.50"), ("192.168.0.50", 9100))
+        self.assertEqual(endereco_tcp("192.168.0.50:9100"), ("192.168.0.50", 9100))
+        self.assertEqual(endereco_tcp(" zebra-expedicao:9100 "), ("zebra-expedicao", 9100))
+        self.assertEqual(endereco_tcp("tcp://zebra"), ("zebra", 9100))
+        self.assertEqual(endereco_tcp("tcp://zebra:6101"), ("zebra", 6101))
+
+    def test_arquivo(self) -> None:
+        self.assertIsNone(endereco_tcp("etiquetas.zpl"))
+        self.assertIsNone(endereco_tcp("zebra"))
+        self.assertIsNone(endereco_tcp(r"C:\saida\etiquetas.zpl"))
+        self.assertIsNone(endereco_tcp(""))
+
+
+# ============================================================
+# IMPRESSORA FALSA (TCP local)
+# ============================================================
+
+class ImpressoraFalsaTest(unittest.TestCase):
+    def _imprimir(self, linguagem: str, quantidade: int):
+        seriais = [f"EKX-{n:05d}" for n in range(1, quantidade + 1)]
+        esperado = b"".join(gerar_fluxo(linguagem, EMPRESA, PRODUTO, seriais,
+                                        exemplo_serie=f"EKX-{quantidade:03d}"))
+        with ImpressoraFalsa() as imp:
+            enviadas = imprimir_etiquetas(imp.endereco, EMPRESA, PRODUTO, "EKX", quantidade,
+                                          linguagem=linguagem, seriais=seriais)
+            recebido = _esperar(imp, len(esperado))
+            return enviadas, imp, recebido, esperado
+
+    def test_zpl_formato_uma_vez_e_n_etiquetas(self) -> None:
+        n = 3000                                    # ~200 KB: vários blocos
+        enviadas, imp, recebido, esperado = self._imprimir(ZPL, n)
+        self.assertEqual(enviadas, n)
+        self.assertGreater(len(esperado), 2 * BLOCO_BYTES)
+        self.assertEqual(recebido, esperado)
+        self.assertEqual(imp.formatos(), 1)
+        self.assertEqual(imp.etiquetas(), n)
+        self.assertEqual(imp.conexoes, 1)
+        self.assertTrue(recebido.startswith(compilar_zpl(EMPRESA, PRODUTO)))
+
+    def test_epl_formato_uma_vez_e_n_etiquetas(self) -> None:
+        n = 250
+        enviadas, imp, recebido, esperado = self._imprimir(EPL, n)
+        self.assertEqual(enviadas, n)
+        self.assertEqual(recebido, esperado)
+        self.assertEqual(imp.formatos(), 1)
+        self.assertEqual(imp.etiquetas(), n)
+
+    def test_saida_junta_em_blocos_de_64kb(self) -> None:
+        with ImpressoraFalsa() as imp:
+            with SaidaImpressora(imp.endereco) as saida:
+                saida.write(b"x" * (BLOCO_BYTES - 1))
+                self.assertEqual(saida.bytes_enviados, 0)
+                saida.write(b"y")
+                self.assertEqual(saida.bytes_enviados, BLOCO_BYTES)
+                saida.write(b"z" * 10)
+                self.assertEqual(saida.bytes_enviados, BLOCO_BYTES)
+            self.assertEqual(saida.bytes_enviados, BLOCO_BYTES + 10)   # o resto vai no fim
+            recebido = _esperar(imp, BLOCO_BYTES + 10)
+        self.assertEqual(recebido, b"x" * (BLOCO_BYTES - 1) + b"y" + b"z" * 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
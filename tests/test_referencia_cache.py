@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+"""
+Hierarquia de categorias do ReferenciaCacheMixin: o filtro vem de
+"filtroProducao" (categoria_hierarquia.sql); sem nenhum filtro no banco
+vale a lista fixa antiga, nunca "nada excluído".
+Falha na carga não desfaz a transação aberta pelo chamador (SAVEPOINT).
+"""
+
+import unittest
+from typing import Any, Dict, Optional
+
+from referencia_cache import CATEGORIAS_EXCLUIDAS_LEGADO, ReferenciaCacheMixin
+from tests.banco_teste import conectar_teste, preparar_schema
+
+
+def _estado(*categorias: Dict[str, Any]) -> Dict[str, Any]:
+    return {"categoria_por_id": {int(c["categoriaId"]): c for c in categorias}}
+
+
+def _cat(cid: int, pai: Optional[int] = None, filtro: Optional[str] = None) -> Dict[str, Any]:
+    return {"categoriaId": cid, "nomeCategoria": f"C{cid}", "categoriaPai": pai, "filtroProducao": filtro}
+
+
+class HierarquiaCategoriasTest(unittest.TestCase):
+    def test_sem_filtro_vale_a_lista_antiga(self) -> None:
+        # categoria_hierarquia.sql não aplicado: as 17 de antes continuam fora
+        est = _estado(_cat(3844533), _cat(10, 3844533))
+        ReferenciaCacheMixin._ref_montar_hierarquia(est)
+        self.assertEqual(est["categorias_excluidas"], set(CATEGORIAS_EXCLUIDAS_LEGADO))
+        self.assertIn(3844533, est["categorias_excluidas"])
+
+    def test_com_filtro_a_lista_antiga_nao_vale(self) -> None:
+        est = _estado(_cat(3844533), _cat(1, filtro="E"))
+        ReferenciaCacheMixin._ref_montar_hierarquia(est)
+        self.assertEqual(est["categorias_excluidas"], {1})
+
+    def test_exclusao_vale_para_a_subarvore(self) -> None:
+        est = _estado(_cat(1, filtro="E"), _cat(2, 1), _cat(3, 2), _cat(4))
+        ReferenciaCacheMixin._ref_montar_hierarquia(est)
+        self.assertEqual(est["categorias_excluidas"], {1, 2, 3})
+
+    def test_inclusao_reabre_um_ramo(self) -> None:
+        est = _estado(_cat(1, filtro="E"), _cat(2, 1, filtro="I"), _cat(3, 2), _cat(5, 1))
+        ReferenciaCacheMixin._ref_montar_hierarquia(est)
+        self.assertEqual(est["categorias_excluidas"], {1, 5})
+
+    def test_ciclo_em_categoria_pai_nao_trava(self) -> None:
+        est = _estado(_cat(1, 2, filtro="E"), _cat(2, 1))
+        ReferenciaCacheMixin._ref_montar_hierarquia(est)
+        self.assertEqual(est["categorias_excluidas"], {1, 2})
+
+
+
+class FalhaNaCargaBancoTest(unittest.TestCase):
+    SITUACAO_TESTE = 990000001
+
+    def setUp(self) -> None:
+        from Ordem_Producao import AppConfig, SistemaOrdemProducao
+        from tempo_limite import CursorLimitado
+
+        self.conn = conectar_teste()
+        preparar_schema(self.conn)
+        self.sistema = SistemaOrdemProducao(AppConfig())
+        self.sistema.conn = self.conn
+        self.sistema.cursor = self.conn.cursor(cursor_factory=CursorLimitado)
+
+    def tearDown(self) -> None:
+        self.conn.rollback()
+        self.conn.close()
+
+    def _situacao_existe(self) -> bool:
+        with self.conn.cursor() as cur:
+            cur.execute('SELECT 1 FROM "Ekenox".situacao WHERE id = %s;', (self.SITUACAO_TESTE,))
+            return cur.fetchone() is not None
+
+    def _quebrar_carga(self) -> None:
+        self.sistema.SQL_REF_CARGA = 'SELECT 1 / 0, NULL, NULL, NULL;'
+
+    def test_falha_com_transacao_do_chamador_desfaz_so_o_cache(self) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute('INSERT INTO "Ekenox".situacao (id, nome) VALUES (%s, %s);',
+                        (self.SITUACAO_TESTE, "TESTE CACHE"))
+        self._quebrar_carga()
+        self.assertFalse(self.sistema.ref_carregar(forcar=True))
+        self.assertTrue(self._situacao_existe())
+
+    def test_carga_ok_dentro_da_transacao_do_chamador(self) -> None:
+        with self.conn.cursor() as cur:
+            cur.execute('INSERT INTO "Ekenox".situacao (id, nome) VALUES (%s, %s);',
+                        (self.SITUACAO_TESTE, "TESTE CACHE"))
+        self.assertTrue(self.sistema.ref_carregar(forcar=True))
+        self.assertIn(self.SITUACAO_TESTE, self.sistema._ref_estado()["situacao_por_id"])
+        self.assertTrue(self._situacao_existe())
+
+    def test_falha_sem_transacao_aberta_volta_a_ociosa(self) -> None:
+        from psycopg2 import extensions as pg_ext
+
+        self._quebrar_carga()
+        self.assertFalse(self.sistema.ref_carregar(forcar=True))
+        self.assertEqual(self.conn.get_transaction_status(), pg_ext.TRANSACTION_STATUS_IDLE)
+
+
+if __name__ == "__main__":
+    unittest.main()
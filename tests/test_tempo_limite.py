@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+"""
+aplicar_limite (tempo_limite): o SET LOCAL só é pulado na mesma transação
+da ConexaoLimitada; depois de commit/rollback ele vai de novo.
+"""
+
+import os
+import unittest
+
+from tempo_limite import CONSULTA, GRAVACAO, ConexaoLimitada, CursorLimitado, aplicar_limite, limite_ms
+
+
+class AplicarLimiteBancoTest(unittest.TestCase):
+    def setUp(self) -> None:
+        dsn = os.getenv("EKENOX_TEST_DSN", "").strip()
+        if not dsn:
+            raise unittest.SkipTest("EKENOX_TEST_DSN não definido (banco de teste)")
+        import psycopg2
+
+        self.conn = psycopg2.connect(dsn, connect_timeout=5, connection_factory=ConexaoLimitada)
+        self.cur = self.conn.cursor(cursor_factory=CursorLimitado)
+
+    def tearDown(self) -> None:
+        self.conn.rollback()
+        self.conn.close()
+
+    def _timeout_ms(self) -> int:
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT current_setting('statement_timeout', true);")
+            valor = cur.fetchone()[0]
+        if valor.endswith("ms"):
+            return int(valor[:-2])
+        return int(valor[:-1]) * 1000 if valor.endswith("s") else int(valor)
+
+    def test_mesma_transacao_nao_repete_o_set(self) -> None:
+        aplicar_limite(self.cur, CONSULTA)
+        marca = self.cur.limite_transacao
+        aplicar_limite(self.cur, CONSULTA)
+        self.assertEqual(self.cur.limite_transacao, marca)
+        self.assertEqual(self._timeout_ms(), limite_ms(CONSULTA))
+
+    def test_depois_do_commit_o_set_vale_na_nova_transacao(self) -> None:
+        aplicar_limite(self.cur, GRAVACAO)
+        self.conn.commit()
+        # transação aberta por outro cursor (como os mixins com cursor próprio)
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT 1;")
+        aplicar_limite(self.cur, GRAVACAO)
+        self.assertEqual(self.cur.limite_transacao, self.conn.transacao)
+        self.assertEqual(self._timeout_ms(), limite_ms(GRAVACAO))
+
+    def test_depois_do_rollback_o_set_vale_na_nova_transacao(self) -> None:
+        aplicar_limite(self.cur, CONSULTA)
+        self.conn.rollback()
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT 1;")
+        aplicar_limite(self.cur, CONSULTA)
+        self.assertEqual(self._timeout_ms(), limite_ms(CONSULTA))
+
+
+if __name__ == "__main__":
+    unittest.main()
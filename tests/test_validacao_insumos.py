@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+"""
+"Ekenox".fn_validar_insumos (validacao_insumos.sql) x laço em Python
+(ValidacaoInsumosMixin._validar_insumos_python): mesma saída nos casos de
+saldo negativo, saldo insuficiente, componente sem cadastro em produtos,
+vários lotes e com os dois bloqueios desligados.
+
+Os dados ficam numa transação desfeita no fim de cada teste.
+"""
+
+import unittest
+from typing import Any, List, Tuple
+
+from tests.banco_teste import conectar_teste, preparar_schema
+
+# produtos de teste (IDs altos para não cruzar com dados do banco)
+FINAL_A = 990000001
+FINAL_B = 990000002
+COMP_OK = 990000101             # saldo folgado
+COMP_NEG = 990000102            # saldo negativo
+COMP_POUCO = 990000103          # saldo 3
+COMP_SEM_CADASTRO = 990000104   # só na estrutura (sem produtos/estoque)
+COMP_OITO = 990000105           # saldo 8
+
+ESTRUTURA: List[Tuple[int, int, float]] = [
+    (FINAL_A, COMP_OK, 1.0),
+    (FINAL_A, COMP_NEG, 2.0),
+    (FINAL_A, COMP_POUCO, 0.5),
+    (FINAL_A, COMP_SEM_CADASTRO, 1.0),
+    (FINAL_B, COMP_OK, 3.0),
+    (FINAL_B, COMP_OITO, 4.0),
+]
+
+SALDOS = {COMP_OK: 1000.0, COMP_NEG: -5.0, COMP_POUCO: 3.0, COMP_OITO: 8.0}
+
+
+class ValidacaoInsumosSqlPythonTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        conn = conectar_teste()
+        try:
+            preparar_schema(conn, "validacao_insumos.sql")
+        finally:
+            conn.close()
+
+    def setUp(self) -> None:
+        from Ordem_Producao import AppConfig, SistemaOrdemProducao
+        from tempo_limite import CursorLimitado
+
+        self.conn = conectar_teste()
+        self.sistema = SistemaOrdemProducao(AppConfig())
+        self.sistema.conn = self.conn
+        self.sistema.cursor = self.conn.cursor(cursor_factory=CursorLimitado)
+        self.sistema.validacao_invalidar()
+
+        with self.conn.cursor() as cur:
+            for pid in (FINAL_A, FINAL_B, COMP_OK, COMP_NEG, COMP_POUCO, COMP_OITO):
+                cur.execute('INSERT INTO "Ekenox".produtos ("produtoId", "nomeProduto") VALUES (%s, %s);',
+                            (str(pid), f"  PRODUTO {pid} "))
+            for comp, saldo in SALDOS.items():
+                cur.execute('INSERT INTO "Ekenox".estoque ("fkProduto", "saldoFisico", "saldoVirtual") '
+                            'VALUES (%s, %s, %s);', (str(comp), saldo, saldo))
+            for fk, comp, qtd in ESTRUTURA:
+                cur.execute('INSERT INTO "Ekenox".estrutura (fkproduto, componente, quantidade, dados) '
+                            'VALUES (%s, %s, %s, %s);', (str(fk), str(comp), qtd, f"teste-{fk}-{comp}"))
+
+    def tearDown(self) -> None:
+        self.conn.rollback()
+        self.conn.close()
+
+    def _comparar(self, lotes: List[Tuple[int, float]], negativo: bool = True,
+                  insuficiente: bool = True) -> List[Any]:
+        self.assertTrue(self.sistema._validacao_sql_disponivel(), "fn_validar_insumos não instalada")
+        diferencas = self.sistema.conferir_validacao_insumos(lotes, negativo, insuficiente)
+        self.assertEqual(diferencas, [])
+        return self.sistema.validar_insumos_lotes(lotes, negativo, insuficiente)
+
+    @staticmethod
+    def _motivos(res: Any) -> dict:
+        return {p["componente"]: p["motivo"] for p in res["problemas"]}
+
+    def test_saldo_negativo_tem_prioridade(self) -> None:
+        (res,) = self._comparar([(FINAL_A, 1)])
+        self.assertEqual(self._motivos(res)[COMP_NEG], "Saldo negativo")
+
+    def test_saldo_insuficiente(self) -> None:
+        (res,) = self._comparar([(FINAL_A, 10)])
+        motivos = self._motivos(res)
+        self.assertEqual(motivos[COMP_POUCO], "Saldo insuficiente")
+        self.assertNotIn(COMP_OK, motivos)
+        falta = next(p["falta"] for p in res["problemas"] if p["componente"] == COMP_POUCO)
+        self.assertAlmostEqual(falta, 2.0)
+
+    def test_componente_sem_cadastro(self) -> None:
+        (res,) = self._comparar([(FINAL_A, 1)])
+        prob = next(p for p in res["problemas"] if p["componente"] == COMP_SEM_CADASTRO)
+        self.assertEqual(prob["nome"], "")
+        self.assertEqual(prob["saldo"], 0.0)
+        self.assertEqual(prob["motivo"], "Saldo insuficiente")
+
+    def test_varios_lotes(self) -> None:
+        res = self._comparar([(FINAL_A, 2), (FINAL_B, 1), (FINAL_B, 5), (FINAL_A, 0)])
+        self.assertEqual(len(res), 4)
+        self.assertTrue(res[1]["ok"])                      # 4 x 1 <= 8
+        self.assertEqual(self._motivos(res[2]), {COMP_OITO: "Saldo insuficiente"})
+        self.assertEqual(self._motivos(res[3]), {COMP_NEG: "Saldo negativo"})
+
+    def test_bloqueios_desligados(self) -> None:
+        res = self._comparar([(FINAL_A, 100), (FINAL_B, 100)], negativo=False, insuficiente=False)
+        self.assertTrue(all(r["ok"] for r in res))
+
+    def test_so_bloqueio_de_negativo(self) -> None:
+        (res,) = self._comparar([(FINAL_A, 100)], negativo=True, insuficiente=False)
+        self.assertEqual(self._motivos(res), {COMP_NEG: "Saldo negativo"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+-- usuarios_busca.sql
+-- Índices da administração de usuários (tela_usuarios.py). Idempotente.
+--
+-- Consultas (tela_usuarios.py):
+--   busca por trecho de nome/e-mail -> GIN pg_trgm em lower(COALESCE(col, ''))
+--                                      (mesma expressão do WHERE, senão o índice não é usado)
+--   busca por e-mail completo        -> "email_hash" = sha256(e-mail)
+--   lista paginada                   -> chave primária ("usuarioId" < último da página)
+--   salvar permissões                -> único ("usuarioId", "programaId") para o
+--                                       INSERT ... ON CONFLICT em lote
+--
+-- email_enc/email_hash podem ser TEXT ou BYTEA conforme o banco: o índice
+-- trigram só é criado nas colunas de texto.
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS ix_usuarios_nome_trgm
+    ON "Ekenox"."usuarios" USING gin (lower(COALESCE("nome", '')) gin_trgm_ops);
+
+DO $$
+DECLARE
+    col text;
+BEGIN
+    FOREACH col IN ARRAY ARRAY['email_enc', 'email_hash'] LOOP
+        IF EXISTS (
+            SELECT 1
+              FROM information_schema.columns
+             WHERE table_schema = 'Ekenox'
+               AND table_name = 'usuarios'
+               AND column_name = col
+               AND data_type IN ('text', 'character varying')
+        ) THEN
+            EXECUTE format(
+                'CREATE INDEX IF NOT EXISTS %I ON "Ekenox"."usuarios" '
+                'USING gin (lower(COALESCE(%I, %L)) gin_trgm_ops)',
+                'ix_usuarios_' || col || '_trgm', col, '');
+        END IF;
+    END LOOP;
+END $$;
+
+CREATE INDEX IF NOT EXISTS ix_usuarios_email_hash
+    ON "Ekenox"."usuarios" ("email_hash");
+
+-- duplicados antigos (DELETE + INSERT sem chave): fica o maior nível
+DELETE FROM "Ekenox"."usuario_programa" a
+ USING "Ekenox"."usuario_programa" b
+ WHERE a."usuarioId" = b."usuarioId"
+   AND a."programaId" = b."programaId"
+   AND (COALESCE(a."nivel", 0) < COALESCE(b."nivel", 0)
+        OR (COALESCE(a."nivel", 0) = COALESCE(b."nivel", 0) AND a.ctid < b.ctid));
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_usuario_programa
+    ON "Ekenox"."usuario_programa" ("usuarioId", "programaId");
+
+COMMIT;
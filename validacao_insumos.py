@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+"""
+validacao_insumos.py
+Checagem de falta de insumos antes de gravar OP.
+
+- Caminho principal: "Ekenox".fn_validar_insumos (validacao_insumos.sql),
+  uma ida ao banco para todos os lotes/produtos da gravação
+- Caminho reserva: o laço em Python de sempre (estrutura, saldo e nome por
+  componente), usado enquanto a função não está instalada ou com outra
+  versão, ou se a chamada falhar
+- conferir_validacao_insumos() roda os dois caminhos e lista as diferenças
+  (mesmo formato de saída), para checar o banco depois de instalar/alterar
+  a função
+
+Resultado por lote (igual ao que a tela de OP já usa):
+    {"ok": bool, "problemas": [{"componente", "nome", "qtd_base",
+                                "necessario", "saldo", "falta", "motivo"}]}
+
+CLI:
+    python validacao_insumos.py --instalar
+    python validacao_insumos.py --conferir 1234:50 1234:20 5678:3
+"""
+
+import argparse
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from conexao_resiliente import ConexaoIndisponivel, executar_com_cursor
+
+# tem que bater com "Ekenox".fn_validar_insumos_versao()
+VERSAO_SQL = 1
+
+ARQUIVO_SQL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "validacao_insumos.sql")
+
+MOTIVO_NEGATIVO = "Saldo negativo"
+MOTIVO_INSUFICIENTE = "Saldo insuficiente"
+
+Lote = Tuple[int, float]   # (fkproduto, quantidade)
+
+
+def versao_instalada(cur: Any) -> int:
+    """0 = função não instalada."""
+    cur.execute("""SELECT to_regprocedure('"Ekenox".fn_validar_insumos_versao()') IS NOT NULL""")
+    r = cur.fetchone()
+    if not r or not r[0]:
+        return 0
+    cur.execute('SELECT "Ekenox".fn_validar_insumos_versao()')
+    r = cur.fetchone()
+    return int(r[0] or 0) if r else 0
+
+
+def instalar(conn: Any, caminho: str = ARQUIVO_SQL) -> int:
+    """Aplica validacao_insumos.sql e devolve a versão instalada."""
+    with open(caminho, "r", encoding="utf-8") as f:
+        sql = f.read()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql)
+            versao = versao_instalada(cur)
+        conn.commit()
+        return versao
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def validar_lotes_sql(cur: Any, lotes: Sequence[Lote], bloquear_se_saldo_negativo: bool = True,
+                      bloquear_se_insuficiente: bool = True) -> List[Dict[str, Any]]:
+    """Uma chamada da função para todos os lotes; um resultado por lote, na ordem."""
+    out: List[Dict[str, Any]] = [{"ok": True, "problemas": []} for _ in lotes]
+    if not lotes:
+        return out
+
+    cur.execute(
+        """
+        SELECT lote, componente, nome, qtd_base, necessario, saldo, falta, motivo
+          FROM "Ekenox".fn_validar_insumos(%s::bigint[], %s::float8[], %s, %s)
+        """,
+        ([int(fk) for fk, _ in lotes], [float(q) for _, q in lotes],
+         bool(bloquear_se_saldo_negativo), bool(bloquear_se_insuficiente)),
+    )
+    for (lote, comp, nome, qtd_base, necessario, saldo, falta, motivo) in cur.fetchall():
+        res = out[int(lote) - 1]
+        res["ok"] = False
+        res["problemas"].append({
+            "componente": int(comp),
+            "nome": nome or "",
+            "qtd_base": float(qtd_base),
+            "necessario": float(necessario),
+            "saldo": float(saldo),
+            "falta": float(falta),
+            "motivo": motivo,
+        })
+    return out
+
+
+# ============================================================
+# MIXIN
+# ============================================================
+
+class ValidacaoInsumosMixin:
+    """
+    Requer self._q, self.cursor e self.conn (igual aos CRUDMixins) e, para o
+    caminho em Python, f7_buscar_estrutura, saldo_fisico e validar_produto.
+    As consultas passam por executar_com_cursor (limite CONSULTA, reconecta com
+    ConexaoResilienteMixin); conectar() chama validacao_invalidar().
+    """
+
+    def validacao_invalidar(self) -> None:
+        """Conexão nova: a versão da função é lida de novo na próxima validação."""
+        self._validacao_versao = None
+
+    def _validacao_rollback(self) -> None:
+        if self.conn and not self.conn.closed:
+            self.conn.rollback()
+
+    def _validacao_sql_disponivel(self) -> bool:
+        versao = getattr(self, "_validacao_versao", None)
+        if versao is None:
+            try:
+                versao = executar_com_cursor(self, versao_instalada, True)
+            except ConexaoIndisponivel:
+                return False        # sem banco: não guarda 0, lê de novo ao reconectar
+            except Exception:
+                self._validacao_rollback()
+                versao = 0
+            self._validacao_versao = versao
+        return versao == VERSAO_SQL
+
+    def validar_insumos_lotes(
+        self,
+        lotes: Sequence[Lote],
+        bloquear_se_saldo_negativo: bool = True,
+        bloquear_se_insuficiente: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """Um resultado por (fkproduto, quantidade), na ordem recebida."""
+        lotes = [(int(fk), float(q)) for fk, q in lotes]
+
+        if self._validacao_sql_disponivel():
+            try:
+                return executar_com_cursor(
+                    self, lambda cur: validar_lotes_sql(cur, lotes, bloquear_se_saldo_negativo,
+                                                        bloquear_se_insuficiente), True)
+            except ConexaoIndisponivel:
+                pass                # queda, não a função: o caminho em Python responde o erro
+            except Exception:
+                self._validacao_rollback()
+                # função quebrada/removida: usa o Python até reconectar o objeto
+                self._validacao_versao = 0
+
+        return [
+            self._validar_insumos_python(fk, q, bloquear_se_saldo_negativo, bloquear_se_insuficiente)
+            for fk, q in lotes
+        ]
+
+    def validar_estoque_insumos_para_producao(
+        self,
+        fkproduto: int,
+        qtd_produzir: float,
+        bloquear_se_saldo_negativo: bool = True,
+        bloquear_se_insuficiente: bool = True,
+    ) -> Dict[str, Any]:
+        return self.validar_insumos_lotes(
+            [(fkproduto, qtd_produzir)], bloquear_se_saldo_negativo, bloquear_se_insuficiente)[0]
+
+    def _validar_insumos_python(
+        self,
+        fkproduto: int,
+        qtd_produzir: float,
+        bloquear_se_saldo_negativo: bool = True,
+        bloquear_se_insuficiente: bool = True,
+    ) -> Dict[str, Any]:
+        problemas: List[Dict[str, Any]] = []
+        try:
+            itens = self.f7_buscar_estrutura(int(fkproduto))
+            if not itens:
+                return {"ok": True, "problemas": []}
+
+            for (componente, qtd_base) in itens:
+                comp_id = int(componente)
+                qtd_base_f = float(qtd_base or 0.0)
+                necessario = qtd_base_f * float(qtd_produzir)
+
+                saldo = float(self.saldo_fisico(comp_id) or 0.0)
+                prod_comp = self.validar_produto(comp_id) or {}
+                nome = (prod_comp.get("nomeproduto") or "").strip()
+                falta = max(0.0, necessario - saldo)
+
+                if bloquear_se_saldo_negativo and saldo < 0:
+                    problemas.append({
+                        "componente": comp_id,
+                        "nome": nome,
+                        "qtd_base": qtd_base_f,
+                        "necessario": necessario,
+                        "saldo": saldo,
+                        "falta": falta,
+                        "motivo": MOTIVO_NEGATIVO,
+                    })
+                    continue
+
+                if bloquear_se_insuficiente and saldo < necessario:
+                    problemas.append({
+                        "componente": comp_id,
+                        "nome": nome,
+                        "qtd_base": qtd_base_f,
+                        "necessario": necessario,
+                        "saldo": saldo,
+                        "falta": falta,
+                        "motivo": MOTIVO_INSUFICIENTE,
+                    })
+
+            return {"ok": (len(problemas) == 0), "problemas": problemas}
+        except ConexaoIndisponivel:
+            raise           # queda: quem salva a OP avisa para refazer
+        except Exception:
+            self._validacao_rollback()
+            return {"ok": False, "problemas": [{"motivo": "Erro ao validar estrutura/estoque"}]}
+
+    def conferir_validacao_insumos(
+        self,
+        lotes: Sequence[Lote],
+        bloquear_se_saldo_negativo: bool = True,
+        bloquear_se_insuficiente: bool = True,
+    ) -> List[str]:
+        """
+        Roda a função do banco e o laço em Python nos mesmos lotes e devolve
+        as diferenças (lista vazia = saída idêntica).
+        """
+        if not self._validacao_sql_disponivel():
+            return [f"fn_validar_insumos versão {VERSAO_SQL} não instalada"]
+
+        lotes = [(int(fk), float(q)) for fk, q in lotes]
+        via_sql = executar_com_cursor(
+            self, lambda cur: validar_lotes_sql(cur, lotes, bloquear_se_saldo_negativo,
+                                                bloquear_se_insuficiente), True)
+        diferencas: List[str] = []
+        for i, (fk, q) in enumerate(lotes):
+            via_py = self._validar_insumos_python(fk, q, bloquear_se_saldo_negativo,
+                                                  bloquear_se_insuficiente)
+            if via_py != via_sql[i]:
+                diferencas.append(
+                    f"lote {i + 1} (produto {fk}, qtd {q:g}):\n"
+                    f"  python: {via_py}\n"
+                    f"  sql:    {via_sql[i]}"
+                )
+        return diferencas
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+def _parse_lote(txt: str) -> Lote:
+    fk, _, qtd = txt.partition(":")
+    return int(fk), float(qtd.replace(",", ".") or 1)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from Ordem_Producao import SistemaOrdemProducao, load_config
+
+    ap = argparse.ArgumentParser(description="Função de validação de insumos (fn_validar_insumos).")
+    ap.add_argument("--instalar", action="store_true", help="aplica validacao_insumos.sql")
+    ap.add_argument("--conferir", nargs="*", metavar="PRODUTO:QTD",
+                    help="compara a função com o caminho em Python")
+    args = ap.parse_args(argv)
+
+    sistema = SistemaOrdemProducao(load_config())
+    if not sistema.conectar():
+        print(f"Falha ao conectar: {sistema.ultimo_erro}")
+        return 2
+    try:
+        if args.instalar:
+            print(f"fn_validar_insumos instalada (versão {instalar(sistema.conn)}).")
+
+        if args.conferir:
+            diferencas = sistema.conferir_validacao_insumos([_parse_lote(x) for x in args.conferir])
+            for d in diferencas:
+                print(d)
+            print("Saída idêntica." if not diferencas else f"{len(diferencas)} lote(s) com diferença.")
+            return 1 if diferencas else 0
+        return 0
+    finally:
+        sistema.desconectar()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,144 @@
+-- validacao_insumos.sql
+-- Checagem de falta de insumos no servidor (uma ida ao banco por OP/lotes).
+-- Rodar depois do Criacao_arquivo.sql. Idempotente.
+-- Também instalável por: python validacao_insumos.py --instalar
+--
+-- Versão: "Ekenox".fn_validar_insumos_versao() -> 1
+--   Ao mudar assinatura/resultado, subir a versão aqui e VERSAO_SQL em
+--   validacao_insumos.py (o Python só usa a função se a versão bater).
+--
+-- Uso:
+--   -- um produto, vários lotes
+--   SELECT * FROM "Ekenox".fn_validar_insumos(1234::bigint, ARRAY[50, 50, 20]::float8[]);
+--   -- vários produtos (lote i = produto i + quantidade i)
+--   SELECT * FROM "Ekenox".fn_validar_insumos(ARRAY[1234, 5678]::bigint[], ARRAY[10, 3]::float8[],
+--                                             true, true);
+--
+-- Retorna só as linhas com problema, na mesma regra do
+-- SistemaOrdemProducao.validar_estoque_insumos_para_producao:
+--   necessario = quantidade da estrutura * quantidade do lote
+--   saldo      = soma de estoque."saldoFisico" do componente
+--   'Saldo negativo'     : bloquear_negativo e saldo < 0 (tem prioridade)
+--   'Saldo insuficiente' : bloquear_insuficiente e saldo < necessario
+-- Ordem: lote, componente (como texto, igual ao ORDER BY da estrutura).
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION "Ekenox".fn_validar_insumos_versao()
+RETURNS integer
+LANGUAGE sql
+IMMUTABLE
+AS $$ SELECT 1 $$;
+
+
+DROP FUNCTION IF EXISTS "Ekenox".fn_validar_insumos(bigint, double precision[], boolean, boolean);
+DROP FUNCTION IF EXISTS "Ekenox".fn_validar_insumos(bigint[], double precision[], boolean, boolean);
+
+CREATE FUNCTION "Ekenox".fn_validar_insumos(
+    p_fkprodutos bigint[],
+    p_qtd double precision[],
+    p_bloquear_negativo boolean DEFAULT true,
+    p_bloquear_insuficiente boolean DEFAULT true
+)
+RETURNS TABLE (
+    lote integer,
+    fkproduto bigint,
+    componente bigint,
+    nome text,
+    qtd_base double precision,
+    necessario double precision,
+    saldo double precision,
+    falta double precision,
+    motivo text
+)
+LANGUAGE plpgsql
+STABLE
+AS $$
+#variable_conflict use_column
+BEGIN
+    IF COALESCE(array_length(p_fkprodutos, 1), 0) <> COALESCE(array_length(p_qtd, 1), 0) THEN
+        RAISE EXCEPTION 'fn_validar_insumos: % produto(s) para % quantidade(s)',
+            COALESCE(array_length(p_fkprodutos, 1), 0), COALESCE(array_length(p_qtd, 1), 0);
+    END IF;
+
+    RETURN QUERY
+    WITH lotes AS (
+        SELECT l.i::integer AS n, l.fk, COALESCE(l.qtd, 0)::double precision AS qtd
+          FROM unnest(p_fkprodutos, p_qtd) WITH ORDINALITY AS l(fk, qtd, i)
+    ),
+    itens AS (
+        SELECT lo.n, lo.fk, lo.qtd,
+               e."componente"                                 AS comp_txt,
+               e."componente"::bigint                         AS comp,
+               COALESCE(e."quantidade", 0)::double precision  AS base
+          FROM lotes lo
+          JOIN "Ekenox".estrutura e
+            ON CASE WHEN e."fkproduto" ~ '^[0-9]+$' THEN e."fkproduto"::bigint END = lo.fk
+    ),
+    comps AS (
+        SELECT DISTINCT i.comp FROM itens i
+    ),
+    saldos AS (
+        SELECT x.comp, SUM(x.s)::double precision AS total
+          FROM (
+                SELECT CASE WHEN es."fkProduto" ~ '^[0-9]+$' THEN es."fkProduto"::bigint END AS comp,
+                       es."saldoFisico" AS s
+                  FROM "Ekenox".estoque es
+               ) x
+          JOIN comps c ON c.comp = x.comp
+         GROUP BY x.comp
+    ),
+    nomes AS (
+        SELECT c.comp,
+               regexp_replace(COALESCE(p."nomeProduto", ''), '^\s+|\s+$', '', 'g') AS nome
+          FROM comps c
+          JOIN "Ekenox".produtos p ON p."produtoId"::text = c.comp::text
+    ),
+    calc AS (
+        SELECT i.n, i.fk, i.comp, i.comp_txt, COALESCE(nm.nome, '') AS nome, i.base,
+               i.base * i.qtd          AS nec,
+               COALESCE(s.total, 0)    AS sal
+          FROM itens i
+          LEFT JOIN saldos s ON s.comp = i.comp
+          LEFT JOIN nomes nm ON nm.comp = i.comp
+    )
+    SELECT c.n, c.fk, c.comp, c.nome, c.base, c.nec, c.sal,
+           GREATEST(0::double precision, c.nec - c.sal),
+           CASE WHEN p_bloquear_negativo AND c.sal < 0 THEN 'Saldo negativo'
+                ELSE 'Saldo insuficiente' END
+      FROM calc c
+     WHERE (p_bloquear_negativo AND c.sal < 0)
+        OR (p_bloquear_insuficiente AND c.sal < c.nec)
+     ORDER BY c.n, c.comp_txt;
+END;
+$$;
+
+
+-- um produto, vários lotes
+CREATE FUNCTION "Ekenox".fn_validar_insumos(
+    p_fkproduto bigint,
+    p_qtd double precision[],
+    p_bloquear_negativo boolean DEFAULT true,
+    p_bloquear_insuficiente boolean DEFAULT true
+)
+RETURNS TABLE (
+    lote integer,
+    fkproduto bigint,
+    componente bigint,
+    nome text,
+    qtd_base double precision,
+    necessario double precision,
+    saldo double precision,
+    falta double precision,
+    motivo text
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT *
+      FROM "Ekenox".fn_validar_insumos(
+               array_fill(p_fkproduto, ARRAY[COALESCE(array_length(p_qtd, 1), 0)]),
+               p_qtd, p_bloquear_negativo, p_bloquear_insuficiente);
+$$;
+
+END;